@@ -0,0 +1,459 @@
+# dashboard/components/drive_index.py
+# -*- coding: utf-8 -*-
+"""
+Local Drive metadata index for the dashboard (SQLite)
+
+Layout tracked (same as the pipeline upload):
+  ROOT/{MARKET}/Latest/{slot}/latest_{slot}.mp4
+                             /latest_meta.json
+
+Tables:
+  items     id, name, name_l, mime, parent_id, modified_time, size, web_link
+            (ROOT + every folder / file below it that the dashboard reads)
+  summaries file_id, modified_time, youtube_video_id, privacy, raw_json
+            (parsed latest_meta.json, re-downloaded only when modifiedTime changes)
+  state     key / value: root_id, changes_token, cursor, last_full_sync, last_sync
+
+Refresh:
+  - first run / root changed / DASHBOARD_INDEX_FULL_EVERY_H elapsed => crawl the subtree
+  - otherwise Drive changes feed (changes.list from the stored page token);
+    if the changes API is unavailable, a modifiedTime cursor query is used instead
+  - DASHBOARD_INDEX_MIN_SYNC_SEC: page loads within this window make no API calls
+
+The UI reads everything with one local SELECT (latest_rows()).
+
+Env:
+  DASHBOARD_DRIVE_INDEX          (default data/cache/dashboard/drive_index.sqlite)
+  DASHBOARD_INDEX_MIN_SYNC_SEC   (default 60)
+  DASHBOARD_INDEX_FULL_EVERY_H   (default 24)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .paths import DATA_DIR
+
+FOLDER_MIME = "application/vnd.google-apps.folder"
+META_NAME = "latest_meta.json"
+FILE_FIELDS = "id,name,mimeType,parents,modifiedTime,size,webViewLink,trashed"
+
+_LOCK = threading.Lock()
+
+
+def index_path() -> str:
+    p = (os.getenv("DASHBOARD_DRIVE_INDEX") or "").strip()
+    return p or os.path.join(DATA_DIR, "cache", "dashboard", "drive_index.sqlite")
+
+
+def _min_sync_sec() -> float:
+    return float(os.getenv("DASHBOARD_INDEX_MIN_SYNC_SEC", "60"))
+
+
+def _full_every_sec() -> float:
+    return float(os.getenv("DASHBOARD_INDEX_FULL_EVERY_H", "24")) * 3600.0
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+# =============================================================================
+# Storage
+# =============================================================================
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    path = path or index_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS items (
+            id TEXT PRIMARY KEY,
+            name TEXT,
+            name_l TEXT,
+            mime TEXT,
+            parent_id TEXT,
+            modified_time TEXT,
+            size TEXT,
+            web_link TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_items_parent ON items(parent_id, name_l);
+        CREATE TABLE IF NOT EXISTS summaries (
+            file_id TEXT PRIMARY KEY,
+            modified_time TEXT,
+            youtube_video_id TEXT,
+            privacy TEXT,
+            raw_json TEXT
+        );
+        CREATE TABLE IF NOT EXISTS state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        """
+    )
+    return conn
+
+
+def _get_state(conn: sqlite3.Connection, key: str) -> str:
+    row = conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+    return str(row[0]) if row and row[0] is not None else ""
+
+
+def _set_state(conn: sqlite3.Connection, key: str, value: Any) -> None:
+    conn.execute("INSERT OR REPLACE INTO state(key, value) VALUES (?, ?)", (key, str(value)))
+
+
+def _upsert(conn: sqlite3.Connection, f: Dict[str, Any], parent_id: Optional[str] = None) -> None:
+    parents = f.get("parents") or []
+    pid = parent_id if parent_id is not None else (parents[0] if parents else "")
+    name = str(f.get("name") or "")
+    conn.execute(
+        "INSERT OR REPLACE INTO items(id, name, name_l, mime, parent_id, modified_time, size, web_link) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            str(f.get("id") or ""),
+            name,
+            name.strip().lower(),
+            str(f.get("mimeType") or ""),
+            pid,
+            str(f.get("modifiedTime") or ""),
+            str(f.get("size") or ""),
+            str(f.get("webViewLink") or ""),
+        ),
+    )
+
+
+def _delete_subtree(conn: sqlite3.Connection, item_id: str) -> None:
+    todo = [item_id]
+    while todo:
+        cur = todo.pop()
+        todo.extend(r[0] for r in conn.execute("SELECT id FROM items WHERE parent_id = ?", (cur,)))
+        conn.execute("DELETE FROM items WHERE id = ?", (cur,))
+        conn.execute("DELETE FROM summaries WHERE file_id = ?", (cur,))
+
+
+# =============================================================================
+# Drive API
+# =============================================================================
+def _list_children(service, parent_id: str) -> List[dict]:
+    out: List[dict] = []
+    page_token = None
+    while True:
+        resp = (
+            service.files()
+            .list(
+                q=f"'{parent_id}' in parents and trashed = false",
+                fields=f"nextPageToken,files({FILE_FIELDS})",
+                pageSize=1000,
+                pageToken=page_token,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True,
+            )
+            .execute()
+        )
+        out.extend(resp.get("files", []) or [])
+        page_token = resp.get("nextPageToken")
+        if not page_token:
+            return out
+
+
+def _read_json(service, file_id: str) -> Optional[dict]:
+    try:
+        data = service.files().get_media(fileId=file_id, supportsAllDrives=True).execute()
+        if not data:
+            return None
+        s = data.decode("utf-8", errors="replace") if isinstance(data, (bytes, bytearray)) else str(data)
+        obj = json.loads(s)
+        return obj if isinstance(obj, dict) else None
+    except Exception:
+        return None
+
+
+def _crawl(service, conn: sqlite3.Connection, root_id: str, markets: Iterable[str], slots: Iterable[str]) -> int:
+    """
+    Full listing of ROOT/{market}/Latest/{slot}/* (only the branches the dashboard reads).
+    """
+    markets_l = {m.lower() for m in markets}
+    slots_l = {s.lower() for s in slots}
+    conn.execute("DELETE FROM items")
+    conn.execute(
+        "INSERT OR REPLACE INTO items(id, name, name_l, mime, parent_id) VALUES (?, 'ROOT', 'root', ?, '')",
+        (root_id, FOLDER_MIME),
+    )
+    n_calls = 0
+
+    def _children(pid: str) -> List[dict]:
+        nonlocal n_calls
+        n_calls += 1
+        kids = _list_children(service, pid)
+        for f in kids:
+            _upsert(conn, f, parent_id=pid)
+        return kids
+
+    for mf in _children(root_id):
+        if mf.get("mimeType") != FOLDER_MIME or str(mf.get("name") or "").strip().lower() not in markets_l:
+            continue
+        for lf in _children(str(mf["id"])):
+            if lf.get("mimeType") != FOLDER_MIME or str(lf.get("name") or "").strip().lower() != "latest":
+                continue
+            for sf in _children(str(lf["id"])):
+                if sf.get("mimeType") == FOLDER_MIME and str(sf.get("name") or "").strip().lower() in slots_l:
+                    _children(str(sf["id"]))
+    return n_calls
+
+
+def _tracked_ids(conn: sqlite3.Connection) -> Set[str]:
+    return {r[0] for r in conn.execute("SELECT id FROM items")}
+
+
+def _apply_file(conn: sqlite3.Connection, f: Dict[str, Any], tracked: Set[str]) -> bool:
+    fid = str(f.get("id") or "")
+    if not fid:
+        return False
+    if f.get("trashed"):
+        if fid in tracked:
+            _delete_subtree(conn, fid)
+            tracked.discard(fid)
+            return True
+        return False
+    parents = [p for p in (f.get("parents") or []) if p in tracked]
+    if parents:
+        _upsert(conn, f, parent_id=parents[0])
+        tracked.add(fid)
+        return True
+    if fid in tracked:
+        # moved out of the tracked tree
+        _delete_subtree(conn, fid)
+        tracked.discard(fid)
+        return True
+    return False
+
+
+def _sync_changes(service, conn: sqlite3.Connection) -> Tuple[int, int]:
+    token = _get_state(conn, "changes_token")
+    tracked = _tracked_ids(conn)
+    n_calls = n_applied = 0
+    while token:
+        resp = (
+            service.changes()
+            .list(
+                pageToken=token,
+                fields=f"nextPageToken,newStartPageToken,changes(fileId,removed,file({FILE_FIELDS}))",
+                pageSize=1000,
+                includeItemsFromAllDrives=True,
+                supportsAllDrives=True,
+            )
+            .execute()
+        )
+        n_calls += 1
+        for ch in resp.get("changes", []) or []:
+            fid = str(ch.get("fileId") or "")
+            if ch.get("removed") or not ch.get("file"):
+                if fid in tracked:
+                    _delete_subtree(conn, fid)
+                    tracked.discard(fid)
+                    n_applied += 1
+                continue
+            n_applied += int(_apply_file(conn, ch["file"], tracked))
+        if resp.get("newStartPageToken"):
+            _set_state(conn, "changes_token", resp["newStartPageToken"])
+            break
+        token = resp.get("nextPageToken") or ""
+        _set_state(conn, "changes_token", token)
+    return n_calls, n_applied
+
+
+def _sync_cursor(service, conn: sqlite3.Connection) -> Tuple[int, int]:
+    """
+    Fallback without the changes feed: everything modified after the stored cursor.
+    (Trashed files are only dropped by the periodic full crawl.)
+    """
+    cursor = _get_state(conn, "cursor") or _now_iso()
+    tracked = _tracked_ids(conn)
+    n_calls = n_applied = 0
+    newest = cursor
+    page_token = None
+    while True:
+        resp = (
+            service.files()
+            .list(
+                q=f"modifiedTime > '{cursor}'",
+                fields=f"nextPageToken,files({FILE_FIELDS})",
+                pageSize=1000,
+                pageToken=page_token,
+                orderBy="modifiedTime",
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True,
+            )
+            .execute()
+        )
+        n_calls += 1
+        for f in resp.get("files", []) or []:
+            newest = max(newest, str(f.get("modifiedTime") or ""))
+            n_applied += int(_apply_file(conn, f, tracked))
+        page_token = resp.get("nextPageToken")
+        if not page_token:
+            break
+    _set_state(conn, "cursor", newest)
+    return n_calls, n_applied
+
+
+def _refresh_summaries(service, conn: sqlite3.Connection) -> int:
+    """
+    Download latest_meta.json only when its modifiedTime differs from the stored summary.
+    """
+    rows = conn.execute(
+        """
+        SELECT i.id, i.modified_time FROM items i
+        LEFT JOIN summaries s ON s.file_id = i.id
+        WHERE i.name_l = ? AND (s.file_id IS NULL OR s.modified_time != i.modified_time)
+        """,
+        (META_NAME,),
+    ).fetchall()
+    for fid, mtime in rows:
+        obj = _read_json(service, fid) or {}
+        conn.execute(
+            "INSERT OR REPLACE INTO summaries(file_id, modified_time, youtube_video_id, privacy, raw_json) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                fid,
+                mtime,
+                str(obj.get("youtube_video_id") or obj.get("video_id") or "").strip(),
+                str(obj.get("privacy") or "").strip(),
+                json.dumps(obj, ensure_ascii=False),
+            ),
+        )
+    return len(rows)
+
+
+def sync(
+    service,
+    root_id: str,
+    markets: Iterable[str],
+    slots: Iterable[str],
+    *,
+    force_full: bool = False,
+    conn: Optional[sqlite3.Connection] = None,
+) -> Dict[str, Any]:
+    """
+    Bring the index up to date (full crawl / changes feed / cursor) and refresh summaries.
+    """
+    own = conn is None
+    conn = conn or connect()
+    stats: Dict[str, Any] = {"mode": "skip", "api_calls": 0, "applied": 0, "summaries": 0}
+    try:
+        with _LOCK:
+            now = time.time()
+            last_sync = float(_get_state(conn, "last_sync") or 0)
+            last_full = float(_get_state(conn, "last_full_sync") or 0)
+            same_root = _get_state(conn, "root_id") == root_id
+            need_full = force_full or not same_root or (now - last_full) >= _full_every_sec()
+
+            if not need_full and (now - last_sync) < _min_sync_sec():
+                return stats
+
+            if need_full:
+                stats["mode"] = "full"
+                token = ""
+                try:
+                    token = str(service.changes().getStartPageToken(supportsAllDrives=True).execute().get("startPageToken") or "")
+                    stats["api_calls"] += 1
+                except Exception:
+                    token = ""
+                stats["api_calls"] += _crawl(service, conn, root_id, markets, slots)
+                _set_state(conn, "root_id", root_id)
+                _set_state(conn, "changes_token", token)
+                _set_state(conn, "cursor", _now_iso())
+                _set_state(conn, "last_full_sync", now)
+            else:
+                try:
+                    if not _get_state(conn, "changes_token"):
+                        raise RuntimeError("no changes token")
+                    stats["mode"] = "changes"
+                    calls, applied = _sync_changes(service, conn)
+                except Exception:
+                    stats["mode"] = "cursor"
+                    calls, applied = _sync_cursor(service, conn)
+                stats["api_calls"] += calls
+                stats["applied"] = applied
+
+            n = _refresh_summaries(service, conn)
+            stats["summaries"] = n
+            stats["api_calls"] += n
+            _set_state(conn, "last_sync", now)
+            conn.commit()
+        return stats
+    finally:
+        if own:
+            conn.close()
+
+
+# =============================================================================
+# Query (UI)
+# =============================================================================
+def latest_rows(markets: Iterable[str], slot: str, *, conn: Optional[sqlite3.Connection] = None) -> List[Dict[str, Any]]:
+    """
+    One local query; resolves ROOT/{MARKET}/Latest/{slot}/ for every market.
+    Returns dicts with market, slot, folder_path, video (item dict | None), meta (item | None), summary.
+    """
+    own = conn is None
+    conn = conn or connect()
+    try:
+        root_id = _get_state(conn, "root_id")
+        rows = conn.execute(
+            """
+            SELECT i.id, i.name, i.name_l, i.mime, i.parent_id, i.modified_time, i.size, i.web_link,
+                   s.youtube_video_id, s.privacy
+            FROM items i LEFT JOIN summaries s ON s.file_id = i.id
+            """
+        ).fetchall()
+    finally:
+        if own:
+            conn.close()
+
+    by_parent: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for r in rows:
+        item = {
+            "id": r[0],
+            "name": r[1],
+            "mime": r[3],
+            "modifiedTime": r[5],
+            "size": r[6],
+            "webViewLink": r[7],
+            "youtube_video_id": r[8] or "",
+            "privacy": r[9] or "",
+        }
+        key = (r[4], r[2])
+        # duplicate names: keep the newest, like the Drive pickers elsewhere
+        if key not in by_parent or str(item["modifiedTime"]) > str(by_parent[key]["modifiedTime"]):
+            by_parent[key] = item
+
+    slot_l = (slot or "").strip().lower()
+    out: List[Dict[str, Any]] = []
+    for m in markets:
+        m_u = m.upper()
+        rec: Dict[str, Any] = {"market": m_u, "slot": slot_l, "video": None, "meta": None}
+        mf = by_parent.get((root_id, m.lower())) if root_id else None
+        lf = by_parent.get((mf["id"], "latest")) if mf else None
+        sf = by_parent.get((lf["id"], slot_l)) if lf else None
+        if not root_id:
+            rec["folder_path"] = "(index empty)"
+        elif not mf:
+            rec["folder_path"] = f"{m_u}/(missing)"
+        elif not lf:
+            rec["folder_path"] = f"{m_u}/Latest(missing)"
+        elif not sf:
+            rec["folder_path"] = f"{m_u}/Latest/{slot_l}(missing)"
+        else:
+            rec["folder_path"] = f"{m_u}/Latest/{slot_l}"
+            rec["video"] = by_parent.get((sf["id"], f"latest_{slot_l}.mp4"))
+            rec["meta"] = by_parent.get((sf["id"], META_NAME))
+        out.append(rec)
+    return out
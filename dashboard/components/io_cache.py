@@ -5,12 +5,16 @@ from __future__ import annotations
 import os
 import json
 import glob
+from pathlib import Path
 from typing import Dict, Any, List, Tuple, Optional
 
 import pandas as pd
 import streamlit as st
 
-from .paths import TW_CACHE_DIR
+from .paths import CACHE_ROOT, TW_CACHE_DIR
+
+# columns latest_and_prev_daily() needs
+DAILY_COLUMNS = ["symbol", "date", "close", "high"]
 
 
 def read_json(path: str) -> Dict[str, Any]:
@@ -33,33 +37,61 @@ def safe_read_stocklist(path: str) -> pd.DataFrame:
     return df[["symbol", "name", "sector", "market_detail"]].drop_duplicates("symbol")
 
 
-def find_latest_payloads() -> List[str]:
-    paths = glob.glob(os.path.join(TW_CACHE_DIR, "*", "*.payload.json"))
-    paths = [p for p in paths if os.path.isfile(p)]
-    paths.sort(key=lambda p: os.path.getmtime(p), reverse=True)
-    return paths
+def _catalog():
+    # markets/ lives at repo root (dashboard is run from there)
+    from markets import payload_catalog
+
+    return payload_catalog
+
+
+@st.cache_data(ttl=30)
+def _sync_catalog(market: Optional[str]) -> int:
+    """
+    Index day folders the catalog hasn't seen (main.py write_payload records its own
+    payloads; this only catches copied / downloaded caches). Flat cost: a couple of
+    dir stats per market, listings only when a dir changed.
+    """
+    return _catalog().sync_new_days(Path(CACHE_ROOT), [market] if market else None)
 
 
-def list_days_slots() -> Tuple[List[str], Dict[str, List[str]]]:
-    days: List[str] = []
+def find_latest_payloads(market: Optional[str] = "tw", limit: int = 500) -> List[str]:
+    """
+    Payload paths, newest first (from the payload catalog; market=None => all markets).
+    """
+    _sync_catalog(market)
+    rows = _catalog().latest(market, limit=limit, cache_root=Path(CACHE_ROOT))
+    return [r["path"] for r in rows if os.path.isfile(r["path"])]
+
+
+def list_days_slots(market: Optional[str] = "tw") -> Tuple[List[str], Dict[str, List[str]]]:
+    """
+    (days desc, {day: [slots]}); with market=None days are keyed "<market>/<ymd>".
+    """
+    _sync_catalog(market)
     mapping: Dict[str, List[str]] = {}
-    for day_dir in glob.glob(os.path.join(TW_CACHE_DIR, "20??-??-??")):
-        day = os.path.basename(day_dir)
-        payloads = glob.glob(os.path.join(day_dir, "*.payload.json"))
-        if not payloads:
-            continue
-        slots = []
-        for p in payloads:
-            base = os.path.basename(p)
-            slot = base.replace(".payload.json", "")
-            slots.append(slot)
-        slots = sorted(list(set(slots)))
-        days.append(day)
-        mapping[day] = slots
-    days = sorted(list(set(days)), reverse=True)
+    for m, ymd, slot in _catalog().days_slots(market, cache_root=Path(CACHE_ROOT)):
+        key = ymd if market else f"{m}/{ymd}"
+        mapping.setdefault(key, []).append(slot)
+    for k in mapping:
+        mapping[k] = sorted(set(mapping[k]))
+    days = sorted(mapping.keys(), reverse=True)
     return days, mapping
 
 
+def catalog_frame(market: Optional[str] = None, limit: int = 500) -> pd.DataFrame:
+    """
+    Cross-market listing: market, ymd, slot, size, sha1, written_at_utc + headline stats.
+    """
+    _sync_catalog(market)
+    rows = _catalog().latest(market, limit=limit, cache_root=Path(CACHE_ROOT))
+    recs = []
+    for r in rows:
+        rec = {k: r.get(k) for k in ("market", "ymd", "slot", "size", "sha1", "written_at_utc", "path")}
+        rec.update(r.get("headline") or {})
+        recs.append(rec)
+    return pd.DataFrame(recs)
+
+
 def find_latest_daily_csv() -> Optional[str]:
     paths = glob.glob(os.path.join(TW_CACHE_DIR, "tw_prices_1d_*d_*.csv"))
     paths = [p for p in paths if os.path.isfile(p)]
@@ -75,9 +107,13 @@ def load_payload(day: str, slot: str) -> Dict[str, Any]:
     return read_json(path)
 
 
-@st.cache_data(ttl=3600)
-def load_daily_csv(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path)
+def _columnar_path(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def _read_daily_csv(path: str, columns: Optional[Tuple[str, ...]] = None) -> pd.DataFrame:
+    usecols = (lambda c: c in columns) if columns else None
+    df = pd.read_csv(path, usecols=usecols)
     for c in ["symbol", "date"]:
         if c not in df.columns:
             df[c] = ""
@@ -86,6 +122,54 @@ def load_daily_csv(path: str) -> pd.DataFrame:
     return df
 
 
+def ensure_columnar(path: str) -> Optional[str]:
+    """
+    Parquet copy of the daily CSV (rebuilt when the CSV is newer).
+    Returns None when no parquet engine (pyarrow / fastparquet) is installed.
+    """
+    pq = _columnar_path(path)
+    try:
+        if os.path.exists(pq) and os.path.getmtime(pq) >= os.path.getmtime(path):
+            return pq
+        df = _read_daily_csv(path)
+        tmp = pq + ".tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, pq)
+        return pq
+    except Exception:
+        # no parquet engine installed / read-only cache dir => CSV path
+        return None
+
+
+@st.cache_data(ttl=None, max_entries=8)
+def _load_daily(path: str, mtime: float, columns: Optional[Tuple[str, ...]]) -> pd.DataFrame:
+    pq = ensure_columnar(path)
+    if pq:
+        try:
+            df = pd.read_parquet(pq, columns=list(columns) if columns else None)
+            for c in ["symbol", "date"]:
+                if c not in df.columns:
+                    df[c] = ""
+            return df
+        except Exception:
+            # e.g. a requested column the file doesn't have
+            pass
+    return _read_daily_csv(path, columns)
+
+
+def load_daily_csv(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Daily bars (symbol, date, ...). Reads only `columns` from the parquet copy when
+    available; cache is keyed by file mtime, so it stays valid until the CSV changes.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = 0.0
+    cols = tuple(dict.fromkeys(["symbol", "date"] + list(columns))) if columns else None
+    return _load_daily(path, mtime, cols)
+
+
 def latest_and_prev_daily(daily: pd.DataFrame) -> pd.DataFrame:
     """
     回傳每檔最新日K與前一日 close/high，並算 ret。
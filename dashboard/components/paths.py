@@ -6,7 +6,8 @@ import os
 
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 DATA_DIR = os.path.join(ROOT_DIR, "data")
-TW_CACHE_DIR = os.path.join(DATA_DIR, "cache", "tw")
+CACHE_ROOT = os.path.join(DATA_DIR, "cache")
+TW_CACHE_DIR = os.path.join(CACHE_ROOT, "tw")
 PROMPTS_DIR = os.path.join(ROOT_DIR, "prompts")
 
 STOCKLIST_FILE = os.path.join(DATA_DIR, "tw_stock_list.json")
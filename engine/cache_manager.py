@@ -0,0 +1,490 @@
+# engine/cache_manager.py
+# -*- coding: utf-8 -*-
+"""
+Two-tier cache (in-process LRU + disk files) shared by the downloaders
+
+原本每個 cache 各寫一套：calendar 每天一個 JSON、TW 大 CSV（symbol hash 當 key）、
+sec_industry_cache.json ……各自的 TTL / atomic write / 沒有任何命中率可看。改成：
+
+  from engine.cache_manager import namespace
+
+  ns = namespace("calendar", dir="data/cache/calendar", ttl_sec=7 * 86400)
+  payload = ns.get("jp_1306.T_2026-01-23")          # memory -> disk -> None
+  ns.set("jp_1306.T_2026-01-23", payload)           # atomic tmp + os.replace
+  df = ns.get_or_set(key, lambda: download(...))
+
+✅ namespace = 一個目錄裡 {prefix}{key}[.v{version}]{ext} 的檔案（檔名跟舊 cache 一樣，舊檔直接命中）
+✅ TTL：以檔案 mtime 計；過期 => miss（可淘汰的 namespace 會順手刪掉）
+✅ version：檔名帶 .v{version}；改 version 時舊版本的檔案在第一次開啟 namespace 時清掉
+✅ memory tier：LRU（INTRADAY_CACHE_MEM_ITEMS），命中時 stat 一次確認檔案沒被別的 process 換掉
+   （回傳的是同一個物件，呼叫端請當唯讀）
+✅ 淘汰：每次 set() 後把「可淘汰」namespace 的總大小壓回 INTRADAY_CACHE_MAX_MB
+   （先丟過期的，再丟最久沒用的；讀取會 touch atime）=> CI cache artifact 不會一直長大
+✅ pinned（evict=False）：對外發布 / 手動維護的檔案（sec_industry_cache.json）只借用
+   讀寫 / 計數，不會被 TTL 或大小淘汰
+✅ 計數：每個 namespace 的 mem_hits / disk_hits / misses / expired / sets / evicted / load_ms / store_ms，
+   透過 markets.spans 的 meta provider 掛在 payload["meta"]["timings"]["cache"]
+
+Codecs: json (indent=2, utf-8) / bytes / pickle / csv (pandas, utf-8-sig) / parquet (pandas)
+
+Env:
+- INTRADAY_CACHE_ROOT        (default data/cache; namespaces without dir= live in <root>/_kv/<name>)
+- INTRADAY_CACHE_MAX_MB      (default 512, budget of all evictable namespaces in this process)
+- INTRADAY_CACHE_MEM_ITEMS   (default 128 objects in the memory tier)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+_MISSING = object()
+_SAFE_RE = re.compile(r"[^A-Za-z0-9._=-]+")
+_MAX_KEY_LEN = 120
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+# =============================================================================
+# Codecs
+# =============================================================================
+def _dump_json(obj: Any, path: Path) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+
+
+def _load_json(path: Path) -> Any:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _dump_bytes(obj: Any, path: Path) -> None:
+    path.write_bytes(bytes(obj))
+
+
+def _load_bytes(path: Path) -> Any:
+    return path.read_bytes()
+
+
+def _dump_pickle(obj: Any, path: Path) -> None:
+    with open(path, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load_pickle(path: Path) -> Any:
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _dump_csv(df: Any, path: Path) -> None:
+    df.to_csv(path, index=False, encoding="utf-8-sig")
+
+
+def _load_csv(path: Path) -> Any:
+    import pandas as pd
+
+    return pd.read_csv(path)
+
+
+def _dump_parquet(df: Any, path: Path) -> None:
+    df.to_parquet(path, index=False)
+
+
+def _load_parquet(path: Path) -> Any:
+    import pandas as pd
+
+    return pd.read_parquet(path)
+
+
+# name -> (ext, dump(obj, path), load(path), memory tier by default)
+CODECS: Dict[str, Tuple[str, Callable[[Any, Path], None], Callable[[Path], Any], bool]] = {
+    "json": (".json", _dump_json, _load_json, True),
+    "bytes": (".bin", _dump_bytes, _load_bytes, True),
+    # 自己 process 產生的狀態（markets.agg_state）；呼叫端會原地改 => 不進 memory tier
+    "pickle": (".pkl", _dump_pickle, _load_pickle, False),
+    # DataFrames: big + mutable => disk tier only unless memory=True
+    "csv": (".csv", _dump_csv, _load_csv, False),
+    "parquet": (".parquet", _dump_parquet, _load_parquet, False),
+}
+
+
+def safe_key(key: str) -> str:
+    """
+    Key -> file-name-safe stem (long keys keep a readable head + sha1 tail).
+    """
+    s = _SAFE_RE.sub("_", str(key)).strip("._") or "_"
+    if len(s) > _MAX_KEY_LEN:
+        import hashlib
+
+        s = s[:80] + "_" + hashlib.sha1(str(key).encode("utf-8")).hexdigest()[:16]
+    return s
+
+
+# =============================================================================
+# Namespace
+# =============================================================================
+class Namespace:
+    def __init__(
+        self,
+        manager: "CacheManager",
+        name: str,
+        *,
+        dir: Path,
+        codec: str = "json",
+        ext: Optional[str] = None,
+        prefix: str = "",
+        ttl_sec: Optional[float] = None,
+        version: Optional[str] = None,
+        evict: bool = True,
+        memory: Optional[bool] = None,
+    ):
+        if codec not in CODECS:
+            raise ValueError(f"unknown cache codec: {codec!r} (expected one of {sorted(CODECS)})")
+        c_ext, self._dump, self._load, c_mem = CODECS[codec]
+        self.manager = manager
+        self.name = name
+        self.dir = Path(dir)
+        self.codec = codec
+        self.ext = ext if ext is not None else c_ext
+        self.prefix = prefix
+        self.ttl_sec = float(ttl_sec) if ttl_sec else None
+        self.version = str(version) if version not in (None, "") else None
+        self.evictable = bool(evict)
+        self.memory = c_mem if memory is None else bool(memory)
+        self.counters: Dict[str, Any] = {
+            "mem_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "invalid": 0,
+            "errors": 0,
+            "sets": 0,
+            "evicted": 0,
+            "bytes_read": 0,
+            "bytes_written": 0,
+            "load_ms": 0.0,
+            "store_ms": 0.0,
+        }
+        if self.version is not None and self.evictable:
+            self._purge_other_versions()
+
+    # ------------------------------------------------------------------
+    def path_for(self, key: str) -> Path:
+        tag = f".v{safe_key(self.version)}" if self.version is not None else ""
+        return self.dir / f"{self.prefix}{safe_key(key)}{tag}{self.ext}"
+
+    def files(self) -> List[Path]:
+        """
+        Files owned by this namespace (prefix*ext in dir; tmp files excluded).
+        """
+        if not self.dir.is_dir():
+            return []
+        return [p for p in self.dir.glob(f"{self.prefix}*{self.ext}") if p.is_file() and not p.name.startswith(".")]
+
+    def _purge_other_versions(self) -> None:
+        tail = f".v{safe_key(self.version or '')}{self.ext}"
+        for p in self.files():
+            if not p.name.endswith(tail):
+                self._unlink(p)
+                self.counters["evicted"] += 1
+
+    def _bump(self, k: str, v: Any = 1) -> None:
+        with self.manager._lock:
+            self.counters[k] += v
+
+    def _expired(self, st: os.stat_result, now: float) -> bool:
+        return self.ttl_sec is not None and (now - st.st_mtime) > self.ttl_sec
+
+    @staticmethod
+    def _unlink(p: Path) -> None:
+        try:
+            p.unlink()
+        except OSError:
+            pass
+
+    # ------------------------------------------------------------------
+    def get(self, key: str, default: Any = None, *, validate: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        memory -> disk; miss / expired / undecodable / validate(obj) False => default.
+        """
+        path = self.path_for(key)
+        try:
+            st = path.stat()
+        except OSError:
+            self.manager._mem_drop(path)
+            self._bump("misses")
+            return default
+
+        now = time.time()
+        if self._expired(st, now):
+            self.manager._mem_drop(path)
+            if self.evictable:
+                self._unlink(path)
+            self._bump("expired")
+            self._bump("misses")
+            return default
+
+        if self.memory:
+            obj = self.manager._mem_get(path, st.st_mtime_ns)
+            if obj is not _MISSING:
+                if validate is not None and not validate(obj):
+                    self._bump("invalid")
+                    self._bump("misses")
+                    return default
+                self._bump("mem_hits")
+                return obj
+
+        t0 = time.perf_counter()
+        try:
+            obj = self._load(path)
+        except Exception:
+            self._bump("errors")
+            self._bump("misses")
+            return default
+        finally:
+            self._bump("load_ms", (time.perf_counter() - t0) * 1000.0)
+
+        if validate is not None and not validate(obj):
+            self._bump("invalid")
+            self._bump("misses")
+            return default
+
+        self._bump("disk_hits")
+        self._bump("bytes_read", int(st.st_size))
+        try:
+            # LRU touch: atime = last use, mtime stays = written at (TTL)
+            os.utime(path, (now, st.st_mtime))
+        except OSError:
+            pass
+        if self.memory:
+            self.manager._mem_put(path, st.st_mtime_ns, obj)
+        return obj
+
+    def set(self, key: str, value: Any) -> Path:
+        """
+        Atomic write (tmp + os.replace), then enforce the size budget.
+        """
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        t0 = time.perf_counter()
+        try:
+            self._dump(value, tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            self._unlink(tmp)
+            self._bump("errors")
+            raise
+        finally:
+            self._bump("store_ms", (time.perf_counter() - t0) * 1000.0)
+
+        try:
+            st = path.stat()
+            self._bump("bytes_written", int(st.st_size))
+            if self.memory:
+                self.manager._mem_put(path, st.st_mtime_ns, value)
+        except OSError:
+            pass
+        self._bump("sets")
+        if self.evictable:
+            self.manager.evict(keep=path)
+        return path
+
+    def get_or_set(self, key: str, fn: Callable[[], Any], *, validate: Optional[Callable[[Any], bool]] = None) -> Any:
+        obj = self.get(key, _MISSING, validate=validate)
+        if obj is _MISSING:
+            obj = fn()
+            if obj is not None:
+                self.set(key, obj)
+        return obj
+
+    def delete(self, key: str) -> None:
+        path = self.path_for(key)
+        self.manager._mem_drop(path)
+        self._unlink(path)
+
+    def clear(self) -> int:
+        n = 0
+        for p in self.files():
+            self.manager._mem_drop(p)
+            self._unlink(p)
+            n += 1
+        return n
+
+    def stats(self) -> Dict[str, Any]:
+        with self.manager._lock:
+            c = dict(self.counters)
+        lookups = c["mem_hits"] + c["disk_hits"] + c["misses"]
+        c["hit_rate"] = round((c["mem_hits"] + c["disk_hits"]) / lookups, 4) if lookups else None
+        c["load_ms"] = round(float(c["load_ms"]), 2)
+        c["store_ms"] = round(float(c["store_ms"]), 2)
+        return c
+
+
+# =============================================================================
+# Manager
+# =============================================================================
+class CacheManager:
+    def __init__(
+        self,
+        root: Optional[Union[str, Path]] = None,
+        *,
+        max_bytes: Optional[int] = None,
+        mem_items: Optional[int] = None,
+    ):
+        self.root = Path(root or os.getenv("INTRADAY_CACHE_ROOT") or (REPO_ROOT / "data" / "cache"))
+        self.max_bytes = int(max_bytes if max_bytes is not None else _env_int("INTRADAY_CACHE_MAX_MB", 512) * 1024 * 1024)
+        self.mem_items = max(0, int(mem_items if mem_items is not None else _env_int("INTRADAY_CACHE_MEM_ITEMS", 128)))
+        self._lock = threading.RLock()
+        self._mem: "OrderedDict[str, Tuple[int, Any]]" = OrderedDict()
+        self._namespaces: Dict[Tuple[str, str], Namespace] = {}
+
+    def namespace(self, name: str, *, dir: Optional[Union[str, Path]] = None, **kw: Any) -> Namespace:
+        """
+        Same (name, dir) => same Namespace object (counters accumulate per process).
+        """
+        d = Path(dir) if dir is not None else self.root / "_kv" / safe_key(name)
+        k = (name, str(d))
+        with self._lock:
+            ns = self._namespaces.get(k)
+            if ns is None:
+                ns = Namespace(self, name, dir=d, **kw)
+                self._namespaces[k] = ns
+            return ns
+
+    # ------------------------------------------------------------------
+    # memory tier
+    def _mem_get(self, path: Path, mtime_ns: int) -> Any:
+        k = str(path)
+        with self._lock:
+            hit = self._mem.get(k)
+            if hit is None:
+                return _MISSING
+            if hit[0] != mtime_ns:
+                # rewritten by another process since we loaded it
+                del self._mem[k]
+                return _MISSING
+            self._mem.move_to_end(k)
+            return hit[1]
+
+    def _mem_put(self, path: Path, mtime_ns: int, obj: Any) -> None:
+        if self.mem_items <= 0:
+            return
+        k = str(path)
+        with self._lock:
+            self._mem[k] = (mtime_ns, obj)
+            self._mem.move_to_end(k)
+            while len(self._mem) > self.mem_items:
+                self._mem.popitem(last=False)
+
+    def _mem_drop(self, path: Path) -> None:
+        with self._lock:
+            self._mem.pop(str(path), None)
+
+    # ------------------------------------------------------------------
+    def evict(self, *, keep: Optional[Path] = None) -> int:
+        """
+        Drop expired files, then least recently used ones until the evictable
+        namespaces fit in max_bytes. keep = the file just written (never dropped).
+        """
+        with self._lock:
+            spaces = [ns for ns in self._namespaces.values() if ns.evictable]
+        now = time.time()
+        live: List[Tuple[float, int, Path, Namespace]] = []
+        seen = set()
+        n = 0
+        for ns in spaces:
+            for p in ns.files():
+                if str(p) in seen:
+                    continue
+                seen.add(str(p))
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                if ns._expired(st, now) and p != keep:
+                    self._mem_drop(p)
+                    ns._unlink(p)
+                    ns._bump("evicted")
+                    n += 1
+                    continue
+                live.append((max(st.st_atime, st.st_mtime), int(st.st_size), p, ns))
+
+        total = sum(x[1] for x in live)
+        if total <= self.max_bytes:
+            return n
+        for _, size, p, ns in sorted(live, key=lambda x: x[0]):
+            if total <= self.max_bytes:
+                break
+            if keep is not None and p == keep:
+                continue
+            self._mem_drop(p)
+            ns._unlink(p)
+            ns._bump("evicted")
+            total -= size
+            n += 1
+        return n
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        {namespace: counters}; only namespaces that were touched in this process.
+        """
+        with self._lock:
+            spaces = list(self._namespaces.values())
+        out: Dict[str, Any] = {}
+        for ns in spaces:
+            s = ns.stats()
+            if not any(s[k] for k in ("mem_hits", "disk_hits", "misses", "sets", "evicted")):
+                continue
+            prev = out.get(ns.name)
+            if prev is None:
+                out[ns.name] = s
+            else:
+                # same name, different dir (e.g. CAL_CACHE_ROOT override): sum
+                for k, v in s.items():
+                    if isinstance(v, (int, float)) and k != "hit_rate":
+                        prev[k] = round(prev[k] + v, 2) if isinstance(v, float) else prev[k] + v
+                lookups = prev["mem_hits"] + prev["disk_hits"] + prev["misses"]
+                prev["hit_rate"] = round((prev["mem_hits"] + prev["disk_hits"]) / lookups, 4) if lookups else None
+        return out
+
+
+_DEFAULT: Optional[CacheManager] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_manager() -> CacheManager:
+    global _DEFAULT
+    if _DEFAULT is None:
+        with _DEFAULT_LOCK:
+            if _DEFAULT is None:
+                _DEFAULT = CacheManager()
+                try:
+                    from markets.spans import add_meta_provider
+
+                    add_meta_provider("cache", _DEFAULT.stats)
+                except Exception:
+                    pass
+    return _DEFAULT
+
+
+def namespace(name: str, **kw: Any) -> Namespace:
+    return get_manager().namespace(name, **kw)
+
+
+def stats() -> Dict[str, Any]:
+    return get_manager().stats() if _DEFAULT is not None else {}
@@ -0,0 +1,386 @@
+# engine/clock.py
+# -*- coding: utf-8 -*-
+"""
+Market clock — session times / holidays per market, in the market timezone
+
+取代「手動傳 --slot / --asof + CI cron」：
+  - is_trading_day(ymd)  : 週末 / 假日表 => False（完全不碰網路）
+  - is_open(at)          : 盤中（含午休判斷）
+  - slot_time(ymd, slot) : open / midday / close 的觸發時間（市場當地時間）
+  - next_run(slots)      : 下一個要跑的 (market, ymd, slot, when)，自動跳過非交易日
+  - run_forever()        : 常駐：sleep 到下一個 slot -> 觸發 main.py -> 再算下一個
+
+時區沿用 markets/timekit.py（DEFAULT_MARKET_TZ / INTRADAY_MARKET_TZ_<M>），DST 由 ZoneInfo 處理。
+
+Holidays（聯集）:
+  1) 週末
+  2) data/calendar/<market>_holidays.json   ["2026-10-10", ...]（或 {"holidays": [...]}）
+  3) env INTRADAY_HOLIDAYS_<M>=2026-10-10,2026-10-26
+  4) exchange_calendars（有裝才用；提前收盤也會反映在 close）
+
+Slot 時間（市場當地 HH:MM），env 可覆蓋 INTRADAY_SLOT_<M>_<SLOT>=HH:MM：
+  open   = 開盤 + 30 分
+  midday = 午休開始（有午休的市場）/ 盤中中點
+  close  = 收盤 + INTRADAY_CLOCK_CLOSE_DELAY_MIN（default 20，等日K資料落地）
+
+CLI:
+  python -m engine.clock --markets tw,jp,us --next            # 列出下一次觸發
+  python -m engine.clock --markets tw --is-open
+  python -m engine.clock --markets tw,cn,jp --slots open,midday,close   # 常駐
+  python -m engine.clock --markets tw --slots close --once --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from markets.timekit import _norm_market, get_market_tzinfo  # noqa: E402
+
+HOLIDAYS_DIR = REPO_ROOT / "data" / "calendar"
+SLOTS = ("open", "midday", "close")
+
+# regular sessions (market-local), lunch break = two segments
+SESSIONS: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "TW": (("09:00", "13:30"),),
+    "CN": (("09:30", "11:30"), ("13:00", "15:00")),
+    "JP": (("09:00", "11:30"), ("12:30", "15:30")),
+    "KR": (("09:00", "15:30"),),
+    "TH": (("10:00", "12:30"), ("14:30", "16:30")),
+    "IN": (("09:15", "15:30"),),
+    "US": (("09:30", "16:00"),),
+    "CA": (("09:30", "16:00"),),
+    "UK": (("08:00", "16:30"),),
+    "AU": (("10:00", "16:00"),),
+    "FR": (("09:00", "17:30"),),
+}
+
+# exchange_calendars codes (optional dependency)
+XCAL_CODES: Dict[str, str] = {
+    "TW": "XTAI",
+    "CN": "XSHG",
+    "JP": "XTKS",
+    "KR": "XKRX",
+    "TH": "XBKK",
+    "IN": "XBOM",
+    "US": "XNYS",
+    "CA": "XTSE",
+    "UK": "XLON",
+    "AU": "XASX",
+    "FR": "XPAR",
+}
+
+
+def _env_bool(name: str, default: str = "0") -> bool:
+    v = str(os.getenv(name, default)).strip().lower()
+    return v in ("1", "true", "yes", "y", "on")
+
+
+def _close_delay_min() -> int:
+    try:
+        return int(os.getenv("INTRADAY_CLOCK_CLOSE_DELAY_MIN", "20"))
+    except Exception:
+        return 20
+
+
+def _hm(s: str) -> int:
+    hh, mm = str(s).strip().split(":")[:2]
+    return int(hh) * 60 + int(mm)
+
+
+def _fmt_hm(mins: int) -> str:
+    mins = max(0, min(int(mins), 23 * 60 + 59))
+    return f"{mins // 60:02d}:{mins % 60:02d}"
+
+
+def _ymd(d: date) -> str:
+    return d.strftime("%Y-%m-%d")
+
+
+# =============================================================================
+# Holidays
+# =============================================================================
+def _load_holiday_file(market: str) -> Set[str]:
+    p = HOLIDAYS_DIR / f"{market.lower()}_holidays.json"
+    if not p.exists():
+        return set()
+    try:
+        obj = json.loads(p.read_text(encoding="utf-8"))
+    except Exception:
+        return set()
+    if isinstance(obj, dict):
+        obj = obj.get("holidays") or []
+    return {str(x)[:10] for x in obj if x}
+
+
+def _env_holidays(market: str) -> Set[str]:
+    v = (os.getenv(f"INTRADAY_HOLIDAYS_{market}") or "").strip()
+    return {s.strip()[:10] for s in v.split(",") if s.strip()}
+
+
+@lru_cache(maxsize=None)
+def _xcal(market: str) -> Any:
+    code = XCAL_CODES.get(market)
+    if not code or not _env_bool("INTRADAY_CLOCK_XCAL", "1"):
+        return None
+    try:
+        import exchange_calendars as xcals  # optional
+    except Exception:
+        return None
+    try:
+        return xcals.get_calendar(code)
+    except Exception:
+        return None
+
+
+# =============================================================================
+# Clock
+# =============================================================================
+@dataclass(frozen=True)
+class SlotRun:
+    market: str  # as passed in (main.py market key)
+    ymd: str  # market-local trading day
+    slot: str
+    at: datetime  # aware, market tz
+
+    @property
+    def asof(self) -> str:
+        return self.at.strftime("%H:%M")
+
+
+class MarketClock:
+    def __init__(
+        self,
+        market: str,
+        *,
+        holidays: Optional[Iterable[str]] = None,
+        now_fn: Optional[Callable[[], datetime]] = None,
+    ):
+        self.market = market
+        self.key = _norm_market(market)
+        self.tz = get_market_tzinfo(self.key)
+        self.segments = SESSIONS.get(self.key, (("09:00", "16:00"),))
+        self.holidays: Set[str] = set(holidays or ()) | _load_holiday_file(self.key) | _env_holidays(self.key)
+        self._now_fn = now_fn or (lambda: datetime.now(timezone.utc))
+
+    # ------------------------------------------------------------------
+    def now(self) -> datetime:
+        return self._now_fn().astimezone(self.tz)
+
+    def today_ymd(self) -> str:
+        return _ymd(self.now().date())
+
+    def _local(self, d: date, hm: str) -> datetime:
+        m = _hm(hm)
+        return datetime(d.year, d.month, d.day, m // 60, m % 60, tzinfo=self.tz)
+
+    # ------------------------------------------------------------------
+    def is_trading_day(self, ymd: str) -> bool:
+        d = datetime.strptime(str(ymd)[:10], "%Y-%m-%d").date()
+        if d.weekday() >= 5 or _ymd(d) in self.holidays:
+            return False
+        cal = _xcal(self.key)
+        if cal is not None:
+            try:
+                return bool(cal.is_session(_ymd(d)))
+            except Exception:
+                pass  # outside the calendar's range => fall back to weekday rule
+        return True
+
+    def next_trading_day(self, ymd: str, *, include: bool = True, max_days: int = 30) -> str:
+        d = datetime.strptime(str(ymd)[:10], "%Y-%m-%d").date()
+        if not include:
+            d += timedelta(days=1)
+        for _ in range(max_days):
+            if self.is_trading_day(_ymd(d)):
+                return _ymd(d)
+            d += timedelta(days=1)
+        raise RuntimeError(f"no trading day within {max_days} days after {ymd} ({self.key})")
+
+    def session_bounds(self, ymd: str) -> Optional[Tuple[datetime, datetime]]:
+        """
+        (open, close) aware datetimes; None on non-trading days. Early closes via exchange_calendars.
+        """
+        if not self.is_trading_day(ymd):
+            return None
+        d = datetime.strptime(str(ymd)[:10], "%Y-%m-%d").date()
+        opn = self._local(d, self.segments[0][0])
+        cls = self._local(d, self.segments[-1][1])
+        cal = _xcal(self.key)
+        if cal is not None:
+            try:
+                cls = cal.session_close(_ymd(d)).to_pydatetime().astimezone(self.tz)
+            except Exception:
+                pass
+        return opn, cls
+
+    def is_open(self, at: Optional[datetime] = None) -> bool:
+        at = (at or self.now()).astimezone(self.tz)
+        bounds = self.session_bounds(_ymd(at.date()))
+        if bounds is None or not (bounds[0] <= at < bounds[1]):
+            return False
+        mins = at.hour * 60 + at.minute
+        return any(_hm(a) <= mins < _hm(b) for a, b in self.segments)
+
+    # ------------------------------------------------------------------
+    def slot_hm(self, slot: str) -> str:
+        v = (os.getenv(f"INTRADAY_SLOT_{self.key}_{slot.upper()}") or "").strip()
+        if v:
+            return v
+        opn, cls = _hm(self.segments[0][0]), _hm(self.segments[-1][1])
+        if slot == "open":
+            return _fmt_hm(opn + 30)
+        if slot == "midday":
+            if len(self.segments) > 1:
+                return self.segments[0][1]
+            mid = (opn + cls) // 2
+            return _fmt_hm(mid - mid % 30)
+        if slot == "close":
+            return _fmt_hm(cls + _close_delay_min())
+        raise ValueError(f"unknown slot: {slot}")
+
+    def slot_time(self, ymd: str, slot: str) -> Optional[datetime]:
+        bounds = self.session_bounds(ymd)
+        if bounds is None:
+            return None
+        d = bounds[0].date()
+        at = self._local(d, self.slot_hm(slot))
+        if slot == "close" and not os.getenv(f"INTRADAY_SLOT_{self.key}_CLOSE"):
+            # early close (exchange_calendars) moves the close slot with it
+            at = min(at, bounds[1] + timedelta(minutes=_close_delay_min()))
+        return at
+
+    def next_run(self, slots: Iterable[str] = SLOTS, *, after: Optional[datetime] = None) -> SlotRun:
+        """
+        First (ymd, slot) with slot_time > after, skipping non-trading days.
+        """
+        after = (after or self.now()).astimezone(self.tz)
+        ymd = self.next_trading_day(_ymd(after.date()))
+        for _ in range(30):
+            runs = [(self.slot_time(ymd, s), s) for s in slots]
+            runs = sorted((t, s) for t, s in runs if t is not None and t > after)
+            if runs:
+                return SlotRun(market=self.market, ymd=ymd, slot=runs[0][1], at=runs[0][0])
+            ymd = self.next_trading_day(ymd, include=False)
+        raise RuntimeError(f"no slot run found ({self.key} {list(slots)})")
+
+
+def is_trading_day(market: str, ymd: str) -> bool:
+    return MarketClock(market).is_trading_day(ymd)
+
+
+def is_open(market: str, at: Optional[datetime] = None) -> bool:
+    return MarketClock(market).is_open(at)
+
+
+def next_run(markets: Iterable[str], slots: Iterable[str] = SLOTS, *, after: Optional[datetime] = None) -> SlotRun:
+    slots = list(slots)
+    runs = [MarketClock(m).next_run(slots, after=after) for m in markets]
+    return min(runs, key=lambda r: r.at.astimezone(timezone.utc))
+
+
+# =============================================================================
+# Long-lived driver
+# =============================================================================
+def _sleep_until(when: datetime, *, sleep: Callable[[float], None] = time.sleep, max_chunk: float = 300.0) -> None:
+    """
+    Sleep in chunks (laptop suspend / clock jumps re-check the wall clock).
+    """
+    while True:
+        left = (when - datetime.now(timezone.utc)).total_seconds()
+        if left <= 0:
+            return
+        sleep(min(left, max_chunk))
+
+
+def main_cmd(run: SlotRun, *, py: str = sys.executable, extra: Optional[List[str]] = None) -> List[str]:
+    cmd = [py, str(REPO_ROOT / "main.py"), "--market", run.market, "--slot", run.slot, "--asof", run.asof, "--no-debug"]
+    return cmd + list(extra or [])
+
+
+def run_forever(
+    markets: List[str],
+    slots: List[str],
+    *,
+    once: bool = False,
+    dry_run: bool = False,
+    limit: int = 0,
+    extra_args: Optional[List[str]] = None,
+    trigger: Optional[Callable[[SlotRun], int]] = None,
+) -> int:
+    """
+    Sleep until the next slot of any market, trigger it, repeat.
+    Non-trading days never wake the process. limit > 0 stops after that many runs.
+    """
+
+    def _default_trigger(run: SlotRun) -> int:
+        cmd = main_cmd(run, extra=extra_args)
+        print(f"▶️  {' '.join(cmd)}", flush=True)
+        if dry_run:
+            return 0
+        return subprocess.run(cmd, cwd=str(REPO_ROOT)).returncode
+
+    fire = trigger or _default_trigger
+    clocks = {m: MarketClock(m) for m in markets}
+    pending = {m: c.next_run(slots) for m, c in clocks.items()}
+    n = 0
+    rc = 0
+    while True:
+        run = min(pending.values(), key=lambda r: r.at.astimezone(timezone.utc))
+        print(f"⏰ next: {run.market} {run.ymd} {run.slot} at {run.at.isoformat(timespec='minutes')}", flush=True)
+        if not dry_run:
+            _sleep_until(run.at)
+        rc = fire(run)
+        if rc != 0:
+            print(f"⚠️ {run.market} {run.slot} exited with {rc} (continue)", flush=True)
+        pending[run.market] = clocks[run.market].next_run(slots, after=run.at)
+        n += 1
+        if once or (limit and n >= limit):
+            return rc
+
+
+def main(argv: Optional[list] = None) -> int:
+    ap = argparse.ArgumentParser(description="Market clock: sleep until the next slot and run main.py.")
+    ap.add_argument("--markets", default="tw")
+    ap.add_argument("--slots", default="open,midday,close")
+    ap.add_argument("--next", action="store_true", help="print the next run per market and exit")
+    ap.add_argument("--is-open", action="store_true", help="print open/closed per market and exit")
+    ap.add_argument("--once", action="store_true", help="run only the next slot, then exit")
+    ap.add_argument("--dry-run", action="store_true", help="print commands, do not sleep or run")
+    ap.add_argument("--limit", type=int, default=0, help="stop after N runs (--dry-run defaults to 10)")
+    ap.add_argument("extra", nargs=argparse.REMAINDER, help="extra main.py args after --")
+    args = ap.parse_args(argv)
+
+    markets = [m.strip() for m in args.markets.split(",") if m.strip()]
+    slots = [s.strip() for s in args.slots.split(",") if s.strip()]
+
+    if args.next or args.is_open:
+        for m in markets:
+            c = MarketClock(m)
+            if args.is_open:
+                print(f"{m:<6} {'OPEN' if c.is_open() else 'closed'}  now={c.now().isoformat(timespec='minutes')}")
+            if args.next:
+                r = c.next_run(slots)
+                print(f"{m:<6} next={r.ymd} {r.slot:<6} at {r.at.isoformat(timespec='minutes')}")
+        return 0
+
+    extra = [a for a in (args.extra or []) if a != "--"]
+    limit = args.limit or (10 if args.dry_run else 0)
+    return run_forever(markets, slots, once=args.once, dry_run=args.dry_run, limit=limit, extra_args=extra)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,307 @@
+# engine/db_writer.py
+# -*- coding: utf-8 -*-
+"""
+Background batched SQLite writer (one warehouse connection on its own thread)
+
+下載端原本：抓一批 -> executemany -> conn.commit() -> 才抓下一批（網路等磁碟、磁碟等網路），
+us_prices 甚至每個 fallback symbol 都 commit 一次。改成：
+
+  writer = DbWriter(db_path, name="us")
+  writer.start()
+  writer.submit(PRICES_UPSERT_SQL, price_rows(df_long), tag="batch:12")   # 不等磁碟
+  ...
+  stats = writer.close()                                                   # flush + join
+
+✅ bounded queue：寫入跟不上時 submit() 會擋住（backpressure，記憶體不會爆）
+✅ 合併交易：累積到 max_rows 筆或 max_sec 秒才 COMMIT 一次（一次 sync 只剩幾次 commit）
+✅ checkpoint：每次 COMMIT 在同一個交易裡寫 writer_checkpoint(job, seq, tag, rows, committed_at)
+   => 「最後一個已落地的 batch」是 durable 的（last_checkpoint() 讀回來）
+✅ 順序保證：submit / call 依呼叫順序執行（call(fn) 可以插 DELETE / VACUUM 前的雜項）
+✅ writer thread 出錯：之後的 submit() / close() 會把原本的例外丟回呼叫端（不會默默吃掉）
+
+Env:
+- INTRADAY_DB_WRITER_ROWS     (default 200000 rows per transaction)
+- INTRADAY_DB_WRITER_SEC      (default 10 seconds per transaction)
+- INTRADAY_DB_WRITER_QUEUE    (default 32 pending batches)
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from markets.spans import span
+
+PRICES_UPSERT_SQL = (
+    "INSERT OR REPLACE INTO stock_prices (symbol, date, open, high, low, close, volume) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+_CHECKPOINT_DDL = """
+CREATE TABLE IF NOT EXISTS writer_checkpoint (
+    job TEXT PRIMARY KEY,
+    seq INTEGER,
+    tag TEXT,
+    rows INTEGER,
+    committed_at TEXT
+)
+"""
+
+_STOP = object()
+_FLUSH = object()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def price_rows(df_long: Any) -> List[Tuple[Any, ...]]:
+    """
+    long OHLCV frame (symbol, date, open, high, low, close, volume) -> stock_prices tuples
+    """
+    import pandas as pd
+
+    if df_long is None or df_long.empty:
+        return []
+    dfw = df_long.copy()
+    dfw["volume"] = pd.to_numeric(dfw["volume"], errors="coerce")
+    for col in ["open", "high", "low", "close"]:
+        dfw[col] = pd.to_numeric(dfw[col], errors="coerce")
+    return [
+        (
+            str(r.symbol),
+            str(r.date)[:10],
+            None if pd.isna(r.open) else float(r.open),
+            None if pd.isna(r.high) else float(r.high),
+            None if pd.isna(r.low) else float(r.low),
+            None if pd.isna(r.close) else float(r.close),
+            None if pd.isna(r.volume) else int(r.volume),
+        )
+        for r in dfw.itertuples(index=False)
+    ]
+
+
+def last_checkpoint(db_path: str, job: str) -> Optional[Dict[str, Any]]:
+    """
+    Last committed batch for job (None if the writer never committed for it).
+    """
+    conn = sqlite3.connect(db_path, timeout=120)
+    try:
+        conn.execute(_CHECKPOINT_DDL)
+        r = conn.execute(
+            "SELECT job, seq, tag, rows, committed_at FROM writer_checkpoint WHERE job = ?", (job,)
+        ).fetchone()
+        if not r:
+            return None
+        return {"job": r[0], "seq": r[1], "tag": r[2], "rows": r[3], "committed_at": r[4]}
+    finally:
+        conn.close()
+
+
+class DbWriterError(RuntimeError):
+    pass
+
+
+class DbWriter:
+    def __init__(
+        self,
+        db_path: str,
+        *,
+        name: str = "db",
+        job: Optional[str] = None,
+        max_rows: Optional[int] = None,
+        max_sec: Optional[float] = None,
+        queue_size: Optional[int] = None,
+    ):
+        self.db_path = str(db_path)
+        self.name = name
+        self.job = job or name
+        self.max_rows = int(max_rows or _env_int("INTRADAY_DB_WRITER_ROWS", 200_000))
+        self.max_sec = float(max_sec if max_sec is not None else _env_float("INTRADAY_DB_WRITER_SEC", 10.0))
+        self._q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, int(queue_size or _env_int("INTRADAY_DB_WRITER_QUEUE", 32))))
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+        self._seq = 0
+        self.stats: Dict[str, Any] = {
+            "batches": 0,
+            "rows": 0,
+            "commits": 0,
+            "calls": 0,
+            "max_queue": 0,
+            "commit_s": 0.0,
+            "submit_wait_s": 0.0,
+            "last_tag": None,
+        }
+
+    # ------------------------------------------------------------------
+    def __enter__(self) -> "DbWriter":
+        return self.start()
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        # 呼叫端已經出錯時：仍然把已收到的批次 flush 掉，但不蓋掉原本的例外
+        try:
+            self.close()
+        except Exception:
+            if exc_type is None:
+                raise
+
+    def start(self) -> "DbWriter":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"db-writer-{self.name}", daemon=True)
+            self._thread.start()
+        return self
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise DbWriterError(f"db writer ({self.name}) failed: {self._error}") from self._error
+
+    def _put(self, item: Any) -> None:
+        self._raise_if_failed()
+        t0 = time.perf_counter()
+        while True:
+            try:
+                self._q.put(item, timeout=1.0)
+                break
+            except queue.Full:
+                self._raise_if_failed()
+        self.stats["submit_wait_s"] += time.perf_counter() - t0
+        self.stats["max_queue"] = max(self.stats["max_queue"], self._q.qsize())
+
+    # ------------------------------------------------------------------
+    def submit(self, sql: str, rows: Sequence[Tuple[Any, ...]], *, tag: Optional[str] = None) -> None:
+        """
+        Queue rows for executemany(sql, rows). Blocks only when the queue is full.
+        """
+        if not rows:
+            return
+        self._put(("rows", sql, list(rows), tag))
+
+    def call(self, fn: Callable[[sqlite3.Connection], Any], *, tag: Optional[str] = None) -> None:
+        """
+        Run fn(conn) on the writer thread, in submission order, inside the open transaction.
+        """
+        self._put(("call", fn, None, tag))
+
+    def flush(self) -> None:
+        """
+        Commit whatever is pending and wait until it is on disk.
+        """
+        done = threading.Event()
+        self._put((_FLUSH, done, None, None))
+        while not done.wait(timeout=1.0):
+            self._raise_if_failed()
+        self._raise_if_failed()
+
+    def close(self) -> Dict[str, Any]:
+        if self._thread is not None:
+            if self._error is None:
+                self._q.put((_STOP, None, None, None))
+            self._thread.join()
+            self._thread = None
+        self._raise_if_failed()
+        self.stats["commit_s"] = round(float(self.stats["commit_s"]), 3)
+        self.stats["submit_wait_s"] = round(float(self.stats["submit_wait_s"]), 3)
+        return dict(self.stats)
+
+    # ------------------------------------------------------------------
+    def _run(self) -> None:
+        conn = sqlite3.connect(self.db_path, timeout=120, check_same_thread=False)
+        try:
+            conn.execute(_CHECKPOINT_DDL)
+            conn.commit()
+            self._loop(conn)
+        except BaseException as e:  # noqa: BLE001 - surfaced to the caller via _raise_if_failed
+            self._error = e
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            # 讓卡在 put() 的呼叫端醒來
+            self._drain()
+        finally:
+            conn.close()
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                item = self._q.get_nowait()
+            except queue.Empty:
+                return
+            if item[0] is _FLUSH:
+                item[1].set()
+
+    def _loop(self, conn: sqlite3.Connection) -> None:
+        pending_rows = 0
+        pending_items = 0
+        last_tag: Optional[str] = None
+        opened_at: Optional[float] = None
+
+        def _commit() -> None:
+            nonlocal pending_rows, pending_items, opened_at
+            if pending_items == 0:
+                return
+            t0 = time.perf_counter()
+            with span("db_commit", market=self.name) as sp:
+                sp.rows = pending_rows
+                self._seq += 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO writer_checkpoint (job, seq, tag, rows, committed_at) VALUES (?, ?, ?, ?, ?)",
+                    (self.job, self._seq, last_tag, pending_rows, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+                )
+                conn.commit()
+            self.stats["commit_s"] += time.perf_counter() - t0
+            self.stats["commits"] += 1
+            self.stats["last_tag"] = last_tag
+            pending_rows = 0
+            pending_items = 0
+            opened_at = None
+
+        while True:
+            timeout = None
+            if opened_at is not None:
+                timeout = max(0.0, self.max_sec - (time.monotonic() - opened_at))
+            try:
+                kind, a, b, tag = self._q.get(timeout=timeout)
+            except queue.Empty:
+                _commit()  # time-based
+                continue
+
+            if kind is _STOP:
+                _commit()
+                return
+            if kind is _FLUSH:
+                _commit()
+                a.set()
+                continue
+
+            if opened_at is None:
+                opened_at = time.monotonic()
+            if kind == "rows":
+                conn.executemany(a, b)
+                pending_rows += len(b)
+                self.stats["rows"] += len(b)
+                self.stats["batches"] += 1
+            else:
+                a(conn)
+                self.stats["calls"] += 1
+            pending_items += 1
+            if tag is not None:
+                last_tag = tag
+
+            if pending_rows >= self.max_rows or (time.monotonic() - opened_at) >= self.max_sec:
+                _commit()
@@ -0,0 +1,920 @@
+# engine/intraday_runner.py
+# -*- coding: utf-8 -*-
+"""
+Intraday polling engine (TW / CN / JP; other markets = movers only)
+
+每 N 秒向 quote source 要一次「全 universe」最新報價，記憶體裡只保留每檔最新的
+OHLC（open / high / low / last / volume），並「增量」維護三個集合：
+
+  movers   : ret >= INTRADAY_MOVER_RET
+  locked   : last 在漲停價（鎖住）
+  touched  : high 曾觸及漲停價（含已鎖住；touched - locked = 炸板 / 觸及未鎖）
+
+✅ 只有報價有變的 symbol 才重新判斷（dirty set），其餘沿用上一輪結果
+✅ 漲停價每檔只算一次（prev_close 固定），沿用各市場既有規則：
+     TW : markets/tw/rules.py       (calc_limitup_price / is_limitup_locked / is_limitup_touch)
+     JP : markets/jp/jp_limit_rules (jp_limit_amount)
+     CN : markets/cn/snapshot_builder._limit_rate (+ _round_price_2 / CN_LIMIT_EPS)
+✅ 到 slot 邊界（open / midday / close, 市場當地時間）就輸出一份 payload：
+     RAW schema（snapshot_main rows 跟 downloader 一樣）-> 市場 aggregator -> main.write_payload
+     寫到 data/cache/<market>/<ymd>/<slot>.payload.json（dashboard / shorts 直接可用）
+     （aggregator 沿用上一個 slot 的 state，只重算有變的 symbol：markets/agg_state.py）
+
+Quote sources:
+  - ReplaySource   : 本地 tick 檔（JSON / JSONL），虛擬時鐘，不 sleep（測試 / 離線重播）
+  - YFinanceSource : 1m bars via markets.datasource.yf_download
+                     （INTRADAY_DATASOURCE=record / replay 時一樣可以離線重播）
+
+Replay file:
+  JSONL：每行一筆 tick {"ts": "2026-10-16T09:01:05+08:00" | epoch, "symbol": "2330.TW",
+                        "price": 1005, "volume": 12, ["high": .., "low": .., "open": ..]}
+  或 JSON：{"market": "tw", "ymd": "2026-10-16", "universe": {...}, "ticks": [...]}
+  universe：{symbol: {"prev_close": 1000, "name": "...", "sector": "...", ...其他欄位原樣帶進 row}}
+
+CLI:
+  python -m engine.intraday_runner --market tw --replay ticks.json --raw-only
+  python -m engine.intraday_runner --market cn --poll-sec 30          # live (DB universe)
+
+Env:
+- INTRADAY_POLL_SEC      (default 30)
+- INTRADAY_MOVER_RET     (default 0.10)
+- INTRADAY_YF_CHUNK      (default 200 symbols per yf_download)
+- INTRADAY_MINUTE_BARS   (default 1: minute-bar store + lock/unlock detector, engine/minute_bars.py;
+                          rows gain first_lock_hm / first_touch_hm / lock_cycles / unlock_count / minutes_locked)
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Protocol, Sequence, Set, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from engine.clock import SESSIONS  # noqa: E402
+from markets.timekit import get_market_tzinfo  # noqa: E402
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    v = os.getenv(name)
+    if v is None:
+        return default
+    v = str(v).strip().lower()
+    if v in ("1", "true", "yes", "y", "on"):
+        return True
+    if v in ("0", "false", "no", "n", "off"):
+        return False
+    return default
+
+
+POLL_SEC = _env_float("INTRADAY_POLL_SEC", 30.0)
+MOVER_RET = _env_float("INTRADAY_MOVER_RET", 0.10)
+MINUTE_BARS = _env_bool("INTRADAY_MINUTE_BARS", True)
+YF_CHUNK = int(_env_float("INTRADAY_YF_CHUNK", 200))
+
+# market-local session (first open, last close; engine/clock.py SESSIONS) + slot boundaries (HH:MM)
+DEFAULT_SESSIONS: Dict[str, Tuple[str, str]] = {
+    m.lower(): (segs[0][0], segs[-1][1]) for m, segs in SESSIONS.items()
+}
+DEFAULT_SLOTS: Dict[str, List[Tuple[str, str]]] = {
+    "tw": [("open", "09:30"), ("midday", "11:00"), ("close", "13:30")],
+    "cn": [("open", "09:45"), ("midday", "11:30"), ("close", "15:00")],
+    "jp": [("open", "09:30"), ("midday", "11:30"), ("close", "15:30")],
+    "kr": [("open", "09:30"), ("midday", "12:00"), ("close", "15:30")],
+}
+
+
+# =============================================================================
+# Quotes
+# =============================================================================
+@dataclass
+class Quote:
+    symbol: str
+    ts: float  # epoch seconds
+    price: float
+    volume: Optional[float] = None  # cumulative for the day (None = unknown)
+    high: Optional[float] = None
+    low: Optional[float] = None
+    open: Optional[float] = None
+
+
+class QuoteSource(Protocol):
+    def poll(self, symbols: Sequence[str], now: float) -> List[Quote]:
+        """Quotes that changed since the last poll (may include unchanged ones)."""
+        ...
+
+
+def _to_epoch(v: Any) -> float:
+    if isinstance(v, (int, float)):
+        return float(v)
+    s = str(v).strip().replace("Z", "+00:00")
+    dt = datetime.fromisoformat(s)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _f(v: Any) -> Optional[float]:
+    try:
+        if v is None:
+            return None
+        x = float(v)
+        if math.isnan(x) or math.isinf(x):
+            return None
+        return x
+    except Exception:
+        return None
+
+
+def quote_from_dict(d: Dict[str, Any]) -> Optional[Quote]:
+    px = _f(d.get("price", d.get("last", d.get("close"))))
+    sym = str(d.get("symbol") or "").strip()
+    if px is None or not sym or d.get("ts") is None:
+        return None
+    return Quote(
+        symbol=sym,
+        ts=_to_epoch(d["ts"]),
+        price=px,
+        volume=_f(d.get("volume")),
+        high=_f(d.get("high")),
+        low=_f(d.get("low")),
+        open=_f(d.get("open")),
+    )
+
+
+class ReplaySource:
+    """
+    Local tick replay. poll(now) returns every tick with ts <= now not returned yet.
+    """
+
+    def __init__(self, ticks: Iterable[Quote]):
+        self.ticks: List[Quote] = sorted(ticks, key=lambda q: q.ts)
+        self._i = 0
+
+    @classmethod
+    def from_file(cls, path: Path) -> Tuple["ReplaySource", Dict[str, Any]]:
+        """
+        -> (source, header) ; header = JSON object minus "ticks" ({} for JSONL)
+        """
+        text = Path(path).read_text(encoding="utf-8")
+        header: Dict[str, Any] = {}
+        rows: List[Dict[str, Any]] = []
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError:
+            obj = None  # JSONL
+        if isinstance(obj, dict) and "ticks" in obj:
+            rows = list(obj.pop("ticks") or [])
+            header = obj
+        elif isinstance(obj, list):
+            rows = obj
+        else:
+            rows = [json.loads(ln) for ln in text.splitlines() if ln.strip()]
+        ticks = [q for q in (quote_from_dict(r) for r in rows) if q is not None]
+        return cls(ticks), header
+
+    @property
+    def first_ts(self) -> Optional[float]:
+        return self.ticks[0].ts if self.ticks else None
+
+    @property
+    def last_ts(self) -> Optional[float]:
+        return self.ticks[-1].ts if self.ticks else None
+
+    def exhausted(self) -> bool:
+        return self._i >= len(self.ticks)
+
+    def poll(self, symbols: Sequence[str], now: float) -> List[Quote]:
+        out: List[Quote] = []
+        n = len(self.ticks)
+        while self._i < n and self.ticks[self._i].ts <= now:
+            out.append(self.ticks[self._i])
+            self._i += 1
+        return out
+
+
+class YFinanceSource:
+    """
+    Live 1m bars for the whole universe (chunked yf_download through markets.datasource).
+    Each poll returns one Quote per symbol: day open / high / low, last close, summed volume.
+    """
+
+    def __init__(self, *, chunk: int = YF_CHUNK):
+        self.chunk = max(1, int(chunk))
+
+    def _frame_quotes(self, df: Any, symbols: Sequence[str]) -> List[Quote]:
+        import pandas as pd
+
+        out: List[Quote] = []
+        if df is None or getattr(df, "empty", True):
+            return out
+        multi = isinstance(df.columns, pd.MultiIndex)
+        for sym in symbols:
+            try:
+                g = df[sym] if multi else df
+            except KeyError:
+                continue
+            g = g.dropna(subset=["Close"]) if "Close" in g.columns else g.iloc[0:0]
+            if g.empty:
+                continue
+            ts = pd.Timestamp(g.index[-1])
+            ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts
+            out.append(
+                Quote(
+                    symbol=sym,
+                    ts=float(ts.timestamp()),
+                    price=float(g["Close"].iloc[-1]),
+                    volume=_f(g["Volume"].sum()) if "Volume" in g.columns else None,
+                    high=_f(g["High"].max()) if "High" in g.columns else None,
+                    low=_f(g["Low"].min()) if "Low" in g.columns else None,
+                    open=_f(g["Open"].iloc[0]) if "Open" in g.columns else None,
+                )
+            )
+        return out
+
+    def poll(self, symbols: Sequence[str], now: float) -> List[Quote]:
+        from markets.datasource import yf_download
+
+        out: List[Quote] = []
+        syms = list(symbols)
+        for i in range(0, len(syms), self.chunk):
+            batch = syms[i : i + self.chunk]
+            df = yf_download(
+                tickers=batch,
+                period="1d",
+                interval="1m",
+                group_by="ticker",
+                auto_adjust=False,
+                progress=False,
+                threads=True,
+            )
+            out.extend(self._frame_quotes(df, batch))
+        return out
+
+
+# =============================================================================
+# Limit rules (per market, existing rule modules)
+# =============================================================================
+class LimitRule:
+    """No price limit: movers only."""
+
+    def limit_price(self, symbol: str, name: str, prev_close: float) -> Optional[float]:
+        return None
+
+    def is_locked(self, last: Optional[float], limit_price: float) -> bool:
+        return False
+
+    def is_touched(self, high: Optional[float], limit_price: float) -> bool:
+        return False
+
+    def tolerance(self, limit_price: float) -> float:
+        """Vectorized form for engine.minute_bars: locked = close >= limit_price - tolerance."""
+        return 0.0
+
+
+class TwLimitRule(LimitRule):
+    def __init__(self) -> None:
+        from markets.tw import rules
+
+        self._r = rules
+
+    def limit_price(self, symbol: str, name: str, prev_close: float) -> Optional[float]:
+        return float(self._r.calc_limitup_price(prev_close, up_rate=0.10))
+
+    def is_locked(self, last: Optional[float], limit_price: float) -> bool:
+        return bool(self._r.is_limitup_locked(last, limit_price))
+
+    def is_touched(self, high: Optional[float], limit_price: float) -> bool:
+        return bool(self._r.is_limitup_touch(high, limit_price))
+
+    def tolerance(self, limit_price: float) -> float:
+        return float(self._r.get_tick_size(float(limit_price))) / 2.0
+
+
+class JpLimitRule(LimitRule):
+    EPS = 1e-6
+
+    def __init__(self) -> None:
+        from markets.jp.jp_limit_rules import jp_limit_amount
+
+        self._amount = jp_limit_amount
+
+    def limit_price(self, symbol: str, name: str, prev_close: float) -> Optional[float]:
+        return float(prev_close) + float(self._amount(prev_close))
+
+    def is_locked(self, last: Optional[float], limit_price: float) -> bool:
+        return last is not None and float(last) >= float(limit_price) - self.EPS
+
+    def is_touched(self, high: Optional[float], limit_price: float) -> bool:
+        return high is not None and float(high) >= float(limit_price) - self.EPS
+
+    def tolerance(self, limit_price: float) -> float:
+        return self.EPS
+
+
+class CnLimitRule(LimitRule):
+    def __init__(self) -> None:
+        from markets.cn import snapshot_builder as sb
+
+        self._sb = sb
+        self.eps = sb._eps()
+
+    def limit_rate(self, symbol: str, name: str) -> float:
+        return float(self._sb._limit_rate(symbol, name))
+
+    def limit_price(self, symbol: str, name: str, prev_close: float) -> Optional[float]:
+        return self._sb._round_price_2(float(prev_close) * (1.0 + self.limit_rate(symbol, name)))
+
+    def is_locked(self, last: Optional[float], limit_price: float) -> bool:
+        return last is not None and float(last) >= float(limit_price) - self.eps
+
+    def is_touched(self, high: Optional[float], limit_price: float) -> bool:
+        return high is not None and float(high) >= float(limit_price) - self.eps
+
+    def tolerance(self, limit_price: float) -> float:
+        return float(self.eps)
+
+
+def limit_rule(market: str) -> LimitRule:
+    m = (market or "").strip().lower()
+    if m == "tw":
+        return TwLimitRule()
+    if m == "jp":
+        return JpLimitRule()
+    if m == "cn":
+        return CnLimitRule()
+    return LimitRule()
+
+
+# =============================================================================
+# Per-symbol state
+# =============================================================================
+@dataclass
+class SymbolState:
+    symbol: str
+    prev_close: float
+    name: str = ""
+    sector: str = ""
+    limit_price: Optional[float] = None
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    open: Optional[float] = None
+    high: Optional[float] = None
+    low: Optional[float] = None
+    last: Optional[float] = None
+    volume: Optional[float] = None
+    ts: Optional[float] = None
+
+    is_mover: bool = False
+    is_locked: bool = False
+    is_touched: bool = False
+    first_touch_ts: Optional[float] = None
+    first_lock_ts: Optional[float] = None
+
+    def apply(self, q: Quote) -> bool:
+        """
+        Merge one quote; True if anything the rules look at changed.
+        """
+        if self.ts is not None and q.ts < self.ts:
+            return False  # stale / out-of-order
+        before = (self.last, self.high, self.low, self.open)
+
+        px = float(q.price)
+        hi = max(px, q.high) if q.high is not None else px
+        lo = min(px, q.low) if q.low is not None else px
+        if self.open is None:
+            self.open = q.open if q.open is not None else px
+        self.high = hi if self.high is None else max(self.high, hi)
+        self.low = lo if self.low is None else min(self.low, lo)
+        self.last = px
+        if q.volume is not None:
+            self.volume = q.volume
+        self.ts = q.ts
+        return (self.last, self.high, self.low, self.open) != before
+
+    @property
+    def ret(self) -> Optional[float]:
+        if self.last is None or self.prev_close <= 0:
+            return None
+        return self.last / self.prev_close - 1.0
+
+    @property
+    def touch_ret(self) -> Optional[float]:
+        if self.high is None or self.prev_close <= 0:
+            return None
+        return self.high / self.prev_close - 1.0
+
+
+# =============================================================================
+# Engine
+# =============================================================================
+def _hm(s: str) -> int:
+    hh, mm = str(s).strip().split(":")[:2]
+    return int(hh) * 60 + int(mm)
+
+
+def _iso_local(ts: Optional[float], tz: Any) -> Optional[str]:
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, tz).isoformat(timespec="seconds")
+
+
+class IntradayEngine:
+    """
+    In-memory OHLC per symbol + incremental mover / locked / touched sets.
+
+    ingest(quotes)      -> apply quotes, re-evaluate only the symbols that changed
+    due_slots(now)      -> slots whose boundary (market-local HH:MM) has passed, not yet emitted
+    build_payload(slot) -> RAW payload (downloader schema: snapshot_main rows)
+    """
+
+    def __init__(
+        self,
+        market: str,
+        universe: Dict[str, Dict[str, Any]],
+        *,
+        ymd: str,
+        slots: Optional[Sequence[Tuple[str, str]]] = None,
+        mover_ret: float = MOVER_RET,
+        rule: Optional[LimitRule] = None,
+        minute_bars: Optional[bool] = None,
+    ):
+        self.market = (market or "").strip().lower()
+        self.ymd = str(ymd)[:10]
+        self.tz = get_market_tzinfo(self.market)
+        self.slots: List[Tuple[str, str]] = list(slots or DEFAULT_SLOTS.get(self.market, [("close", "16:00")]))
+        self.mover_ret = float(mover_ret)
+        self.rule = rule or limit_rule(self.market)
+
+        self.states: Dict[str, SymbolState] = {}
+        for sym, meta in (universe or {}).items():
+            pc = _f((meta or {}).get("prev_close", (meta or {}).get("last_close")))
+            if pc is None or pc <= 0:
+                continue
+            meta = dict(meta)
+            name = str(meta.pop("name", "") or "")
+            sector = str(meta.pop("sector", "") or "") or "未分類"
+            meta.pop("prev_close", None)
+            meta.pop("last_close", None)
+            self.states[sym] = SymbolState(
+                symbol=sym,
+                prev_close=pc,
+                name=name,
+                sector=sector,
+                limit_price=self.rule.limit_price(sym, name, pc),
+                extra=meta,
+            )
+
+        self.movers: Set[str] = set()
+        self.locked: Set[str] = set()
+        self.touched: Set[str] = set()
+        self.emitted: Set[str] = set()
+        self.counters: Dict[str, int] = {"polls": 0, "quotes": 0, "reevaluated": 0, "unknown_symbols": 0}
+        self.started_utc = datetime.now(timezone.utc)
+
+        # minute bars: only where there is a limit to lock on
+        self.bars: Any = None
+        if minute_bars is None:
+            minute_bars = MINUTE_BARS
+        if minute_bars and any(st.limit_price is not None for st in self.states.values()):
+            from engine.minute_bars import MinuteBarStore
+
+            self.bars = MinuteBarStore(
+                self.symbols,
+                segments=SESSIONS.get(self.market.upper(), (DEFAULT_SESSIONS.get(self.market, ("09:00", "16:00")),)),
+                tz=self.tz,
+                ymd=self.ymd,
+            )
+
+        # 上一個 slot 的 aggregator 狀態（markets.agg_state；同一個 process 直接沿用，不落地）
+        self.agg_state: Any = None
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self.states.keys())
+
+    # ------------------------------------------------------------------
+    def ingest(self, quotes: Iterable[Quote]) -> int:
+        # ts order: first_lock / first_touch come from the first quote that crossed,
+        # not from the last quote of the poll batch
+        quotes = sorted(quotes, key=lambda q: q.ts)
+        if self.bars is not None:
+            self.bars.update_quotes(quotes)
+        dirty: Set[str] = set()
+        n = 0
+        for q in quotes:
+            n += 1
+            st = self.states.get(q.symbol)
+            if st is None:
+                self.counters["unknown_symbols"] += 1
+                continue
+            if st.apply(q):
+                dirty.add(q.symbol)
+                self._mark_first_cross(st)
+        self.counters["polls"] += 1
+        self.counters["quotes"] += n
+        for sym in dirty:
+            self._reevaluate(self.states[sym])
+        self.counters["reevaluated"] += len(dirty)
+        return len(dirty)
+
+    def _mark_first_cross(self, st: SymbolState) -> None:
+        if st.limit_price is None:
+            return
+        if st.first_touch_ts is None and self.rule.is_touched(st.high, st.limit_price):
+            st.first_touch_ts = st.ts
+        if st.first_lock_ts is None and self.rule.is_locked(st.last, st.limit_price):
+            st.first_lock_ts = st.ts
+
+    def _reevaluate(self, st: SymbolState) -> None:
+        r = st.ret
+        st.is_mover = r is not None and r >= self.mover_ret
+        if st.limit_price is not None:
+            st.is_touched = self.rule.is_touched(st.high, st.limit_price)
+            st.is_locked = self.rule.is_locked(st.last, st.limit_price)
+        if st.is_touched and st.first_touch_ts is None:
+            st.first_touch_ts = st.ts
+        if st.is_locked and st.first_lock_ts is None:
+            st.first_lock_ts = st.ts
+
+        for flag, bucket in ((st.is_mover, self.movers), (st.is_locked, self.locked), (st.is_touched, self.touched)):
+            if flag:
+                bucket.add(st.symbol)
+            else:
+                bucket.discard(st.symbol)
+
+    # ------------------------------------------------------------------
+    def local_minutes(self, now: float) -> int:
+        dt = datetime.fromtimestamp(now, self.tz)
+        return dt.hour * 60 + dt.minute
+
+    def due_slots(self, now: float) -> List[str]:
+        mins = self.local_minutes(now)
+        return [s for s, hm in self.slots if s not in self.emitted and mins >= _hm(hm)]
+
+    def limit_states(self, now: Optional[float] = None) -> Any:
+        """
+        engine.minute_bars.LimitStates for every symbol (None without minute bars).
+        """
+        if self.bars is None:
+            return None
+        from engine.minute_bars import detect_limit_states
+
+        n = len(self.bars.symbols)
+        lp = [float("nan")] * n
+        tol = [0.0] * n
+        for sym, i in self.bars.index.items():
+            st = self.states[sym]
+            if st.limit_price is not None:
+                lp[i] = st.limit_price
+                tol[i] = self.rule.tolerance(st.limit_price)
+        return detect_limit_states(self.bars, lp, tol, until_ts=now)
+
+    def _row(self, st: SymbolState, ls: Any = None) -> Dict[str, Any]:
+        row: Dict[str, Any] = dict(st.extra)
+        row.update(
+            {
+                "symbol": st.symbol,
+                "name": st.name,
+                "sector": st.sector,
+                "bar_date": self.ymd,
+                "date": self.ymd,
+                "prev_close": st.prev_close,
+                "last_close": st.prev_close,
+                "open": st.open,
+                "high": st.high,
+                "low": st.low,
+                "close": st.last,
+                "volume": st.volume,
+                "ret": st.ret if st.ret is not None else 0.0,
+                "touch_ret": st.touch_ret if st.touch_ret is not None else 0.0,
+                "limit_price": st.limit_price,
+                "is_limitup_locked": bool(st.is_locked),
+                "is_limitup_touch": bool(st.is_touched),
+                "touched_only": bool(st.is_touched and not st.is_locked),
+                "is_mover": bool(st.is_mover),
+                "first_touch_at": _iso_local(st.first_touch_ts, self.tz),
+                "first_lock_at": _iso_local(st.first_lock_ts, self.tz),
+                "quote_at": _iso_local(st.ts, self.tz),
+            }
+        )
+        if isinstance(self.rule, CnLimitRule):
+            row.setdefault("limit_rate", self.rule.limit_rate(st.symbol, st.name))
+        if ls is not None and st.limit_price is not None:
+            row.update(ls.fields(self.bars.index[st.symbol]))
+        return row
+
+    def build_payload(self, slot: str, *, now: Optional[float] = None) -> Dict[str, Any]:
+        now = time.time() if now is None else now
+        ls = self.limit_states(now)
+        rows = [self._row(st, ls) for st in self.states.values() if st.last is not None]
+        asof = datetime.fromtimestamp(now, self.tz)
+        payload = {
+            "market": self.market,
+            "ymd": self.ymd,
+            "ymd_effective": self.ymd,
+            "slot": slot,
+            "asof": asof.strftime("%H:%M"),
+            "generated_at": asof.isoformat(timespec="seconds"),
+            "source": "intraday_engine",
+            "stats": {
+                "symbols_universe": int(len(self.states)),
+                "snapshot_main_count": int(len(rows)),
+                "movers_count": int(len(self.movers)),
+                "locked_count": int(len(self.locked)),
+                "touched_count": int(len(self.touched)),
+                "touched_only_count": int(len(self.touched - self.locked)),
+            },
+            "intraday": {
+                "movers": sorted(self.movers),
+                "locked": sorted(self.locked),
+                "touched_only": sorted(self.touched - self.locked),
+                "counters": dict(self.counters),
+            },
+            "snapshot_main": rows,
+            "snapshot_open": [],
+            "errors": [],
+        }
+        if ls is not None:
+            payload["stats"]["relocked_count"] = int((ls.lock_cycles > 1).sum())
+            payload["stats"]["unlocked_total"] = int(ls.unlock_count.sum())
+            payload["intraday"]["bars"] = {
+                "symbols": len(self.bars.symbols),
+                "minutes": int(ls.minutes.size),
+                "capacity": int(self.bars.capacity),
+                "mb": round(self.bars.nbytes / 1024.0 / 1024.0, 1),
+                **self.bars.counters,
+            }
+        return payload
+
+
+# =============================================================================
+# Universe
+# =============================================================================
+def load_universe_db(db_path: str, ymd: str) -> Dict[str, Dict[str, Any]]:
+    """
+    prev_close = each symbol's latest close strictly before ymd (stock_prices),
+    name / sector / market_detail from stock_info.
+    """
+    sql = """
+    SELECT p.symbol, p.close, i.name, i.sector, i.market_detail
+    FROM stock_prices p
+    JOIN (SELECT symbol, MAX(date) AS d FROM stock_prices WHERE date < ? GROUP BY symbol) m
+      ON m.symbol = p.symbol AND m.d = p.date
+    LEFT JOIN stock_info i ON i.symbol = p.symbol
+    """
+    conn = sqlite3.connect(db_path, timeout=120)
+    try:
+        out: Dict[str, Dict[str, Any]] = {}
+        for sym, close, name, sector, mdetail in conn.execute(sql, (str(ymd)[:10],)):
+            if close is None:
+                continue
+            out[str(sym)] = {
+                "prev_close": float(close),
+                "name": name or "",
+                "sector": sector or "",
+                "market_detail": mdetail or "",
+            }
+        return out
+    finally:
+        conn.close()
+
+
+def load_universe_tw(ymd: str) -> Dict[str, Dict[str, Any]]:
+    """
+    tw_stock_list.json + daily bars cache (same source as markets/tw/downloader.py).
+    """
+    from markets.tw.downloader import fetch_daily_bars, load_tw_stock_list
+
+    meta_map = load_tw_stock_list()
+    syms = [s for s, m in meta_map.items() if (m.get("market_detail") or "") != "emerging"]
+    daily, _, _ = fetch_daily_bars(syms, ymd_hint=ymd)
+    if daily is None or daily.empty:
+        return {}
+    d = daily[daily["date"].astype(str).str.slice(0, 10) < str(ymd)[:10]]
+    last = d.sort_values(["symbol", "date"]).groupby("symbol").tail(1)
+    out: Dict[str, Dict[str, Any]] = {}
+    for r in last.to_dict(orient="records"):
+        sym = str(r["symbol"])
+        pc = _f(r.get("close"))
+        if pc is None:
+            continue
+        m = dict(meta_map.get(sym) or {})
+        m.pop("symbol", None)
+        m["prev_close"] = pc
+        out[sym] = m
+    return out
+
+
+def load_universe(market: str, ymd: str) -> Dict[str, Dict[str, Any]]:
+    m = (market or "").strip().lower()
+    if m == "tw":
+        return load_universe_tw(ymd)
+    env = "INDIA_DB_PATH" if m == "in" else f"{m.upper()}_DB_PATH"
+    db = (os.getenv(env) or "").strip() or str(REPO_ROOT / "markets" / m / f"{m}_stock_warehouse.db")
+    if not os.path.exists(db):
+        raise FileNotFoundError(f"{env} not found: {db}")
+    return load_universe_db(db, ymd)
+
+
+# =============================================================================
+# Payload output
+# =============================================================================
+def _aggregate(engine: IntradayEngine, raw: Dict[str, Any]) -> Dict[str, Any]:
+    import importlib
+
+    from markets.agg_state import aggregate_with_state
+
+    mod = importlib.import_module(f"markets.{engine.market}.aggregator")
+    payload, engine.agg_state = aggregate_with_state(
+        engine.market, getattr(mod, "aggregate"), raw, engine.agg_state, ymd=engine.ymd
+    )
+    return payload
+
+
+def emit_payload(
+    engine: IntradayEngine,
+    slot: str,
+    *,
+    now: float,
+    base_dir: Path = REPO_ROOT,
+    raw_only: bool = False,
+) -> Path:
+    from main import cache_paths, write_payload
+    from markets.timekit import build_market_time_meta
+
+    raw = engine.build_payload(slot, now=now)
+    payload = raw
+    if not raw_only:
+        try:
+            payload = _aggregate(engine, raw)
+        except Exception as e:
+            # 引擎還要繼續 poll：aggregator 出錯就先寫 RAW，不要丟掉整天的狀態
+            print(f"⚠️ [intraday] aggregate failed ({engine.market}/{slot}), writing raw payload: {e}")
+            payload = raw
+            payload.setdefault("errors", []).append({"reason": "aggregate_failed", "detail": str(e)})
+
+    payload.setdefault("meta", {})
+    payload["meta"].setdefault("time", {})
+    payload["meta"]["time"].update(
+        build_market_time_meta(
+            engine.market,
+            started_utc=engine.started_utc,
+            finished_utc=datetime.fromtimestamp(now, timezone.utc),
+        )
+    )
+    payload["meta"]["intraday"] = dict(engine.counters)
+
+    paths = cache_paths(Path(base_dir), engine.market, slot, engine.ymd)
+    write_payload(paths["payload"], payload)
+    engine.emitted.add(slot)
+    return paths["payload"]
+
+
+# =============================================================================
+# Loop
+# =============================================================================
+def run(
+    engine: IntradayEngine,
+    source: QuoteSource,
+    *,
+    poll_sec: float = POLL_SEC,
+    session: Optional[Tuple[str, str]] = None,
+    clock: Optional[Callable[[], float]] = None,
+    sleep: Optional[Callable[[float], None]] = None,
+    start: Optional[float] = None,
+    on_payload: Optional[Callable[[str, float], Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Poll until the session closes and every slot has been emitted.
+
+    clock=None => virtual clock (starts at `start`, advances poll_sec per loop, no sleeping)
+    on_payload(slot, now) is called at each slot boundary (default: emit_payload).
+    """
+    sess = session or DEFAULT_SESSIONS.get(engine.market, ("00:00", "23:59"))
+    open_m, close_m = _hm(sess[0]), _hm(sess[1])
+    virtual = clock is None
+    if virtual:
+        if start is None:
+            raise ValueError("virtual clock needs start=")
+        state = {"now": float(start)}
+        clock = lambda: state["now"]  # noqa: E731
+
+        def sleep(dt: float) -> None:  # type: ignore[no-redef]
+            state["now"] += dt
+
+    sleep = sleep or time.sleep
+    emit = on_payload or (lambda slot, now: emit_payload(engine, slot, now=now))
+    slot_names = [s for s, _ in engine.slots]
+    written: List[str] = []
+
+    while True:
+        now = clock()
+        mins = engine.local_minutes(now)
+
+        if mins >= open_m:
+            t0 = time.perf_counter()
+            engine.ingest(source.poll(engine.symbols, now))
+            for slot in engine.due_slots(now):
+                emit(slot, now)
+                engine.emitted.add(slot)
+                written.append(slot)
+                print(
+                    f"📦 [intraday] {engine.market} {engine.ymd} {slot} "
+                    f"movers={len(engine.movers)} locked={len(engine.locked)} "
+                    f"touched_only={len(engine.touched - engine.locked)} "
+                    f"poll={time.perf_counter() - t0:.3f}s",
+                    flush=True,
+                )
+
+        if mins >= close_m and all(s in engine.emitted for s in slot_names):
+            break
+        sleep(float(poll_sec))
+
+    return {"slots": written, "counters": dict(engine.counters), "symbols": len(engine.states)}
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+def _parse_slots(s: str) -> List[Tuple[str, str]]:
+    out = []
+    for part in (s or "").split(","):
+        if "=" in part:
+            k, v = part.split("=", 1)
+            out.append((k.strip(), v.strip()))
+    return out
+
+
+def main(argv: Optional[list] = None) -> int:
+    ap = argparse.ArgumentParser(description="Intraday polling engine (incremental movers / locked / touched).")
+    ap.add_argument("--market", required=True)
+    ap.add_argument("--ymd", default="", help="market-local trading day (default: replay header / today)")
+    ap.add_argument("--replay", default="", help="local tick file (JSON / JSONL); virtual clock")
+    ap.add_argument("--universe", default="", help="JSON {symbol: {prev_close, name, sector}} (default: DB / replay header)")
+    ap.add_argument("--poll-sec", type=float, default=POLL_SEC)
+    ap.add_argument("--slots", default="", help="e.g. open=09:30,midday=11:00,close=13:30")
+    ap.add_argument("--session", default="", help="e.g. 09:00-13:30")
+    ap.add_argument("--raw-only", action="store_true")
+    ap.add_argument("--base-dir", default=str(REPO_ROOT))
+    args = ap.parse_args(argv)
+
+    market = args.market.strip().lower()
+    header: Dict[str, Any] = {}
+    source: QuoteSource
+    if args.replay:
+        source, header = ReplaySource.from_file(Path(args.replay))
+    else:
+        source = YFinanceSource()
+
+    tz = get_market_tzinfo(market)
+    ymd = args.ymd or str(header.get("ymd") or "")
+    if not ymd:
+        first = getattr(source, "first_ts", None)
+        ymd = datetime.fromtimestamp(first if first else time.time(), tz).strftime("%Y-%m-%d")
+
+    if args.universe:
+        universe = json.loads(Path(args.universe).read_text(encoding="utf-8"))
+    elif header.get("universe"):
+        universe = header["universe"]
+    else:
+        universe = load_universe(market, ymd)
+
+    engine = IntradayEngine(market, universe, ymd=ymd, slots=_parse_slots(args.slots) or None)
+    session = tuple(args.session.split("-", 1)) if args.session else None
+    base_dir = Path(args.base_dir)
+
+    def _emit(slot: str, now: float) -> Any:
+        return emit_payload(engine, slot, now=now, base_dir=base_dir, raw_only=args.raw_only)
+
+    if isinstance(source, ReplaySource):
+        open_hm = (session or DEFAULT_SESSIONS.get(market, ("00:00", "23:59")))[0]
+        day = datetime.strptime(ymd, "%Y-%m-%d")
+        start = day.replace(hour=_hm(open_hm) // 60, minute=_hm(open_hm) % 60, tzinfo=tz).timestamp()
+        res = run(engine, source, poll_sec=args.poll_sec, session=session, start=start, on_payload=_emit)
+    else:
+        res = run(engine, source, poll_sec=args.poll_sec, session=session, clock=time.time, on_payload=_emit)
+
+    print(json.dumps(res, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
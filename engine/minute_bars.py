@@ -0,0 +1,344 @@
+# engine/minute_bars.py
+# -*- coding: utf-8 -*-
+"""
+Minute-bar ring buffers + vectorized limit-up state detector (one session)
+
+IntradayEngine 只留每檔「最新」OHLC，只看得出 locked / touched；看不出：
+幾點第一次鎖上？中間打開（炸板）幾次？一共鎖了幾分鐘？改成每分鐘也存一根 bar：
+
+  store = MinuteBarStore(symbols, segments=SESSIONS["TW"], tz=tz, ymd="2026-10-16")
+  store.update_quotes(quotes)                    # 每次 poll 一批，numpy 向量化寫入
+  st = detect_limit_states(store, limit_price, tol)
+  st.fields(i)  -> {"first_lock_hm": "09:12", "lock_cycles": 2, "unlock_count": 1, "minutes_locked": 180, ...}
+
+✅ 預先配置的 float32 陣列 bars[field, symbol, minute]（不是 DataFrame）：
+     2k TW × 270 分鐘 ≈ 11 MB、5k CN × 240 分鐘 ≈ 24 MB（5 個欄位）
+✅ minute index = 「交易分鐘」（午休不佔位，開盤前 / 收盤後的 tick 夾到頭尾）
+✅ ring：capacity 預設 = 整個 session 的交易分鐘數，不會繞回；設小一點（INTRADAY_BARS_MINUTES）
+   就只保留最近 N 分鐘，欄位被新的一分鐘占用時整欄清成 NaN
+✅ 同一分鐘多筆 tick：open = 第一筆、high / low = 極值、close / volume = 最後一筆（依 ts）
+   volume 存的是「累積成交量」（跟 Quote.volume 一樣），每分鐘量 = 相鄰差
+✅ 沒成交的分鐘沿用上一分鐘 close（鎖漲停常常整分鐘沒成交，不能當成打開）
+✅ detector 一次對全部 symbol × 分鐘 做比較（locked = close >= limit - tol；touched = high >= limit - tol）
+   tol 至少放寬到 storage dtype 的一個 ulp（float32 存 1137.6 會變 1137.59998，不能因此判成沒鎖）
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FIELDS = ("open", "high", "low", "close", "volume")
+_O, _H, _L, _C, _V = range(len(FIELDS))
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _hm(s: str) -> int:
+    hh, mm = str(s).strip().split(":")[:2]
+    return int(hh) * 60 + int(mm)
+
+
+def _hm_str(m: int) -> str:
+    return f"{int(m) // 60:02d}:{int(m) % 60:02d}"
+
+
+# =============================================================================
+# Store
+# =============================================================================
+class MinuteBarStore:
+    def __init__(
+        self,
+        symbols: Sequence[str],
+        *,
+        segments: Sequence[Tuple[str, str]],
+        tz: Any,
+        ymd: str,
+        capacity: Optional[int] = None,
+        dtype: Any = np.float32,
+    ):
+        self.symbols: List[str] = list(symbols)
+        self.index: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+        self.tz = tz
+        self.ymd = str(ymd)[:10]
+
+        # trading-minute axis: [(seg_open_min, seg_close_min, offset)]
+        self._segs: List[Tuple[int, int, int]] = []
+        off = 0
+        for a, b in segments:
+            ma, mb = _hm(a), _hm(b)
+            self._segs.append((ma, mb, off))
+            off += mb - ma
+        self.session_minutes = max(1, off)
+
+        cap = capacity if capacity is not None else _env_int("INTRADAY_BARS_MINUTES", 0)
+        self.capacity = int(cap) if cap and int(cap) > 0 else self.session_minutes
+
+        n = len(self.symbols)
+        self.bars = np.full((len(FIELDS), n, self.capacity), np.nan, dtype=dtype)
+        self.col_minute = np.full(self.capacity, -1, dtype=np.int32)  # trading minute held by each column
+        self.last_ts = np.full(n, -np.inf, dtype=np.float64)
+        y, mo, d = (int(x) for x in self.ymd.split("-"))
+        self._midnight = datetime(y, mo, d, tzinfo=tz).timestamp()
+        self.counters: Dict[str, int] = {"ticks": 0, "stale": 0, "unknown": 0, "columns_reset": 0}
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.bars.nbytes + self.col_minute.nbytes + self.last_ts.nbytes)
+
+    # ------------------------------------------------------------------
+    def minute_index(self, local_min: np.ndarray) -> np.ndarray:
+        """
+        Local minute-of-day -> trading minute (0 .. session_minutes - 1).
+        Before the open / lunch / after the close => clamp to the nearest traded minute.
+        """
+        lm = np.asarray(local_min, dtype=np.int64)
+        out = np.zeros(lm.shape, dtype=np.int64)
+        for ma, mb, off in self._segs:
+            out = np.where(lm >= ma, np.minimum(lm, mb - 1) - ma + off, out)
+        return np.clip(out, 0, self.session_minutes - 1)
+
+    def hm_of(self, minute: int) -> str:
+        for ma, mb, off in self._segs:
+            if minute < off + (mb - ma):
+                return _hm_str(ma + minute - off)
+        return _hm_str(self._segs[-1][1] - 1)
+
+    def local_minutes(self, ts: np.ndarray) -> np.ndarray:
+        return np.floor((np.asarray(ts, dtype=np.float64) - self._midnight) / 60.0).astype(np.int64)
+
+    # ------------------------------------------------------------------
+    def update(
+        self,
+        idx: np.ndarray,
+        ts: np.ndarray,
+        price: np.ndarray,
+        *,
+        volume: Optional[np.ndarray] = None,
+        high: Optional[np.ndarray] = None,
+        low: Optional[np.ndarray] = None,
+        open_: Optional[np.ndarray] = None,
+    ) -> int:
+        """
+        Vectorized merge of one batch of ticks (any order). Returns ticks applied.
+        """
+        idx = np.asarray(idx, dtype=np.int64)
+        ts = np.asarray(ts, dtype=np.float64)
+        px = np.asarray(price, dtype=np.float64)
+        if idx.size == 0:
+            return 0
+
+        # out-of-order vs. what we already have for that symbol
+        keep = ts >= self.last_ts[idx]
+        self.counters["stale"] += int((~keep).sum())
+        order = np.argsort(np.where(keep, ts, np.inf), kind="stable")[: int(keep.sum())]
+        if order.size == 0:
+            return 0
+        idx, ts, px = idx[order], ts[order], px[order]
+        vol = None if volume is None else np.asarray(volume, dtype=np.float64)[order]
+        hi = px if high is None else np.fmax(px, np.asarray(high, dtype=np.float64)[order])
+        lo = px if low is None else np.fmin(px, np.asarray(low, dtype=np.float64)[order])
+        if open_ is None:
+            op = px
+        else:
+            o = np.asarray(open_, dtype=np.float64)[order]
+            op = np.where(np.isnan(o), px, o)
+
+        minute = self.minute_index(self.local_minutes(ts))
+        col = minute % self.capacity
+
+        # ring: claim columns for minutes not held yet; drop ticks older than the column's minute
+        held = self.col_minute[col]
+        ok = held <= minute
+        if not ok.all():
+            self.counters["stale"] += int((~ok).sum())
+            idx, ts, px, hi, lo, op, minute, col = (a[ok] for a in (idx, ts, px, hi, lo, op, minute, col))
+            vol = None if vol is None else vol[ok]
+            held = held[ok]
+        new_cols = np.unique(col[held < minute])
+        if new_cols.size:
+            self.bars[:, :, new_cols] = np.nan
+            # col -> its (newest) minute in this batch
+            for c in new_cols.tolist():
+                self.col_minute[c] = int(minute[col == c].max())
+            self.counters["columns_reset"] += int(new_cols.size)
+            live = self.col_minute[col] == minute
+            if not live.all():
+                idx, ts, px, hi, lo, op, minute, col = (a[live] for a in (idx, ts, px, hi, lo, op, minute, col))
+                vol = None if vol is None else vol[live]
+
+        # group by (symbol, column); stable sort keeps ts order inside each group
+        key = idx * self.capacity + col
+        g = np.argsort(key, kind="stable")
+        key, idx, col, ts, px, hi, lo, op = (x[g] for x in (key, idx, col, ts, px, hi, lo, op))
+        starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+        ends = np.r_[starts[1:], key.size] - 1
+        ci, cc = idx[starts], col[starts]  # one cell per group => plain fancy assignment is safe
+
+        b = self.bars
+        b[_H, ci, cc] = np.fmax(b[_H, ci, cc], np.fmax.reduceat(hi, starts))
+        b[_L, ci, cc] = np.fmin(b[_L, ci, cc], np.fmin.reduceat(lo, starts))
+        o = b[_O, ci, cc]
+        b[_O, ci, cc] = np.where(np.isnan(o), op[starts], o)
+        b[_C, ci, cc] = px[ends]
+        if vol is not None:
+            vol = vol[g]
+            # last tick with a volume in each group
+            pos = np.maximum.reduceat(np.where(np.isnan(vol), -1, np.arange(vol.size)), starts)
+            hv = pos >= starts
+            b[_V, ci[hv], cc[hv]] = vol[pos[hv]]
+
+        sym_starts = np.flatnonzero(np.r_[True, idx[1:] != idx[:-1]])
+        si = idx[sym_starts]
+        self.last_ts[si] = np.maximum(self.last_ts[si], np.maximum.reduceat(ts, sym_starts))
+        self.counters["ticks"] += int(idx.size)
+        return int(idx.size)
+
+    def update_quotes(self, quotes: Iterable[Any]) -> int:
+        """
+        Quote objects (engine.intraday_runner.Quote) -> update(); unknown symbols skipped.
+        """
+        rows = []
+        for q in quotes:
+            i = self.index.get(q.symbol)
+            if i is None:
+                self.counters["unknown"] += 1
+                continue
+            rows.append((i, q.ts, q.price, q.volume, q.high, q.low, q.open))
+        if not rows:
+            return 0
+        a = np.array(rows, dtype=np.float64)  # None -> nan
+        return self.update(
+            a[:, 0].astype(np.int64), a[:, 1], a[:, 2], volume=a[:, 3], high=a[:, 4], low=a[:, 5], open_=a[:, 6]
+        )
+
+    # ------------------------------------------------------------------
+    def ordered(self, until_minute: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (every trading minute from the first one held to the last one / until_minute,
+         its column or -1 when the ring no longer / never held it)
+        """
+        used = self.col_minute[self.col_minute >= 0]
+        if used.size == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        lo, hi = int(used.min()), int(used.max())
+        if until_minute is not None:
+            hi = max(hi, min(int(until_minute), self.session_minutes - 1))
+        minutes = np.arange(lo, hi + 1, dtype=np.int64)
+        cols = minutes % self.capacity
+        cols = np.where(self.col_minute[cols] == minutes, cols, -1)
+        return minutes, cols
+
+    def minute_of(self, ts: float) -> int:
+        return int(self.minute_index(self.local_minutes(np.array([ts])))[0])
+
+    def _gather(self, field: int, cols: np.ndarray) -> np.ndarray:
+        out = self.bars[field][:, np.maximum(cols, 0)].astype(np.float64)
+        out[:, cols < 0] = np.nan
+        return out
+
+    def frame(self, symbol: str) -> Dict[str, List[Any]]:
+        """
+        One symbol's bars as plain lists (debug / export), chronological.
+        """
+        minutes, cols = self.ordered()
+        i = self.index[symbol]
+        out: Dict[str, List[Any]] = {"hm": [self.hm_of(int(m)) for m in minutes]}
+        for k, f in enumerate(FIELDS):
+            out[f] = [None if np.isnan(v) else float(v) for v in self._gather(k, cols)[i]]
+        return out
+
+
+# =============================================================================
+# Detector
+# =============================================================================
+@dataclass
+class LimitStates:
+    minutes: np.ndarray          # trading-minute axis (first bar .. until)
+    first_lock: np.ndarray       # trading minute or -1
+    first_touch: np.ndarray      # trading minute or -1
+    lock_cycles: np.ndarray      # locked episodes (unlocked -> locked edges)
+    unlock_count: np.ndarray     # locked -> unlocked edges (炸板次數)
+    minutes_locked: np.ndarray
+    locked_last: np.ndarray      # locked in the latest minute
+    store: MinuteBarStore
+
+    def fields(self, i: int) -> Dict[str, Any]:
+        fl, ft = int(self.first_lock[i]), int(self.first_touch[i])
+        return {
+            "first_lock_hm": self.store.hm_of(fl) if fl >= 0 else None,
+            "first_touch_hm": self.store.hm_of(ft) if ft >= 0 else None,
+            "lock_cycles": int(self.lock_cycles[i]),
+            "unlock_count": int(self.unlock_count[i]),
+            "minutes_locked": int(self.minutes_locked[i]),
+        }
+
+
+def _ffill(a: np.ndarray) -> np.ndarray:
+    """
+    Forward-fill NaN along axis 1 (leading NaN stay NaN).
+    """
+    n, m = a.shape
+    if m == 0:
+        return a
+    pos = np.where(~np.isnan(a), np.arange(m)[None, :], 0)
+    np.maximum.accumulate(pos, axis=1, out=pos)
+    out = a[np.arange(n)[:, None], pos]
+    return out
+
+
+def detect_limit_states(
+    store: MinuteBarStore,
+    limit_price: Sequence[float],
+    tol: Sequence[float],
+    *,
+    until_ts: Optional[float] = None,
+) -> LimitStates:
+    """
+    limit_price / tol: one per store symbol, NaN limit => never locked / touched.
+    until_ts: extend the axis to this time (a lock with no trades since still counts).
+    """
+    until = store.minute_of(until_ts) if until_ts is not None else None
+    minutes, cols = store.ordered(until)
+    n = len(store.symbols)
+    if cols.size == 0:
+        z = np.zeros(n, dtype=np.int32)
+        return LimitStates(minutes, z - 1, z - 1, z, z.copy(), z.copy(), np.zeros(n, dtype=bool), store)
+
+    lp = np.asarray(limit_price, dtype=np.float64)
+    # bars may be float32: 1137.6 is stored as 1137.59998, below limit - 1e-6. Widen tol by one
+    # ulp of the storage dtype so the bars agree with the engine's float64 is_locked.
+    ulp = np.abs(lp) * float(np.finfo(store.bars.dtype).eps)
+    thr = (lp - np.maximum(np.asarray(tol, dtype=np.float64), ulp))[:, None]
+    close = _ffill(store._gather(_C, cols))
+    high = store._gather(_H, cols)
+
+    with np.errstate(invalid="ignore"):
+        locked = close >= thr
+        touched = (high >= thr) | locked
+
+    def _first(mask: np.ndarray) -> np.ndarray:
+        any_ = mask.any(axis=1)
+        return np.where(any_, minutes[mask.argmax(axis=1)], -1).astype(np.int32)
+
+    prev = np.zeros_like(locked)
+    prev[:, 1:] = locked[:, :-1]
+    return LimitStates(
+        minutes=minutes,
+        first_lock=_first(locked),
+        first_touch=_first(touched),
+        lock_cycles=(locked & ~prev).sum(axis=1).astype(np.int32),
+        unlock_count=(~locked & prev).sum(axis=1).astype(np.int32),
+        minutes_locked=locked.sum(axis=1).astype(np.int32),
+        locked_last=locked[:, -1].copy(),
+        store=store,
+    )
@@ -10,13 +10,17 @@ import subprocess
 import platform
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, Iterable, Tuple
+from typing import Any, Dict, Iterable, Optional, Tuple
 
 from markets.timekit import (
     market_today_ymd,
     build_market_time_meta,
 )
 
+# main.py exit code when the market clock says "not a trading day":
+# nothing was written except <slot>.skip.json, callers must not fall back to an older payload
+EXIT_NONTRADING = 3
+
 
 # =============================================================================
 # Env helpers
@@ -115,17 +119,106 @@ def cache_paths(base_dir: Path, market: str, slot: str, ymd: str) -> dict:
         "dir": cache_dir,
         "marker": cache_dir / f"{slot}.done.json",
         "payload": cache_dir / f"{slot}.payload.json",
+        "skip": cache_dir / f"{slot}.skip.json",
     }
 
 
-def should_skip_by_cache(marker_path: Path, payload_path: Path) -> bool:
+def should_skip_by_cache(
+    marker_path: Path,
+    payload_path: Path,
+    *,
+    step_cache: Any = None,
+    inputs: Optional[Dict[str, Any]] = None,
+) -> bool:
     # Cache "hit" means marker exists AND payload exists.
-    return marker_path.exists() and payload_path.exists()
+    if not (marker_path.exists() and payload_path.exists()):
+        return False
+    # ✅ Content-hash mode: inputs (DB fingerprint / code / args) and payload hash must match too.
+    if step_cache is not None and inputs is not None:
+        return bool(step_cache.is_fresh("main", inputs))
+    return True
+
+
+def main_step_inputs(args: argparse.Namespace, market: str, ymd: str) -> Dict[str, Any]:
+    """
+    Inputs that decide whether a cached payload is still valid.
+    asof is intentionally excluded (run_shorts passes the wall clock each run).
+    """
+    from markets.pipeline_cache import db_fingerprint, market_source_dirs, source_fingerprint
+
+    return {
+        "market": market,
+        "slot": args.slot,
+        "ymd": ymd,
+        "raw_only": bool(args.raw_only),
+        "allow_nontrading": bool(args.allow_nontrading),
+        "start": args.start,
+        "end": args.end,
+        "code": source_fingerprint(market_source_dirs(market)),
+        "db": db_fingerprint(market, ymd),
+    }
+
+
+# =============================================================================
+# Market clock (skip non-trading days before any sync / network work)
+# =============================================================================
+def known_nontrading_day(market: str, ymd: str) -> bool:
+    """
+    True only when the market clock is sure (weekend / holiday list / exchange calendar).
+    """
+    try:
+        from engine.clock import is_trading_day
+
+        return not is_trading_day(market, ymd)
+    except Exception:
+        return False
+
+
+def write_skip_marker(skip_path: Path, *, market: str, ymd: str, slot: str, reason: str) -> None:
+    skip_path.parent.mkdir(parents=True, exist_ok=True)
+    marker = {
+        "market": market,
+        "ymd": ymd,
+        "slot": slot,
+        "reason": reason,
+        "written_at_utc": _now_utc().isoformat(timespec="seconds").replace("+00:00", "Z"),
+    }
+    skip_path.write_text(json.dumps(marker, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
 def write_payload(payload_path: Path, payload: dict) -> None:
     payload_path.parent.mkdir(parents=True, exist_ok=True)
-    payload_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    data = json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+    payload_path.write_bytes(data)
+
+    # payload catalog (dashboard listings); never fails the run
+    try:
+        from markets import payload_catalog
+
+        payload_catalog.record(payload_path, payload, data=data)
+    except Exception as e:
+        print(f"⚠️ payload catalog update failed (continue): {e}")
+
+    # sector breadth history (rolling 5/20-day trend per sector); never fails the run
+    try:
+        from markets import sector_history
+
+        sector_history.record(payload_path, payload)
+    except Exception as e:
+        print(f"⚠️ sector history update failed (continue): {e}")
+
+
+def refresh_cross_summary() -> None:
+    # data/cache/cross_market_summary.json (all markets, this one now from sector_history);
+    # not in write_payload so --replay doesn't rebuild it once per day. Never fails the run.
+    if not parse_bool_env("CROSS_SUMMARY_AUTO", True):
+        return
+    try:
+        from markets import cross_summary
+
+        cross_summary.write(cross_summary.build())
+    except Exception as e:
+        print(f"⚠️ cross-market summary update failed (continue): {e}")
 
 
 def write_marker(marker_path: Path, payload_path: Path, meta: dict) -> None:
@@ -166,8 +259,12 @@ def maybe_update_tw_stock_list(base_dir: Path) -> None:
 # =============================================================================
 # Main
 # =============================================================================
-def main():
-    from markets.guard import guard_enabled_default
+def main(argv: Optional[list] = None) -> Optional[Dict[str, Any]]:
+    """
+    Returns the payload dict (None on cache hit) so in-process callers
+    (scripts/run_shorts.py) can hand it to the renderer without re-reading JSON.
+    """
+    from markets.guard import allow_nontrading, guard_enabled_default
     from markets.runners import RUNNERS
 
     ap = argparse.ArgumentParser()
@@ -181,13 +278,33 @@ def main():
     ap.add_argument("--start", default=None)
     ap.add_argument("--end", default=None)
     ap.add_argument("--no-refresh-list", action="store_true")
+    ap.add_argument("--no-sync", action="store_true", help="Skip the warehouse sync stage (already done by a scheduler)")
+    ap.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Sync before the step-cache check (picks up late data corrections; a hit then still skips the build)",
+    )
+    ap.add_argument("--sync-only", action="store_true", help="Run only the warehouse sync stage, write no payload")
+    ap.add_argument(
+        "--profile",
+        default="",
+        help="Profile stages, e.g. sync,aggregate or snapshot:mem (same as INTRADAY_PROFILE; see markets/profiling.py)",
+    )
+    ap.add_argument(
+        "--replay",
+        default=None,
+        metavar="START..END",
+        help="Backfill one payload per trading day in [START, END] from a single warehouse pass (see markets/replay.py)",
+    )
+    ap.add_argument("--workers", type=int, default=None, help="Worker processes for --replay (INTRADAY_REPLAY_WORKERS)")
+    ap.add_argument("--profile-mode", default=None, choices=["cpu", "mem", "pyspy"], help="Default mode for --profile")
 
     # ✅ Default ON debug (your request)
     ap.add_argument("--no-debug", action="store_true", help="Disable main.py debug prints/tree")
     ap.add_argument("--debug-tree-depth", type=int, default=5)
     ap.add_argument("--debug-tree-max", type=int, default=250)
 
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     dbg_on = _debug_enabled(args.no_debug)
 
@@ -199,11 +316,80 @@ def main():
     if args.no_cache:
         enable_cache = False
 
+    from markets import profiling, spans
+
+    spans.reset()
+    base_dir = Path(__file__).resolve().parent
+
+    # ✅ Opt-in profiling (INTRADAY_PROFILE env is picked up on import)
+    if args.profile:
+        profiling.install(args.profile, mode=args.profile_mode)
+
+    # ✅ Historical replay: no sync / guard / marker — only days the warehouse already has
+    if args.replay:
+        from markets.replay import parse_range, run_replay
+
+        start, end = parse_range(args.replay)
+        res_replay = run_replay(
+            args.market,
+            start,
+            end,
+            slot=args.slot,
+            asof=args.asof,
+            base_dir=base_dir,
+            workers=args.workers,
+            raw_only=bool(args.raw_only),
+        )
+        if res_replay["failed"]:
+            raise SystemExit(1)
+        return None
+
+    # ✅ Non-trading day => stop here (the guard would only refuse after sync already ran)
+    if guard_enabled_default() and not allow_nontrading(args):
+        today_ymd = market_today_ymd(args.market)
+        if known_nontrading_day(args.market, today_ymd):
+            print(f"⏭️  Skip (non-trading day per market clock): market={args.market} ymd={today_ymd}")
+            if args.sync_only:
+                return None
+            skip = cache_paths(base_dir, args.market, args.slot, today_ymd)["skip"]
+            write_skip_marker(skip, market=args.market, ymd=today_ymd, slot=args.slot, reason="nontrading")
+            raise SystemExit(EXIT_NONTRADING)
+
+    # ✅ Sync-only stage (scripts/run_daily.py runs network sync separately)
+    if args.sync_only:
+        from markets.runners import SYNCERS
+
+        syncer = SYNCERS.get(args.market)
+        if syncer is None:
+            print(f"⏭️  No sync stage for market={args.market} (skip)")
+            return None
+        sync_ymd = market_today_ymd(args.market)
+        profiling.set_output(base_dir / "data" / "cache" / args.market / sync_ymd, tag="sync")
+        res_sync = syncer(args)
+        profiling.finish()
+        spans.flush(
+            spans.sidecar_path(base_dir, args.market, sync_ymd),
+            market=args.market, ymd=sync_ymd, stage="sync",
+        )
+        try:
+            print(f"✅ Synced: market={args.market} {json.dumps(res_sync, ensure_ascii=False, default=str)}")
+        except Exception:
+            print(f"✅ Synced: market={args.market}")
+        return None
+
     # ✅ ymd is market-local (unified for all markets)
     ymd = market_today_ymd(args.market)
 
-    base_dir = Path(__file__).resolve().parent
     paths = cache_paths(base_dir, args.market, args.slot, ymd)
+    profiling.set_output(paths["dir"], tag=args.slot)
+
+    # ✅ Step fingerprint (DB / code / args) instead of marker-existence only.
+    # INTRADAY_CACHE_FINGERPRINT=0 restores the old existence-only behavior.
+    step_cache = None
+    if enable_cache and parse_bool_env("INTRADAY_CACHE_FINGERPRINT", True):
+        from markets.pipeline_cache import StepCache, steps_manifest_path
+
+        step_cache = StepCache(steps_manifest_path(base_dir, args.market, ymd, args.slot))
 
     meta: Dict[str, Any] = {
         "market": args.market,
@@ -227,19 +413,43 @@ def main():
     _dbg(f"[debug] marker_path={paths['marker']}", enabled=dbg_on)
     _dbg(f"[debug] enable_cache={enable_cache} force={bool(args.force)}", enabled=dbg_on)
 
-    if enable_cache and (not args.force) and should_skip_by_cache(paths["marker"], paths["payload"]):
+    # ✅ --refresh: sync even when a hit is possible, so a late data correction is fetched and
+    # shows up in the (content) DB fingerprint. Off by default: a hit then costs no network.
+    # The runner skips its own sync (args.presync carries the result into the payload filters).
+    if (
+        args.refresh
+        and step_cache is not None
+        and not args.force
+        and not args.no_sync
+        and paths["marker"].exists()
+        and paths["payload"].exists()
+    ):
+        from markets.runners import SYNCERS
+
+        syncer = SYNCERS.get(args.market)
+        if syncer is not None:
+            args.presync = syncer(args)
+            args.no_sync = True
+
+    pre_inputs = main_step_inputs(args, args.market, ymd) if step_cache is not None else None
+
+    if enable_cache and (not args.force) and should_skip_by_cache(
+        paths["marker"], paths["payload"], step_cache=step_cache, inputs=pre_inputs
+    ):
         print(f"⏭️  Skip (cache hit): {paths['marker']}")
         if dbg_on:
             _tree(paths["dir"], enabled=True, max_depth=args.debug_tree_depth, max_items=args.debug_tree_max)
-        return
+        return None
 
     runner = RUNNERS.get(args.market)
     if not runner:
         raise RuntimeError(f"Unknown market: {args.market}")
 
     started_utc = _now_utc()
-    payload = runner(args, base_dir, ymd, meta)
+    with spans.span("main", market=args.market, slot=args.slot):
+        payload = runner(args, base_dir, ymd, meta)
     finished_utc = _now_utc()
+    profiling.finish()
 
     # Normalize required fields
     payload.setdefault("market", args.market)
@@ -258,15 +468,25 @@ def main():
         build_market_time_meta(args.market, started_utc=started_utc, finished_utc=finished_utc)
     )
 
+    # ✅ Stage spans (INTRADAY_TIMINGS=0 disables): summary only, records go to timings.jsonl below
+    if spans.enabled():
+        payload["meta"]["timings"] = spans.payload_timings()
+
     # -------------------------------------------------------------------------
     # ✅ CRITICAL FIX:
     # Always write payload json (run_shorts.py depends on it).
     # Cache flag only controls marker + skip behavior.
     # -------------------------------------------------------------------------
     write_payload(paths["payload"], payload)
+    paths["skip"].unlink(missing_ok=True)  # e.g. --allow-nontrading rerun of a skipped day
+    refresh_cross_summary()
+    spans.flush(spans.sidecar_path(base_dir, args.market, ymd), market=args.market, ymd=ymd, slot=args.slot, stage="main")
 
     if enable_cache:
         write_marker(paths["marker"], paths["payload"], meta)
+        if step_cache is not None:
+            # record the DB state the payload was actually built from (post-sync)
+            step_cache.record("main", main_step_inputs(args, args.market, ymd), outputs={"payload": paths["payload"]})
         print(f"✅ Cached: {paths['payload']}")
     else:
         print(f"✅ Payload written (cache disabled): {paths['payload']}")
@@ -278,6 +498,8 @@ def main():
     if dbg_on:
         _tree(paths["dir"], enabled=True, max_depth=args.debug_tree_depth, max_items=args.debug_tree_max)
 
+    return payload
+
 
 if __name__ == "__main__":
     main()
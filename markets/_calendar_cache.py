@@ -2,41 +2,36 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
-import json
-import os
 from datetime import timedelta
 from typing import Any, Dict, List, Optional
 
 import pandas as pd
-import yfinance as yf
+
+from markets.spans import span_fn
 
 
 def _safe_ticker(t: str) -> str:
     return (t or "").replace("^", "").replace("=", "_").replace("/", "_").replace("\\", "_").strip() or "ticker"
 
 
-def _calendar_cache_path(*, cache_root: str, market: str, calendar_ticker: str, asof_ymd: str) -> str:
-    os.makedirs(cache_root, exist_ok=True)
-    fn = f"{market}_{_safe_ticker(calendar_ticker)}_{asof_ymd}.json"
-    return os.path.join(cache_root, fn)
+# one JSON per (market, ticker, asof day); older days are never read again => TTL lets
+# engine.cache_manager evict them instead of piling up in data/cache/calendar
+_CAL_TTL_SEC = 7 * 86400
 
 
-def _load_calendar_cache(path: str) -> Optional[dict]:
-    try:
-        if not os.path.exists(path):
-            return None
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return None
+def _calendar_ns(cache_root: str) -> Any:
+    from engine.cache_manager import namespace
+
+    return namespace("calendar", dir=cache_root, ttl_sec=_CAL_TTL_SEC)
+
 
+def _calendar_cache_key(*, market: str, calendar_ticker: str, asof_ymd: str) -> str:
+    return f"{market}_{_safe_ticker(calendar_ticker)}_{asof_ymd}"
 
-def _save_calendar_cache(path: str, payload: dict) -> None:
+
+def _save_calendar_cache(ns: Any, key: str, payload: dict) -> None:
     try:
-        tmp = path + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
-        os.replace(tmp, path)
+        ns.set(key, payload)
     except Exception:
         pass
 
@@ -48,7 +43,9 @@ def _download_calendar_dates(
     end_dt: pd.Timestamp,
     timeout_sec: int = 30,
 ) -> List[pd.Timestamp]:
-    df = yf.download(
+    from markets.datasource import yf_download
+
+    df = yf_download(
         ticker,
         start=start_dt.strftime("%Y-%m-%d"),
         end=(end_dt + timedelta(days=1)).strftime("%Y-%m-%d"),
@@ -89,6 +86,7 @@ def _fallback_payload(
     }
 
 
+@span_fn("calendar")
 def _get_trading_window_cached(
     *,
     market: str,
@@ -113,14 +111,11 @@ def _get_trading_window_cached(
         "cache_path": "...",
       }
     """
-    cache_path = _calendar_cache_path(
-        cache_root=cache_root,
-        market=market,
-        calendar_ticker=calendar_ticker,
-        asof_ymd=asof_ymd,
-    )
-    cached = _load_calendar_cache(cache_path)
-    if cached and isinstance(cached, dict) and cached.get("asof_ymd") == asof_ymd:
+    ns = _calendar_ns(cache_root)
+    key = _calendar_cache_key(market=market, calendar_ticker=calendar_ticker, asof_ymd=asof_ymd)
+    cache_path = str(ns.path_for(key))
+    cached = ns.get(key, validate=lambda c: isinstance(c, dict) and c.get("asof_ymd") == asof_ymd)
+    if cached:
         return cached
 
     end_dt = pd.to_datetime(asof_ymd)
@@ -141,7 +136,7 @@ def _get_trading_window_cached(
             fallback_rolling_cal_days=fallback_rolling_cal_days,
             error=err or "calendar_empty",
         )
-        _save_calendar_cache(cache_path, payload)
+        _save_calendar_cache(ns, key, payload)
         return payload
 
     # <= asof
@@ -154,7 +149,7 @@ def _get_trading_window_cached(
             fallback_rolling_cal_days=fallback_rolling_cal_days,
             error=err or "calendar_filtered_empty",
         )
-        _save_calendar_cache(cache_path, payload)
+        _save_calendar_cache(ns, key, payload)
         return payload
 
     latest_ymd = dates_dt[-1].strftime("%Y-%m-%d")
@@ -174,7 +169,7 @@ def _get_trading_window_cached(
             "calendar_ticker": calendar_ticker,
             "cache_path": cache_path,
         }
-        _save_calendar_cache(cache_path, payload)
+        _save_calendar_cache(ns, key, payload)
         return payload
 
     # insufficient dates -> fallback cal-days (but keep latest)
@@ -186,5 +181,5 @@ def _get_trading_window_cached(
         error=err or "calendar_insufficient_dates",
         latest_ymd=latest_ymd,
     )
-    _save_calendar_cache(cache_path, payload)
+    _save_calendar_cache(ns, key, payload)
     return payload
@@ -0,0 +1,456 @@
+# markets/agg_state.py
+# -*- coding: utf-8 -*-
+"""
+Slot-to-slot aggregation reuse within one trading day
+
+同一個 (market, ymd) 的 open / midday / close 每次都從頭 aggregate：
+universe / sector 分母、peers、snapshot_main 的 to_dict + sanitize、各種「前一交易日」DB 查詢……
+日 K 市場大部分跟上一個 slot 一樣，盤中模式也只有變動的 symbol 不同。改成：
+
+  from markets.agg_state import aggregate_with_state
+
+  payload, state = aggregate_with_state("tw", aggregate, raw_payload, prev_state)
+
+aggregator 簽名不變；aggregate_with_state 期間有一個 thread-local 的 SlotState，
+aggregator 內部用下面幾個 hook（沒有 state 時就是原本的完整計算）：
+
+  rows(name, df, build)                 per-symbol 輸出列：input row hash 沒變 => 直接沿用上一個 slot 的輸出
+                                        （build 必須是 row-local：build(df.iloc[changed]) 一列對一列）
+  sector_counts(name, keys, sectors)    universe / sector 分母：只對新增 / 移除 / 換 sector 的 symbol 做 +/- 1
+  memo(name, key, fn, deps=)            per-(symbol, ymd) 的 DB 查詢（上市日、前一交易日 OHLC、連板數）
+  memo_many(name, keys, fetch, deps=)   同上，只查還沒查過的 symbols（deps 帶 db_token()，DB 一變就整包作廢）
+
+✅ 輸出跟完整重算一致：state 只在 (market, ymd, STATE_VERSION, 程式碼 / env 指紋) 都一樣時沿用，
+   rows 另外比對 schema（columns + dtypes）；DB 類 memo 以 db_token()（db + -wal 的 mtime/size）當 deps
+✅ verify：INTRADAY_AGG_VERIFY=1（或 verify=True）時另外用 deepcopy 的 raw 完整重算一次，
+   兩份 payload 不一樣就丟 AggStateMismatch（訊息帶第一個不同的路徑）
+✅ 持久化：main.py 每個 slot 是獨立 process => state 以 pickle 存在
+   data/cache/<market>/<ymd>/agg_state.v<STATE_VERSION>.pkl（engine.cache_manager namespace）；
+   engine/intraday_runner 同一個 process 裡直接把上一個 slot 的 state 傳進來
+✅ 計數（reused / built / memo hits）掛在 payload["meta"]["timings"]["agg_state"]
+
+Env:
+- INTRADAY_AGG_STATE    (default 1; 0 => 每個 slot 完整重算)
+- INTRADAY_AGG_VERIFY   (default 0)
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from markets.spans import add_meta_provider
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+STATE_VERSION = 1
+
+# 兩次 aggregate 之間一定不同、比對時忽略的欄位
+VOLATILE_KEYS = frozenset({"aggregated_at", "generated_at"})
+
+_ENV_RE = re.compile(r"^(TW|CN|JP|KR|TH|US|CA|UK|AU|FR|IN|INDIA)_")
+
+_local = threading.local()
+_last_stats: Dict[str, Any] = {}
+_code_token_cache: Optional[str] = None
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    v = os.getenv(name)
+    if v is None:
+        return default
+    return str(v).strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+class AggStateMismatch(AssertionError):
+    pass
+
+
+# =============================================================================
+# State
+# =============================================================================
+@dataclass
+class SlotState:
+    market: str
+    ymd: str
+    slot: str = ""
+    version: int = STATE_VERSION
+    code: str = ""
+    env: str = ""
+    # rows name -> {"schema": ..., "rows": {key: (row_hash, output)}}
+    rows: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # sector_counts name -> {"sectors": {key: raw_sector}, "norm": {key: sector}, "counts": Counter}
+    sectors: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # memo name -> {"deps": deps, "values": {key: (found, value)}}
+    memo: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    stats: Dict[str, int] = field(default_factory=dict)
+
+    def bump(self, name: str, n: int = 1) -> None:
+        self.stats[name] = self.stats.get(name, 0) + int(n)
+
+
+def _code_token() -> str:
+    """
+    markets/**/*.py 檔案指紋（換版 / 改程式之後上一個 slot 的輸出不能再沿用）；一個 process 算一次
+    """
+    global _code_token_cache
+    if _code_token_cache is None:
+        h = hashlib.sha1()
+        root = REPO_ROOT / "markets"
+        for f in sorted(root.rglob("*.py")):
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            h.update(f"{f.relative_to(root)}:{st.st_mtime_ns}:{st.st_size};".encode())
+        _code_token_cache = h.hexdigest()
+    return _code_token_cache
+
+
+def _env_token() -> str:
+    h = hashlib.sha1()
+    for k in sorted(k for k in os.environ if _ENV_RE.match(k)):
+        h.update(f"{k}={os.environ[k]};".encode())
+    return h.hexdigest()
+
+
+def db_token(db_path: Optional[str]) -> Tuple[Any, ...]:
+    """
+    (path, mtime_ns, size) of the db and its -wal file: memo deps for DB lookups
+    """
+    if not db_path:
+        return ("",)
+    out: List[Any] = [os.path.abspath(str(db_path))]
+    for p in (str(db_path), str(db_path) + "-wal"):
+        try:
+            st = os.stat(p)
+            out.extend([st.st_mtime_ns, st.st_size])
+        except OSError:
+            out.extend([None, None])
+    return tuple(out)
+
+
+def active() -> Optional[SlotState]:
+    return getattr(_local, "state", None)
+
+
+def enabled() -> bool:
+    return _env_bool("INTRADAY_AGG_STATE", True)
+
+
+# =============================================================================
+# Hooks (called inside aggregators; no state => full computation)
+# =============================================================================
+def rows(name: str, df: Any, build: Callable[[Any], List[Any]], *, key: str = "symbol") -> List[Any]:
+    """
+    build(df) -> one output per input row, in order. With a state, only rows whose
+    input hash changed since the previous slot go through build().
+    """
+    st = active()
+    if st is None or df is None or len(df) == 0 or key not in df.columns:
+        return build(df)
+
+    import pandas as pd
+
+    try:
+        hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    except Exception:
+        return build(df)
+
+    keys = df[key].astype(str).tolist()
+    if len(set(keys)) != len(keys):
+        return build(df)
+
+    schema = (tuple(str(c) for c in df.columns), tuple(str(t) for t in df.dtypes))
+    prev = st.rows.get(name)
+    old: Dict[str, Tuple[int, Any]] = prev["rows"] if prev and prev.get("schema") == schema else {}
+
+    out: List[Any] = [None] * len(keys)
+    changed: List[int] = []
+    for i, (k, hv) in enumerate(zip(keys, hashes)):
+        hit = old.get(k)
+        if hit is not None and hit[0] == int(hv):
+            out[i] = copy.copy(hit[1])
+        else:
+            changed.append(i)
+
+    if changed:
+        built = build(df.iloc[changed])
+        if len(built) != len(changed):
+            # builder 不是一列對一列（filter / dedupe）=> 不能沿用
+            st.rows.pop(name, None)
+            return build(df)
+        for i, o in zip(changed, built):
+            out[i] = o
+
+    st.rows[name] = {
+        "schema": schema,
+        "rows": {k: (int(hv), copy.copy(o)) for k, hv, o in zip(keys, hashes, out)},
+    }
+    st.bump("rows_reused", len(keys) - len(changed))
+    st.bump("rows_built", len(changed))
+    return out
+
+
+def sector_counts(
+    name: str,
+    keys: Sequence[str],
+    sectors: Sequence[Any],
+    norm: Optional[Callable[[Any], Optional[str]]] = None,
+) -> Counter:
+    """
+    Counter(norm(sector)) over the universe; norm(...) -> None drops the row
+    (groupby dropna). With a state, only added / removed / re-sectored keys are touched.
+    """
+    fn = norm or (lambda s: s)
+
+    def _full() -> Counter:
+        c: Counter = Counter()
+        for s in sectors:
+            v = fn(s)
+            if v is not None:
+                c[v] += 1
+        return c
+
+    st = active()
+    keys = [str(k) for k in keys]
+    if st is None or len(set(keys)) != len(keys) or len(keys) != len(sectors):
+        return _full()
+
+    prev = st.sectors.get(name)
+    raw_new = dict(zip(keys, sectors))
+    if not prev:
+        normed = {k: fn(s) for k, s in raw_new.items()}
+        counts = Counter(v for v in normed.values() if v is not None)
+        touched = len(keys)
+    else:
+        raw_old, normed, counts = prev["sectors"], dict(prev["norm"]), Counter(prev["counts"])
+        touched = 0
+        for k in [k for k in raw_old if k not in raw_new]:
+            v = normed.pop(k)
+            if v is not None:
+                counts[v] -= 1
+            touched += 1
+        for k, s in raw_new.items():
+            if k in raw_old and raw_old[k] == s:
+                continue
+            v_old = normed.get(k)
+            if k in raw_old and v_old is not None:
+                counts[v_old] -= 1
+            v = fn(s)
+            normed[k] = v
+            if v is not None:
+                counts[v] += 1
+            touched += 1
+        counts = +counts  # drop zero / negative buckets
+
+    st.sectors[name] = {"sectors": raw_new, "norm": normed, "counts": Counter(counts)}
+    st.bump("sector_keys_touched", touched)
+    st.bump("sector_keys_reused", len(keys) - touched if prev else 0)
+    return Counter(counts)
+
+
+def _memo_ns(st: SlotState, name: str, deps: Tuple[Any, ...]) -> Dict[Hashable, Tuple[bool, Any]]:
+    ns = st.memo.get(name)
+    if ns is None or ns.get("deps") != deps:
+        ns = {"deps": deps, "values": {}}
+        st.memo[name] = ns
+    return ns["values"]
+
+
+def memo(name: str, key: Hashable, fn: Callable[[], Any], *, deps: Tuple[Any, ...] = ()) -> Any:
+    st = active()
+    if st is None:
+        return fn()
+    values = _memo_ns(st, name, tuple(deps))
+    if key in values:
+        st.bump("memo_hits")
+        return copy.copy(values[key][1])
+    v = fn()
+    values[key] = (True, copy.copy(v))
+    st.bump("memo_misses")
+    return v
+
+
+def memo_many(
+    name: str,
+    keys: Iterable[Hashable],
+    fetch: Callable[[List[Hashable]], Dict[Hashable, Any]],
+    *,
+    deps: Tuple[Any, ...] = (),
+) -> Dict[Hashable, Any]:
+    """
+    fetch(missing_keys) -> {key: value}; keys absent from the result are remembered as absent.
+    """
+    keys = list(keys)
+    st = active()
+    if st is None:
+        return fetch(keys)
+    values = _memo_ns(st, name, tuple(deps))
+    missing = [k for k in keys if k not in values]
+    if missing:
+        got = fetch(missing) or {}
+        for k in missing:
+            values[k] = (k in got, copy.copy(got.get(k)))
+    st.bump("memo_hits", len(keys) - len(missing))
+    st.bump("memo_misses", len(missing))
+    out: Dict[Hashable, Any] = {}
+    for k in keys:
+        found, v = values[k]
+        if found:
+            out[k] = copy.copy(v)
+    return out
+
+
+# =============================================================================
+# Driver
+# =============================================================================
+def _state_ns(market: str, ymd: str, base_dir: Optional[Path] = None) -> Any:
+    from engine.cache_manager import namespace
+
+    d = Path(base_dir or REPO_ROOT) / "data" / "cache" / market / ymd
+    return namespace("agg_state", dir=d, codec="pickle", version=STATE_VERSION, ttl_sec=3 * 86400)
+
+
+def load_state(market: str, ymd: str, *, base_dir: Optional[Path] = None) -> Optional[SlotState]:
+    if not enabled() or not ymd:
+        return None
+    try:
+        st = _state_ns(market, ymd, base_dir).get("agg_state")
+    except Exception:
+        return None
+    return st if isinstance(st, SlotState) else None
+
+
+def save_state(state: Optional[SlotState], *, base_dir: Optional[Path] = None) -> None:
+    if state is None or not state.ymd:
+        return
+    try:
+        _state_ns(state.market, state.ymd, base_dir).set("agg_state", state)
+    except Exception as e:
+        print(f"⚠️ [agg_state] save failed ({state.market}/{state.ymd}): {e}")
+
+
+def _fresh(market: str, ymd: str, prev: Optional[SlotState]) -> SlotState:
+    code, env = _code_token(), _env_token()
+    if (
+        prev is not None
+        and prev.market == market
+        and prev.ymd == ymd
+        and prev.version == STATE_VERSION
+        and prev.code == code
+        and prev.env == env
+    ):
+        prev.stats = {}
+        return prev
+    return SlotState(market=market, ymd=ymd, code=code, env=env)
+
+
+def first_diff(a: Any, b: Any, path: str = "$") -> Optional[str]:
+    """
+    First differing path between two payloads (NaN == NaN, VOLATILE_KEYS ignored); None if equal.
+    """
+    if isinstance(a, dict) and isinstance(b, dict):
+        ka = [k for k in a if k not in VOLATILE_KEYS]
+        kb = [k for k in b if k not in VOLATILE_KEYS]
+        if ka != kb:
+            return f"{path} keys: {sorted(map(str, set(ka) ^ set(kb)))[:10] or 'order'}"
+        for k in ka:
+            d = first_diff(a[k], b[k], f"{path}.{k}")
+            if d:
+                return d
+        return None
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        if len(a) != len(b):
+            return f"{path} len {len(a)} != {len(b)}"
+        for i, (x, y) in enumerate(zip(a, b)):
+            d = first_diff(x, y, f"{path}[{i}]")
+            if d:
+                return d
+        return None
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return None
+    try:
+        if a is b or a == b:
+            return None
+    except Exception:
+        pass
+    return f"{path}: {a!r} != {b!r}"
+
+
+def aggregate_with_state(
+    market: str,
+    fn: Callable[[Dict[str, Any]], Dict[str, Any]],
+    payload: Dict[str, Any],
+    prev_state: Optional[SlotState] = None,
+    *,
+    ymd: Optional[str] = None,
+    verify: Optional[bool] = None,
+) -> Tuple[Dict[str, Any], Optional[SlotState]]:
+    """
+    Run fn(payload) with the previous slot's state active. Returns (payload, state for the next slot).
+    """
+    global _last_stats
+
+    if not enabled():
+        return fn(payload), None
+
+    market = str(market or "").lower()
+    ymd = str(ymd or (payload or {}).get("ymd") or "")[:10]
+    state = _fresh(market, ymd, prev_state)
+    state.slot = str((payload or {}).get("slot") or "")
+    verify = _env_bool("INTRADAY_AGG_VERIFY", False) if verify is None else bool(verify)
+
+    # aggregator 會改 raw（JP/TH 直接寫回 raw_payload）=> verify 要先留一份
+    raw_copy = copy.deepcopy(payload) if verify else None
+
+    _local.state = state
+    try:
+        out = fn(payload)
+    finally:
+        _local.state = None
+
+    if raw_copy is not None:
+        full = fn(raw_copy)
+        diff = first_diff(out, full)
+        if diff:
+            raise AggStateMismatch(f"[agg_state] {market}/{ymd}/{state.slot} incremental != full rebuild: {diff}")
+        state.bump("verified")
+
+    _last_stats = dict(state.stats)
+    return out, state
+
+
+def aggregate_slot(
+    market: str,
+    fn: Callable[[Dict[str, Any]], Dict[str, Any]],
+    payload: Dict[str, Any],
+    *,
+    ymd: Optional[str] = None,
+    base_dir: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """
+    main.py runners: load this day's state from disk, aggregate, save it back for the next slot.
+    """
+    if not enabled():
+        return fn(payload)
+    ymd = str(ymd or (payload or {}).get("ymd") or "")[:10]
+    prev = load_state(str(market).lower(), ymd, base_dir=base_dir)
+    out, state = aggregate_with_state(market, fn, payload, prev, ymd=ymd)
+    save_state(state, base_dir=base_dir)
+    return out
+
+
+def stats() -> Dict[str, Any]:
+    return dict(_last_stats)
+
+
+add_meta_provider("agg_state", stats)
@@ -8,7 +8,7 @@ AU rolling-window price sync (DB-based) — Batch + Clean Stats
 ✅ run_sync(start_date=None, end_date=None, refresh_list=True)
 
 下載策略：
-✅ batch：yf.download("CBA.AX BHP.AX ...", group_by="ticker")
+✅ batch：yf_download("CBA.AX BHP.AX ...", group_by="ticker")
 ✅ 單檔 fallback：只救最終失敗者（可關）
 
 環境變數（AU 版）：
@@ -39,9 +39,10 @@ from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
-import yfinance as yf
 from tqdm import tqdm
 
+from engine.db_writer import PRICES_UPSERT_SQL, DbWriter, price_rows
+
 # -----------------------------------------------------------------------------
 # Optional imports
 # -----------------------------------------------------------------------------
@@ -181,6 +182,8 @@ def init_db(db_path: str) -> None:
 # Calendar helpers (fallback internal)
 # =============================================================================
 def _latest_trading_day_from_calendar(asof_ymd: Optional[str] = None) -> Optional[str]:
+    from markets.datasource import yf_download
+
     if _latest_td_ext is not None:
         try:
             return _latest_td_ext(asof_ymd=asof_ymd)
@@ -192,7 +195,7 @@ def _latest_trading_day_from_calendar(asof_ymd: Optional[str] = None) -> Optiona
     try:
         end_dt = pd.to_datetime(asof_ymd) if asof_ymd else pd.Timestamp.now()
         start_dt = end_dt - timedelta(days=lookback)
-        df = yf.download(
+        df = yf_download(
             cal_ticker,
             start=start_dt.strftime("%Y-%m-%d"),
             end=(end_dt + timedelta(days=1)).strftime("%Y-%m-%d"),
@@ -216,6 +219,8 @@ def _latest_trading_day_from_calendar(asof_ymd: Optional[str] = None) -> Optiona
 
 
 def _infer_window_by_trading_days(end_ymd: str, n_trading_days: int) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    from markets.datasource import yf_download
+
     if _infer_window_ext is not None:
         try:
             return _infer_window_ext(end_ymd=end_ymd, n_trading_days=n_trading_days)
@@ -227,7 +232,7 @@ def _infer_window_by_trading_days(end_ymd: str, n_trading_days: int) -> Tuple[Op
     try:
         end_dt = pd.to_datetime(end_ymd)
         start_dt = end_dt - timedelta(days=lookback)
-        df = yf.download(
+        df = yf_download(
             cal_ticker,
             start=start_dt.strftime("%Y-%m-%d"),
             end=(end_dt + timedelta(days=1)).strftime("%Y-%m-%d"),
@@ -417,11 +422,13 @@ def _load_items_df_for_stock_info(refresh_list: bool) -> pd.DataFrame:
 # Download core (batch + single fallback)
 # =============================================================================
 def _download_one(symbol: str, start_date: str, end_date_exclusive: str) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    from markets.datasource import yf_download
+
     max_retries = 2
     last_err: Optional[str] = None
     for attempt in range(max_retries + 1):
         try:
-            df = yf.download(
+            df = yf_download(
                 symbol,
                 start=start_date,
                 end=end_date_exclusive,
@@ -478,12 +485,14 @@ def _download_batch(
     回傳 (long_df, failed_tickers, err_msg)
     long_df 欄位：symbol,date,open,high,low,close,volume
     """
+    from markets.datasource import yf_download
+
     if not tickers:
         empty = pd.DataFrame(columns=["symbol", "date", "open", "high", "low", "close", "volume"])
         return empty, [], None
 
     try:
-        df = yf.download(
+        df = yf_download(
             tickers=" ".join(tickers),
             start=start_date,
             end=end_date_exclusive,
@@ -587,34 +596,6 @@ def _download_batch(
     return out, sorted(list(set(failed))), None
 
 
-def _insert_prices(conn: sqlite3.Connection, df_long: pd.DataFrame) -> None:
-    if df_long is None or df_long.empty:
-        return
-
-    dfw = df_long.copy()
-    dfw["volume"] = pd.to_numeric(dfw["volume"], errors="coerce")
-    for col in ["open", "high", "low", "close"]:
-        dfw[col] = pd.to_numeric(dfw[col], errors="coerce")
-
-    rows = [
-        (
-            str(r.symbol),
-            str(r.date)[:10],
-            None if pd.isna(r.open) else float(r.open),
-            None if pd.isna(r.high) else float(r.high),
-            None if pd.isna(r.low) else float(r.low),
-            None if pd.isna(r.close) else float(r.close),
-            None if pd.isna(r.volume) else int(r.volume),
-        )
-        for r in dfw.itertuples(index=False)
-    ]
-
-    conn.executemany(
-        "INSERT OR REPLACE INTO stock_prices (symbol, date, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?)",
-        rows,
-    )
-
-
 def _write_download_errors(
     conn: sqlite3.Connection,
     final_failed: Dict[str, str],
@@ -722,9 +703,9 @@ def run_sync(
     ok_set: set[str] = set()
     final_failed: Dict[str, str] = {}
 
-    conn = sqlite3.connect(db_path, timeout=120)
-    try:
-        for batch in pbar:
+    # ✅ 寫入交給背景 writer（合併交易、不擋下載）；離開 with 時 flush + checkpoint
+    with DbWriter(db_path, name="au", job="au_prices") as writer:
+        for bi, batch in enumerate(pbar):
             df_long, failed_batch, err_msg = _download_batch(batch, start_ymd, end_excl_date)
 
             if err_msg:
@@ -734,8 +715,7 @@ def run_sync(
                 continue
 
             if df_long is not None and not df_long.empty:
-                _insert_prices(conn, df_long)
-                conn.commit()
+                writer.submit(PRICES_UPSERT_SQL, price_rows(df_long), tag=f"batch:{bi}")
 
             failed_batch_set = set(failed_batch or [])
             for sym in batch:
@@ -750,8 +730,7 @@ def run_sync(
                 for sym in need_fallback:
                     df_one, err_one = _download_one(sym, start_ymd, end_excl_date)
                     if df_one is not None and not df_one.empty:
-                        _insert_prices(conn, df_one)
-                        conn.commit()
+                        writer.submit(PRICES_UPSERT_SQL, price_rows(df_one), tag=f"single:{sym}")
                         ok_set.add(sym)
                         final_failed.pop(sym, None)
                     else:
@@ -761,6 +740,11 @@ def run_sync(
 
             time.sleep(_batch_sleep_sec())
 
+    writer_stats = writer.stats
+    log(f"💾 writer: {writer_stats['rows']} rows / {writer_stats['batches']} batches in {writer_stats['commits']} commits")
+
+    conn = sqlite3.connect(db_path, timeout=120)
+    try:
         _write_download_errors(conn, final_failed, name_map, start_ymd, end_inclusive)
         conn.commit()
 
@@ -161,6 +161,79 @@ def _build_status_text(ret: float, touched_only: bool, th: float) -> str:
     return ""
 
 
+# {day_filter}: 單日 "date = ?" / replay "date BETWEEN ? AND ?"（同一個 window pass 算整段）
+_FLAGS_SQL = """
+WITH p AS (
+  SELECT
+    symbol,
+    date,
+    close,
+    LAG(close) OVER (PARTITION BY symbol ORDER BY date) AS prev_close
+  FROM stock_prices
+  WHERE date <= ?
+),
+rets AS (
+  SELECT
+    symbol,
+    date,
+    close,
+    prev_close,
+    CASE
+      WHEN prev_close IS NOT NULL AND prev_close > 0 AND close IS NOT NULL
+      THEN (close / prev_close) - 1.0
+      ELSE NULL
+    END AS ret,
+    CASE
+      WHEN prev_close IS NOT NULL AND prev_close > 0 AND close IS NOT NULL
+           AND (close / prev_close) - 1.0 >= ?
+      THEN 1 ELSE 0
+    END AS hit
+  FROM p
+),
+grp AS (
+  SELECT
+    *,
+    SUM(CASE WHEN hit = 0 THEN 1 ELSE 0 END)
+      OVER (PARTITION BY symbol ORDER BY date ROWS UNBOUNDED PRECEDING) AS g
+  FROM rets
+  WHERE ret IS NOT NULL
+),
+streaked AS (
+  SELECT
+    *,
+    CASE
+      WHEN hit = 1 THEN
+        SUM(hit) OVER (
+          PARTITION BY symbol, g
+          ORDER BY date
+          ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+        )
+      ELSE 0
+    END AS streak
+  FROM grp
+),
+final AS (
+  SELECT
+    s.*,
+    COALESCE(LAG(s.hit) OVER (PARTITION BY s.symbol ORDER BY s.date), 0) AS hit_prev,
+    COALESCE(LAG(s.streak) OVER (PARTITION BY s.symbol ORDER BY s.date), 0) AS streak_prev
+  FROM streaked s
+)
+SELECT
+  symbol,
+  date,
+  prev_close AS prev_close_sql,
+  ret       AS ret_sql,
+  hit_prev,
+  streak,
+  streak_prev
+FROM final
+WHERE {day_filter}
+"""
+
+_FLAGS_COLUMNS = ["symbol", "prev_close_sql", "ret_sql", "hit_prev", "streak", "streak_prev"]
+
+
 def _load_prev_flags_for_day(
     conn: sqlite3.Connection,
     *,
@@ -178,77 +251,14 @@ def _load_prev_flags_for_day(
     - This returns only rows where ret is computable (needs prev_close > 0).
     - We'll LEFT-MERGE this back to df_today to keep FULL universe.
     """
-    sql = """
-    WITH p AS (
-      SELECT
-        symbol,
-        date,
-        close,
-        LAG(close) OVER (PARTITION BY symbol ORDER BY date) AS prev_close
-      FROM stock_prices
-      WHERE date <= ?
-    ),
-    rets AS (
-      SELECT
-        symbol,
-        date,
-        close,
-        prev_close,
-        CASE
-          WHEN prev_close IS NOT NULL AND prev_close > 0 AND close IS NOT NULL
-          THEN (close / prev_close) - 1.0
-          ELSE NULL
-        END AS ret,
-        CASE
-          WHEN prev_close IS NOT NULL AND prev_close > 0 AND close IS NOT NULL
-               AND (close / prev_close) - 1.0 >= ?
-          THEN 1 ELSE 0
-        END AS hit
-      FROM p
-    ),
-    grp AS (
-      SELECT
-        *,
-        SUM(CASE WHEN hit = 0 THEN 1 ELSE 0 END)
-          OVER (PARTITION BY symbol ORDER BY date ROWS UNBOUNDED PRECEDING) AS g
-      FROM rets
-      WHERE ret IS NOT NULL
-    ),
-    streaked AS (
-      SELECT
-        *,
-        CASE
-          WHEN hit = 1 THEN
-            SUM(hit) OVER (
-              PARTITION BY symbol, g
-              ORDER BY date
-              ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
-            )
-          ELSE 0
-        END AS streak
-      FROM grp
-    ),
-    final AS (
-      SELECT
-        s.*,
-        COALESCE(LAG(s.hit) OVER (PARTITION BY s.symbol ORDER BY s.date), 0) AS hit_prev,
-        COALESCE(LAG(s.streak) OVER (PARTITION BY s.symbol ORDER BY s.date), 0) AS streak_prev
-      FROM streaked s
-    )
-    SELECT
-      symbol,
-      prev_close AS prev_close_sql,
-      ret       AS ret_sql,
-      hit_prev,
-      streak,
-      streak_prev
-    FROM final
-    WHERE date = ?
-    """
-    df = pd.read_sql_query(sql, conn, params=(ymd_eff, th, ymd_eff))
+    df = pd.read_sql_query(_FLAGS_SQL.format(day_filter="date = ?"), conn, params=(ymd_eff, th, ymd_eff))
+    return _flags_frame(df)
+
+
+def _flags_frame(df: Optional[pd.DataFrame]) -> pd.DataFrame:
     if df is None or df.empty:
-        return pd.DataFrame(columns=["symbol", "prev_close_sql", "ret_sql", "hit_prev", "streak", "streak_prev"])
-    return df
+        return pd.DataFrame(columns=_FLAGS_COLUMNS)
+    return df.drop(columns=["date"]).reset_index(drop=True)
 
 
 # -----------------------------------------------------------------------------
@@ -474,181 +484,289 @@ def run_intraday(*, slot: str, asof: str, ymd: str) -> Dict[str, Any]:
     try:
         ymd_eff, prev_ymd = _get_effective_dates(conn, ymd)
         if not ymd_eff or not prev_ymd:
-            return {
-                "market": "au",
-                "ymd": str(ymd)[:10],
-                "ymd_effective": ymd_eff or "",
-                "slot": slot,
-                "asof": asof,
-                "generated_at": dt_utc.isoformat(timespec="seconds").replace("+00:00", "Z"),
-                "snapshot_open": [],
-                "stats": {"snapshot_open_count": 0, "is_market_open": 0},
-                "meta": {
-                    "db_path": db_path,
-                    "note": "Insufficient trading days in DB (need at least 2 dates).",
-                    "ymd_effective": ymd_eff,
-                    "prev_ymd": prev_ymd,
-                    "time": _build_meta_time_au(dt_utc),
-                },
-            }
+            return _insufficient_payload(
+                slot=slot, asof=asof, ymd=ymd, ymd_eff=ymd_eff, prev_ymd=prev_ymd, db_path=db_path, dt_utc=dt_utc
+            )
 
         th = float(_ret_threshold())
+        day = {
+            "ymd_eff": ymd_eff,
+            "prev_ymd": prev_ymd,
+            "today": _load_today_rows(conn, ymd_eff),
+            "prev": _load_prev_close(conn, prev_ymd),
+            "info": _load_info(conn),
+            "flags": _load_prev_flags_for_day(conn, ymd_eff=ymd_eff, th=th),
+        }
+    finally:
+        conn.close()
 
-        df_today = _load_today_rows(conn, ymd_eff)
-        df_prev = _load_prev_close(conn, prev_ymd)
-        df_info = _load_info(conn)
+    return _build_payload(day, slot=slot, asof=asof, ymd=ymd, db_path=db_path, dt_utc=dt_utc, th=th)
 
-        # Merge: today + prev_close + info  (FULL universe stays here)
-        df = df_today.merge(df_prev, on="symbol", how="left").merge(df_info, on="symbol", how="left")
 
-        # NEW: compute hit_prev / streak from DB, then left-merge back
-        df_flags = _load_prev_flags_for_day(conn, ymd_eff=ymd_eff, th=th)
-        if df_flags is not None and not df_flags.empty:
-            df = df.merge(df_flags, on="symbol", how="left")
-        else:
-            df["hit_prev"] = 0
-            df["streak"] = 0
-            df["streak_prev"] = 0
-            df["ret_sql"] = pd.NA
-            df["prev_close_sql"] = pd.NA
-
-        # Clean defaults
-        for c, dv in [
-            ("name", "Unknown"),
-            ("sector", "Unknown"),
-            ("market_detail", "ASX"),
-            ("open", 0.0),
-            ("high", 0.0),
-            ("low", 0.0),
-            ("close", 0.0),
-            ("volume", 0),
-            ("prev_close", 0.0),
-            ("hit_prev", 0),
-            ("streak", 0),
-            ("streak_prev", 0),
-        ]:
-            if c not in df.columns:
-                df[c] = dv
-            df[c] = df[c].fillna(dv)
-
-        # numeric normalize
-        for col in ["open", "high", "low", "close", "prev_close"]:
-            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0)
-        df["volume"] = pd.to_numeric(df["volume"], errors="coerce").fillna(0).astype(int)
-
-        df["hit_prev"] = pd.to_numeric(df.get("hit_prev", 0), errors="coerce").fillna(0).astype(int)
-        df["streak"] = pd.to_numeric(df.get("streak", 0), errors="coerce").fillna(0).astype(int)
-        df["streak_prev"] = pd.to_numeric(df.get("streak_prev", 0), errors="coerce").fillna(0).astype(int)
-
-        # denom (avoid div by 0)
-        denom = df["prev_close"].where(df["prev_close"] > 0, pd.NA)
-
-        # ret: prefer SQL ret if available, else compute
-        if "ret_sql" in df.columns:
-            df["ret_sql"] = pd.to_numeric(df["ret_sql"], errors="coerce")
-        df["ret"] = df.get("ret_sql")
-        need_calc = df["ret"].isna()
-        df.loc[need_calc, "ret"] = (df.loc[need_calc, "close"] / denom.loc[need_calc]) - 1.0
-        df["ret"] = pd.to_numeric(df["ret"], errors="coerce").fillna(0.0)
-
-        # touch_ret: high vs prev close
-        df["touch_ret"] = (df["high"] / denom) - 1.0
-        df["touch_ret"] = pd.to_numeric(df["touch_ret"], errors="coerce").fillna(0.0)
-
-        # touched_only: hit threshold intraday but didn't close above threshold
-        df["touched_only"] = (df["touch_ret"] >= th) & ~(df["ret"] >= th)
-        df["touched_only"] = df["touched_only"].fillna(False).astype(bool)
-
-        # if prev_close missing, ret/touch_ret are 0; ensure touched_only false
-        df.loc[df["prev_close"] <= 0, "touched_only"] = False
-
-        # is_reit
-        df["is_reit"] = df.get("sector", "").apply(_infer_is_reit)
-
-        # move fields
-        if "move_band" not in df.columns:
-            df["move_band"] = -1
-        if "move_key" not in df.columns:
-            df["move_key"] = ""
-
-        df["market_label"] = "AU"
-        df["bar_date"] = str(ymd_eff)[:10]
-
-        df["status_text"] = [
-            _build_status_text(float(r), bool(t), th)
-            for r, t in zip(df["ret"].tolist(), df["touched_only"].tolist())
-        ]
-
-        df = df.sort_values("ret", ascending=False).reset_index(drop=True)
-
-        rows: List[Dict[str, Any]] = []
-        for r in df.itertuples(index=False):
-            touch_ret_val = float(getattr(r, "touch_ret") or 0.0)
-            touched_only_val = bool(getattr(r, "touched_only"))
-            ret_val = float(getattr(r, "ret") or 0.0)
-
-            rows.append(
-                {
-                    "symbol": str(getattr(r, "symbol")),
-                    "name": str(getattr(r, "name") or "Unknown"),
-                    "sector": str(getattr(r, "sector") or "Unknown"),
-                    "is_reit": bool(getattr(r, "is_reit")),
-                    "market_detail": str(getattr(r, "market_detail") or "ASX"),
-                    "market_label": str(getattr(r, "market_label") or "AU"),
-                    "bar_date": str(getattr(r, "bar_date") or str(ymd_eff)[:10]),
-                    "prev_close": float(getattr(r, "prev_close") or 0.0),
-                    "open": float(getattr(r, "open") or 0.0),
-                    "high": float(getattr(r, "high") or 0.0),
-                    "low": float(getattr(r, "low") or 0.0),
-                    "close": float(getattr(r, "close") or 0.0),
-                    "volume": int(getattr(r, "volume") or 0),
-                    "ret": ret_val,
-                    "touch_ret": touch_ret_val,
-                    "touched_only": touched_only_val,
-                    "streak": int(getattr(r, "streak") or 0),
-                    "streak_prev": int(getattr(r, "streak_prev") or 0),
-                    "hit_prev": int(getattr(r, "hit_prev") or 0),
-                    "badge_text": "",
-                    "badge_level": 0,
-                    "status_text": str(getattr(r, "status_text") or _build_status_text(ret_val, touched_only_val, th)),
-                    "limit_type": "open_limit",
-                    "is_limitup_touch": False,
-                    "is_limitup_locked": False,
-                    "move_band": int(getattr(r, "move_band") if getattr(r, "move_band") is not None else -1),
-                    "move_key": str(getattr(r, "move_key") or ""),
-                }
-            )
+def load_replay(start: str, end: str) -> Dict[str, Any]:
+    """
+    --replay: one pass over [prev trading day of start, end] -> {ymd_effective: day input}
+    (streak / hit_prev flags come from the same window SQL, filtered to the whole range at once)
+    """
+    from markets.replay import dates_before, split_days, trading_days
 
-        # ✅ FIX: compute is_market_open (was always 0)
-        is_open = _is_market_open_au(
-            dt_utc=dt_utc,
-            asof=asof,
-            has_today_rows=(df_today is not None and not df_today.empty),
-        )
+    db_path = _db_path()
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"AU DB not found: {db_path} (set AU_DB_PATH to override)")
 
-        payload: Dict[str, Any] = {
-            "market": "au",
-            "ymd": str(ymd)[:10],
-            "ymd_effective": str(ymd_eff)[:10],
-            "slot": slot,
-            "asof": asof,
-            "generated_at": dt_utc.isoformat(timespec="seconds").replace("+00:00", "Z"),
-            "snapshot_open": rows,
-            "stats": {
-                "snapshot_open_count": int(len(rows)),
-                "is_market_open": int(is_open),
-            },
-            "meta": {
-                "db_path": db_path,
-                "prev_ymd": str(prev_ymd)[:10],
-                "ret_th": th,
-                "time": _build_meta_time_au(dt_utc),
-            },
-        }
-        return payload
+    th = float(_ret_threshold())
+    conn = sqlite3.connect(db_path, timeout=120)
+    try:
+        days = trading_days(conn, start, end)
+        all_dates = dates_before(conn, start, 1) + days
+        first = all_dates[0] if all_dates else start
+        df_px = pd.read_sql_query(
+            """
+            SELECT symbol, date, open, high, low, close, volume
+            FROM stock_prices
+            WHERE date BETWEEN ? AND ?
+            """,
+            conn,
+            params=(first, end),
+        )
+        df_info = _load_info(conn)
+        df_flags = pd.read_sql_query(
+            _FLAGS_SQL.format(day_filter="date BETWEEN ? AND ?"), conn, params=(end, th, start, end)
+        )
     finally:
         conn.close()
 
+    px_by_day = split_days(df_px, all_dates, col="date")
+    flags_by_day = split_days(df_flags, days, col="date")
+    prev_of = dict(zip(all_dates[1:], all_dates[:-1]))
+    out: Dict[str, Any] = {}
+    for d in days:
+        prev_ymd = prev_of.get(d)
+        df_today = px_by_day[d]
+        df_prev = (
+            px_by_day[prev_ymd][["symbol", "close"]].rename(columns={"close": "prev_close"})
+            if prev_ymd
+            else pd.DataFrame(columns=["symbol", "prev_close"])
+        )
+        out[d] = {
+            "ymd_eff": d,
+            "prev_ymd": prev_ymd,
+            "today": df_today if not df_today.empty else pd.DataFrame(columns=list(df_px.columns)),
+            "prev": df_prev if not df_prev.empty else pd.DataFrame(columns=["symbol", "prev_close"]),
+            "info": df_info,
+            "flags": _flags_frame(flags_by_day[d]),
+        }
+    return out
+
+
+def replay_payload(ymd: str, day: Dict[str, Any], *, slot: str, asof: str) -> Dict[str, Any]:
+    dt_utc = datetime.now(timezone.utc)
+    if not day.get("prev_ymd"):
+        return _insufficient_payload(
+            slot=slot, asof=asof, ymd=ymd, ymd_eff=day.get("ymd_eff"), prev_ymd=None, db_path=_db_path(), dt_utc=dt_utc
+        )
+    th = float(_ret_threshold())
+    return _build_payload(day, slot=slot, asof=asof, ymd=ymd, db_path=_db_path(), dt_utc=dt_utc, th=th)
+
+
+def _insufficient_payload(
+    *,
+    slot: str,
+    asof: str,
+    ymd: str,
+    ymd_eff: Optional[str],
+    prev_ymd: Optional[str],
+    db_path: str,
+    dt_utc: datetime,
+) -> Dict[str, Any]:
+    return {
+        "market": "au",
+        "ymd": str(ymd)[:10],
+        "ymd_effective": ymd_eff or "",
+        "slot": slot,
+        "asof": asof,
+        "generated_at": dt_utc.isoformat(timespec="seconds").replace("+00:00", "Z"),
+        "snapshot_open": [],
+        "stats": {"snapshot_open_count": 0, "is_market_open": 0},
+        "meta": {
+            "db_path": db_path,
+            "note": "Insufficient trading days in DB (need at least 2 dates).",
+            "ymd_effective": ymd_eff,
+            "prev_ymd": prev_ymd,
+            "time": _build_meta_time_au(dt_utc),
+        },
+    }
+
+
+def _build_payload(
+    day: Dict[str, Any],
+    *,
+    slot: str,
+    asof: str,
+    ymd: str,
+    db_path: str,
+    dt_utc: datetime,
+    th: float,
+) -> Dict[str, Any]:
+    """
+    one day's inputs (today rows / prev close / info / SQL flags) -> raw payload
+    (shared by run_intraday / replay)
+    """
+    ymd_eff = day["ymd_eff"]
+    prev_ymd = day["prev_ymd"]
+    df_today = day["today"]
+    df_prev = day["prev"]
+    df_info = day["info"]
+    df_flags = day["flags"]
+
+    # Merge: today + prev_close + info  (FULL universe stays here)
+    df = df_today.merge(df_prev, on="symbol", how="left").merge(df_info, on="symbol", how="left")
+
+    # NEW: hit_prev / streak from DB (window SQL), left-merge back
+    if df_flags is not None and not df_flags.empty:
+        df = df.merge(df_flags, on="symbol", how="left")
+    else:
+        df["hit_prev"] = 0
+        df["streak"] = 0
+        df["streak_prev"] = 0
+        df["ret_sql"] = pd.NA
+        df["prev_close_sql"] = pd.NA
+
+    # Clean defaults
+    for c, dv in [
+        ("name", "Unknown"),
+        ("sector", "Unknown"),
+        ("market_detail", "ASX"),
+        ("open", 0.0),
+        ("high", 0.0),
+        ("low", 0.0),
+        ("close", 0.0),
+        ("volume", 0),
+        ("prev_close", 0.0),
+        ("hit_prev", 0),
+        ("streak", 0),
+        ("streak_prev", 0),
+    ]:
+        if c not in df.columns:
+            df[c] = dv
+        df[c] = df[c].fillna(dv)
+
+    # numeric normalize
+    for col in ["open", "high", "low", "close", "prev_close"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0)
+    df["volume"] = pd.to_numeric(df["volume"], errors="coerce").fillna(0).astype(int)
+
+    df["hit_prev"] = pd.to_numeric(df.get("hit_prev", 0), errors="coerce").fillna(0).astype(int)
+    df["streak"] = pd.to_numeric(df.get("streak", 0), errors="coerce").fillna(0).astype(int)
+    df["streak_prev"] = pd.to_numeric(df.get("streak_prev", 0), errors="coerce").fillna(0).astype(int)
+
+    # denom (avoid div by 0)
+    denom = df["prev_close"].where(df["prev_close"] > 0, pd.NA)
+
+    # ret: prefer SQL ret if available, else compute
+    if "ret_sql" in df.columns:
+        df["ret_sql"] = pd.to_numeric(df["ret_sql"], errors="coerce")
+    df["ret"] = df.get("ret_sql")
+    need_calc = df["ret"].isna()
+    df.loc[need_calc, "ret"] = (df.loc[need_calc, "close"] / denom.loc[need_calc]) - 1.0
+    df["ret"] = pd.to_numeric(df["ret"], errors="coerce").fillna(0.0)
+
+    # touch_ret: high vs prev close
+    df["touch_ret"] = (df["high"] / denom) - 1.0
+    df["touch_ret"] = pd.to_numeric(df["touch_ret"], errors="coerce").fillna(0.0)
+
+    # touched_only: hit threshold intraday but didn't close above threshold
+    df["touched_only"] = (df["touch_ret"] >= th) & ~(df["ret"] >= th)
+    df["touched_only"] = df["touched_only"].fillna(False).astype(bool)
+
+    # if prev_close missing, ret/touch_ret are 0; ensure touched_only false
+    df.loc[df["prev_close"] <= 0, "touched_only"] = False
+
+    # is_reit
+    df["is_reit"] = df.get("sector", "").apply(_infer_is_reit)
+
+    # move fields
+    if "move_band" not in df.columns:
+        df["move_band"] = -1
+    if "move_key" not in df.columns:
+        df["move_key"] = ""
+
+    df["market_label"] = "AU"
+    df["bar_date"] = str(ymd_eff)[:10]
+
+    df["status_text"] = [
+        _build_status_text(float(r), bool(t), th)
+        for r, t in zip(df["ret"].tolist(), df["touched_only"].tolist())
+    ]
+
+    df = df.sort_values("ret", ascending=False).reset_index(drop=True)
+
+    rows: List[Dict[str, Any]] = []
+    for r in df.itertuples(index=False):
+        touch_ret_val = float(getattr(r, "touch_ret") or 0.0)
+        touched_only_val = bool(getattr(r, "touched_only"))
+        ret_val = float(getattr(r, "ret") or 0.0)
+
+        rows.append(
+            {
+                "symbol": str(getattr(r, "symbol")),
+                "name": str(getattr(r, "name") or "Unknown"),
+                "sector": str(getattr(r, "sector") or "Unknown"),
+                "is_reit": bool(getattr(r, "is_reit")),
+                "market_detail": str(getattr(r, "market_detail") or "ASX"),
+                "market_label": str(getattr(r, "market_label") or "AU"),
+                "bar_date": str(getattr(r, "bar_date") or str(ymd_eff)[:10]),
+                "prev_close": float(getattr(r, "prev_close") or 0.0),
+                "open": float(getattr(r, "open") or 0.0),
+                "high": float(getattr(r, "high") or 0.0),
+                "low": float(getattr(r, "low") or 0.0),
+                "close": float(getattr(r, "close") or 0.0),
+                "volume": int(getattr(r, "volume") or 0),
+                "ret": ret_val,
+                "touch_ret": touch_ret_val,
+                "touched_only": touched_only_val,
+                "streak": int(getattr(r, "streak") or 0),
+                "streak_prev": int(getattr(r, "streak_prev") or 0),
+                "hit_prev": int(getattr(r, "hit_prev") or 0),
+                "badge_text": "",
+                "badge_level": 0,
+                "status_text": str(getattr(r, "status_text") or _build_status_text(ret_val, touched_only_val, th)),
+                "limit_type": "open_limit",
+                "is_limitup_touch": False,
+                "is_limitup_locked": False,
+                "move_band": int(getattr(r, "move_band") if getattr(r, "move_band") is not None else -1),
+                "move_key": str(getattr(r, "move_key") or ""),
+            }
+        )
+
+    # ✅ FIX: compute is_market_open (was always 0)
+    is_open = _is_market_open_au(
+        dt_utc=dt_utc,
+        asof=asof,
+        has_today_rows=(df_today is not None and not df_today.empty),
+    )
+
+    payload: Dict[str, Any] = {
+        "market": "au",
+        "ymd": str(ymd)[:10],
+        "ymd_effective": str(ymd_eff)[:10],
+        "slot": slot,
+        "asof": asof,
+        "generated_at": dt_utc.isoformat(timespec="seconds").replace("+00:00", "Z"),
+        "snapshot_open": rows,
+        "stats": {
+            "snapshot_open_count": int(len(rows)),
+            "is_market_open": int(is_open),
+        },
+        "meta": {
+            "db_path": db_path,
+            "prev_ymd": str(prev_ymd)[:10],
+            "ret_th": th,
+            "time": _build_meta_time_au(dt_utc),
+        },
+    }
+    return payload
+
 
 if __name__ == "__main__":
     print(run_intraday(slot="close", asof="16:10", ymd=datetime.now().strftime("%Y-%m-%d"))["stats"])
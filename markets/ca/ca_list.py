@@ -60,7 +60,8 @@ from pathlib import Path
 from typing import List, Tuple, Optional, Any, Dict
 
 import pandas as pd
-import requests
+
+from markets.datasource import http_get
 
 
 # ---------------------------------------------------------------------
@@ -169,7 +170,7 @@ def _open_excel() -> pd.ExcelFile:
 
     url = (_env_str("CA_LIST_URL", DEFAULT_CA_LIST_URL) or DEFAULT_CA_LIST_URL).strip() or DEFAULT_CA_LIST_URL
     log(f"📡 Downloading TMX issuer list ... {url}")
-    r = requests.get(url, timeout=90, allow_redirects=True)
+    r = http_get(url, timeout=90, allow_redirects=True)
     r.raise_for_status()
     return pd.ExcelFile(BytesIO(r.content))
 
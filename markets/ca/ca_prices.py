@@ -45,9 +45,10 @@ from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
-import yfinance as yf
 from tqdm import tqdm
 
+from engine.db_writer import PRICES_UPSERT_SQL, DbWriter, price_rows
+
 from .ca_list import get_ca_stock_list
 
 
@@ -234,12 +235,14 @@ def init_db(db_path: str) -> None:
 # calendar helpers (yfinance)
 # ---------------------------------------------------------------------
 def _latest_trading_day_from_calendar(asof_ymd: Optional[str] = None) -> Optional[str]:
+    from markets.datasource import yf_download
+
     cal_ticker = _calendar_ticker()
     lookback = _calendar_lookback_cal_days()
     try:
         end_dt = pd.to_datetime(asof_ymd) if asof_ymd else pd.Timestamp.now()
         start_dt = end_dt - timedelta(days=lookback)
-        df = yf.download(
+        df = yf_download(
             cal_ticker,
             start=start_dt.strftime("%Y-%m-%d"),
             end=(end_dt + timedelta(days=1)).strftime("%Y-%m-%d"),
@@ -263,12 +266,14 @@ def _latest_trading_day_from_calendar(asof_ymd: Optional[str] = None) -> Optiona
 
 
 def _infer_window_by_trading_days(end_ymd: str, n_trading_days: int) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    from markets.datasource import yf_download
+
     cal_ticker = _calendar_ticker()
     lookback = _calendar_lookback_cal_days()
     try:
         end_dt = pd.to_datetime(end_ymd)
         start_dt = end_dt - timedelta(days=lookback)
-        df = yf.download(
+        df = yf_download(
             cal_ticker,
             start=start_dt.strftime("%Y-%m-%d"),
             end=(end_dt + timedelta(days=1)).strftime("%Y-%m-%d"),
@@ -338,11 +343,13 @@ def _get_ca_items(db_path: str, refresh_list: bool) -> List[Tuple[str, str]]:
 # download core
 # ---------------------------------------------------------------------
 def _download_one(symbol: str, start_date: str, end_date_exclusive: str) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    from markets.datasource import yf_download
+
     max_retries = 2
     last_err: Optional[str] = None
     for attempt in range(max_retries + 1):
         try:
-            df = yf.download(
+            df = yf_download(
                 symbol,
                 start=start_date,
                 end=end_date_exclusive,
@@ -399,12 +406,14 @@ def _download_one(symbol: str, start_date: str, end_date_exclusive: str) -> Tupl
 
 
 def _download_batch(tickers: List[str], start_date: str, end_date_exclusive: str) -> Tuple[pd.DataFrame, List[str], Optional[str]]:
+    from markets.datasource import yf_download
+
     if not tickers:
         empty = pd.DataFrame(columns=["symbol", "date", "open", "high", "low", "close", "volume"])
         return empty, [], None
 
     try:
-        df = yf.download(
+        df = yf_download(
             tickers=" ".join(tickers),
             start=start_date,
             end=end_date_exclusive,
@@ -487,29 +496,6 @@ def _download_batch(tickers: List[str], start_date: str, end_date_exclusive: str
     return out, sorted(list(set(failed))), None
 
 
-def _insert_prices(conn: sqlite3.Connection, df_long: pd.DataFrame) -> None:
-    if df_long is None or df_long.empty:
-        return
-    dfw = df_long.copy()
-    dfw["volume"] = pd.to_numeric(dfw["volume"], errors="coerce")
-    for col in ["open", "high", "low", "close"]:
-        dfw[col] = pd.to_numeric(dfw[col], errors="coerce")
-
-    rows = [
-        (str(r.symbol), str(r.date)[:10],
-         None if pd.isna(r.open) else float(r.open),
-         None if pd.isna(r.high) else float(r.high),
-         None if pd.isna(r.low) else float(r.low),
-         None if pd.isna(r.close) else float(r.close),
-         None if pd.isna(r.volume) else int(r.volume))
-        for r in dfw.itertuples(index=False)
-    ]
-    conn.executemany(
-        "INSERT OR REPLACE INTO stock_prices (symbol, date, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?)",
-        rows,
-    )
-
-
 def _write_download_errors(conn: sqlite3.Connection, final_failed: Dict[str, str], name_map: Dict[str, str], start_date: str, end_date_inclusive: str) -> None:
     if not final_failed:
         return
@@ -584,9 +570,9 @@ def run_sync(start_date: Optional[str] = None, end_date: Optional[str] = None, r
     ok_set: set[str] = set()
     final_failed: Dict[str, str] = {}
 
-    conn = sqlite3.connect(db_path, timeout=120)
-    try:
-        for batch in pbar:
+    # ✅ 寫入交給背景 writer（合併交易、不擋下載）；離開 with 時 flush + checkpoint
+    with DbWriter(db_path, name="ca", job="ca_prices") as writer:
+        for bi, batch in enumerate(pbar):
             # batch could contain symbols appended to skiplist in previous loop, re-filter defensively
             if skipset:
                 batch = [s for s in batch if _norm_sym(s) not in skipset]
@@ -603,8 +589,7 @@ def run_sync(start_date: Optional[str] = None, end_date: Optional[str] = None, r
                 continue
 
             if df_long is not None and not df_long.empty:
-                _insert_prices(conn, df_long)
-                conn.commit()
+                writer.submit(PRICES_UPSERT_SQL, price_rows(df_long), tag=f"batch:{bi}")
 
             failed_batch_set = set(failed_batch or [])
             for sym in batch:
@@ -624,8 +609,7 @@ def run_sync(start_date: Optional[str] = None, end_date: Optional[str] = None, r
 
                     df_one, err_one = _download_one(sym, start_ymd, end_excl_date)
                     if df_one is not None and not df_one.empty:
-                        _insert_prices(conn, df_one)
-                        conn.commit()
+                        writer.submit(PRICES_UPSERT_SQL, price_rows(df_one), tag=f"single:{sym}")
                         ok_set.add(sym)
                         final_failed.pop(sym, None)
                     else:
@@ -640,6 +624,11 @@ def run_sync(start_date: Optional[str] = None, end_date: Optional[str] = None, r
 
             time.sleep(_batch_sleep_sec())
 
+    writer_stats = writer.stats
+    log(f"💾 writer: {writer_stats['rows']} rows / {writer_stats['batches']} batches in {writer_stats['commits']} commits")
+
+    conn = sqlite3.connect(db_path, timeout=120)
+    try:
         _write_download_errors(conn, final_failed, name_map_all, start_ymd, end_inclusive)
         conn.commit()
 
@@ -128,13 +128,97 @@ def _ceil_div(a: int, b: int) -> int:
     return (a + b - 1) // b if b > 0 else 0
 
 
+# {day_filter}: 單日 "f.date = ?" / replay "f.date BETWEEN ? AND ?"（同一個 window pass 算整段）
+_SNAPSHOT_SQL = """
+WITH p AS (
+  SELECT
+    symbol,
+    date,
+    open, high, low, close, volume,
+    LAG(close) OVER (PARTITION BY symbol ORDER BY date) AS prev_close
+  FROM stock_prices
+  WHERE date <= ?
+),
+rets AS (
+  SELECT
+    symbol,
+    date,
+    open, high, low, close, volume,
+    prev_close,
+    CASE
+      WHEN prev_close IS NOT NULL AND prev_close > 0 AND close IS NOT NULL
+      THEN (close / prev_close) - 1.0
+      ELSE NULL
+    END AS ret,
+    CASE
+      WHEN prev_close IS NOT NULL AND prev_close > 0 AND close IS NOT NULL
+           AND (close / prev_close) - 1.0 >= ?
+      THEN 1 ELSE 0
+    END AS hit
+  FROM p
+),
+grp AS (
+  SELECT
+    symbol,
+    date,
+    open, high, low, close, volume,
+    prev_close,
+    ret,
+    hit,
+    SUM(CASE WHEN hit = 0 THEN 1 ELSE 0 END)
+      OVER (PARTITION BY symbol ORDER BY date ROWS UNBOUNDED PRECEDING) AS g
+  FROM rets
+  WHERE ret IS NOT NULL
+),
+streaked AS (
+  SELECT
+    symbol,
+    date,
+    open, high, low, close, volume,
+    prev_close,
+    ret,
+    hit,
+    CASE
+      WHEN hit = 1 THEN
+        SUM(hit) OVER (
+          PARTITION BY symbol, g
+          ORDER BY date
+          ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+        )
+      ELSE 0
+    END AS streak
+  FROM grp
+),
+final AS (
+  SELECT
+    s.*,
+    LAG(s.hit)    OVER (PARTITION BY s.symbol ORDER BY s.date) AS hit_prev,
+    LAG(s.streak) OVER (PARTITION BY s.symbol ORDER BY s.date) AS streak_prev
+  FROM streaked s
+)
+SELECT
+  f.symbol,
+  f.date AS ymd,
+  f.open, f.high, f.low, f.close, f.volume,
+  f.prev_close,
+  f.ret,
+  f.hit,
+  f.streak,
+  COALESCE(f.hit_prev, 0) AS hit_prev,
+  COALESCE(f.streak_prev, 0) AS streak_prev,
+  i.name,
+  i.sector,
+  i.market_detail
+FROM final f
+JOIN stock_info i ON i.symbol = f.symbol
+WHERE i.market='CA' AND {day_filter}
+"""
+
+
 # =============================================================================
 # Main
 # =============================================================================
 def run_intraday(slot: str, asof: str, ymd: str, db_path: Optional[Path] = None) -> Dict[str, Any]:
-    # ✅ single UTC timestamp for this payload (avoid local TZ leakage)
-    dt_utc = datetime.now(timezone.utc)
-
     db_path = db_path or _db_path()
     if isinstance(db_path, str):
         db_path = Path(db_path)
@@ -148,94 +232,59 @@ def run_intraday(slot: str, asof: str, ymd: str, db_path: Optional[Path] = None)
         log(f"🕒 requested ymd={ymd} slot={slot} asof={asof}")
         log(f"📅 ymd_effective = {ymd_effective}")
 
-        sql = """
-        WITH p AS (
-          SELECT
-            symbol,
-            date,
-            open, high, low, close, volume,
-            LAG(close) OVER (PARTITION BY symbol ORDER BY date) AS prev_close
-          FROM stock_prices
-          WHERE date <= ?
-        ),
-        rets AS (
-          SELECT
-            symbol,
-            date,
-            open, high, low, close, volume,
-            prev_close,
-            CASE
-              WHEN prev_close IS NOT NULL AND prev_close > 0 AND close IS NOT NULL
-              THEN (close / prev_close) - 1.0
-              ELSE NULL
-            END AS ret,
-            CASE
-              WHEN prev_close IS NOT NULL AND prev_close > 0 AND close IS NOT NULL
-                   AND (close / prev_close) - 1.0 >= ?
-              THEN 1 ELSE 0
-            END AS hit
-          FROM p
-        ),
-        grp AS (
-          SELECT
-            symbol,
-            date,
-            open, high, low, close, volume,
-            prev_close,
-            ret,
-            hit,
-            SUM(CASE WHEN hit = 0 THEN 1 ELSE 0 END)
-              OVER (PARTITION BY symbol ORDER BY date ROWS UNBOUNDED PRECEDING) AS g
-          FROM rets
-          WHERE ret IS NOT NULL
-        ),
-        streaked AS (
-          SELECT
-            symbol,
-            date,
-            open, high, low, close, volume,
-            prev_close,
-            ret,
-            hit,
-            CASE
-              WHEN hit = 1 THEN
-                SUM(hit) OVER (
-                  PARTITION BY symbol, g
-                  ORDER BY date
-                  ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
-                )
-              ELSE 0
-            END AS streak
-          FROM grp
-        ),
-        final AS (
-          SELECT
-            s.*,
-            LAG(s.hit)    OVER (PARTITION BY s.symbol ORDER BY s.date) AS hit_prev,
-            LAG(s.streak) OVER (PARTITION BY s.symbol ORDER BY s.date) AS streak_prev
-          FROM streaked s
+        df = pd.read_sql_query(
+            _SNAPSHOT_SQL.format(day_filter="f.date = ?"),
+            conn,
+            params=(ymd_effective, CA_RET_TH, ymd_effective),
         )
-        SELECT
-          f.symbol,
-          f.date AS ymd,
-          f.open, f.high, f.low, f.close, f.volume,
-          f.prev_close,
-          f.ret,
-          f.hit,
-          f.streak,
-          COALESCE(f.hit_prev, 0) AS hit_prev,
-          COALESCE(f.streak_prev, 0) AS streak_prev,
-          i.name,
-          i.sector,
-          i.market_detail
-        FROM final f
-        JOIN stock_info i ON i.symbol = f.symbol
-        WHERE i.market='CA' AND f.date = ?
-        """
-        df = pd.read_sql_query(sql, conn, params=(ymd_effective, CA_RET_TH, ymd_effective))
     finally:
         conn.close()
 
+    return _build_payload(df, slot=slot, asof=asof, ymd=ymd, ymd_effective=ymd_effective, db_path=db_path)
+
+
+def load_replay(start: str, end: str, db_path: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    --replay：一次 range SQL（causal window：date <= end）=> {ymd_effective: 當天的 df}
+    """
+    from markets.replay import split_days, trading_days
+
+    db_path = Path(db_path or _db_path())
+    if not db_path.exists():
+        raise FileNotFoundError(f"CA DB not found: {db_path} (set CA_DB_PATH to override)")
+
+    conn = sqlite3.connect(str(db_path))
+    try:
+        days = trading_days(conn, start, end)
+        df = pd.read_sql_query(
+            _SNAPSHOT_SQL.format(day_filter="f.date BETWEEN ? AND ?"),
+            conn,
+            params=(end, CA_RET_TH, start, end),
+        )
+    finally:
+        conn.close()
+    return split_days(df, days)
+
+
+def replay_payload(ymd: str, day: pd.DataFrame, *, slot: str, asof: str) -> Dict[str, Any]:
+    return _build_payload(day, slot=slot, asof=asof, ymd=ymd, ymd_effective=ymd, db_path=Path(_db_path()))
+
+
+def _build_payload(
+    df: pd.DataFrame,
+    *,
+    slot: str,
+    asof: str,
+    ymd: str,
+    ymd_effective: str,
+    db_path: Path,
+) -> Dict[str, Any]:
+    """
+    snapshot SQL rows (one day) -> raw payload（run_intraday / replay 共用）
+    """
+    # ✅ single UTC timestamp for this payload (avoid local TZ leakage)
+    dt_utc = datetime.now(timezone.utc)
+
     # ✅ build meta.time even when no rows (overview won't fall back wrongly)
     meta_time = build_meta_time_america(dt_utc, tz_name=CA_MARKET_TZ)
 
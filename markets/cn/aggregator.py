@@ -7,6 +7,7 @@ from typing import Any, Dict, List, Tuple
 
 import pandas as pd
 
+from markets import agg_state
 from markets.tw.builders import (
     build_limitup,
     build_sector_summary_main,
@@ -163,6 +164,10 @@ def _is_20_board(df: pd.DataFrame) -> pd.Series:
 
 
 def _build_sector_total_by_sector(dfS: pd.DataFrame) -> Dict[str, int]:
+    if agg_state.active() is not None and "symbol" in dfS.columns:
+        # 分母只對新增 / 移除 / 換 sector 的 symbol 做 +/-1（_ensure_cols 之後 sector 一定是 str）
+        c = agg_state.sector_counts("cn.sector_total", dfS["symbol"].astype(str).tolist(), dfS["sector"].tolist())
+        return {str(k): int(c[k]) for k in sorted(c)}
     g = dfS.groupby("sector").size()
     return {str(k): int(v) for k, v in g.items()}
 
@@ -683,7 +688,7 @@ def aggregate(payload: Dict[str, Any]) -> Dict[str, Any]:
     payload["peers_by_sector"] = peers_by_sector
     payload["peers_not_limitup"] = flatten_peers(peers_by_sector)
 
-    payload["snapshot_main"] = dfS.to_dict(orient="records")
+    payload["snapshot_main"] = agg_state.rows("cn.snapshot_main", dfS, lambda d: d.to_dict(orient="records"))
     payload.setdefault("filters", {})
     payload["filters"].update({"market": "CN", "disclaimer": "非券商資料；各市場/個股漲停制度不同，結果僅供資訊參考"})
 
@@ -6,7 +6,6 @@ from datetime import timedelta
 from typing import Optional, Tuple
 
 import pandas as pd
-import yfinance as yf
 
 from .cn_config import calendar_ticker, calendar_lookback_cal_days
 
@@ -18,6 +17,8 @@ def infer_window_by_trading_days(
     用 yfinance proxy ticker 當交易日曆來源，推算最近 N 個交易日窗口。
     回傳 (start_ymd, end_ymd_inclusive, end_exclusive_ymd)
     """
+    from markets.datasource import yf_download
+
     cal_ticker = calendar_ticker()
     lookback = calendar_lookback_cal_days()
 
@@ -25,7 +26,7 @@ def infer_window_by_trading_days(
         end_dt = pd.to_datetime(end_ymd).normalize()
         start_dt = end_dt - timedelta(days=lookback)
 
-        df_cal = yf.download(
+        df_cal = yf_download(
             cal_ticker,
             start=start_dt.strftime("%Y-%m-%d"),
             end=(end_dt + timedelta(days=1)).strftime("%Y-%m-%d"),
@@ -8,7 +8,6 @@ from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
-import yfinance as yf
 
 from .cn_config import sleep_sec
 
@@ -44,12 +43,14 @@ def download_one(symbol: str, start_date: str, end_date_exclusive: str) -> Tuple
     回傳 (df, err)
     df 欄位：symbol,date,open,high,low,close,volume
     """
+    from markets.datasource import yf_download
+
     max_retries = 2
     last_err: Optional[str] = None
 
     for attempt in range(max_retries + 1):
         try:
-            df = yf.download(
+            df = yf_download(
                 symbol,
                 start=start_date,
                 end=end_date_exclusive,
@@ -114,12 +115,14 @@ def download_batch(
     回傳 (long_df, failed_tickers, err_msg)
     long_df 欄位：symbol,date,open,high,low,close,volume
     """
+    from markets.datasource import yf_download
+
     if not tickers:
         empty = pd.DataFrame(columns=["symbol", "date", "open", "high", "low", "close", "volume"])
         return empty, [], None
 
     try:
-        df = yf.download(
+        df = yf_download(
             tickers=" ".join(tickers),
             start=start_date,
             end=end_date_exclusive,
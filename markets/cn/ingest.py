@@ -49,7 +49,6 @@ from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
-import yfinance as yf
 from tqdm import tqdm
 
 
@@ -161,6 +160,8 @@ def _infer_window_by_trading_days(
     - end_ymd_inclusive：窗口最後一天（通常是最近交易日）
     - end_exclusive_ymd：yfinance end 是 exclusive，所以要 +1 天
     """
+    from markets.datasource import yf_download
+
     cal_ticker = _calendar_ticker()
     lookback = _calendar_lookback_cal_days()
 
@@ -168,7 +169,7 @@ def _infer_window_by_trading_days(
         end_dt = pd.to_datetime(end_ymd).normalize()
         start_dt = end_dt - timedelta(days=lookback)
 
-        df_cal = yf.download(
+        df_cal = yf_download(
             cal_ticker,
             start=start_dt.strftime("%Y-%m-%d"),
             end=(end_dt + timedelta(days=1)).strftime("%Y-%m-%d"),
@@ -373,12 +374,14 @@ def download_one_cn(symbol: str, start_date: str, end_date_exclusive: str) -> Tu
     df columns: symbol,date,open,high,low,close,volume
     NOTE: yfinance end is exclusive.
     """
+    from markets.datasource import yf_download
+
     max_retries = 2
     last_err: Optional[str] = None
 
     for attempt in range(max_retries + 1):
         try:
-            df = yf.download(
+            df = yf_download(
                 symbol,
                 start=start_date,
                 end=end_date_exclusive,
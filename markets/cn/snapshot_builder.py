@@ -6,7 +6,7 @@ import os
 import sqlite3
 from decimal import Decimal, ROUND_HALF_UP
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Mapping, Optional
 
 import pandas as pd
 
@@ -68,34 +68,37 @@ def _limit_rate(symbol: str, name: str) -> float:
 # =============================================================================
 # Load from DB
 # =============================================================================
+# {day_filter}: 單日 "p.date = ?" / replay "p.date BETWEEN ? AND ?"（LAG 整段只跑一次）
+_DAY_SQL = """
+WITH p AS (
+  SELECT
+    stock_prices.symbol AS symbol,
+    stock_prices.date   AS date,
+    stock_prices.open   AS open,
+    stock_prices.high   AS high,
+    stock_prices.low    AS low,
+    stock_prices.close  AS close,
+    stock_prices.volume AS volume,
+    LAG(stock_prices.close) OVER (PARTITION BY stock_prices.symbol ORDER BY stock_prices.date) AS last_close
+  FROM stock_prices
+)
+SELECT
+  p.symbol,
+  p.date AS ymd,
+  p.open, p.high, p.low, p.close, p.volume,
+  p.last_close,
+  i.name,
+  i.sector,
+  i.market,
+  i.market_detail
+FROM p
+LEFT JOIN stock_info i ON i.symbol = p.symbol
+WHERE {day_filter}
+"""
+
+
 def _load_day(conn: sqlite3.Connection, ymd: str) -> pd.DataFrame:
-    sql = """
-    WITH p AS (
-      SELECT
-        stock_prices.symbol AS symbol,
-        stock_prices.date   AS date,
-        stock_prices.open   AS open,
-        stock_prices.high   AS high,
-        stock_prices.low    AS low,
-        stock_prices.close  AS close,
-        stock_prices.volume AS volume,
-        LAG(stock_prices.close) OVER (PARTITION BY stock_prices.symbol ORDER BY stock_prices.date) AS last_close
-      FROM stock_prices
-    )
-    SELECT
-      p.symbol,
-      p.date AS ymd,
-      p.open, p.high, p.low, p.close, p.volume,
-      p.last_close,
-      i.name,
-      i.sector,
-      i.market,
-      i.market_detail
-    FROM p
-    LEFT JOIN stock_info i ON i.symbol = p.symbol
-    WHERE p.date = ?
-    """
-    return pd.read_sql_query(sql, conn, params=(ymd,))
+    return pd.read_sql_query(_DAY_SQL.format(day_filter="p.date = ?"), conn, params=(ymd,))
 
 
 def _pick_latest_trading_day(conn: sqlite3.Connection, ymd: str) -> Optional[str]:
@@ -339,15 +342,7 @@ def run_intraday(
 
     req_ymd = str(ymd)[:10]
 
-    payload: Dict[str, Any] = {
-        "market": "CN",
-        "slot": slot,
-        "asof": asof,
-        "ymd": req_ymd,              # 使用者要求的日期（可能是休市日）
-        "ymd_effective": req_ymd,    # 實際抓資料的日期（若休市會回退）
-        "generated_at": datetime.now().isoformat(timespec="seconds"),
-        "snapshot_main": [],
-    }
+    payload = _base_payload(slot, asof, req_ymd)
 
     if not os.path.exists(db):
         payload["error"] = f"DB not found: {db}"
@@ -374,6 +369,71 @@ def run_intraday(
     finally:
         conn.close()
 
+    return _build_payload(payload, df_day, df_recent)
+
+
+def load_replay(start: str, end: str, db_path: Optional[str] = None) -> Mapping:
+    """
+    --replay：整段一次撈（day LAG 一次 + 最近 60 交易日 close/high 一次）
+    -> {ymd: (df_day, df_recent)}；df_recent 的 last_close 跟單日 SQL 一樣只在 60 日視窗內 LAG
+    """
+    from markets.replay import LazyDays, dates_before, split_days, trading_days, trailing_dates, window_rows
+
+    conn = _connect(db_path or _db_path())
+    try:
+        days = trading_days(conn, start, end)
+        all_dates = dates_before(conn, start, 59) + days
+        df_days = pd.read_sql_query(_DAY_SQL.format(day_filter="p.date BETWEEN ? AND ?"), conn, params=(start, end))
+        df_prices = pd.read_sql_query(
+            """
+            SELECT
+              stock_prices.symbol AS symbol,
+              stock_prices.date   AS date,
+              stock_prices.high   AS high,
+              stock_prices.close  AS close,
+              i.name AS name
+            FROM stock_prices
+            LEFT JOIN stock_info i ON i.symbol = stock_prices.symbol
+            WHERE stock_prices.date BETWEEN ? AND ?
+            """,
+            conn,
+            params=(all_dates[0] if all_dates else start, end),
+        )
+    finally:
+        conn.close()
+
+    by_day = split_days(df_days, days)
+    return LazyDays(
+        days,
+        lambda d: (by_day[d], window_rows(df_prices, trailing_dates(all_dates, d, 60), col="date")),
+    )
+
+
+def replay_payload(ymd: str, day: Any, *, slot: str, asof: str) -> Dict[str, Any]:
+    df_day, df_window = day
+    payload = _base_payload(slot, asof, ymd)
+    if df_day is None or df_day.empty:
+        return payload
+
+    # = _load_recent_prices：視窗內 LAG(close)，ORDER BY symbol, date
+    df_recent = df_window.sort_values(["symbol", "date"], kind="mergesort").reset_index(drop=True)
+    df_recent.insert(4, "last_close", df_recent.groupby("symbol")["close"].shift(1))
+    return _build_payload(payload, df_day, df_recent)
+
+
+def _base_payload(slot: str, asof: str, req_ymd: str) -> Dict[str, Any]:
+    return {
+        "market": "CN",
+        "slot": slot,
+        "asof": asof,
+        "ymd": req_ymd,              # 使用者要求的日期（可能是休市日）
+        "ymd_effective": req_ymd,    # 實際抓資料的日期（若休市會回退）
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "snapshot_main": [],
+    }
+
+
+def _build_payload(payload: Dict[str, Any], df_day: pd.DataFrame, df_recent: pd.DataFrame) -> Dict[str, Any]:
     df_day = _compute_limit_fields(df_day)
     df_day = _attach_streaks(df_day, df_recent, payload["ymd_effective"])
 
@@ -383,4 +443,4 @@ def run_intraday(
     df_day.loc[df_day["sector"].isin(["", "A-Share", "—", "-", "--", "－", "–"]), "sector"] = "未分類"
 
     payload["snapshot_main"] = df_day.to_dict(orient="records")
-    return payload
\ No newline at end of file
+    return payload
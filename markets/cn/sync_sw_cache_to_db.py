@@ -25,11 +25,17 @@ data[symbol] = {
 from __future__ import annotations
 
 import argparse
-import json
 import os
 import sqlite3
+import sys
+from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+# 以 `python markets/cn/sync_sw_cache_to_db.py` 執行時也能 import engine.*
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
 BAD_SECTOR = {"", "A-Share", "—", "-", "--", "－", "–", None, "未分類"}
 
 
@@ -79,7 +85,13 @@ def _ensure_columns(conn: sqlite3.Connection) -> None:
 
 
 def _load_cache(cache_path: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
-    obj = json.loads(open(cache_path, "r", encoding="utf-8").read())
+    # checked-in reference data, not a download cache: pinned (never evicted / expired)
+    from engine.cache_manager import namespace
+
+    p = Path(cache_path)
+    obj = namespace("cn_sw", dir=p.parent, ext=p.suffix, evict=False).get(p.stem)
+    if obj is None:
+        raise ValueError(f"SW cache unreadable: {cache_path}")
     meta = obj.get("_meta", {}) if isinstance(obj, dict) else {}
     data = obj.get("data", {}) if isinstance(obj, dict) else {}
     if not isinstance(data, dict):
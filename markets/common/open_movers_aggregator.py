@@ -5,6 +5,8 @@ from __future__ import annotations
 from typing import Any, Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 
+from markets import agg_state
+
 
 def _pct(x: Any) -> float:
     try:
@@ -78,6 +80,19 @@ def move_band(ret: float) -> str:
 # Totals & sector_summary for overview_mpl
 # ------------------------------------------------------------
 def build_sector_totals_from_snapshot(snapshot_rows: List[Dict[str, Any]]) -> Dict[str, int]:
+    if agg_state.active() is not None and snapshot_rows:
+        # 同一天的下一個 slot：只對新增 / 移除 / 換 sector 的 symbol 做 +/-1
+        rows = [r for r in snapshot_rows if isinstance(r, dict)]
+        if len(rows) == len(snapshot_rows) and all(r.get("symbol") for r in rows):
+            return dict(
+                agg_state.sector_counts(
+                    "open_movers.sector_totals",
+                    [str(r.get("symbol")) for r in rows],
+                    [r.get("sector") or r.get("industry") for r in rows],
+                    _norm_sector,
+                )
+            )
+
     totals: Dict[str, int] = {}
     for r in snapshot_rows or []:
         sector = _norm_sector(r.get("sector") or r.get("industry"))
@@ -0,0 +1,360 @@
+# markets/cross_summary.py
+# -*- coding: utf-8 -*-
+"""
+Cross-market summary — one compact JSON for every market's latest day
+
+Comparing markets used to mean opening nine payload JSONs (or nine run_intraday
+calls). This reads, per market and in parallel:
+
+  1) sector_history (markets/sector_history.py)  — materialized per-sector counts
+     of the last recorded day: locked / touched / bigmove10 / mix + top sectors,
+     used only when that day is not older than the warehouse's latest date
+  2) otherwise the market warehouse, opened read-only: one SQL over the last
+     ~20 calendar days (LAG for prev_close) -> 10%+ movers, touched-only and
+     closed-at-high movers per sector
+
+and writes data/cache/cross_market_summary.json:
+
+  {"generated_at_utc", "ret_th",
+   "markets": {"us": {"ymd", "source", "slot", "locked", "touched_only", "bigmove10",
+                      "movers", "sectors", "top_sectors": [{"sector", "mix_cnt", "mix_pct", "arrow"}]}, ...},
+   "movers_def": "mix = locked + touched_only + bigmove10",
+   "ranking": ["kr", "us", ...]}     # markets by movers desc
+
+main.py rebuilds it after every payload it writes (CROSS_SUMMARY_AUTO=0 turns
+that off). Consumers (overview page, scripts/metadata_builder.py) read this one
+file via load() / market_entry() instead of re-parsing full payloads.
+
+"movers" is mix_cnt for both sources: locked + touched_only + bigmove10, disjoint
+buckets as in the aggregators' sector_summary, so one ranking covers every market.
+Warehouse fallback notes: "locked" there is ret >= ret_th with close at the day
+high (no per-market limit-price rules), bigmove10 ret >= ret_th below the high,
+touched_only high >= ret_th but close below; sectors are stock_info.sector.
+
+Env:
+- CROSS_SUMMARY_RET_TH   (default 0.10)
+- CROSS_SUMMARY_TOP      (default 5 sectors per market)
+- CROSS_SUMMARY_WORKERS  (default number of markets)
+
+CLI:
+  python -m markets.cross_summary
+  python -m markets.cross_summary --markets us,kr,jp --ymd 2026-02-20 --source warehouse
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_CACHE_ROOT = REPO_ROOT / "data" / "cache"
+SUMMARY_NAME = "cross_market_summary.json"
+
+# cache market code -> (warehouse env, default path)
+WAREHOUSES: Dict[str, tuple] = {
+    "us": ("US_DB_PATH", REPO_ROOT / "markets" / "us" / "us_stock_warehouse.db"),
+    "ca": ("CA_DB_PATH", REPO_ROOT / "markets" / "ca" / "ca_stock_warehouse.db"),
+    "uk": ("UK_DB_PATH", REPO_ROOT / "markets" / "uk" / "uk_stock_warehouse.db"),
+    "au": ("AU_DB_PATH", REPO_ROOT / "markets" / "au" / "au_stock_warehouse.db"),
+    "fr": ("FR_DB_PATH", REPO_ROOT / "markets" / "fr" / "fr_stock_warehouse.db"),
+    "cn": ("CN_DB_PATH", REPO_ROOT / "markets" / "cn" / "cn_stock_warehouse.db"),
+    "jp": ("JP_DB_PATH", REPO_ROOT / "markets" / "jp" / "jp_stock_warehouse.db"),
+    "kr": ("KR_DB_PATH", REPO_ROOT / "markets" / "kr" / "kr_stock_warehouse.db"),
+    "th": ("TH_DB_PATH", REPO_ROOT / "markets" / "th" / "th_stock_warehouse.db"),
+    "in": ("INDIA_DB_PATH", REPO_ROOT / "markets" / "india" / "india_stock_warehouse.db"),
+}
+
+MOVERS_DEF = "mix = locked + touched_only + bigmove10"
+
+# TW has no warehouse (daily CSV cache); it only shows up via sector_history
+MARKETS: List[str] = ["tw"] + list(WAREHOUSES)
+
+_WAREHOUSE_SQL = """
+WITH d AS (
+  SELECT MAX(date) AS ymd FROM stock_prices WHERE date <= ? AND close IS NOT NULL
+),
+p AS (
+  SELECT
+    symbol,
+    date,
+    high,
+    close,
+    LAG(close) OVER (PARTITION BY symbol ORDER BY date) AS prev_close
+  FROM stock_prices
+  WHERE date <= (SELECT ymd FROM d)
+    AND date >= date((SELECT ymd FROM d), '-20 days')
+)
+SELECT
+  p.date AS ymd,
+  COALESCE(NULLIF(TRIM(i.sector), ''), '-') AS sector,
+  COUNT(*) AS sector_total,
+  SUM(CASE WHEN CAST(p.close AS REAL) / p.prev_close - 1.0 >= ? AND p.close >= p.high THEN 1 ELSE 0 END) AS locked,
+  SUM(CASE WHEN CAST(p.close AS REAL) / p.prev_close - 1.0 >= ? AND p.close < p.high THEN 1 ELSE 0 END) AS bigmove10,
+  SUM(CASE WHEN CAST(p.high AS REAL) / p.prev_close - 1.0 >= ? AND CAST(p.close AS REAL) / p.prev_close - 1.0 < ? THEN 1 ELSE 0 END) AS touched_only
+FROM p
+LEFT JOIN stock_info i ON i.symbol = p.symbol
+WHERE p.date = (SELECT ymd FROM d)
+  AND p.prev_close > 0
+  AND p.close IS NOT NULL
+GROUP BY 2
+"""
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def summary_path(cache_root: Optional[Path] = None) -> Path:
+    return Path(cache_root or DEFAULT_CACHE_ROOT) / SUMMARY_NAME
+
+
+def warehouse_path(market: str) -> Optional[Path]:
+    spec = WAREHOUSES.get(market)
+    if not spec:
+        return None
+    env, default = spec
+    return Path((os.getenv(env) or "").strip() or default)
+
+
+# =============================================================================
+# Per-market sources
+# =============================================================================
+def _from_history(market: str, ymd: Optional[str], top: int, cache_root: Optional[Path]) -> Optional[Dict[str, Any]]:
+    from markets import sector_history
+
+    rows = sector_history.latest(market, ymd, cache_root=cache_root)
+    if not rows:
+        return None
+    day = str(rows[0]["ymd"])
+    slot = None
+    conn = sector_history.connect(cache_root)
+    try:
+        r = conn.execute("SELECT slot FROM sector_days WHERE market = ? AND ymd = ?", (market, day)).fetchone()
+        slot = r[0] if r else None
+    finally:
+        conn.close()
+
+    return {
+        "ymd": day,
+        "source": "sector_history",
+        "slot": slot,
+        "locked": sum(int(r["locked_cnt"]) for r in rows),
+        "touched_only": sum(int(r["touched_cnt"]) for r in rows),
+        "bigmove10": sum(int(r["bigmove10_cnt"]) for r in rows),
+        "movers": sum(int(r["mix_cnt"]) for r in rows),
+        "sectors": sum(1 for r in rows if int(r["mix_cnt"]) > 0),
+        "top_sectors": [
+            {
+                "sector": r["sector"],
+                "mix_cnt": int(r["mix_cnt"]),
+                "mix_pct": round(float(r["mix_pct"]), 4),
+                "arrow": sector_history.trend_arrow(r),
+            }
+            for r in rows[:top]
+            if int(r["mix_cnt"]) > 0
+        ],
+    }
+
+
+def _warehouse_latest(market: str, ymd: Optional[str]) -> Optional[str]:
+    db = warehouse_path(market)
+    if db is None or not db.exists():
+        return None
+    conn = sqlite3.connect(f"{db.resolve().as_uri()}?mode=ro", uri=True, timeout=30)
+    try:
+        r = conn.execute("SELECT MAX(date) FROM stock_prices WHERE date <= ?", (str(ymd or "9999-12-31")[:10],)).fetchone()
+    finally:
+        conn.close()
+    return str(r[0])[:10] if r and r[0] else None
+
+
+def _from_warehouse(market: str, ymd: Optional[str], top: int, ret_th: float) -> Optional[Dict[str, Any]]:
+    db = warehouse_path(market)
+    if db is None or not db.exists():
+        return None
+    conn = sqlite3.connect(f"{db.resolve().as_uri()}?mode=ro", uri=True, timeout=30)
+    try:
+        cur = conn.execute(_WAREHOUSE_SQL, (str(ymd or "9999-12-31")[:10], ret_th, ret_th, ret_th, ret_th))
+        rows = [dict(zip([c[0] for c in cur.description], r)) for r in cur.fetchall()]
+    finally:
+        conn.close()
+    if not rows:
+        return None
+
+    # same disjoint buckets as the aggregators' sector_summary: mix = locked + touched_only + bigmove10
+    for r in rows:
+        r["mix"] = sum(int(r[k] or 0) for k in ("locked", "touched_only", "bigmove10"))
+    rows.sort(key=lambda r: (-r["mix"], -int(r["touched_only"] or 0), str(r["sector"])))
+    return {
+        "ymd": str(rows[0]["ymd"]),
+        "source": "warehouse",
+        "slot": None,
+        "locked": sum(int(r["locked"] or 0) for r in rows),
+        "touched_only": sum(int(r["touched_only"] or 0) for r in rows),
+        "bigmove10": sum(int(r["bigmove10"] or 0) for r in rows),
+        "movers": sum(r["mix"] for r in rows),
+        "sectors": sum(1 for r in rows if r["mix"] > 0),
+        "top_sectors": [
+            {
+                "sector": r["sector"],
+                "mix_cnt": r["mix"],
+                "mix_pct": round(r["mix"] / max(1, int(r["sector_total"] or 0)), 4),
+                "arrow": "",
+            }
+            for r in rows[:top]
+            if r["mix"] > 0
+        ],
+    }
+
+
+def summarize_market(
+    market: str,
+    *,
+    ymd: Optional[str] = None,
+    source: str = "auto",
+    top: int = 5,
+    ret_th: float = 0.10,
+    cache_root: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """
+    source: auto (sector_history unless the warehouse has a newer day, then warehouse)
+            / history / warehouse
+    """
+    try:
+        res = None
+        if source in ("auto", "history"):
+            res = _from_history(market, ymd, top, cache_root)
+        if res is not None and source == "auto":
+            # history only moves when main.py writes a payload; a warehouse synced since wins
+            newest = _warehouse_latest(market, ymd)
+            if newest and newest > str(res["ymd"])[:10]:
+                res = None
+        if res is None and source in ("auto", "warehouse"):
+            res = _from_warehouse(market, ymd, top, ret_th)
+        if res is None:
+            return {"market": market, "source": "missing"}
+        return {"market": market, **res}
+    except Exception as e:
+        return {"market": market, "source": "error", "error": f"{type(e).__name__}: {e}"}
+
+
+def build(
+    markets: Optional[Iterable[str]] = None,
+    *,
+    ymd: Optional[str] = None,
+    source: str = "auto",
+    cache_root: Optional[Path] = None,
+    workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    mk = list(markets or MARKETS)
+    top = _env_int("CROSS_SUMMARY_TOP", 5)
+    ret_th = _env_float("CROSS_SUMMARY_RET_TH", 0.10)
+    n = max(1, int(workers or _env_int("CROSS_SUMMARY_WORKERS", len(mk))))
+
+    with ThreadPoolExecutor(max_workers=min(n, max(1, len(mk)))) as ex:
+        results = list(
+            ex.map(
+                lambda m: summarize_market(m, ymd=ymd, source=source, top=top, ret_th=ret_th, cache_root=cache_root),
+                mk,
+            )
+        )
+
+    by_market = {r["market"]: r for r in results}
+    ranking = sorted(
+        (m for m, r in by_market.items() if "movers" in r),
+        key=lambda m: -int(by_market[m]["movers"]),
+    )
+    return {
+        "generated_at_utc": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "ret_th": ret_th,
+        "movers_def": MOVERS_DEF,
+        "markets": by_market,
+        "ranking": ranking,
+    }
+
+
+def write(summary: Dict[str, Any], path: Optional[Path] = None) -> Path:
+    path = Path(path or summary_path())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # per-process tmp: run_daily builds several markets at once, each rewriting the summary
+    tmp = path.with_suffix(f"{path.suffix}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(summary, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+
+# =============================================================================
+# Readers
+# =============================================================================
+def load(path: Optional[Path] = None) -> Dict[str, Any]:
+    p = Path(path or summary_path())
+    if not p.exists():
+        return {}
+    try:
+        obj = json.loads(p.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    return obj if isinstance(obj, dict) else {}
+
+
+def market_entry(market: str, ymd: Optional[str] = None, *, path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """
+    One market's entry; ymd given => only if the summary is for that day.
+    Accepts metadata-style codes (INDIA / IN / US ...).
+    """
+    m = str(market or "").strip().lower()
+    m = "in" if m in ("india", "nse") else m
+    e = (load(path).get("markets") or {}).get(m)
+    if not isinstance(e, dict) or "movers" not in e:
+        return None
+    if ymd and str(e.get("ymd") or "") != str(ymd)[:10]:
+        return None
+    return e
+
+
+def main(argv: Optional[list] = None) -> int:
+    ap = argparse.ArgumentParser(description="Cross-market summary (data/cache/cross_market_summary.json).")
+    ap.add_argument("--markets", default="", help="comma list (default: all)")
+    ap.add_argument("--ymd", default=None, help="latest day <= ymd per market (default: newest)")
+    ap.add_argument("--source", default="auto", choices=["auto", "history", "warehouse"])
+    ap.add_argument("--cache-root", default=str(DEFAULT_CACHE_ROOT))
+    ap.add_argument("--out", default=None)
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args(argv)
+
+    root = Path(args.cache_root)
+    mk = [m.strip() for m in args.markets.split(",") if m.strip()] or None
+    summary = build(mk, ymd=args.ymd, source=args.source, cache_root=root, workers=args.workers)
+    out = write(summary, Path(args.out) if args.out else summary_path(root))
+
+    for m, r in summary["markets"].items():
+        if "movers" not in r:
+            print(f"{m:<3} {r.get('source')} {r.get('error', '')}")
+            continue
+        tops = ", ".join(f"{t['sector']}{t['arrow']}({t['mix_cnt']})" for t in r["top_sectors"][:3])
+        print(
+            f"{m:<3} {r['ymd']} {r['source']:<14} movers={r['movers']:<4} locked={r['locked']:<4} "
+            f"touched={r['touched_only']:<4} sectors={r['sectors']:<3} {tops}"
+        )
+    print(f"✅ {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,469 @@
+# markets/datasource.py
+# -*- coding: utf-8 -*-
+"""
+Pluggable data source for the downloaders (live / record / replay)
+
+Every network read of the sync stage goes through these calls:
+
+    from markets.datasource import http_get, yf_download, yf_ticker_info
+
+    df = yf_download(tickers, start=..., end=..., interval="1d", ...)   # == yf.download
+    d  = yf_ticker_info("RELIANCE.NS")                                   # == yf.Ticker(s).info
+    r  = http_get(url, headers=..., timeout=30)                          # == requests.get
+    r  = http_get(url, session=s, timeout=30)                            # == s.get
+
+Modes (env INTRADAY_DATASOURCE, or configure()):
+  live    (default) call yfinance / requests directly
+  record  call live and store every response in the fixture store
+  replay  serve responses from the fixture store, no network
+
+Fixture store (INTRADAY_FIXTURES_DIR, default data/fixtures):
+  <dir>/<kind>/<key[:2]>/<key>.pkl     one pickled response per request
+  <dir>/index.jsonl                    key / kind / request summary / recorded_at
+The key is a hash of the request (tickers + date window + interval ... / url + params);
+arguments that don't change the data (progress, threads, timeout, headers) are ignored.
+Live failures are recorded too and re-raised on replay.
+
+Replay knobs (deterministic with INTRADAY_REPLAY_SEED):
+  INTRADAY_REPLAY_LATENCY_MS   "150" or "50-400" (uniform) added per call
+  INTRADAY_REPLAY_ERROR_RATE   0..1 share of calls that fail
+                               (yf_download -> empty DataFrame like a failed yfinance batch,
+                                http_get / yf_ticker_info -> ConnectionError)
+  INTRADAY_REPLAY_MISSING      error (default) | live | empty   what to do on a fixture miss
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+MODES = ("live", "record", "replay")
+
+# yf.download kwargs that don't change the returned data
+_YF_IGNORED = {"progress", "threads", "timeout", "session", "multi_level_index"}
+
+
+class FixtureMissing(LookupError):
+    """Replay mode: no recorded response for this request."""
+
+
+class InjectedError(ConnectionError):
+    """Replay mode: failure injected by INTRADAY_REPLAY_ERROR_RATE."""
+
+
+class RecordedError(RuntimeError):
+    """Replay mode: the live call failed when it was recorded."""
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except Exception:
+        return default
+
+
+def _parse_latency(s: str) -> Tuple[float, float]:
+    s = (s or "").strip()
+    if not s:
+        return 0.0, 0.0
+    try:
+        if "-" in s:
+            a, b = s.split("-", 1)
+            lo, hi = float(a), float(b)
+        else:
+            lo = hi = float(s)
+    except Exception:
+        return 0.0, 0.0
+    return max(0.0, min(lo, hi)) / 1000.0, max(0.0, max(lo, hi)) / 1000.0
+
+
+@dataclass
+class DataSourceConfig:
+    mode: str = "live"
+    fixtures_dir: Path = REPO_ROOT / "data" / "fixtures"
+    latency_s: Tuple[float, float] = (0.0, 0.0)
+    error_rate: float = 0.0
+    missing: str = "error"
+    seed: Optional[int] = None
+    stats: Dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def from_env(cls) -> "DataSourceConfig":
+        mode = (os.getenv("INTRADAY_DATASOURCE") or "live").strip().lower()
+        if mode not in MODES:
+            print(f"[datasource] unknown INTRADAY_DATASOURCE={mode!r}; using live", flush=True)
+            mode = "live"
+        seed_raw = (os.getenv("INTRADAY_REPLAY_SEED") or "").strip()
+        return cls(
+            mode=mode,
+            fixtures_dir=Path(os.getenv("INTRADAY_FIXTURES_DIR") or (REPO_ROOT / "data" / "fixtures")),
+            latency_s=_parse_latency(os.getenv("INTRADAY_REPLAY_LATENCY_MS", "")),
+            error_rate=min(1.0, max(0.0, _env_float("INTRADAY_REPLAY_ERROR_RATE", 0.0))),
+            missing=(os.getenv("INTRADAY_REPLAY_MISSING") or "error").strip().lower(),
+            seed=int(seed_raw) if seed_raw.lstrip("-").isdigit() else None,
+        )
+
+
+_CFG: Optional[DataSourceConfig] = None
+_RNG = random.Random()
+_LOCK = threading.Lock()
+
+
+def config() -> DataSourceConfig:
+    global _CFG
+    if _CFG is None:
+        with _LOCK:
+            if _CFG is None:
+                _CFG = DataSourceConfig.from_env()
+                if _CFG.seed is not None:
+                    _RNG.seed(_CFG.seed)
+    return _CFG
+
+
+def configure(
+    *,
+    mode: Optional[str] = None,
+    fixtures_dir: Optional[Path] = None,
+    latency_ms: Optional[str] = None,
+    error_rate: Optional[float] = None,
+    missing: Optional[str] = None,
+    seed: Optional[int] = None,
+    export_env: bool = True,
+) -> DataSourceConfig:
+    """
+    Programmatic setup (benchmarks / tests). export_env=True also sets the
+    INTRADAY_* env vars so child processes use the same source.
+    """
+    cfg = config()
+    if mode is not None:
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        cfg.mode = mode
+    if fixtures_dir is not None:
+        cfg.fixtures_dir = Path(fixtures_dir)
+    if latency_ms is not None:
+        cfg.latency_s = _parse_latency(str(latency_ms))
+    if error_rate is not None:
+        cfg.error_rate = min(1.0, max(0.0, float(error_rate)))
+    if missing is not None:
+        cfg.missing = missing
+    if seed is not None:
+        cfg.seed = int(seed)
+        _RNG.seed(cfg.seed)
+
+    if export_env:
+        os.environ["INTRADAY_DATASOURCE"] = cfg.mode
+        os.environ["INTRADAY_FIXTURES_DIR"] = str(cfg.fixtures_dir)
+        if latency_ms is not None:
+            os.environ["INTRADAY_REPLAY_LATENCY_MS"] = str(latency_ms)
+        os.environ["INTRADAY_REPLAY_ERROR_RATE"] = str(cfg.error_rate)
+        os.environ["INTRADAY_REPLAY_MISSING"] = cfg.missing
+        if cfg.seed is not None:
+            os.environ["INTRADAY_REPLAY_SEED"] = str(cfg.seed)
+    return cfg
+
+
+def mode() -> str:
+    return config().mode
+
+
+def _bump(name: str, n: int = 1) -> None:
+    cfg = config()
+    with _LOCK:
+        cfg.stats[name] = cfg.stats.get(name, 0) + n
+
+
+def stats() -> Dict[str, int]:
+    with _LOCK:
+        return dict(config().stats)
+
+
+# =============================================================================
+# Fixture store
+# =============================================================================
+def _norm(v: Any) -> Any:
+    if isinstance(v, (list, tuple, set)):
+        return [_norm(x) for x in v]
+    if isinstance(v, dict):
+        return {str(k): _norm(x) for k, x in sorted(v.items(), key=lambda kv: str(kv[0]))}
+    if v is None or isinstance(v, (bool, int, float, str)):
+        return v
+    # dates / timestamps
+    return str(v)
+
+
+def request_key(kind: str, req: Dict[str, Any]) -> str:
+    blob = json.dumps({"kind": kind, "req": _norm(req)}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def _fixture_path(kind: str, key: str) -> Path:
+    return config().fixtures_dir / kind / key[:2] / f"{key}.pkl"
+
+
+def _save(kind: str, key: str, req: Dict[str, Any], obj: Dict[str, Any]) -> None:
+    path = _fixture_path(kind, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".tmp{os.getpid()}_{threading.get_ident()}")
+    with open(tmp, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+    line = {
+        "key": key,
+        "kind": kind,
+        "req": _norm(req),
+        "ok": "error" not in obj,
+        "recorded_at_utc": datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z"),
+    }
+    text = json.dumps(line, ensure_ascii=False) + "\n"
+    with _LOCK:
+        with open(config().fixtures_dir / "index.jsonl", "a", encoding="utf-8") as f:
+            f.write(text)
+    _bump("recorded")
+
+
+def _load(kind: str, key: str) -> Optional[Dict[str, Any]]:
+    path = _fixture_path(kind, key)
+    if not path.exists():
+        return None
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _inject(kind: str) -> bool:
+    """
+    Sleep for the configured latency; True if this call should fail.
+    """
+    cfg = config()
+    lo, hi = cfg.latency_s
+    with _LOCK:
+        delay = _RNG.uniform(lo, hi) if hi > 0 else 0.0
+        fail = cfg.error_rate > 0 and _RNG.random() < cfg.error_rate
+    if delay > 0:
+        time.sleep(delay)
+    if fail:
+        _bump(f"{kind}_injected_errors")
+    return fail
+
+
+def _replay(kind: str, key: str, req: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    obj = _load(kind, key)
+    if obj is None:
+        _bump(f"{kind}_misses")
+        if config().missing in ("live", "empty"):
+            return None
+        raise FixtureMissing(f"no fixture for {kind} {json.dumps(_norm(req), ensure_ascii=False)[:200]} ({key})")
+    _bump(f"{kind}_hits")
+    if "error" in obj:
+        raise RecordedError(obj["error"])
+    return obj
+
+
+def _through(
+    kind: str,
+    req: Dict[str, Any],
+    live: Callable[[], Any],
+    *,
+    pack: Callable[[Any], Dict[str, Any]],
+    unpack: Callable[[Dict[str, Any]], Any],
+    on_error: Callable[[], Any],
+    on_missing: Callable[[], Any],
+) -> Any:
+    """
+    live / record / replay dispatch shared by all wrapped calls.
+    on_error   : result of an injected failure (may raise)
+    on_missing : result of a fixture miss with INTRADAY_REPLAY_MISSING=empty
+    """
+    cfg = config()
+    if cfg.mode == "live":
+        return live()
+
+    key = request_key(kind, req)
+    if cfg.mode == "replay":
+        obj = _replay(kind, key, req)
+        if _inject(kind):
+            return on_error()
+        if obj is not None:
+            return unpack(obj)
+        if cfg.missing == "empty":
+            return on_missing()
+        # missing == "live": fetch without recording
+
+    try:
+        res = live()
+    except Exception as e:
+        if cfg.mode == "record":
+            _save(kind, key, req, {"error": f"{type(e).__name__}: {e}"})
+        raise
+    if cfg.mode == "record":
+        _save(kind, key, req, pack(res))
+    return res
+
+
+# =============================================================================
+# yfinance
+# =============================================================================
+def _empty_frame():
+    import pandas as pd
+
+    return pd.DataFrame()
+
+
+def _yf_request(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    req = dict(kwargs)
+    if args:
+        req["tickers"] = args[0]
+    t = req.get("tickers")
+    if isinstance(t, str):
+        req["tickers"] = t.split()
+    for k in _YF_IGNORED:
+        req.pop(k, None)
+    return req
+
+
+def yf_download(*args: Any, **kwargs: Any) -> Any:
+    """
+    Drop-in for yfinance.download(*args, **kwargs).
+    An injected failure returns an empty DataFrame (what a failed batch looks like).
+    """
+
+    def _live() -> Any:
+        import yfinance as yf
+
+        return yf.download(*args, **kwargs)
+
+    return _through(
+        "yf_download",
+        _yf_request(args, kwargs),
+        _live,
+        pack=lambda df: {"frame": df},
+        unpack=lambda obj: obj["frame"].copy(),
+        on_error=_empty_frame,
+        on_missing=_empty_frame,
+    )
+
+
+def yf_ticker_info(symbol: str) -> Dict[str, Any]:
+    """
+    Drop-in for yfinance.Ticker(symbol).info.
+    """
+
+    def _live() -> Dict[str, Any]:
+        import yfinance as yf
+
+        return dict(yf.Ticker(symbol).info or {})
+
+    def _fail() -> Dict[str, Any]:
+        raise InjectedError(f"injected failure: Ticker({symbol}).info")
+
+    return _through(
+        "yf_info",
+        {"symbol": symbol},
+        _live,
+        pack=lambda info: {"info": info},
+        unpack=lambda obj: dict(obj["info"]),
+        on_error=_fail,
+        on_missing=dict,
+    )
+
+
+# =============================================================================
+# HTTP (requests.get)
+# =============================================================================
+def _to_response(obj: Dict[str, Any]) -> Any:
+    import requests
+
+    r = requests.models.Response()
+    r.status_code = int(obj.get("status_code") or 0)
+    r._content = obj.get("content") or b""  # type: ignore[attr-defined]
+    r.headers = requests.structures.CaseInsensitiveDict(obj.get("headers") or {})
+    r.url = str(obj.get("url") or "")
+    r.encoding = obj.get("encoding")
+    r.reason = str(obj.get("reason") or "")
+    return r
+
+
+def _from_response(r: Any) -> Dict[str, Any]:
+    return {
+        "status_code": r.status_code,
+        "content": r.content,
+        "headers": dict(r.headers),
+        "url": r.url,
+        "encoding": r.encoding,
+        "reason": r.reason,
+    }
+
+
+def http_get(url: str, *, session: Any = None, **kwargs: Any) -> Any:
+    """
+    Drop-in for requests.get(url, **kwargs) / session.get(url, **kwargs).
+    Returns a requests.Response in every mode; an injected failure raises ConnectionError.
+    """
+
+    def _live() -> Any:
+        if session is not None:
+            return session.get(url, **kwargs)
+        import requests
+
+        return requests.get(url, **kwargs)
+
+    def _fail() -> Any:
+        raise InjectedError(f"injected failure: GET {url}")
+
+    return _through(
+        "http_get",
+        {"method": "GET", "url": url, "params": kwargs.get("params"), "data": kwargs.get("data")},
+        _live,
+        pack=_from_response,
+        unpack=_to_response,
+        on_error=_fail,
+        on_missing=lambda: _to_response({"status_code": 404, "url": url, "reason": "fixture missing"}),
+    )
+
+
+def main(argv: Optional[list] = None) -> int:
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Inspect the recorded fixture store.")
+    ap.add_argument("--dir", default="", help="fixture dir (default: INTRADAY_FIXTURES_DIR or data/fixtures)")
+    ap.add_argument("--kind", default="", help="yf_download | yf_info | http_get")
+    args = ap.parse_args(argv)
+
+    root = Path(args.dir) if args.dir else config().fixtures_dir
+    idx = root / "index.jsonl"
+    if not idx.exists():
+        print(f"no fixtures in {root}")
+        return 1
+    latest: Dict[str, Dict[str, Any]] = {}
+    with open(idx, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                obj = json.loads(line)
+            except Exception:
+                continue
+            if args.kind and obj.get("kind") != args.kind:
+                continue
+            latest[obj["key"]] = obj
+    for obj in latest.values():
+        req = obj.get("req") or {}
+        what = req.get("url") or req.get("symbol") or " ".join((req.get("tickers") or [])[:5])
+        flag = "" if obj.get("ok") else "  (error)"
+        print(f"{obj['recorded_at_utc']}  {obj['kind']:<11} {obj['key'][:10]}  {what[:90]}{flag}")
+    print(f"{len(latest)} fixture(s) in {root}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
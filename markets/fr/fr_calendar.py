@@ -6,18 +6,19 @@ from datetime import datetime, timedelta
 from typing import Optional, Tuple
 
 import pandas as pd
-import yfinance as yf
 
 from .fr_config import calendar_ticker, calendar_lookback_cal_days
 
 
 def latest_trading_day_from_calendar(asof_ymd: Optional[str] = None) -> Optional[str]:
+    from markets.datasource import yf_download
+
     cal_ticker = calendar_ticker()
     lookback = calendar_lookback_cal_days()
     try:
         end_dt = pd.to_datetime(asof_ymd) if asof_ymd else pd.Timestamp.now()
         start_dt = end_dt - timedelta(days=lookback)
-        df = yf.download(
+        df = yf_download(
             cal_ticker,
             start=start_dt.strftime("%Y-%m-%d"),
             end=(end_dt + timedelta(days=1)).strftime("%Y-%m-%d"),
@@ -41,12 +42,14 @@ def latest_trading_day_from_calendar(asof_ymd: Optional[str] = None) -> Optional
 
 
 def infer_window_by_trading_days(end_ymd: str, n_trading_days: int) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    from markets.datasource import yf_download
+
     cal_ticker = calendar_ticker()
     lookback = calendar_lookback_cal_days()
     try:
         end_dt = pd.to_datetime(end_ymd)
         start_dt = end_dt - timedelta(days=lookback)
-        df = yf.download(
+        df = yf_download(
             cal_ticker,
             start=start_dt.strftime("%Y-%m-%d"),
             end=(end_dt + timedelta(days=1)).strftime("%Y-%m-%d"),
@@ -7,17 +7,18 @@ from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
-import yfinance as yf
 
 from .fr_config import yf_threads_enabled
 
 
 def download_one(symbol: str, start_date: str, end_date_exclusive: str) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    from markets.datasource import yf_download
+
     max_retries = 2
     last_err: Optional[str] = None
     for attempt in range(max_retries + 1):
         try:
-            df = yf.download(
+            df = yf_download(
                 symbol,
                 start=start_date,
                 end=end_date_exclusive,
@@ -70,12 +71,14 @@ def download_batch(
     start_date: str,
     end_date_exclusive: str,
 ) -> Tuple[pd.DataFrame, List[str], Optional[str]]:
+    from markets.datasource import yf_download
+
     if not tickers:
         empty = pd.DataFrame(columns=["symbol", "date", "open", "high", "low", "close", "volume"])
         return empty, [], None
 
     try:
-        df = yf.download(
+        df = yf_download(
             tickers=" ".join(tickers),
             start=start_date,
             end=end_date_exclusive,
@@ -4,7 +4,7 @@ from __future__ import annotations
 import sqlite3
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
 import pandas as pd
 
@@ -202,6 +202,60 @@ def _base_payload(
     }
 
 
+_SNAPSHOT_SQL = """
+WITH base AS (
+  SELECT
+    sp.symbol,
+    sp.date AS ymd,
+    sp.open, sp.high, sp.low, sp.close, sp.volume,
+    LAG(sp.close) OVER (PARTITION BY sp.symbol ORDER BY sp.date) AS prev_close,
+    i.name,
+    i.sector,
+    i.market_detail,
+    ROW_NUMBER() OVER (PARTITION BY sp.symbol ORDER BY sp.date DESC) AS rn
+  FROM stock_prices sp
+  JOIN stock_info i ON i.symbol = sp.symbol
+  WHERE i.market='FR' AND sp.date <= ?
+)
+SELECT
+  symbol, ymd, open, high, low, close, volume, prev_close,
+  name, sector, market_detail
+FROM base
+WHERE rn <= ?
+"""
+
+# --replay: same LAG pass over [start, end] plus each symbol's last N rows before start
+# (tail N rows per day == rn <= N of _SNAPSHOT_SQL)
+_REPLAY_SQL = """
+WITH base AS (
+  SELECT
+    sp.symbol,
+    sp.date AS ymd,
+    sp.open, sp.high, sp.low, sp.close, sp.volume,
+    LAG(sp.close) OVER (PARTITION BY sp.symbol ORDER BY sp.date) AS prev_close,
+    i.name,
+    i.sector,
+    i.market_detail
+  FROM stock_prices sp
+  JOIN stock_info i ON i.symbol = sp.symbol
+  WHERE i.market='FR' AND sp.date <= ?
+),
+ranked AS (
+  SELECT
+    *,
+    SUM(CASE WHEN ymd < ? THEN 1 ELSE 0 END)
+      OVER (PARTITION BY symbol ORDER BY ymd DESC ROWS UNBOUNDED PRECEDING) AS pre_rn
+  FROM base
+)
+SELECT
+  symbol, ymd, open, high, low, close, volume, prev_close,
+  name, sector, market_detail
+FROM ranked
+WHERE ymd >= ? OR pre_rn <= ?
+ORDER BY symbol, ymd
+"""
+
+
 def run_intraday(slot: str, asof: str, ymd: str, db_path_override: Optional[Path] = None) -> Dict[str, Any]:
     dbp = db_path_override or Path(db_path())
     if isinstance(dbp, str):
@@ -216,36 +270,52 @@ def run_intraday(slot: str, asof: str, ymd: str, db_path_override: Optional[Path
         log(f"🕒 requested ymd={ymd} slot={slot} asof={asof}")
         log(f"📅 ymd_effective = {ymd_effective}")
 
-        time_meta: Dict[str, Any] = {
-            "market_tz": "Europe/Paris",
-            "market_tz_offset": _paris_offset_colon_for_date(ymd_effective),
-        }
-
-        sql = """
-        WITH base AS (
-          SELECT
-            sp.symbol,
-            sp.date AS ymd,
-            sp.open, sp.high, sp.low, sp.close, sp.volume,
-            LAG(sp.close) OVER (PARTITION BY sp.symbol ORDER BY sp.date) AS prev_close,
-            i.name,
-            i.sector,
-            i.market_detail,
-            ROW_NUMBER() OVER (PARTITION BY sp.symbol ORDER BY sp.date DESC) AS rn
-          FROM stock_prices sp
-          JOIN stock_info i ON i.symbol = sp.symbol
-          WHERE i.market='FR' AND sp.date <= ?
-        )
-        SELECT
-          symbol, ymd, open, high, low, close, volume, prev_close,
-          name, sector, market_detail
-        FROM base
-        WHERE rn <= ?
-        """
-        df = pd.read_sql_query(sql, conn, params=(ymd_effective, int(FR_STREAK_LOOKBACK_ROWS)))
+        df = pd.read_sql_query(_SNAPSHOT_SQL, conn, params=(ymd_effective, int(FR_STREAK_LOOKBACK_ROWS)))
     finally:
         conn.close()
 
+    return _build_payload(df, slot=slot, asof=asof, ymd=ymd, ymd_effective=ymd_effective, dbp=dbp)
+
+
+def load_replay(start: str, end: str, db_path_override: Optional[Path] = None) -> Mapping:
+    """
+    --replay: one LAG pass over the warehouse -> {ymd_effective: last N rows per symbol <= ymd}
+    (per-day slices are cut lazily; streaks are recomputed per slice exactly like run_intraday)
+    """
+    from markets.replay import LazyDays, tail_rows, trading_days
+
+    dbp = Path(db_path_override or db_path())
+    if not dbp.exists():
+        raise FileNotFoundError(f"FR DB not found: {dbp} (set FR_DB_PATH to override)")
+
+    n = int(FR_STREAK_LOOKBACK_ROWS)
+    conn = sqlite3.connect(str(dbp))
+    try:
+        days = trading_days(conn, start, end)
+        df = pd.read_sql_query(_REPLAY_SQL, conn, params=(end, start, start, n))
+    finally:
+        conn.close()
+    return LazyDays(days, lambda d: tail_rows(df, d, n))
+
+
+def replay_payload(ymd: str, day: pd.DataFrame, *, slot: str, asof: str) -> Dict[str, Any]:
+    return _build_payload(day, slot=slot, asof=asof, ymd=ymd, ymd_effective=ymd, dbp=Path(db_path()))
+
+
+def _build_payload(
+    df: pd.DataFrame,
+    *,
+    slot: str,
+    asof: str,
+    ymd: str,
+    ymd_effective: str,
+    dbp: Path,
+) -> Dict[str, Any]:
+    time_meta: Dict[str, Any] = {
+        "market_tz": "Europe/Paris",
+        "market_tz_offset": _paris_offset_colon_for_date(ymd_effective),
+    }
+
     if df.empty:
         return _base_payload(
             slot=slot,
@@ -33,13 +33,10 @@ def _fetch_yf_one(symbol: str, start_date: str, end_excl_date: str) -> Tuple[Opt
       (df, err)
     df columns: date, open, high, low, close, volume
     """
-    try:
-        import yfinance as yf  # type: ignore
-    except Exception as e:
-        return None, f"yfinance_import_error: {e}"
+    from markets.datasource import yf_download
 
     try:
-        df = yf.download(
+        df = yf_download(
             symbol,
             start=start_date,
             end=end_excl_date,
@@ -129,11 +126,14 @@ def download_batch(
     if not symbols:
         return None, [], None
 
-    # dependency check
-    try:
-        import yfinance as _  # noqa: F401  # type: ignore
-    except Exception as e:
-        return None, list(symbols), f"yfinance_import_error: {e}"
+    # dependency check (replay mode serves recorded responses without yfinance)
+    from markets.datasource import mode as datasource_mode
+
+    if datasource_mode() != "replay":
+        try:
+            import yfinance as _  # noqa: F401  # type: ignore
+        except Exception as e:
+            return None, list(symbols), f"yfinance_import_error: {e}"
 
     failed: List[str] = []
     frames: List[pd.DataFrame] = []
@@ -6,7 +6,7 @@ import math
 import os
 import sqlite3
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Mapping, Optional
 
 import pandas as pd
 
@@ -215,6 +215,78 @@ def _compute_streaks_for_symbol(rows_desc: List[Dict[str, Any]]) -> Dict[str, An
     }
 
 
+N_DAYS = 12
+
+_HIST_SQL = """
+WITH p AS (
+  SELECT
+    symbol,
+    date,
+    open, high, low, close, volume,
+    LAG(close) OVER (PARTITION BY symbol ORDER BY date) AS last_close,
+    ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY date DESC) AS rn
+  FROM stock_prices
+  WHERE date <= ?
+    AND close IS NOT NULL
+)
+SELECT
+  p.symbol,
+  p.date AS ymd,
+  p.open,
+  p.high,
+  p.low,
+  p.close,
+  p.volume,
+  p.last_close,
+  i.local_symbol,
+  i.name,
+  i.industry,
+  i.sector,
+  i.market,
+  i.market_detail
+FROM p
+LEFT JOIN stock_info i ON i.symbol = p.symbol
+WHERE p.rn <= {n_days}
+ORDER BY p.symbol, p.date DESC
+"""
+
+# --replay: same LAG over the whole warehouse once; pre_rn = ROW_NUMBER among dates < start,
+# so every day in [start, end] still sees its own last N_DAYS rows
+_REPLAY_SQL = """
+WITH p AS (
+  SELECT
+    symbol,
+    date,
+    open, high, low, close, volume,
+    LAG(close) OVER (PARTITION BY symbol ORDER BY date) AS last_close,
+    SUM(CASE WHEN date < ? THEN 1 ELSE 0 END)
+      OVER (PARTITION BY symbol ORDER BY date DESC ROWS UNBOUNDED PRECEDING) AS pre_rn
+  FROM stock_prices
+  WHERE date <= ?
+    AND close IS NOT NULL
+)
+SELECT
+  p.symbol,
+  p.date AS ymd,
+  p.open,
+  p.high,
+  p.low,
+  p.close,
+  p.volume,
+  p.last_close,
+  i.local_symbol,
+  i.name,
+  i.industry,
+  i.sector,
+  i.market,
+  i.market_detail
+FROM p
+LEFT JOIN stock_info i ON i.symbol = p.symbol
+WHERE p.date >= ? OR p.pre_rn <= ?
+ORDER BY p.symbol, p.date DESC
+"""
+
+
 def run_intraday(*, slot: str, asof: str, ymd: str) -> Dict[str, Any]:
     db_path = _db_path()
     if not os.path.exists(db_path):
@@ -226,208 +298,210 @@ def run_intraday(*, slot: str, asof: str, ymd: str) -> Dict[str, Any]:
         log(f"🕒 requested ymd={ymd} slot={slot} asof={asof}")
         log(f"📅 ymd_effective = {ymd_effective}")
 
-        N_DAYS = 12
-
-        sql_hist = f"""
-        WITH p AS (
-          SELECT
-            symbol,
-            date,
-            open, high, low, close, volume,
-            LAG(close) OVER (PARTITION BY symbol ORDER BY date) AS last_close,
-            ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY date DESC) AS rn
-          FROM stock_prices
-          WHERE date <= ?
-            AND close IS NOT NULL
+        dfh = pd.read_sql_query(_HIST_SQL.format(n_days=int(N_DAYS)), conn, params=(ymd_effective,))
+    finally:
+        conn.close()
+
+    return _build_payload(dfh, slot=slot, asof=asof, ymd=ymd, ymd_effective=ymd_effective, db_path=db_path)
+
+
+def load_replay(start: str, end: str) -> Mapping:
+    """
+    --replay: one history query for [start, end] -> {ymd_effective: last N_DAYS rows per symbol}
+    """
+    from markets.replay import LazyDays, tail_rows, trading_days
+
+    db_path = _db_path()
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"INDIA DB not found: {db_path} (set INDIA_DB_PATH to override)")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        days = trading_days(conn, start, end, close_not_null=True)
+        df = pd.read_sql_query(_REPLAY_SQL, conn, params=(start, end, start, int(N_DAYS)))
+    finally:
+        conn.close()
+    return LazyDays(days, lambda d: tail_rows(df, d, int(N_DAYS), desc=True))
+
+
+def replay_payload(ymd: str, day: pd.DataFrame, *, slot: str, asof: str) -> Dict[str, Any]:
+    return _build_payload(day, slot=slot, asof=asof, ymd=ymd, ymd_effective=ymd, db_path=_db_path())
+
+
+def _build_payload(
+    dfh: pd.DataFrame,
+    *,
+    slot: str,
+    asof: str,
+    ymd: str,
+    ymd_effective: str,
+    db_path: str,
+) -> Dict[str, Any]:
+
+    if dfh.empty:
+        snapshot_main: List[Dict[str, Any]] = []
+    else:
+        dfh["name"] = dfh["name"].fillna("Unknown")
+        dfh["industry"] = dfh["industry"].fillna("Unclassified")
+        dfh["sector"] = dfh["sector"].fillna("Unclassified")
+
+        for c in ["open", "high", "low", "close", "volume", "last_close"]:
+            dfh[c] = pd.to_numeric(dfh[c], errors="coerce")
+
+        dfh["band_pct"] = dfh["market_detail"].apply(_parse_band_pct_from_market_detail)
+
+        dfh["ret"] = 0.0
+        m = dfh["last_close"].notna() & (dfh["last_close"] > 0) & dfh["close"].notna()
+        dfh.loc[m, "ret"] = (dfh.loc[m, "close"] / dfh.loc[m, "last_close"]) - 1.0
+        dfh["ret_pct"] = dfh["ret"] * 100.0
+
+        # row-level limit flags
+        flag_rows: List[Dict[str, Any]] = []
+        for _, r in dfh.iterrows():
+            flags = _touch_locked_flags(
+                close=_to_num(r.get("close"), 0.0),
+                high=_to_num(r.get("high"), 0.0),
+                last_close=_to_num(r.get("last_close"), 0.0),
+                band_pct=r.get("band_pct"),
+            )
+            flag_rows.append(flags)
+
+        dff = pd.DataFrame(flag_rows, index=dfh.index)
+        for c in dff.columns:
+            dfh[c] = dff[c]
+
+        # normalized limit labels
+        dfh["limit_rate"] = dfh["band_pct"]
+        dfh["limit_rate_pct"] = dfh["band_pct"].apply(
+            lambda x: (float(x) * 100.0) if pd.notna(x) and _is_valid_num(x) else None
         )
-        SELECT
-          p.symbol,
-          p.date AS ymd,
-          p.open,
-          p.high,
-          p.low,
-          p.close,
-          p.volume,
-          p.last_close,
-          i.local_symbol,
-          i.name,
-          i.industry,
-          i.sector,
-          i.market,
-          i.market_detail
-        FROM p
-        LEFT JOIN stock_info i ON i.symbol = p.symbol
-        WHERE p.rn <= {int(N_DAYS)}
-        ORDER BY p.symbol, p.date DESC
-        """
-        dfh = pd.read_sql_query(sql_hist, conn, params=(ymd_effective,))
-
-        if dfh.empty:
-            snapshot_main: List[Dict[str, Any]] = []
+
+        # per-symbol compute today/prev status + streak
+        extra_map: Dict[str, Dict[str, Any]] = {}
+        for sym, g in dfh.groupby("symbol", sort=False):
+            rows_desc = g.sort_values("ymd", ascending=False, kind="mergesort").to_dict(orient="records")
+            extra_map[sym] = _compute_streaks_for_symbol(rows_desc)
+
+        dft = dfh[dfh["ymd"] == ymd_effective].copy()
+        if dft.empty:
+            snapshot_main = []
         else:
-            dfh["name"] = dfh["name"].fillna("Unknown")
-            dfh["industry"] = dfh["industry"].fillna("Unclassified")
-            dfh["sector"] = dfh["sector"].fillna("Unclassified")
-
-            for c in ["open", "high", "low", "close", "volume", "last_close"]:
-                dfh[c] = pd.to_numeric(dfh[c], errors="coerce")
-
-            dfh["band_pct"] = dfh["market_detail"].apply(_parse_band_pct_from_market_detail)
-
-            dfh["ret"] = 0.0
-            m = dfh["last_close"].notna() & (dfh["last_close"] > 0) & dfh["close"].notna()
-            dfh.loc[m, "ret"] = (dfh.loc[m, "close"] / dfh.loc[m, "last_close"]) - 1.0
-            dfh["ret_pct"] = dfh["ret"] * 100.0
-
-            # row-level limit flags
-            flag_rows: List[Dict[str, Any]] = []
-            for _, r in dfh.iterrows():
-                flags = _touch_locked_flags(
-                    close=_to_num(r.get("close"), 0.0),
-                    high=_to_num(r.get("high"), 0.0),
-                    last_close=_to_num(r.get("last_close"), 0.0),
-                    band_pct=r.get("band_pct"),
-                )
-                flag_rows.append(flags)
-
-            dff = pd.DataFrame(flag_rows, index=dfh.index)
-            for c in dff.columns:
-                dfh[c] = dff[c]
-
-            # normalized limit labels
-            dfh["limit_rate"] = dfh["band_pct"]
-            dfh["limit_rate_pct"] = dfh["band_pct"].apply(
-                lambda x: (float(x) * 100.0) if pd.notna(x) and _is_valid_num(x) else None
-            )
+            dft["today_status"] = dft["symbol"].map(lambda s: (extra_map.get(s) or {}).get("today_status", ""))
+            dft["prev_status"] = dft["symbol"].map(lambda s: (extra_map.get(s) or {}).get("prev_status", ""))
+            dft["streak_today"] = dft["symbol"].map(lambda s: int((extra_map.get(s) or {}).get("streak_today", 0)))
+            dft["streak_prev"] = dft["symbol"].map(lambda s: int((extra_map.get(s) or {}).get("streak_prev", 0)))
+
+            prev_ret_pct_map: Dict[str, float] = {}
+            prev_close_map: Dict[str, float] = {}
+            prev_status_map: Dict[str, str] = {}
 
-            # per-symbol compute today/prev status + streak
-            extra_map: Dict[str, Dict[str, Any]] = {}
             for sym, g in dfh.groupby("symbol", sort=False):
-                rows_desc = g.sort_values("ymd", ascending=False, kind="mergesort").to_dict(orient="records")
-                extra_map[sym] = _compute_streaks_for_symbol(rows_desc)
+                g2 = g.sort_values("ymd", ascending=False, kind="mergesort")
+                if len(g2) >= 2:
+                    prev_row = g2.iloc[1]
+                    prev_ret_pct_map[sym] = _to_num(prev_row.get("ret_pct"), 0.0)
+                    prev_close_map[sym] = _to_num(prev_row.get("close"), float("nan"))
+                    prev_status_map[sym] = _day_status(
+                        close=_to_num(prev_row.get("close"), 0.0),
+                        high=_to_num(prev_row.get("high"), 0.0),
+                        last_close=_to_num(prev_row.get("last_close"), 0.0),
+                        band_pct=prev_row.get("band_pct"),
+                        ret=_to_num(prev_row.get("ret"), 0.0),
+                        surge_ret=INDIA_SURGE_RET,
+                    )
+                else:
+                    prev_ret_pct_map[sym] = 0.0
+                    prev_close_map[sym] = float("nan")
+                    prev_status_map[sym] = ""
+
+            dft["prev_ret_pct"] = dft["symbol"].map(lambda s: float(prev_ret_pct_map.get(s, 0.0)))
+            dft["prev_close"] = dft["symbol"].map(lambda s: prev_close_map.get(s))
+            dft["prev_limitup_status"] = dft["symbol"].map(lambda s: prev_status_map.get(s, ""))
+
+            dft["limitup_status"] = dft["today_status"]
+            dft["is_display_limitup"] = dft["limitup_status"].apply(lambda x: bool(str(x).strip()))
+            dft["is_surge_ge10"] = dft["ret"].apply(lambda x: bool(_to_num(x, 0.0) >= INDIA_SURGE_RET))
+            dft["is_bigmove10_ex_locked"] = dft.apply(
+                lambda r: bool(
+                    _to_num(r.get("ret"), 0.0) >= INDIA_SURGE_RET
+                    and not bool(r.get("is_limitup_locked"))
+                ),
+                axis=1,
+            )
 
-            dft = dfh[dfh["ymd"] == ymd_effective].copy()
-            if dft.empty:
-                snapshot_main = []
-            else:
-                dft["today_status"] = dft["symbol"].map(lambda s: (extra_map.get(s) or {}).get("today_status", ""))
-                dft["prev_status"] = dft["symbol"].map(lambda s: (extra_map.get(s) or {}).get("prev_status", ""))
-                dft["streak_today"] = dft["symbol"].map(lambda s: int((extra_map.get(s) or {}).get("streak_today", 0)))
-                dft["streak_prev"] = dft["symbol"].map(lambda s: int((extra_map.get(s) or {}).get("streak_prev", 0)))
-
-                prev_ret_pct_map: Dict[str, float] = {}
-                prev_close_map: Dict[str, float] = {}
-                prev_status_map: Dict[str, str] = {}
-
-                for sym, g in dfh.groupby("symbol", sort=False):
-                    g2 = g.sort_values("ymd", ascending=False, kind="mergesort")
-                    if len(g2) >= 2:
-                        prev_row = g2.iloc[1]
-                        prev_ret_pct_map[sym] = _to_num(prev_row.get("ret_pct"), 0.0)
-                        prev_close_map[sym] = _to_num(prev_row.get("close"), float("nan"))
-                        prev_status_map[sym] = _day_status(
-                            close=_to_num(prev_row.get("close"), 0.0),
-                            high=_to_num(prev_row.get("high"), 0.0),
-                            last_close=_to_num(prev_row.get("last_close"), 0.0),
-                            band_pct=prev_row.get("band_pct"),
-                            ret=_to_num(prev_row.get("ret"), 0.0),
-                            surge_ret=INDIA_SURGE_RET,
-                        )
-                    else:
-                        prev_ret_pct_map[sym] = 0.0
-                        prev_close_map[sym] = float("nan")
-                        prev_status_map[sym] = ""
-
-                dft["prev_ret_pct"] = dft["symbol"].map(lambda s: float(prev_ret_pct_map.get(s, 0.0)))
-                dft["prev_close"] = dft["symbol"].map(lambda s: prev_close_map.get(s))
-                dft["prev_limitup_status"] = dft["symbol"].map(lambda s: prev_status_map.get(s, ""))
-
-                dft["limitup_status"] = dft["today_status"]
-                dft["is_display_limitup"] = dft["limitup_status"].apply(lambda x: bool(str(x).strip()))
-                dft["is_surge_ge10"] = dft["ret"].apply(lambda x: bool(_to_num(x, 0.0) >= INDIA_SURGE_RET))
-                dft["is_bigmove10_ex_locked"] = dft.apply(
-                    lambda r: bool(
-                        _to_num(r.get("ret"), 0.0) >= INDIA_SURGE_RET
-                        and not bool(r.get("is_limitup_locked"))
-                    ),
-                    axis=1,
-                )
-
-                dft["ret_high"] = 0.0
-                mh = dft["last_close"].notna() & (dft["last_close"] > 0) & dft["high"].notna()
-                dft.loc[mh, "ret_high"] = (dft.loc[mh, "high"] / dft.loc[mh, "last_close"]) - 1.0
-                dft["ret_high_pct"] = dft["ret_high"] * 100.0
-
-                dft["abs_move"] = (dft["close"] - dft["last_close"]).abs()
-                dft["is_penny_20inr"] = dft["last_close"].apply(lambda x: bool(pd.notna(x) and _is_valid_num(x) and float(x) < 20.0))
-                dft["ticks_needed_for_10pct"] = dft["last_close"].apply(
-                    lambda x: (float(x) * 0.10 / INDIA_TICK_SIZE) if pd.notna(x) and _is_valid_num(x) and INDIA_TICK_SIZE > 0 else None
-                )
-                dft["is_tick_danger"] = False
-                dft["streak"] = dft["streak_today"]
-
-                snapshot_main = dft[
-                    [
-                        "symbol",
-                        "local_symbol",
-                        "name",
-                        "sector",
-                        "industry",
-                        "ymd",
-                        "open",
-                        "high",
-                        "low",
-                        "close",
-                        "volume",
-                        "last_close",
-                        "ret",
-                        "ret_pct",
-                        "market",
-                        "market_detail",
-                        "band_pct",
-                        "today_status",
-                        "prev_status",
-                        "streak_today",
-                        "streak_prev",
-                        "prev_ret_pct",
-                        "prev_close",
-                        "streak",
-                        "ret_high",
-                        "ret_high_pct",
-                        "limit_price",
-                        "limit_rate",
-                        "limit_rate_pct",
-                        "is_limitup_touch",
-                        "is_limitup_locked",
-                        "is_limitup_opened",
-                        "is_penny_20inr",
-                        "ticks_needed_for_10pct",
-                        "is_tick_danger",
-                        "is_surge_ge10",
-                        "abs_move",
-                        "is_bigmove10_ex_locked",
-                        "is_display_limitup",
-                        "limitup_status",
-                        "prev_limitup_status",
-                    ]
-                ].to_dict(orient="records")
-
-        meta_time = build_meta_time_asia(
-            datetime.now(timezone.utc),
-            tz_name="Asia/Kolkata",
-            fallback_offset="+05:30",
-        )
+            dft["ret_high"] = 0.0
+            mh = dft["last_close"].notna() & (dft["last_close"] > 0) & dft["high"].notna()
+            dft.loc[mh, "ret_high"] = (dft.loc[mh, "high"] / dft.loc[mh, "last_close"]) - 1.0
+            dft["ret_high_pct"] = dft["ret_high"] * 100.0
 
-        return {
-            "market": "india",
-            "slot": slot,
-            "asof": asof,
-            "ymd": ymd,
-            "ymd_effective": ymd_effective,
-            "snapshot_main": snapshot_main,
-            "snapshot_open": [],
-            "stats": {"snapshot_main_count": int(len(snapshot_main)), "snapshot_open_count": 0},
-            "meta": {"db_path": db_path, "ymd_effective": ymd_effective, "time": meta_time},
-        }
-    finally:
-        conn.close()
+            dft["abs_move"] = (dft["close"] - dft["last_close"]).abs()
+            dft["is_penny_20inr"] = dft["last_close"].apply(lambda x: bool(pd.notna(x) and _is_valid_num(x) and float(x) < 20.0))
+            dft["ticks_needed_for_10pct"] = dft["last_close"].apply(
+                lambda x: (float(x) * 0.10 / INDIA_TICK_SIZE) if pd.notna(x) and _is_valid_num(x) and INDIA_TICK_SIZE > 0 else None
+            )
+            dft["is_tick_danger"] = False
+            dft["streak"] = dft["streak_today"]
+
+            snapshot_main = dft[
+                [
+                    "symbol",
+                    "local_symbol",
+                    "name",
+                    "sector",
+                    "industry",
+                    "ymd",
+                    "open",
+                    "high",
+                    "low",
+                    "close",
+                    "volume",
+                    "last_close",
+                    "ret",
+                    "ret_pct",
+                    "market",
+                    "market_detail",
+                    "band_pct",
+                    "today_status",
+                    "prev_status",
+                    "streak_today",
+                    "streak_prev",
+                    "prev_ret_pct",
+                    "prev_close",
+                    "streak",
+                    "ret_high",
+                    "ret_high_pct",
+                    "limit_price",
+                    "limit_rate",
+                    "limit_rate_pct",
+                    "is_limitup_touch",
+                    "is_limitup_locked",
+                    "is_limitup_opened",
+                    "is_penny_20inr",
+                    "ticks_needed_for_10pct",
+                    "is_tick_danger",
+                    "is_surge_ge10",
+                    "abs_move",
+                    "is_bigmove10_ex_locked",
+                    "is_display_limitup",
+                    "limitup_status",
+                    "prev_limitup_status",
+                ]
+            ].to_dict(orient="records")
+
+    meta_time = build_meta_time_asia(
+        datetime.now(timezone.utc),
+        tz_name="Asia/Kolkata",
+        fallback_offset="+05:30",
+    )
+
+    return {
+        "market": "india",
+        "slot": slot,
+        "asof": asof,
+        "ymd": ymd,
+        "ymd_effective": ymd_effective,
+        "snapshot_main": snapshot_main,
+        "snapshot_open": [],
+        "stats": {"snapshot_main_count": int(len(snapshot_main)), "snapshot_open_count": 0},
+        "meta": {"db_path": db_path, "ymd_effective": ymd_effective, "time": meta_time},
+    }
@@ -9,6 +9,8 @@ from typing import Any, Dict, List, Tuple, Optional
 
 import pandas as pd
 
+from markets import agg_state
+
 from .jp_limit_rules import jp_calc_limit, is_true_limitup
 from .jp_labels import surge_label
 
@@ -336,12 +338,21 @@ def aggregate(raw_payload: Dict[str, Any]) -> Dict[str, Any]:
     prev_map: Dict[str, Dict[str, float]] = {}
 
     if JP_ENABLE_TRUE_LIMITUP and ymd_effective and db_path and os.path.exists(db_path):
+        # 同一天的下一個 slot：DB 沒動就沿用，新出現的 symbol 才查（markets.agg_state）
+        db_tok = agg_state.db_token(db_path)
         conn = sqlite3.connect(db_path)
         try:
-            ymd_prev = _get_prev_trade_date(conn, ymd_effective)
+            ymd_prev = agg_state.memo(
+                "jp.prev_trade_date", ymd_effective, lambda: _get_prev_trade_date(conn, ymd_effective), deps=db_tok
+            )
             if ymd_prev:
                 syms = df["symbol"].dropna().astype(str).unique().tolist()
-                prev_map = _fetch_prev_day_rows(conn, ymd_prev=ymd_prev, symbols=syms)
+                prev_map = agg_state.memo_many(
+                    "jp.prev_day_rows",
+                    syms,
+                    lambda miss: _fetch_prev_day_rows(conn, ymd_prev=ymd_prev, symbols=miss),
+                    deps=(ymd_prev,) + db_tok,
+                )
         finally:
             conn.close()
 
@@ -406,13 +417,19 @@ def aggregate(raw_payload: Dict[str, Any]) -> Dict[str, Any]:
         and db_path
         and os.path.exists(db_path)
     ):
+        db_tok = agg_state.db_token(db_path)
         syms_locked = df.loc[df["is_limitup_locked"] == True, "symbol"].dropna().astype(str).unique().tolist()
         if syms_locked:
-            m = _compute_locked_streaks(
-                db_path=db_path,
-                ymd_effective=ymd_effective,
-                symbols=syms_locked,
-                lookback_days=JP_STREAK_LOOKBACK_DAYS,
+            m = agg_state.memo_many(
+                "jp.locked_streaks",
+                syms_locked,
+                lambda miss: _compute_locked_streaks(
+                    db_path=db_path,
+                    ymd_effective=ymd_effective,
+                    symbols=miss,
+                    lookback_days=JP_STREAK_LOOKBACK_DAYS,
+                ),
+                deps=(ymd_effective, JP_STREAK_LOOKBACK_DAYS) + db_tok,
             )
             if m:
                 mask = df["symbol"].astype(str).isin(m.keys())
@@ -422,11 +439,16 @@ def aggregate(raw_payload: Dict[str, Any]) -> Dict[str, Any]:
         if ymd_prev:
             syms_prev_locked = df.loc[df["prev_is_limitup_locked"] == True, "symbol"].dropna().astype(str).unique().tolist()
             if syms_prev_locked:
-                m2 = _compute_locked_streaks(
-                    db_path=db_path,
-                    ymd_effective=ymd_prev,
-                    symbols=syms_prev_locked,
-                    lookback_days=JP_STREAK_LOOKBACK_DAYS,
+                m2 = agg_state.memo_many(
+                    "jp.locked_streaks_prev",
+                    syms_prev_locked,
+                    lambda miss: _compute_locked_streaks(
+                        db_path=db_path,
+                        ymd_effective=ymd_prev,
+                        symbols=miss,
+                        lookback_days=JP_STREAK_LOOKBACK_DAYS,
+                    ),
+                    deps=(ymd_prev, JP_STREAK_LOOKBACK_DAYS) + db_tok,
                 )
                 if m2:
                     mask2 = df["symbol"].astype(str).isin(m2.keys())
@@ -598,7 +620,7 @@ def aggregate(raw_payload: Dict[str, Any]) -> Dict[str, Any]:
     # ------------------------------------------------------------
     # attach outputs
     # ------------------------------------------------------------
-    raw_payload["snapshot_main"] = df.to_dict(orient="records")
+    raw_payload["snapshot_main"] = agg_state.rows("jp.snapshot_main", df, lambda d: d.to_dict(orient="records"))
     raw_payload["limitup"] = limitup_records
     raw_payload["sector_summary"] = summary_rows
     raw_payload["peers_by_sector"] = peers_by_sector
@@ -33,10 +33,9 @@ from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
-import requests
-import yfinance as yf
 from tqdm import tqdm
 
+from markets.datasource import http_get
 from markets._calendar_cache import _get_trading_window_cached
 
 # ✅ unified meta.time builder
@@ -191,7 +190,7 @@ def get_jp_stock_list(db_path: str) -> List[Tuple[str, str, str, str]]:
     log(f"🧩 include TOKYO PRO Market = {_include_tokyo_pro()} (JP_INCLUDE_TOKYO_PRO)")
 
     try:
-        r = requests.get(url, headers=headers, timeout=45)
+        r = http_get(url, headers=headers, timeout=45)
         r.raise_for_status()
         df = pd.read_excel(io.BytesIO(r.content))
     except Exception as e:
@@ -266,12 +265,14 @@ def get_jp_stock_list_from_db(db_path: str) -> List[Tuple[str, str, str, str]]:
 # Download helpers
 # =============================================================================
 def download_one_jp(symbol: str, start_date: str, end_date_exclusive: str) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    from markets.datasource import yf_download
+
     max_retries = 2
     last_err: Optional[str] = None
 
     for attempt in range(max_retries + 1):
         try:
-            df = yf.download(
+            df = yf_download(
                 symbol,
                 start=start_date,
                 end=end_date_exclusive,
@@ -324,13 +325,15 @@ def _download_batch(
     start_date: str,
     end_date_exclusive: str,
 ) -> Tuple[pd.DataFrame, List[str], Optional[str]]:
+    from markets.datasource import yf_download
+
     if not tickers:
         empty = pd.DataFrame(columns=["symbol", "date", "open", "high", "low", "close", "volume"])
         return empty, [], None
 
     tickers_str = " ".join(tickers)
     try:
-        df = yf.download(
+        df = yf_download(
             tickers=tickers_str,
             start=start_date,
             end=end_date_exclusive,
@@ -661,6 +664,32 @@ def _pick_latest_leq(conn: sqlite3.Connection, ymd: str) -> Optional[str]:
     return row[0] if row and row[0] else None
 
 
+# {day_filter}: 單日 "p.date = ?" / replay "p.date BETWEEN ? AND ?"（同一個 LAG pass 算整段）
+_SNAPSHOT_SQL = """
+WITH p AS (
+  SELECT
+    symbol,
+    date,
+    open, high, low, close, volume,
+    LAG(close) OVER (PARTITION BY symbol ORDER BY date) AS last_close
+  FROM stock_prices
+)
+SELECT
+  p.symbol,
+  p.date AS ymd,
+  p.open, p.high, p.low, p.close, p.volume,
+  p.last_close,
+  i.name,
+  i.sector,
+  i.market,
+  i.market_detail
+FROM p
+LEFT JOIN stock_info i ON i.symbol = p.symbol
+WHERE {day_filter}
+  AND p.close IS NOT NULL
+"""
+
+
 def run_intraday(*, slot: str, asof: str, ymd: str) -> Dict[str, Any]:
     db_path = _db_path()
     if not os.path.exists(db_path):
@@ -672,88 +701,95 @@ def run_intraday(*, slot: str, asof: str, ymd: str) -> Dict[str, Any]:
         log(f"🕒 requested ymd={ymd} slot={slot} asof={asof}")
         log(f"📅 ymd_effective = {ymd_effective}")
 
-        sql = """
-        WITH p AS (
-          SELECT
-            symbol,
-            date,
-            open, high, low, close, volume,
-            LAG(close) OVER (PARTITION BY symbol ORDER BY date) AS last_close
-          FROM stock_prices
-        )
-        SELECT
-          p.symbol,
-          p.date AS ymd,
-          p.open, p.high, p.low, p.close, p.volume,
-          p.last_close,
-          i.name,
-          i.sector,
-          i.market,
-          i.market_detail
-        FROM p
-        LEFT JOIN stock_info i ON i.symbol = p.symbol
-        WHERE p.date = ?
-          AND p.close IS NOT NULL
-        """
-        df = pd.read_sql_query(sql, conn, params=(ymd_effective,))
-
-        if df.empty:
-            snapshot_main: List[Dict[str, Any]] = []
-        else:
-            df["name"] = df["name"].fillna("Unknown")
-            df["sector"] = df["sector"].fillna("未分類")
-            df.loc[df["sector"].isin(["", "—", "-", "--", "－", "–"]), "sector"] = "未分類"
-
-            df["last_close"] = pd.to_numeric(df["last_close"], errors="coerce")
-            df["close"] = pd.to_numeric(df["close"], errors="coerce")
-
-            df["ret"] = 0.0
-            m = df["last_close"].notna() & (df["last_close"] > 0) & df["close"].notna()
-            df.loc[m, "ret"] = (df.loc[m, "close"] / df.loc[m, "last_close"]) - 1.0
-
-            df["streak"] = 1
-
-            snapshot_main = df[
-                [
-                    "symbol",
-                    "name",
-                    "sector",
-                    "ymd",
-                    "open",
-                    "high",
-                    "low",
-                    "close",
-                    "volume",
-                    "last_close",
-                    "ret",
-                    "streak",
-                    "market",
-                    "market_detail",
-                ]
-            ].to_dict(orient="records")
-
-        # ✅ unified meta.time for renderers (2-line subtitle)
-        now_utc = datetime.now(timezone.utc)
-        meta_time = build_meta_time_asia(now_utc, tz_name="Asia/Tokyo", fallback_offset="+09:00")
-
-        return {
-            "market": "jp",
-            "slot": slot,
-            "asof": asof,
-            "ymd": ymd,
-            "ymd_effective": ymd_effective,
-            "generated_at": datetime.now().isoformat(timespec="seconds"),
-            "snapshot_main": snapshot_main,
-            "snapshot_open": [],
-            "stats": {"snapshot_main_count": int(len(snapshot_main)), "snapshot_open_count": 0},
-            "meta": {
-                "db_path": db_path,
-                "ymd_effective": ymd_effective,
-                "time": meta_time,
-            },
-        }
+        df = pd.read_sql_query(_SNAPSHOT_SQL.format(day_filter="p.date = ?"), conn, params=(ymd_effective,))
+    finally:
+        conn.close()
+
+    return _build_payload(df, slot=slot, asof=asof, ymd=ymd, ymd_effective=ymd_effective, db_path=db_path)
+
+
+def load_replay(start: str, end: str) -> Dict[str, Any]:
+    """
+    --replay：一次 range SQL（LAG 只掃一遍 stock_prices）=> {ymd_effective: 當天的 df}
+    """
+    from markets.replay import split_days, trading_days
+
+    db_path = _db_path()
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"JP DB not found: {db_path} (set JP_DB_PATH to override)")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        days = trading_days(conn, start, end, close_not_null=True)
+        df = pd.read_sql_query(_SNAPSHOT_SQL.format(day_filter="p.date BETWEEN ? AND ?"), conn, params=(start, end))
     finally:
         conn.close()
+    return split_days(df, days)
+
+
+def replay_payload(ymd: str, day: pd.DataFrame, *, slot: str, asof: str) -> Dict[str, Any]:
+    return _build_payload(day, slot=slot, asof=asof, ymd=ymd, ymd_effective=ymd, db_path=_db_path())
+
+
+def _build_payload(df: pd.DataFrame, *, slot: str, asof: str, ymd: str, ymd_effective: str, db_path: str) -> Dict[str, Any]:
+    """
+    snapshot SQL rows (one day) -> raw payload（run_intraday / replay 共用）
+    """
+    if df.empty:
+        snapshot_main: List[Dict[str, Any]] = []
+    else:
+        df["name"] = df["name"].fillna("Unknown")
+        df["sector"] = df["sector"].fillna("未分類")
+        df.loc[df["sector"].isin(["", "—", "-", "--", "－", "–"]), "sector"] = "未分類"
+
+        df["last_close"] = pd.to_numeric(df["last_close"], errors="coerce")
+        df["close"] = pd.to_numeric(df["close"], errors="coerce")
+
+        df["ret"] = 0.0
+        m = df["last_close"].notna() & (df["last_close"] > 0) & df["close"].notna()
+        df.loc[m, "ret"] = (df.loc[m, "close"] / df.loc[m, "last_close"]) - 1.0
+
+        df["streak"] = 1
+
+        snapshot_main = df[
+            [
+                "symbol",
+                "name",
+                "sector",
+                "ymd",
+                "open",
+                "high",
+                "low",
+                "close",
+                "volume",
+                "last_close",
+                "ret",
+                "streak",
+                "market",
+                "market_detail",
+            ]
+        ].to_dict(orient="records")
+
+    # ✅ unified meta.time for renderers (2-line subtitle)
+    now_utc = datetime.now(timezone.utc)
+    meta_time = build_meta_time_asia(now_utc, tz_name="Asia/Tokyo", fallback_offset="+09:00")
+
+    return {
+        "market": "jp",
+        "slot": slot,
+        "asof": asof,
+        "ymd": ymd,
+        "ymd_effective": ymd_effective,
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "snapshot_main": snapshot_main,
+        "snapshot_open": [],
+        "stats": {"snapshot_main_count": int(len(snapshot_main)), "snapshot_open_count": 0},
+        "meta": {
+            "db_path": db_path,
+            "ymd_effective": ymd_effective,
+            "time": meta_time,
+        },
+    }
 
 
 if __name__ == "__main__":
@@ -9,6 +9,8 @@ from datetime import datetime
 
 import pandas as pd
 
+from markets import agg_state
+
 
 # =============================================================================
 # Env helpers
@@ -36,9 +38,13 @@ def _env_int(name: str, default: int) -> int:
 # =============================================================================
 # Database connection for checking new listings
 # =============================================================================
+def _db_path() -> str:
+    return os.getenv("KR_DB_PATH", os.path.join(os.path.dirname(__file__), "kr_stock_warehouse.db"))
+
+
 def _get_db_connection():
     """DB 연결을 가져오기"""
-    db_path = os.getenv("KR_DB_PATH", os.path.join(os.path.dirname(__file__), "kr_stock_warehouse.db"))
+    db_path = _db_path()
     if not os.path.exists(db_path):
         return None
     return sqlite3.connect(db_path)
@@ -252,14 +258,21 @@ def _df(snapshot: Any, ymd: str = "") -> pd.DataFrame:
     df["new_listing_reason"] = ""
 
     if not df.empty and "ymd" in df.columns:
+        # symbol 당 DB 조회 2회 => 같은 날 다음 slot 에서는 DB 가 안 바뀌었으면 재사용 (markets.agg_state)
+        db_tok = agg_state.db_token(_db_path())
         for idx, row in df.iterrows():
             symbol = row["symbol"]
             current_ymd = row["ymd"] if pd.notna(row["ymd"]) else ymd
             if not symbol or not current_ymd:
                 continue
 
-            is_new_db, days_since, listing_date = _get_listing_info(symbol, str(current_ymd)[:10])
-            is_new_pattern, pattern_reason = _detect_new_listing_pattern(symbol, str(current_ymd)[:10])
+            day = str(current_ymd)[:10]
+            is_new_db, days_since, listing_date = agg_state.memo(
+                "kr.listing_info", (symbol, day), lambda: _get_listing_info(symbol, day), deps=db_tok
+            )
+            is_new_pattern, pattern_reason = agg_state.memo(
+                "kr.listing_pattern", (symbol, day), lambda: _detect_new_listing_pattern(symbol, day), deps=db_tok
+            )
 
             if is_new_db or is_new_pattern:
                 df.at[idx, "is_new_listing"] = True
@@ -28,9 +28,9 @@ from typing import Any, Dict, List, Optional, Tuple
 from io import StringIO
 
 import pandas as pd
-import yfinance as yf
 from tqdm import tqdm
-import requests
+
+from markets.datasource import http_get
 
 
 # =============================================================================
@@ -145,6 +145,8 @@ def init_db(db_path: str) -> None:
 # Trading-day helpers (unchanged)
 # =============================================================================
 def _latest_trading_day_from_calendar(asof_ymd: Optional[str] = None) -> Optional[str]:
+    from markets.datasource import yf_download
+
     cal_ticker = _calendar_ticker()
     lookback = _calendar_lookback_cal_days()
 
@@ -152,7 +154,7 @@ def _latest_trading_day_from_calendar(asof_ymd: Optional[str] = None) -> Optiona
         end_dt = pd.to_datetime(asof_ymd) if asof_ymd else pd.Timestamp.now()
         start_dt = end_dt - timedelta(days=lookback)
 
-        df_cal = yf.download(
+        df_cal = yf_download(
             cal_ticker,
             start=start_dt.strftime("%Y-%m-%d"),
             end=(end_dt + timedelta(days=1)).strftime("%Y-%m-%d"),
@@ -179,6 +181,8 @@ def _latest_trading_day_from_calendar(asof_ymd: Optional[str] = None) -> Optiona
 
 
 def _infer_window_by_trading_days(end_ymd: str, n_trading_days: int) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    from markets.datasource import yf_download
+
     cal_ticker = _calendar_ticker()
     lookback = _calendar_lookback_cal_days()
 
@@ -186,7 +190,7 @@ def _infer_window_by_trading_days(end_ymd: str, n_trading_days: int) -> Tuple[Op
         end_dt = pd.to_datetime(end_ymd)
         start_dt = end_dt - timedelta(days=lookback)
 
-        df_cal = yf.download(
+        df_cal = yf_download(
             cal_ticker,
             start=start_dt.strftime("%Y-%m-%d"),
             end=(end_dt + timedelta(days=1)).strftime("%Y-%m-%d"),
@@ -254,7 +258,7 @@ def _fetch_krx_corplist_html(url: str) -> str:
         "Connection": "close",
     }
 
-    resp = requests.get(url, headers=headers, timeout=30)
+    resp = http_get(url, headers=headers, timeout=30)
     resp.raise_for_status()
     content = resp.content
 
@@ -362,12 +366,14 @@ def get_kr_stock_list(db_path: str, refresh_list: bool = True) -> List[Tuple[str
 # =============================================================================
 def _download_one(symbol: str, start_date: str, end_date_exclusive: str) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
     """單檔 fallback（保留你原本語意）"""
+    from markets.datasource import yf_download
+
     max_retries = 2
     last_err: Optional[str] = None
 
     for attempt in range(max_retries + 1):
         try:
-            df = yf.download(
+            df = yf_download(
                 symbol,
                 start=start_date,
                 end=end_date_exclusive,
@@ -425,6 +431,8 @@ def _download_batch(
     ✅ 批次下載：回傳 (long_df, failed_tickers, err_msg)
     long_df 欄位：symbol,date,open,high,low,close,volume
     """
+    from markets.datasource import yf_download
+
     empty = pd.DataFrame(columns=["symbol", "date", "open", "high", "low", "close", "volume"])
     if not tickers:
         return empty, [], None
@@ -432,7 +440,7 @@ def _download_batch(
     tickers_str = " ".join(tickers)
 
     try:
-        df = yf.download(
+        df = yf_download(
             tickers=tickers_str,
             start=start_date,
             end=end_date_exclusive,  # yfinance end exclusive
@@ -4,7 +4,7 @@ from __future__ import annotations
 
 import os
 import sqlite3
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Mapping, Optional
 
 import pandas as pd
 
@@ -55,30 +55,33 @@ def _latest_k_trading_days(conn: sqlite3.Connection, k: int, *, leq_ymd: str) ->
     return dates
 
 
+# {day_filter}: 단일 "p.date = ?" / replay "p.date BETWEEN ? AND ?" (LAG 는 구간 전체에 한 번)
+_DAY_SQL = """
+WITH p AS (
+  SELECT
+    symbol,
+    date,
+    open, high, low, close, volume,
+    LAG(close) OVER (PARTITION BY symbol ORDER BY date) AS last_close
+  FROM stock_prices
+)
+SELECT
+  p.symbol,
+  p.date AS ymd,
+  p.open, p.high, p.low, p.close, p.volume,
+  p.last_close,
+  i.name,
+  i.sector,
+  i.market,
+  i.market_detail
+FROM p
+LEFT JOIN stock_info i ON i.symbol = p.symbol
+WHERE {day_filter}
+"""
+
+
 def _load_day_snapshot(conn: sqlite3.Connection, ymd_effective: str) -> pd.DataFrame:
-    sql = """
-    WITH p AS (
-      SELECT
-        symbol,
-        date,
-        open, high, low, close, volume,
-        LAG(close) OVER (PARTITION BY symbol ORDER BY date) AS last_close
-      FROM stock_prices
-    )
-    SELECT
-      p.symbol,
-      p.date AS ymd,
-      p.open, p.high, p.low, p.close, p.volume,
-      p.last_close,
-      i.name,
-      i.sector,
-      i.market,
-      i.market_detail
-    FROM p
-    LEFT JOIN stock_info i ON i.symbol = p.symbol
-    WHERE p.date = ?
-    """
-    return pd.read_sql_query(sql, conn, params=(ymd_effective,))
+    return pd.read_sql_query(_DAY_SQL.format(day_filter="p.date = ?"), conn, params=(ymd_effective,))
 
 
 def _normalize(df: pd.DataFrame) -> pd.DataFrame:
@@ -142,6 +145,10 @@ def _load_daily_for_streak(conn: sqlite3.Connection, dates: List[str]) -> pd.Dat
     WHERE date IN ({ph})
     """
     df = pd.read_sql_query(sql, conn, params=tuple(dates))
+    return _prep_daily(df)
+
+
+def _prep_daily(df: pd.DataFrame) -> pd.DataFrame:
     if df is None or df.empty:
         return df
 
@@ -227,70 +234,153 @@ def run_intraday(*, slot: str, asof: str, ymd: str) -> Dict[str, Any]:
         log(f"📅 ymd_effective = {ymd_effective}")
         log(f"📦 KR DB = {db_path} | th30={th30} th10={th10} | K={K}")
 
-        # day snapshot
         df = _load_day_snapshot(conn, ymd_effective)
-        df = _normalize(df)
-        df = _add_flags(df, th30=th30, th10=th10)
-
-        if df is None or df.empty:
-            snapshot_main: List[Dict[str, Any]] = []
-        else:
-            # ✅ 핵심: ret_high 를 snapshot_main 에 포함
-            snapshot_main = df[
-                [
-                    "symbol",
-                    "name",
-                    "sector",
-                    "ymd",
-                    "open",
-                    "high",
-                    "low",
-                    "close",
-                    "volume",
-                    "last_close",
-                    "ret",
-                    "ret_high",
-                    "is_limitup30_locked",
-                    "is_limitup30_touch",
-                    "is_bigup10",
-                    "market",
-                    "market_detail",
-                ]
-            ].to_dict(orient="records")
-
-        # streak maps
         dates = _latest_k_trading_days(conn, K + 1, leq_ymd=ymd_effective)
         daily_df = _load_daily_for_streak(conn, dates)
-        maps = compute_streak_maps(daily_df, ymd_effective=ymd_effective, th30=th30, th10=th10)
-        snapshot_main = apply_maps(snapshot_main, maps)
+    finally:
+        conn.close()
+
+    return _build_payload(
+        df,
+        daily_df,
+        slot=slot,
+        asof=asof,
+        ymd=ymd,
+        ymd_effective=ymd_effective,
+        db_path=db_path,
+        th30=th30,
+        th10=th10,
+        K=K,
+        meta_time=meta_time,
+    )
 
-        # status lines (언어/문구는 여기서 결정)
-        snapshot_main = [dict(r, **_status_lines(r)) for r in snapshot_main]
 
-        raw_payload: Dict[str, Any] = {
-            "market": "kr",
-            "slot": slot,
-            "asof": asof,
-            "ymd": ymd,
-            "ymd_effective": ymd_effective,
-            "snapshot_main": snapshot_main,
-            "snapshot_open": [],
-            "stats": {
-                "snapshot_main_count": int(len(snapshot_main)),
-                "snapshot_open_count": 0,
-            },
-            "filters": {
-                "kr_limitup30_th": float(th30),
-                "kr_bigup10_th": float(th10),
-                "kr_streak_lookback_trading_days": int(K),
-                "kr_streak30_mode": os.getenv("KR_STREAK30_MODE", "touch"),
-            },
-            "meta": {
-                "db_path": db_path,
-                "ymd_effective": ymd_effective,
-                "time": meta_time,  # ✅ unified meta.time
-            },
-        }
-        return raw_payload
+def load_replay(start: str, end: str) -> Mapping:
+    """
+    --replay: 구간 전체를 한 번에 로드 (day snapshot LAG 1회 + streak 용 daily 이력 1회)
+    -> {ymd_effective: (day snapshot, 그날 기준 최근 K+1 거래일 daily rows)}
+    """
+    from markets.replay import LazyDays, dates_before, split_days, trading_days, trailing_dates, window_rows
+
+    db_path = _default_db_path()
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"KR DB not found: {db_path} (set KR_DB_PATH to override)")
+
+    K = max(20, _lookback_trading_days())
+    conn = sqlite3.connect(db_path)
+    try:
+        days = trading_days(conn, start, end)
+        all_dates = dates_before(conn, start, K) + days
+        df_days = pd.read_sql_query(_DAY_SQL.format(day_filter="p.date BETWEEN ? AND ?"), conn, params=(start, end))
+        df_daily = pd.read_sql_query(
+            """
+            SELECT symbol, date AS ymd, high, close
+            FROM stock_prices
+            WHERE date BETWEEN ? AND ?
+            """,
+            conn,
+            params=(all_dates[0] if all_dates else start, end),
+        )
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+    by_day = split_days(df_days, days)
+    return LazyDays(days, lambda d: (by_day[d], window_rows(df_daily, trailing_dates(all_dates, d, K + 1))))
+
+
+def replay_payload(ymd: str, day: Any, *, slot: str, asof: str) -> Dict[str, Any]:
+    df, daily_df = day
+    return _build_payload(
+        df,
+        _prep_daily(daily_df),
+        slot=slot,
+        asof=asof,
+        ymd=ymd,
+        ymd_effective=ymd,
+        db_path=_default_db_path(),
+        th30=_th30(),
+        th10=_th10(),
+        K=max(20, _lookback_trading_days()),
+        meta_time=_build_meta_time_kr(),
+    )
+
+
+def _build_payload(
+    df: pd.DataFrame,
+    daily_df: pd.DataFrame,
+    *,
+    slot: str,
+    asof: str,
+    ymd: str,
+    ymd_effective: str,
+    db_path: str,
+    th30: float,
+    th10: float,
+    K: int,
+    meta_time: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    하루치 snapshot + streak 이력 -> raw payload (run_intraday / replay 공용)
+    """
+    # day snapshot
+    df = _normalize(df)
+    df = _add_flags(df, th30=th30, th10=th10)
+
+    if df is None or df.empty:
+        snapshot_main: List[Dict[str, Any]] = []
+    else:
+        # ✅ 핵심: ret_high 를 snapshot_main 에 포함
+        snapshot_main = df[
+            [
+                "symbol",
+                "name",
+                "sector",
+                "ymd",
+                "open",
+                "high",
+                "low",
+                "close",
+                "volume",
+                "last_close",
+                "ret",
+                "ret_high",
+                "is_limitup30_locked",
+                "is_limitup30_touch",
+                "is_bigup10",
+                "market",
+                "market_detail",
+            ]
+        ].to_dict(orient="records")
+
+    # streak maps
+    maps = compute_streak_maps(daily_df, ymd_effective=ymd_effective, th30=th30, th10=th10)
+    snapshot_main = apply_maps(snapshot_main, maps)
+
+    # status lines (언어/문구는 여기서 결정)
+    snapshot_main = [dict(r, **_status_lines(r)) for r in snapshot_main]
+
+    raw_payload: Dict[str, Any] = {
+        "market": "kr",
+        "slot": slot,
+        "asof": asof,
+        "ymd": ymd,
+        "ymd_effective": ymd_effective,
+        "snapshot_main": snapshot_main,
+        "snapshot_open": [],
+        "stats": {
+            "snapshot_main_count": int(len(snapshot_main)),
+            "snapshot_open_count": 0,
+        },
+        "filters": {
+            "kr_limitup30_th": float(th30),
+            "kr_bigup10_th": float(th10),
+            "kr_streak_lookback_trading_days": int(K),
+            "kr_streak30_mode": os.getenv("KR_STREAK30_MODE", "touch"),
+        },
+        "meta": {
+            "db_path": db_path,
+            "ymd_effective": ymd_effective,
+            "time": meta_time,  # ✅ unified meta.time
+        },
+    }
+    return raw_payload
@@ -0,0 +1,413 @@
+# markets/payload_catalog.py
+# -*- coding: utf-8 -*-
+"""
+Payload catalog (SQLite) — one row per data/cache/<market>/<ymd>/<slot>.payload.json
+
+Written by main.py write_payload() right after the payload hits disk, read by the
+dashboard instead of globbing / stat-ing every payload on every rerun.
+
+Table payloads:
+  market, ymd, slot        (PK)
+  relpath                  path relative to the cache root (data/cache)
+  size, mtime, sha1        of the written bytes
+  written_at_utc
+  headline                 JSON: scalar stats + list lengths (snapshot rows, limitup ...)
+
+Catalog lives in <cache root>/payload_catalog.sqlite (INTRADAY_PAYLOAD_CATALOG overrides).
+Payloads written by other means (copied / downloaded caches) are picked up by
+sync_new_days(): by default it only looks at day dirs newer than the newest one
+seen and at the newest day itself, and only when a directory mtime changed
+(table scanned_dirs), so its cost stays flat as history grows. --sync walks
+everything.
+
+CLI:
+  python -m markets.payload_catalog --rebuild            # index every existing payload
+  python -m markets.payload_catalog --market tw --limit 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_CACHE_ROOT = REPO_ROOT / "data" / "cache"
+PAYLOAD_SUFFIX = ".payload.json"
+
+_LOCK = threading.Lock()
+
+# day dirs: data/cache/<market>/<YYYY-MM-DD>/ (other subdirs never hold payloads)
+_DAY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+# headline: keep the catalog row small
+_MAX_STAT_KEYS = 60
+_LIST_KEYS = ("snapshot_main", "snapshot_open", "snapshot_all", "limitup", "open_limit_watchlist", "peers", "sector_summary")
+
+
+# cache dir / CLI market codes -> one key (run_daily writes India to data/cache/india/,
+# cross_summary / metadata use "in")
+MARKET_ALIASES = {"india": "in", "nse": "in", "bse": "in"}
+
+
+def catalog_market(market: str) -> str:
+    m = str(market or "").strip().lower()
+    return MARKET_ALIASES.get(m, m)
+
+
+def catalog_path(cache_root: Optional[Path] = None) -> Path:
+    p = (os.getenv("INTRADAY_PAYLOAD_CATALOG") or "").strip()
+    if p:
+        return Path(p)
+    return Path(cache_root or DEFAULT_CACHE_ROOT) / "payload_catalog.sqlite"
+
+
+def connect(cache_root: Optional[Path] = None) -> sqlite3.Connection:
+    path = catalog_path(cache_root)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS payloads (
+            market TEXT NOT NULL,
+            ymd TEXT NOT NULL,
+            slot TEXT NOT NULL,
+            relpath TEXT NOT NULL,
+            size INTEGER,
+            mtime REAL,
+            sha1 TEXT,
+            written_at_utc TEXT,
+            headline TEXT,
+            PRIMARY KEY (market, ymd, slot)
+        );
+        CREATE INDEX IF NOT EXISTS idx_payloads_recent ON payloads(market, ymd DESC, mtime DESC);
+        CREATE TABLE IF NOT EXISTS scanned_dirs (
+            relpath TEXT PRIMARY KEY,
+            mtime_ns INTEGER,
+            newest TEXT
+        );
+        """
+    )
+    # rows indexed before market codes were canonicalized
+    aliases = tuple(MARKET_ALIASES)
+    marks = ", ".join("?" for _ in aliases)
+    if conn.execute(f"SELECT 1 FROM payloads WHERE market IN ({marks}) LIMIT 1", aliases).fetchone():
+        conn.execute(f"UPDATE OR REPLACE payloads SET market = 'in' WHERE market IN ({marks})", aliases)
+        conn.commit()
+    return conn
+
+
+def parse_payload_path(path: Path) -> Optional[Tuple[str, str, str]]:
+    """
+    .../<market>/<ymd>/<slot>.payload.json -> (market, ymd, slot), market via catalog_market()
+    """
+    path = Path(path)
+    if not path.name.endswith(PAYLOAD_SUFFIX):
+        return None
+    slot = path.name[: -len(PAYLOAD_SUFFIX)]
+    ymd = path.parent.name
+    market = catalog_market(path.parent.parent.name)
+    if not slot or not ymd or not market:
+        return None
+    return market, ymd, slot
+
+
+def headline(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Scalar stats + list lengths; enough for listings without opening the payload.
+    """
+    out: Dict[str, Any] = {}
+    stats = payload.get("stats") if isinstance(payload, dict) else None
+    if isinstance(stats, dict):
+        for k, v in list(stats.items())[:_MAX_STAT_KEYS]:
+            if isinstance(v, (int, float, str, bool)) or v is None:
+                out[str(k)] = v
+    for k in _LIST_KEYS:
+        v = payload.get(k) if isinstance(payload, dict) else None
+        if isinstance(v, list):
+            out[f"n_{k}"] = len(v)
+    meta = payload.get("meta") if isinstance(payload, dict) else None
+    if isinstance(meta, dict):
+        t = meta.get("time")
+        if isinstance(t, dict):
+            for k in ("market_finished_hm", "finished_utc", "market_tz"):
+                if t.get(k) is not None:
+                    out[f"time.{k}"] = t.get(k)
+    return out
+
+
+def _rel(path: Path, cache_root: Path) -> str:
+    try:
+        return Path(path).resolve().relative_to(Path(cache_root).resolve()).as_posix()
+    except Exception:
+        return str(path)
+
+
+def record(
+    path: Path,
+    payload: Dict[str, Any],
+    *,
+    data: Optional[bytes] = None,
+    cache_root: Optional[Path] = None,
+    conn: Optional[sqlite3.Connection] = None,
+) -> bool:
+    """
+    Upsert one payload. data = the exact bytes written (hashed without re-reading).
+    """
+    key = parse_payload_path(path)
+    if key is None:
+        return False
+    root = Path(cache_root or Path(path).resolve().parents[2])
+    if data is None:
+        data = Path(path).read_bytes()
+    try:
+        mtime = Path(path).stat().st_mtime
+    except OSError:
+        mtime = None
+    row = (
+        key[0],
+        key[1],
+        key[2],
+        _rel(Path(path), root),
+        len(data),
+        mtime,
+        hashlib.sha1(data).hexdigest(),
+        datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        json.dumps(headline(payload), ensure_ascii=False, default=str),
+    )
+    own = conn is None
+    with _LOCK:
+        conn = conn or connect(root)
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO payloads(market, ymd, slot, relpath, size, mtime, sha1, written_at_utc, headline) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+            conn.commit()
+        finally:
+            if own:
+                conn.close()
+    return True
+
+
+def _index_file(conn: sqlite3.Connection, path: Path, cache_root: Path) -> bool:
+    try:
+        data = path.read_bytes()
+        obj = json.loads(data.decode("utf-8"))
+    except Exception:
+        return False
+    return record(path, obj if isinstance(obj, dict) else {}, data=data, cache_root=cache_root, conn=conn)
+
+
+def _market_dirs(cache_root: Path, markets: Optional[Iterable[str]]) -> List[Path]:
+    if markets:
+        want = {catalog_market(m) for m in markets}
+        return [d for d in cache_root.iterdir() if d.is_dir() and catalog_market(d.name) in want]
+    return [d for d in cache_root.iterdir() if d.is_dir() and not d.name.startswith((".", "_"))]
+
+
+def _dir_mtime_ns(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _scan_day(conn: sqlite3.Connection, ddir: Path, root: Path) -> int:
+    """
+    (Re)index the payloads of one day dir whose (mtime, size) differ from their row.
+    """
+    n = 0
+    for p in ddir.glob("*" + PAYLOAD_SUFFIX):
+        key = parse_payload_path(p)
+        if key is None:
+            continue
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        row = conn.execute(
+            "SELECT mtime, size FROM payloads WHERE market = ? AND ymd = ? AND slot = ?", key
+        ).fetchone()
+        if row is not None and (row[0], row[1]) == (st.st_mtime, st.st_size):
+            continue
+        if _index_file(conn, p, root):
+            n += 1
+    return n
+
+
+def _sync_market(conn: sqlite3.Connection, mdir: Path, root: Path, *, full: bool, rebuild: bool) -> int:
+    rel = _rel(mdir, root)
+    state = {
+        r[0]: (r[1], r[2])
+        for r in conn.execute(
+            "SELECT relpath, mtime_ns, newest FROM scanned_dirs WHERE relpath = ? OR relpath LIKE ?",
+            (rel, rel + "/%"),
+        )
+    }
+    m_mtime = _dir_mtime_ns(mdir)
+    m_prev, newest = state.get(rel, (None, None))
+
+    def _is_day(d: Path) -> bool:
+        return bool(_DAY_RE.match(d.name)) and d.is_dir()
+
+    if full or rebuild:
+        days = [d for d in mdir.iterdir() if _is_day(d)]
+    else:
+        days = []
+        # a new day dir changes the market dir's mtime; otherwise only the newest day can still grow
+        if m_mtime != m_prev:
+            days = [d for d in mdir.iterdir() if _is_day(d) and (newest is None or d.name > newest)]
+        if newest and (mdir / newest).is_dir():
+            days.append(mdir / newest)
+
+    n = 0
+    for ddir in days:
+        d_rel = _rel(ddir, root)
+        d_mtime = _dir_mtime_ns(ddir)
+        if not rebuild and not full and state.get(d_rel, (None, None))[0] == d_mtime:
+            continue
+        if rebuild:
+            for p in ddir.glob("*" + PAYLOAD_SUFFIX):
+                n += int(_index_file(conn, p, root))
+        else:
+            n += _scan_day(conn, ddir, root)
+        conn.execute("INSERT OR REPLACE INTO scanned_dirs(relpath, mtime_ns, newest) VALUES (?, ?, NULL)", (d_rel, d_mtime))
+        if newest is None or ddir.name > newest:
+            newest = ddir.name
+    conn.execute("INSERT OR REPLACE INTO scanned_dirs(relpath, mtime_ns, newest) VALUES (?, ?, ?)", (rel, m_mtime, newest))
+    return n
+
+
+def sync_new_days(
+    cache_root: Optional[Path] = None,
+    markets: Optional[Iterable[str]] = None,
+    *,
+    full: bool = False,
+    rebuild: bool = False,
+) -> int:
+    """
+    Index payloads main.py didn't record itself (copied / downloaded caches).
+
+    Default (dashboard, every rerun): flat cost however much history piles up.
+    Per market one stat of the market dir (+ a listing only when it changed, for
+    day dirs newer than the newest one seen) and one stat of the newest day dir;
+    only day dirs whose mtime changed are read.
+    full=True (CLI --sync): every day dir, every payload's (mtime, size).
+    rebuild=True: re-read and re-hash everything.
+    """
+    root = Path(cache_root or DEFAULT_CACHE_ROOT)
+    if not root.is_dir():
+        return 0
+    conn = connect(root)
+    n = 0
+    try:
+        for mdir in _market_dirs(root, markets):
+            n += _sync_market(conn, mdir, root, full=full, rebuild=rebuild)
+        conn.commit()
+    finally:
+        conn.close()
+    return n
+
+
+# =============================================================================
+# Queries
+# =============================================================================
+def _rows(sql: str, params: Tuple[Any, ...], cache_root: Optional[Path]) -> List[Dict[str, Any]]:
+    path = catalog_path(cache_root)
+    if not path.exists():
+        return []
+    conn = connect(cache_root)
+    try:
+        cur = conn.execute(sql, params)
+        cols = [c[0] for c in cur.description]
+        out = []
+        for r in cur.fetchall():
+            d = dict(zip(cols, r))
+            try:
+                d["headline"] = json.loads(d.get("headline") or "{}")
+            except Exception:
+                d["headline"] = {}
+            root = Path(cache_root or DEFAULT_CACHE_ROOT)
+            rp = Path(str(d.get("relpath") or ""))
+            d["path"] = str(rp if rp.is_absolute() else root / rp)
+            out.append(d)
+        return out
+    finally:
+        conn.close()
+
+
+def latest(market: Optional[str] = None, *, limit: int = 50, cache_root: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """
+    Most recent payloads (ymd desc, then write time desc); market=None => all markets.
+    """
+    if market:
+        return _rows(
+            "SELECT * FROM payloads WHERE market = ? ORDER BY ymd DESC, mtime DESC LIMIT ?",
+            (catalog_market(market), int(limit)),
+            cache_root,
+        )
+    return _rows("SELECT * FROM payloads ORDER BY ymd DESC, mtime DESC LIMIT ?", (int(limit),), cache_root)
+
+
+def days_slots(market: Optional[str] = None, *, cache_root: Optional[Path] = None) -> List[Tuple[str, str, str]]:
+    """
+    [(market, ymd, slot)] sorted by market, ymd desc, slot.
+    """
+    path = catalog_path(cache_root)
+    if not path.exists():
+        return []
+    conn = connect(cache_root)
+    try:
+        if market:
+            rows = conn.execute(
+                "SELECT market, ymd, slot FROM payloads WHERE market = ? ORDER BY ymd DESC, slot", (catalog_market(market),)
+            ).fetchall()
+        else:
+            rows = conn.execute("SELECT market, ymd, slot FROM payloads ORDER BY market, ymd DESC, slot").fetchall()
+        return [(str(a), str(b), str(c)) for a, b, c in rows]
+    finally:
+        conn.close()
+
+
+def get(market: str, ymd: str, slot: str, *, cache_root: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    rows = _rows(
+        "SELECT * FROM payloads WHERE market = ? AND ymd = ? AND slot = ?",
+        (catalog_market(market), ymd, slot),
+        cache_root,
+    )
+    return rows[0] if rows else None
+
+
+def main(argv: Optional[list] = None) -> int:
+    ap = argparse.ArgumentParser(description="Payload catalog (data/cache/payload_catalog.sqlite).")
+    ap.add_argument("--cache-root", default=str(DEFAULT_CACHE_ROOT))
+    ap.add_argument("--rebuild", action="store_true", help="re-index every payload under the cache root")
+    ap.add_argument("--sync", action="store_true", help="walk every day dir, index payloads that are new or changed")
+    ap.add_argument("--market", default="")
+    ap.add_argument("--limit", type=int, default=20)
+    args = ap.parse_args(argv)
+
+    root = Path(args.cache_root)
+    if args.rebuild or args.sync:
+        n = sync_new_days(root, [args.market] if args.market else None, full=args.sync, rebuild=args.rebuild)
+        print(f"indexed {n} payload(s) -> {catalog_path(root)}")
+
+    for r in latest(args.market or None, limit=args.limit, cache_root=root):
+        hl = r["headline"]
+        brief = " ".join(f"{k}={v}" for k, v in list(hl.items())[:6])
+        print(f"{r['market']:<4} {r['ymd']} {r['slot']:<8} {r['size']:>9}B {r['sha1'][:10]}  {brief}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,368 @@
+# markets/pipeline_cache.py
+# -*- coding: utf-8 -*-
+"""
+Content-hash step cache for the daily pipeline
+
+    main.py -> render_images -> render_video -> upload
+
+Each step records the fingerprint of its inputs (DB fingerprint, payload hash,
+renderer source hash, CLI args ...) together with the hashes of its outputs in
+
+    data/cache/<market>/<ymd>/<slot>.steps.json
+
+A step is "fresh" only when:
+  - its input fingerprint is unchanged, AND
+  - every recorded output still exists with the same hash.
+
+So a layout-only change re-renders (and re-encodes) without re-syncing prices,
+and a late price fix in the warehouse invalidates the cached payload.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# bump to invalidate every recorded step at once
+PIPELINE_CACHE_VERSION = 3
+
+# written into the images dir by scripts/render_video.py (ffmpeg concat lists);
+# not part of the render_images output, or encoding would invalidate its own upstream
+GENERATED_FILES = frozenset({"list_video.txt", "list_segments.txt"})
+
+
+# =============================================================================
+# Market warehouse locations (same env overrides as the market modules)
+# =============================================================================
+_MARKET_DB: Dict[str, tuple] = {
+    "us": ("US_DB_PATH", "markets/us/us_stock_warehouse.db"),
+    "uk": ("UK_DB_PATH", "markets/uk/uk_stock_warehouse.db"),
+    "ca": ("CA_DB_PATH", "markets/ca/ca_stock_warehouse.db"),
+    "au": ("AU_DB_PATH", "markets/au/au_stock_warehouse.db"),
+    "fr": ("FR_DB_PATH", "markets/fr/fr_stock_warehouse.db"),
+    "cn": ("CN_DB_PATH", "markets/cn/cn_stock_warehouse.db"),
+    "jp": ("JP_DB_PATH", "markets/jp/jp_stock_warehouse.db"),
+    "kr": ("KR_DB_PATH", "markets/kr/kr_stock_warehouse.db"),
+    "th": ("TH_DB_PATH", "markets/th/th_stock_warehouse.db"),
+    "india": ("INDIA_DB_PATH", "markets/india/india_stock_warehouse.db"),
+}
+
+_MARKET_ALIAS = {
+    "in": "india",
+    "nse": "india",
+    "bse": "india",
+}
+
+
+def canonical_market(market: str) -> str:
+    m = (market or "").strip().lower()
+    return _MARKET_ALIAS.get(m, m)
+
+
+def market_db_path(market: str) -> Optional[Path]:
+    """
+    Warehouse path for a DB-backed market (None for TW, which has no warehouse).
+    """
+    m = canonical_market(market)
+    ent = _MARKET_DB.get(m)
+    if not ent:
+        return None
+    env_name, rel = ent
+    v = (os.getenv(env_name) or "").strip()
+    return Path(v) if v else (REPO_ROOT / rel)
+
+
+def market_source_dirs(market: str) -> List[Path]:
+    m = canonical_market(market)
+    out = [REPO_ROOT / "markets" / m, REPO_ROOT / "markets" / "common", REPO_ROOT / "markets" / "runners.py"]
+    return [p for p in out if p.exists()]
+
+
+def renderer_source_dirs(market: str) -> List[Path]:
+    m = canonical_market(market)
+    folder = "in" if m == "india" else m
+    out = [
+        REPO_ROOT / "scripts" / f"render_images_{folder}",
+        REPO_ROOT / "scripts" / "render_images_common",
+    ]
+    return [p for p in out if p.exists()]
+
+
+# =============================================================================
+# Hash helpers
+# =============================================================================
+def _now_utc_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+
+
+def fingerprint(obj: Any) -> str:
+    """
+    Stable sha256 of a JSON-able object (keys sorted).
+    """
+    raw = json.dumps(obj, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def file_sha256(path: Path) -> Optional[str]:
+    p = Path(path)
+    if not p.is_file():
+        return None
+    h = hashlib.sha256()
+    with open(p, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def dir_fingerprint(
+    root: Path,
+    *,
+    patterns: Iterable[str] = ("*",),
+    exclude: Iterable[str] = (),
+) -> Optional[str]:
+    """
+    Hash of (relative path, file sha256) for every file under root
+    (files whose name is in exclude are skipped).
+    """
+    r = Path(root)
+    if not r.is_dir():
+        return None
+    skip = set(exclude)
+    files = set()
+    for pat in patterns:
+        for p in r.rglob(pat):
+            if p.is_file() and p.name not in skip:
+                files.add(p)
+    h = hashlib.sha256()
+    for p in sorted(files, key=lambda x: x.relative_to(r).as_posix()):
+        h.update(p.relative_to(r).as_posix().encode("utf-8"))
+        h.update(b"\0")
+        h.update((file_sha256(p) or "").encode("ascii"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+# change on every main.py run even when the rows are identical
+VOLATILE_PAYLOAD_KEYS = ("generated_at",)
+VOLATILE_META_KEYS = ("time", "timings", "aggregated_at")
+
+
+def payload_fingerprint(path: Path) -> Optional[str]:
+    """
+    sha256 of a payload's canonical JSON without VOLATILE_* keys, so a main.py rerun
+    that produced the same rows doesn't re-render (the images keep the earlier
+    generated_at). Unreadable JSON -> plain file hash.
+    """
+    p = Path(path)
+    if not p.is_file():
+        return None
+    try:
+        obj = json.loads(p.read_text(encoding="utf-8"))
+    except Exception:
+        return file_sha256(p)
+    if not isinstance(obj, dict):
+        return fingerprint(obj)
+    obj = {k: v for k, v in obj.items() if k not in VOLATILE_PAYLOAD_KEYS}
+    if isinstance(obj.get("meta"), dict):
+        obj["meta"] = {k: v for k, v in obj["meta"].items() if k not in VOLATILE_META_KEYS}
+    return fingerprint(obj)
+
+
+def source_fingerprint(paths: Iterable[Path]) -> str:
+    """
+    Code version for a step: hash of every *.py under the given files/dirs.
+    """
+    h = hashlib.sha256()
+    for base in paths:
+        b = Path(base)
+        if b.is_file():
+            h.update(b.name.encode("utf-8"))
+            h.update((file_sha256(b) or "").encode("ascii"))
+            continue
+        fp = dir_fingerprint(b, patterns=("*.py",))
+        h.update(b.name.encode("utf-8"))
+        h.update((fp or "").encode("ascii"))
+    return h.hexdigest()
+
+
+def path_fingerprint(path: Path) -> Optional[str]:
+    p = Path(path)
+    if p.is_dir():
+        return dir_fingerprint(p, exclude=GENERATED_FILES)
+    return file_sha256(p)
+
+
+# =============================================================================
+# DB fingerprint
+# =============================================================================
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+# calendar days of prices a payload can depend on (snapshot lookbacks, 20-day windows ...)
+FP_WINDOW_DAYS = _env_int("INTRADAY_CACHE_FP_DAYS", 45)
+
+# integer sums (price * 1e4) are exact, so the result doesn't depend on row order:
+# sync's DELETE + re-insert of identical rows leaves the fingerprint unchanged
+_DB_FP_SQL = """
+SELECT
+  MAX(date),
+  COUNT(*),
+  SUM(CAST(ROUND(close * 10000) AS INTEGER)),
+  SUM(CAST(ROUND(high * 10000) AS INTEGER)),
+  SUM(CAST(ROUND(close * 10000) AS INTEGER) * CAST(julianday(?) - julianday(date) AS INTEGER))
+FROM stock_prices
+WHERE date BETWEEN date(?, ?) AND ?
+"""
+
+
+def tw_input_files() -> List[Path]:
+    """
+    TW has no warehouse: its local inputs are the stock list and the big daily-bar
+    download cache (markets/tw/downloader.py, tw_prices_1d_*).
+    """
+    data = REPO_ROOT / "data"
+    out = [data / "tw_stock_list.json"]
+    cache = data / "cache" / "tw"
+    if cache.is_dir():
+        out.extend(sorted(cache.glob("tw_prices_1d_*")))
+    return out
+
+
+def db_fingerprint(market: str, ymd: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Content fingerprint of the prices a payload for ymd can read: over the last
+    FP_WINDOW_DAYS calendar days up to ymd (date-indexed range, not a table scan)
+      max(date), row count, checksums of close / high (one date-weighted)
+    plus the stock_info row count. A sync that rewrites identical rows (DELETE +
+    insert + VACUUM) keeps it; a late price fix inside the window changes it.
+
+    TW: sha256 of tw_input_files() (the stock list is rewritten every run).
+    """
+    m = canonical_market(market)
+    if m == "tw":
+        return {"db": None, "files": {p.name: file_sha256(p) for p in tw_input_files()}}
+
+    db = market_db_path(m)
+    if db is None:
+        return {"db": None}
+    if not db.exists():
+        return {"db": str(db), "exists": False}
+
+    try:
+        conn = sqlite3.connect(f"file:{db.as_posix()}?mode=ro", uri=True, timeout=30)
+    except Exception as e:
+        return {"db": str(db), "error": str(e)}
+
+    try:
+        end = str(ymd or "")[:10]
+        if not end:
+            end = conn.execute("SELECT MAX(date) FROM stock_prices").fetchone()[0] or "9999-12-31"
+        max_date, n_rows, close_sum, high_sum, close_w = conn.execute(
+            _DB_FP_SQL, (end, end, f"-{FP_WINDOW_DAYS} days", end)
+        ).fetchone()
+        n_info = conn.execute("SELECT COUNT(*) FROM stock_info").fetchone()[0]
+        return {
+            "db": str(db),
+            "window": [FP_WINDOW_DAYS, end],
+            "max_date": max_date,
+            "rows": int(n_rows or 0),
+            "close_sum": int(close_sum or 0),
+            "high_sum": int(high_sum or 0),
+            "close_wsum": int(close_w or 0),
+            "info_rows": int(n_info or 0),
+        }
+    except Exception as e:
+        return {"db": str(db), "error": str(e)}
+    finally:
+        conn.close()
+
+
+# =============================================================================
+# Step manifest
+# =============================================================================
+def steps_manifest_path(repo_root: Path, market_lower: str, ymd: str, slot: str) -> Path:
+    return Path(repo_root) / "data" / "cache" / market_lower / ymd / f"{slot}.steps.json"
+
+
+class StepCache:
+    """
+    Per (market, ymd, slot) record of step fingerprints.
+
+        sc = StepCache(steps_manifest_path(...))
+        if not sc.is_fresh("render_images", inputs):
+            ... run ...
+            sc.record("render_images", inputs, outputs={"images": images_dir})
+    """
+
+    def __init__(self, path: Path, *, enabled: bool = True):
+        self.path = Path(path)
+        self.enabled = bool(enabled)
+        self._data: Dict[str, Any] = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            obj = json.loads(self.path.read_text(encoding="utf-8"))
+            if isinstance(obj, dict) and obj.get("version") == PIPELINE_CACHE_VERSION:
+                obj.setdefault("steps", {})
+                return obj
+        except Exception:
+            pass
+        return {"version": PIPELINE_CACHE_VERSION, "steps": {}}
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self._data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def get(self, step: str) -> Optional[Dict[str, Any]]:
+        return self._data["steps"].get(step)
+
+    def output_hash(self, step: str, name: str) -> Optional[str]:
+        ent = self.get(step) or {}
+        return (ent.get("outputs") or {}).get(name, {}).get("sha256")
+
+    def is_fresh(self, step: str, inputs: Dict[str, Any]) -> bool:
+        if not self.enabled:
+            return False
+        ent = self.get(step)
+        if not ent or ent.get("fingerprint") != fingerprint(inputs):
+            return False
+        for name, out in (ent.get("outputs") or {}).items():
+            p = Path(out.get("path", ""))
+            if not p.exists() or path_fingerprint(p) != out.get("sha256"):
+                return False
+        return True
+
+    def record(self, step: str, inputs: Dict[str, Any], outputs: Optional[Dict[str, Path]] = None) -> None:
+        outs: Dict[str, Any] = {}
+        for name, p in (outputs or {}).items():
+            if p is None:
+                continue
+            outs[name] = {"path": str(p), "sha256": path_fingerprint(Path(p))}
+        self._data["steps"][step] = {
+            "fingerprint": fingerprint(inputs),
+            "inputs": inputs,
+            "outputs": outs,
+            "recorded_at_utc": _now_utc_iso(),
+        }
+        self._save()
+
+    def invalidate(self, *steps: str) -> None:
+        changed = False
+        for s in steps:
+            if self._data["steps"].pop(s, None) is not None:
+                changed = True
+        if changed:
+            self._save()
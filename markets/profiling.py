@@ -0,0 +1,370 @@
+# markets/profiling.py
+# -*- coding: utf-8 -*-
+"""
+Opt-in per-stage profiling, hooked into markets/spans.py
+
+Enable with env or CLI (main.py / run_shorts.py --profile):
+
+    INTRADAY_PROFILE=sync,aggregate,render
+    INTRADAY_PROFILE=snapshot:mem,render_page:cpu,encode:pyspy
+    INTRADAY_PROFILE_MODE=cpu|mem|pyspy      (default cpu, per-stage ":mode" wins)
+    INTRADAY_PROFILE_TOP=25                  (rows in printed / written tables)
+    INTRADAY_PROFILE_DIR=data/cache/<m>/<ymd> (main.py / run_shorts.py set it)
+    INTRADAY_PROFILE_TAG=<slot>              (file name prefix)
+
+A stage token matches a span name exactly or as a prefix ("render" matches
+render_page / render_overview / render_images). Aliases: run_sync -> sync,
+run_intraday -> snapshot.
+
+Modes:
+  cpu   : cProfile, accumulated over every call of the stage in this process
+          -> <tag>.profile.<stage>.pstats  (+ hot-function table on stdout)
+  mem   : tracemalloc, started only inside the stage
+          -> <tag>.profile.<stage>.alloc.txt (top-N allocation sites + peak)
+  pyspy : attaches `py-spy record` to this pid for the duration of the stage
+          -> <tag>.profile.<stage>.speedscope.json (needs py-spy on PATH)
+
+Only the selected stages pay anything. cProfile sees the calling thread only;
+a stage nested inside another profiled stage is not profiled separately.
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from markets import spans as _spans
+
+MODES = ("cpu", "mem", "pyspy")
+ALIASES = {"run_sync": "sync", "run_intraday": "snapshot", "intraday": "snapshot"}
+
+
+def parse_spec(spec: str, default_mode: str = "cpu") -> Dict[str, str]:
+    """
+    "sync,aggregate:mem" -> {"sync": "cpu", "aggregate": "mem"}
+    """
+    out: Dict[str, str] = {}
+    default_mode = default_mode if default_mode in MODES else "cpu"
+    for tok in str(spec or "").split(","):
+        tok = tok.strip().lower()
+        if not tok:
+            continue
+        name, _, mode = tok.partition(":")
+        name = ALIASES.get(name.strip(), name.strip())
+        mode = mode.strip() or default_mode
+        if mode not in MODES:
+            print(f"[profile] ⚠️ unknown mode '{mode}' for {name} (use {'/'.join(MODES)}); using cpu", flush=True)
+            mode = "cpu"
+        if name:
+            out[name] = mode
+    return out
+
+
+class _Stage:
+    def __init__(self, name: str, mode: str):
+        self.name = name
+        self.mode = mode
+        self.calls = 0
+        self.seconds = 0.0
+        self.profile: Any = None                           # cProfile.Profile
+        self.alloc: Dict[str, List[float]] = {}           # site -> [size_diff, count_diff]
+        self.mem_peak = 0
+        self.pyspy_files: List[Path] = []
+
+
+class Profiler:
+    """
+    Installed as markets.spans._PROFILER; spans call enter()/exit().
+    """
+
+    def __init__(self, stages: Dict[str, str], *, out_dir: Optional[Path] = None, tag: str = "", top: int = 25):
+        self.stages = dict(stages)
+        self.out_dir = Path(out_dir) if out_dir else None
+        self.tag = tag
+        self.top = int(top)
+        self._state: Dict[str, _Stage] = {}
+        self._lock = threading.Lock()
+        self._active: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    def match(self, span_name: str) -> Optional[Tuple[str, str]]:
+        for tok, mode in self.stages.items():
+            if span_name == tok or span_name.startswith(tok + "_"):
+                return tok, mode
+        return None
+
+    def enter(self, span_name: str) -> Any:
+        m = self.match(span_name)
+        if m is None:
+            return None
+        tok, mode = m
+        with self._lock:
+            if self._active is not None:
+                return None
+            self._active = tok
+        st = self._state.setdefault(tok, _Stage(tok, mode))
+        st.calls += 1
+        t0 = time.perf_counter()
+
+        if mode == "cpu":
+            import cProfile
+
+            if st.profile is None:
+                st.profile = cProfile.Profile()
+            try:
+                st.profile.enable()
+            except ValueError as e:  # another profiler (e.g. sys.setprofile user) already active
+                print(f"[profile] ⚠️ cProfile unavailable for {tok}: {e}", flush=True)
+                self._release()
+                return None
+            return (st, t0, None)
+
+        if mode == "mem":
+            import tracemalloc
+
+            started_here = not tracemalloc.is_tracing()
+            if started_here:
+                tracemalloc.start(int(os.getenv("INTRADAY_PROFILE_MEM_FRAMES", "1") or 1))
+            if hasattr(tracemalloc, "reset_peak"):  # py>=3.9
+                tracemalloc.reset_peak()
+            return (st, t0, (tracemalloc.take_snapshot(), started_here))
+
+        # pyspy
+        proc = self._start_pyspy(st)
+        return (st, t0, proc)
+
+    def exit(self, token: Any) -> None:
+        if token is None:
+            return
+        st, t0, extra = token
+        try:
+            if st.mode == "cpu":
+                st.profile.disable()
+            elif st.mode == "mem":
+                self._collect_mem(st, *extra)
+            elif extra is not None:
+                self._stop_pyspy(extra)
+        finally:
+            st.seconds += time.perf_counter() - t0
+            self._release()
+
+    def _release(self) -> None:
+        with self._lock:
+            self._active = None
+
+    # ------------------------------------------------------------------
+    def _collect_mem(self, st: _Stage, base: Any, started_here: bool) -> None:
+        import tracemalloc
+
+        snap = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        st.mem_peak = max(st.mem_peak, int(peak))
+        if started_here:
+            tracemalloc.stop()
+        filt = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        diff = snap.filter_traces(filt).compare_to(base.filter_traces(filt), "lineno")
+        for d in diff:
+            if d.size_diff <= 0:
+                continue
+            fr = d.traceback[0]
+            site = f"{fr.filename}:{fr.lineno}"
+            acc = st.alloc.setdefault(site, [0.0, 0.0])
+            acc[0] += d.size_diff
+            acc[1] += d.count_diff
+
+    def _out_path(self, st: _Stage, suffix: str) -> Path:
+        d = self.out_dir or Path(os.getenv("INTRADAY_PROFILE_DIR") or "data/cache/profile")
+        d.mkdir(parents=True, exist_ok=True)
+        tag = self.tag or (os.getenv("INTRADAY_PROFILE_TAG") or "").strip()
+        prefix = f"{tag}." if tag else ""
+        return d / f"{prefix}profile.{st.name}{suffix}"
+
+    def _start_pyspy(self, st: _Stage) -> Any:
+        exe = shutil.which("py-spy")
+        if not exe:
+            print("[profile] ⚠️ py-spy not on PATH (pip install py-spy); stage not sampled", flush=True)
+            return None
+        out = self._out_path(st, f".{st.calls}.speedscope.json")
+        try:
+            proc = subprocess.Popen(
+                [exe, "record", "--pid", str(os.getpid()), "--format", "speedscope", "-o", str(out), "--nonblocking"],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+            )
+        except Exception as e:
+            print(f"[profile] ⚠️ py-spy failed to start: {e}", flush=True)
+            return None
+        time.sleep(0.3)  # let py-spy attach before the stage starts
+        st.pyspy_files.append(out)
+        return proc
+
+    @staticmethod
+    def _stop_pyspy(proc: Any) -> None:
+        try:
+            proc.send_signal(signal.SIGINT)
+            proc.wait(timeout=30)
+        except Exception:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        if proc.returncode not in (0, None, -signal.SIGINT):
+            err = (proc.stderr.read() if proc.stderr else b"").decode("utf-8", "replace").strip()
+            print(f"[profile] ⚠️ py-spy exited rc={proc.returncode}: {err[-300:]}", flush=True)
+
+    # ------------------------------------------------------------------
+    def finish(self) -> List[Path]:
+        """
+        Write dumps for every stage profiled so far, print the hot tables and
+        start over. Safe to call more than once (atexit calls it too).
+        """
+        with self._lock:
+            if self._active is not None:
+                return []
+            done = list(self._state.values())
+            self._state = {}
+        written: List[Path] = []
+        for st in done:
+            if st.mode == "cpu" and st.profile is not None:
+                p = self._out_path(st, ".pstats")
+                st.profile.dump_stats(str(p))
+                written.append(p)
+                print_hot_table(p, title=f"{st.name} ({st.calls} call(s), {st.seconds:.2f}s)", top=self.top)
+            elif st.mode == "mem":
+                p = self._out_path(st, ".alloc.txt")
+                p.write_text(self._alloc_report(st), encoding="utf-8")
+                written.append(p)
+                print(self._alloc_report(st, top=min(self.top, 10)), flush=True)
+            elif st.mode == "pyspy":
+                written.extend(f for f in st.pyspy_files if f.exists())
+        for p in written:
+            print(f"[profile] wrote {p}", flush=True)
+        return written
+
+    def _alloc_report(self, st: _Stage, top: Optional[int] = None) -> str:
+        n = self.top if top is None else top
+        rows = sorted(st.alloc.items(), key=lambda kv: kv[1][0], reverse=True)[:n]
+        lines = [
+            f"[profile] {st.name}: tracemalloc ({st.calls} call(s), {st.seconds:.2f}s) "
+            f"peak={st.mem_peak / 1048576.0:.1f} MiB",
+            f"  {'net KiB':>10} {'blocks':>8}  site",
+        ]
+        for site, (size, count) in rows:
+            lines.append(f"  {size / 1024.0:>10.1f} {int(count):>8}  {_short_path(site)}")
+        return "\n".join(lines) + "\n"
+
+
+def _short_path(s: str) -> str:
+    root = str(Path(__file__).resolve().parents[1]) + os.sep
+    s = s.replace(root, "")
+    for marker in ("site-packages" + os.sep, "lib" + os.sep + "python"):
+        i = s.find(marker)
+        if i >= 0:
+            return "…" + s[i + len(marker) - 1:]
+    return s
+
+
+def print_hot_table(pstats_path: Path, *, title: str = "", top: int = 25) -> None:
+    """
+    Short hot-function table (by own time), with cumulative time for context.
+    """
+    import pstats
+
+    st = pstats.Stats(str(pstats_path))
+    rows = []
+    for (fn, line, func), (cc, nc, tt, ct, _callers) in st.stats.items():  # type: ignore[attr-defined]
+        rows.append((tt, ct, nc, f"{_short_path(fn)}:{line}({func})"))
+    rows.sort(key=lambda r: r[0], reverse=True)
+    total = float(getattr(st, "total_tt", 0.0) or 0.0)
+
+    print(f"\n[profile] {title} total={total:.2f}s -> {pstats_path.name}", flush=True)
+    print(f"  {'own s':>8} {'own %':>6} {'cum s':>8} {'calls':>9}  function", flush=True)
+    for tt, ct, nc, label in rows[:top]:
+        pct = (tt / total * 100.0) if total > 0 else 0.0
+        print(f"  {tt:>8.3f} {pct:>5.1f}% {ct:>8.3f} {nc:>9}  {label[-110:]}", flush=True)
+
+
+# =============================================================================
+# Install / configure
+# =============================================================================
+def install(
+    spec: str,
+    *,
+    mode: Optional[str] = None,
+    out_dir: Optional[Path] = None,
+    tag: str = "",
+    top: Optional[int] = None,
+) -> Optional[Profiler]:
+    """
+    Install (or replace) the profiler hook. Empty spec uninstalls.
+    Also exports the settings to os.environ so child processes inherit them.
+    """
+    cur = current()
+    if cur is not None:
+        cur.finish()
+        _spans._PROFILER = None
+
+    mode = (mode or os.getenv("INTRADAY_PROFILE_MODE") or "cpu").strip().lower()
+    stages = parse_spec(spec, default_mode=mode)
+    if not stages:
+        return None
+
+    top = int(top if top is not None else (os.getenv("INTRADAY_PROFILE_TOP") or 25))
+    prof = Profiler(stages, out_dir=out_dir, tag=tag, top=top)
+    _spans._PROFILER = prof
+    atexit.register(prof.finish)
+
+    os.environ["INTRADAY_PROFILE"] = ",".join(f"{k}:{v}" for k, v in stages.items())
+    if out_dir:
+        os.environ["INTRADAY_PROFILE_DIR"] = str(out_dir)
+    if tag:
+        os.environ["INTRADAY_PROFILE_TAG"] = tag
+
+    print(f"[profile] stages: {', '.join(f'{k}({v})' for k, v in stages.items())}", flush=True)
+    return prof
+
+
+def install_from_env() -> Optional[Profiler]:
+    spec = (os.getenv("INTRADAY_PROFILE") or "").strip()
+    if not spec or current() is not None:
+        return current()
+    d = (os.getenv("INTRADAY_PROFILE_DIR") or "").strip()
+    return install(spec, out_dir=Path(d) if d else None, tag=(os.getenv("INTRADAY_PROFILE_TAG") or "").strip())
+
+
+def current() -> Optional[Profiler]:
+    p = getattr(_spans, "_PROFILER", None)
+    return p if isinstance(p, Profiler) else None
+
+
+def set_output(out_dir: Path, tag: str = "") -> None:
+    """
+    Point dumps at data/cache/<market>/<ymd>/ once the market day is known.
+    """
+    p = current()
+    if p is None:
+        return
+    p.out_dir = Path(out_dir)
+    p.tag = tag or p.tag
+    os.environ["INTRADAY_PROFILE_DIR"] = str(out_dir)
+    if p.tag:
+        os.environ["INTRADAY_PROFILE_TAG"] = p.tag
+
+
+def finish() -> List[Path]:
+    p = current()
+    return p.finish() if p is not None else []
+
+
+if __name__ == "__main__":  # pragma: no cover
+    # python -m markets.profiling data/cache/us/2026-02-20/close.profile.sync.pstats
+    for a in sys.argv[1:]:
+        print_hot_table(Path(a), title=Path(a).name)
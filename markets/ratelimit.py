@@ -0,0 +1,44 @@
+# markets/ratelimit.py
+# -*- coding: utf-8 -*-
+"""
+Shared request rate limiter for concurrent fetchers
+(markets/us/sec_fetch.py, stocksymboldownload/download_nse.py).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens/second, at most `capacity` banked.
+    acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._t = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._t) * self.rate)
+                self._t = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait_s = (1.0 - self._tokens) / self.rate
+            time.sleep(wait_s)
+
+    def pause(self, seconds: float) -> None:
+        """Drain the bucket so every worker backs off (429 / Retry-After)."""
+        with self._lock:
+            self._tokens = min(self._tokens, 0.0) - max(0.0, seconds) * self.rate
+            self._t = time.monotonic()
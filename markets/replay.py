@@ -0,0 +1,324 @@
+# markets/replay.py
+# -*- coding: utf-8 -*-
+"""
+Historical replay / backfill (one warehouse pass -> one payload per trading day)
+
+規則修正（JP 分級、KR 新上市規則…）之後要重產幾個月的 payload，原本只能每天跑一次 main.py：
+每次都把 LAG / streak window SQL 從頭掃一遍整個 stock_prices。改成：
+
+  python main.py --market jp --replay 2026-01-05..2026-03-31 --workers 6
+
+  1) load_replay(start, end)    每個 snapshot module 一次 range SQL（同一個 window pass 算完整段日期的
+                                prev_close / ret / hit / streak），依 ymd 切成 {ymd_effective: day}
+                                lookback 型市場（UK / FR 最近 N 列、KR / CN 最近 K 個交易日、India 12 列）
+                                在這裡切出「跟單日 SQL 一模一樣」的歷史片段
+  2) replay_payload(ymd, day)   跟 run_intraday 共用同一個 payload builder => 單日結果與 per-day run 一致
+                                收尾（ymd / slot / filters 預設值 + aggregate）也跟 runners 共用
+                                markets.runners.finish_raw_payload（只是不跑 guard、不帶 agg_state）
+  3) ProcessPool fan-out        每天 build raw payload + aggregate（CPU-bound）平行跑，各自寫
+                                data/cache/<market>/<ymd>/<slot>.payload.json
+
+✅ 只重播 warehouse 有資料的交易日（休市日不產 payload，也不跑 nontrading guard）
+✅ 不寫 .done marker、不動 agg_state：正常 run 仍以 step fingerprint 判斷要不要重算
+✅ raw_only=True 時只寫 raw payload（跟 main.py --raw-only 一樣）
+
+Env:
+- INTRADAY_REPLAY_WORKERS   (default min(4, cpu); 1 => 同一個 process 依序跑)
+"""
+
+from __future__ import annotations
+
+import importlib
+import os
+import sqlite3
+import time
+from collections.abc import Mapping
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from markets.payload_catalog import catalog_market
+from markets.spans import span
+
+# market -> (snapshot module with load_replay / replay_payload, aggregator module)
+# (india / nse / bse are folded into "in" by payload_catalog.catalog_market, same as the cache / catalog)
+REPLAY_SOURCES: Dict[str, Tuple[str, str]] = {
+    "us": ("markets.us.us_snapshot", "markets.us.aggregator"),
+    "uk": ("markets.uk.uk_snapshot", "markets.uk.aggregator"),
+    "ca": ("markets.ca.ca_snapshot", "markets.ca.aggregator"),
+    "au": ("markets.au.au_snapshot", "markets.au.aggregator"),
+    "fr": ("markets.fr.fr_intraday", "markets.fr.aggregator"),
+    "cn": ("markets.cn.snapshot_builder", "markets.cn.aggregator"),
+    "jp": ("markets.jp.downloader", "markets.jp.aggregator"),
+    "kr": ("markets.kr.snapshot_builder", "markets.kr.aggregator"),
+    "th": ("markets.th.th_snapshot", "markets.th.aggregator"),
+    "in": ("markets.india.india_snapshot", "markets.india.aggregator"),
+}
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def default_workers() -> int:
+    return max(1, _env_int("INTRADAY_REPLAY_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+def parse_range(spec: str) -> Tuple[str, str]:
+    """
+    "2026-01-05..2026-03-31" -> ("2026-01-05", "2026-03-31")（單一日期 => start == end）
+    """
+    s = str(spec or "").strip()
+    start, sep, end = s.partition("..")
+    start = start.strip()
+    end = (end.strip() if sep else start)
+    for v in (start, end):
+        datetime.strptime(v, "%Y-%m-%d")
+    if end < start:
+        raise ValueError(f"replay range end < start: {spec}")
+    return start, end
+
+
+# =============================================================================
+# Helpers for snapshot modules (load_replay)
+# =============================================================================
+def trading_days(conn: sqlite3.Connection, start: str, end: str, *, close_not_null: bool = False) -> List[str]:
+    """
+    warehouse 在 [start, end] 內有資料的日期（= 各市場 _pick_latest_leq 會挑到的 ymd_effective）
+    """
+    sql = "SELECT DISTINCT date FROM stock_prices WHERE date BETWEEN ? AND ?"
+    if close_not_null:
+        sql += " AND close IS NOT NULL"
+    rows = conn.execute(sql + " ORDER BY date", (start, end)).fetchall()
+    return [str(r[0]) for r in rows if r and r[0]]
+
+
+def dates_before(conn: sqlite3.Connection, ymd: str, n: int) -> List[str]:
+    """
+    最後 n 個 < ymd 的日期（升冪）— lookback 型市場多撈的前置歷史
+    """
+    if n <= 0:
+        return []
+    rows = conn.execute(
+        "SELECT DISTINCT date FROM stock_prices WHERE date < ? ORDER BY date DESC LIMIT ?",
+        (ymd, int(n)),
+    ).fetchall()
+    return sorted(str(r[0]) for r in rows if r and r[0])
+
+
+def split_days(df: Any, days: List[str], *, col: str = "ymd") -> Dict[str, Any]:
+    """
+    range frame -> {ymd: 當天的列}；保留 SQL 的列順序、index 重設（跟單日 read_sql_query 一樣）
+    沒有列的日期給空 frame（builder 走原本的 empty payload 路徑）
+    """
+    empty = df.iloc[0:0].reset_index(drop=True)
+    if df.empty:
+        return {d: empty.copy() for d in days}
+    groups = {str(k): idx for k, idx in df.groupby(df[col].astype(str), sort=False).indices.items()}
+    out: Dict[str, Any] = {}
+    for d in days:
+        idx = groups.get(d)
+        out[d] = df.iloc[idx].reset_index(drop=True) if idx is not None else empty.copy()
+    return out
+
+
+def tail_rows(df: Any, ymd: str, n: int, *, col: str = "ymd", desc: bool = False) -> Any:
+    """
+    每個 symbol「<= ymd 的最後 n 列」（= ROW_NUMBER() OVER (... ORDER BY date DESC) <= n）
+    df 必須依 (symbol, date) 排好；desc=True 表示 date 是降冪（India 的 ORDER BY symbol, date DESC）
+    """
+    sub = df[df[col].astype(str) <= str(ymd)]
+    g = sub.groupby("symbol", sort=False)
+    sub = g.head(int(n)) if desc else g.tail(int(n))
+    return sub.reset_index(drop=True)
+
+
+def window_rows(df: Any, dates: List[str], *, col: str = "ymd") -> Any:
+    """
+    df 裡 date IN (dates) 的列（KR / CN 最近 K 個交易日的 streak 歷史）
+    """
+    return df[df[col].astype(str).isin(set(dates))].reset_index(drop=True)
+
+
+class LazyDays(Mapping):
+    """
+    {ymd: day input}，取值時才切那一天的 lookback 片段
+    （UK / FR 每天 90 列 x 全 symbol、彼此大量重疊 => 不要一次全部 materialize）
+    """
+
+    def __init__(self, days: List[str], make: Callable[[str], Any]):
+        self._days = list(days)
+        self._set = set(self._days)
+        self._make = make
+
+    def __getitem__(self, ymd: str) -> Any:
+        if ymd not in self._set:
+            raise KeyError(ymd)
+        return self._make(ymd)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._days)
+
+    def __len__(self) -> int:
+        return len(self._days)
+
+
+def trailing_dates(all_dates: List[str], ymd: str, k: int) -> List[str]:
+    """
+    all_dates（升冪）裡 <= ymd 的最後 k 個日期
+    """
+    import bisect
+
+    i = bisect.bisect_right(all_dates, str(ymd))
+    return all_dates[max(0, i - int(k)):i]
+
+
+# =============================================================================
+# Orchestrator
+# =============================================================================
+def _modules(market: str) -> Tuple[Any, Any]:
+    market = catalog_market(market)
+    if market not in REPLAY_SOURCES:
+        raise ValueError(f"replay not supported for market={market} (supported: {', '.join(REPLAY_SOURCES)})")
+    snap_name, agg_name = REPLAY_SOURCES[market]
+    return importlib.import_module(snap_name), importlib.import_module(agg_name)
+
+
+def _snapshot_rows(raw_payload: Dict[str, Any]) -> int:
+    n = 0
+    for k in ("snapshot_main", "snapshot_open", "snapshot_emerging"):
+        v = raw_payload.get(k) if isinstance(raw_payload, dict) else None
+        if isinstance(v, list):
+            n += len(v)
+    return n
+
+
+def _replay_day(
+    market: str,
+    ymd: str,
+    day: Any,
+    slot: str,
+    asof: str,
+    base_dir: str,
+    raw_only: bool,
+) -> Dict[str, Any]:
+    """
+    worker：一天的 day input -> raw payload -> aggregate -> payload.json
+    （top-level function：ProcessPoolExecutor 要能 pickle）
+    """
+    from main import cache_paths, write_payload
+    from markets.runners import finish_raw_payload
+
+    t0 = time.perf_counter()
+    snap, agg = _modules(market)
+
+    raw_payload = snap.replay_payload(ymd, day, slot=slot, asof=asof)
+    rows = _snapshot_rows(raw_payload)
+
+    payload = finish_raw_payload(
+        market,
+        raw_payload,
+        agg.aggregate,
+        ymd=ymd,
+        slot=slot,
+        asof=asof,
+        raw_only=raw_only,
+        sync={"skipped": True, "reason": "replay"},
+        guard=False,
+        agg_state=False,
+    )
+    payload.setdefault("meta", {})
+    if isinstance(payload["meta"], dict):
+        payload["meta"]["replay"] = True
+
+    paths = cache_paths(Path(base_dir), market, slot, ymd)
+    write_payload(paths["payload"], payload)
+    return {"ymd": ymd, "rows": rows, "payload": str(paths["payload"]), "sec": round(time.perf_counter() - t0, 3)}
+
+
+def run_replay(
+    market: str,
+    start: str,
+    end: str,
+    *,
+    slot: str = "close",
+    asof: str = "",
+    base_dir: Optional[Path] = None,
+    workers: Optional[int] = None,
+    raw_only: bool = False,
+) -> Dict[str, Any]:
+    """
+    [start, end] 每個交易日寫一份 payload；回傳 {days, written, failed, load_s, total_s}
+    """
+    market = catalog_market(market)
+    base = Path(base_dir) if base_dir else Path(__file__).resolve().parents[1]
+    n_workers = max(1, int(workers or default_workers()))
+    snap, _ = _modules(market)
+
+    t0 = time.perf_counter()
+    with span("replay_load", market=market) as sp:
+        days: Mapping = snap.load_replay(start, end)
+        sp.rows = len(days)
+    load_s = time.perf_counter() - t0
+    print(f"🔁 replay market={market} {start}..{end}: {len(days)} trading day(s), load {load_s:.2f}s, workers={n_workers}")
+
+    written: List[Dict[str, Any]] = []
+    failed: List[Dict[str, Any]] = []
+    todo = sorted(days)
+
+    with span("replay_days", market=market) as sp:
+        sp.rows = len(todo)
+        if n_workers <= 1 or len(todo) <= 1:
+            for ymd in todo:
+                try:
+                    res = _replay_day(market, ymd, days[ymd], slot, asof, str(base), raw_only)
+                    written.append(res)
+                    print(f"  ✅ {ymd} rows={res['rows']} ({res['sec']}s)")
+                except Exception as e:
+                    failed.append({"ymd": ymd, "error": f"{type(e).__name__}: {e}"})
+                    print(f"  ❌ {ymd}: {type(e).__name__}: {e}")
+        else:
+            # 最多 2 x workers 天在途：day input 只在送出前才切（LazyDays）
+            it = iter(todo)
+            with ProcessPoolExecutor(max_workers=min(n_workers, len(todo))) as ex:
+                pending: Dict[Any, str] = {}
+
+                def _submit_next() -> None:
+                    ymd = next(it, None)
+                    if ymd is not None:
+                        fut = ex.submit(_replay_day, market, ymd, days[ymd], slot, asof, str(base), raw_only)
+                        pending[fut] = ymd
+
+                for _ in range(2 * n_workers):
+                    _submit_next()
+                while pending:
+                    done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        ymd = pending.pop(fut)
+                        try:
+                            res = fut.result()
+                            written.append(res)
+                            print(f"  ✅ {ymd} rows={res['rows']} ({res['sec']}s)")
+                        except Exception as e:
+                            failed.append({"ymd": ymd, "error": f"{type(e).__name__}: {e}"})
+                            print(f"  ❌ {ymd}: {type(e).__name__}: {e}")
+                        _submit_next()
+
+    written.sort(key=lambda r: r["ymd"])
+    failed.sort(key=lambda r: r["ymd"])
+    total_s = time.perf_counter() - t0
+    print(f"🔁 replay done: written={len(written)} failed={len(failed)} total {total_s:.2f}s")
+    return {
+        "market": market,
+        "start": start,
+        "end": end,
+        "slot": slot,
+        "days": len(todo),
+        "written": written,
+        "failed": failed,
+        "load_s": round(load_s, 3),
+        "total_s": round(total_s, 3),
+    }
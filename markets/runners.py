@@ -5,10 +5,189 @@ from __future__ import annotations
 import argparse
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Callable
+from typing import Any, Callable, Dict, Optional
+
+from markets.agg_state import aggregate_slot
+from markets.spans import span, span_fn
 
 # NOTE:
 # - Imports are done inside each function to avoid heavy import cost / circular deps.
+#   (markets.spans / markets.agg_state are stdlib-only, safe at module level)
+
+
+def _snapshot_rows(raw_payload: Dict[str, Any]) -> int:
+    n = 0
+    for k in ("snapshot_main", "snapshot_open", "snapshot_emerging"):
+        v = raw_payload.get(k) if isinstance(raw_payload, dict) else None
+        if isinstance(v, list):
+            n += len(v)
+    return n
+
+
+# open movers / hybrid markets: the aggregator's open watchlist is on by default
+OPEN_WATCHLIST_MARKETS = frozenset({"us", "uk", "ca", "au", "fr", "th", "in"})
+
+
+def finish_raw_payload(
+    market: str,
+    raw_payload: Dict[str, Any],
+    aggregate: Callable[[Dict[str, Any]], Dict[str, Any]],
+    *,
+    ymd: str,
+    slot: str,
+    asof: str,
+    base_dir: Optional[Path] = None,
+    raw_only: bool = False,
+    sync: Any = None,
+    guard: bool = True,
+    allow_nontrading: bool = False,
+    agg_state: bool = True,
+) -> Dict[str, Any]:
+    """
+    Shared tail of every runner and of markets/replay.py:
+    stamp ymd / slot / asof / filters on the raw payload -> nontrading guard ->
+    aggregate (agg_state carried across slots) -> stamp the final payload.
+
+    sync      : recorded as filters["<market>_sync"] (None => not recorded)
+    guard     : run_nontrading_guard_or_raise (replay: off, only warehouse days)
+    agg_state : aggregate_slot (replay: off, plain aggregate(raw))
+    """
+    raw_payload.setdefault("ymd", ymd)
+    raw_payload.setdefault("slot", slot)
+    raw_payload.setdefault("asof", asof)
+    raw_payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
+
+    raw_payload.setdefault("filters", {})
+    if market in OPEN_WATCHLIST_MARKETS:
+        raw_payload["filters"].setdefault("enable_open_watchlist", True)
+    if sync is not None:
+        raw_payload["filters"][f"{market}_sync"] = sync
+
+    if guard:
+        from markets.guard import run_nontrading_guard_or_raise
+
+        raw_payload = run_nontrading_guard_or_raise(
+            market=market,
+            today=ymd,
+            raw_payload=raw_payload,
+            allow_nontrading_flag=bool(allow_nontrading),
+        )
+
+    with span("aggregate", raw_only=bool(raw_only)) as sp:
+        sp.rows = _snapshot_rows(raw_payload)
+        if raw_only:
+            payload = raw_payload
+        elif agg_state:
+            payload = aggregate_slot(market, aggregate, raw_payload, ymd=ymd, base_dir=base_dir)
+        else:
+            payload = aggregate(raw_payload)
+
+    payload.setdefault("ymd", ymd)
+    payload.setdefault("slot", slot)
+    payload.setdefault("asof", asof)
+    payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
+    return payload
+
+
+# =============================================================================
+# Sync stage (network-bound; split out so a scheduler can run it on its own)
+# =============================================================================
+def _skip_sync(args: argparse.Namespace) -> bool:
+    return bool(getattr(args, "no_sync", False))
+
+
+def _skipped_sync(args: argparse.Namespace) -> Dict[str, Any]:
+    # main.py may have synced already (before its step-cache check) and handed the result over
+    pre = getattr(args, "presync", None)
+    if pre is not None:
+        return pre
+    return {"skipped": True, "reason": "no_sync"}
+
+
+def _sync_window(args: argparse.Namespace):
+    return getattr(args, "start", None), getattr(args, "end", None), not bool(getattr(args, "no_refresh_list", False))
+
+
+@span_fn("sync")
+def sync_market_us(args: argparse.Namespace) -> Any:
+    from markets.us.downloader_us import run_sync
+
+    start_date, end_date, refresh_list = _sync_window(args)
+    return run_sync(start_date, end_date, refresh_list=refresh_list)
+
+
+@span_fn("sync")
+def sync_market_uk(args: argparse.Namespace) -> Any:
+    from markets.uk.downloader_uk import run_sync
+
+    start_date, end_date, refresh_list = _sync_window(args)
+    return run_sync(start_date, end_date, refresh_list=refresh_list)
+
+
+@span_fn("sync")
+def sync_market_ca(args: argparse.Namespace) -> Any:
+    from markets.ca.downloader_ca import run_sync
+
+    start_date, end_date, refresh_list = _sync_window(args)
+    return run_sync(start_date, end_date, refresh_list=refresh_list)
+
+
+@span_fn("sync")
+def sync_market_au(args: argparse.Namespace) -> Any:
+    from markets.au.downloader_au import run_sync
+
+    start_date, end_date, refresh_list = _sync_window(args)
+    return run_sync(start_date, end_date, refresh_list=refresh_list)
+
+
+@span_fn("sync")
+def sync_market_in(args: argparse.Namespace) -> Any:
+    import importlib
+
+    mod_dl = importlib.import_module("markets.india.downloader")
+    start_date, end_date, refresh_list = _sync_window(args)
+    return getattr(mod_dl, "run_sync")(start_date, end_date, refresh_list=refresh_list)
+
+
+@span_fn("sync")
+def sync_market_th(args: argparse.Namespace) -> Any:
+    from markets.th.downloader import run_sync
+
+    start_date, end_date, refresh_list = _sync_window(args)
+    return run_sync(start_date, end_date, refresh_list=refresh_list)
+
+
+@span_fn("sync")
+def sync_market_fr(args: argparse.Namespace) -> Any:
+    import importlib
+
+    mod_dl = importlib.import_module("markets.fr.fr_snapshot")
+    run_fr_sync = getattr(mod_dl, "run_sync", None)
+    if not callable(run_fr_sync):
+        return None
+    start_date, end_date, refresh_list = _sync_window(args)
+    return run_fr_sync(start_date, end_date, refresh_list=refresh_list)
+
+
+@span_fn("sync")
+def sync_market_cn(args: argparse.Namespace) -> Any:
+    from markets.cn.downloader import run_sync
+
+    return run_sync(start_date=None, end_date=None, refresh_list=True)
+
+
+@span_fn("sync")
+def sync_market_jp(args: argparse.Namespace) -> Any:
+    from markets.jp.downloader import run_sync
+
+    return run_sync(start_date=None, end_date=None, refresh_list=True)
+
+
+@span_fn("sync")
+def sync_market_kr(args: argparse.Namespace) -> Any:
+    from markets.kr.downloader import run_sync
+
+    return run_sync(start_date=None, end_date=None, refresh_list=True)
 
 
 # =============================================================================
@@ -17,205 +196,139 @@ from typing import Any, Dict, Callable
 def run_market_tw(args: argparse.Namespace, base_dir: Path, ymd: str, meta: dict) -> Dict[str, Any]:
     from markets.tw.downloader import run_intraday
     from markets.tw.aggregator import aggregate
-    from markets.guard import run_nontrading_guard_or_raise
     from main import parse_bool_env, maybe_update_tw_stock_list
 
     test_mode = parse_bool_env("TW_TEST_MODE", False)
     meta["test_mode"] = test_mode
 
-    maybe_update_tw_stock_list(base_dir)
-
-    raw_payload = run_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
+    with span("list_refresh"):
+        maybe_update_tw_stock_list(base_dir)
 
-    raw_payload.setdefault("ymd", ymd)
-    raw_payload.setdefault("slot", args.slot)
-    raw_payload.setdefault("asof", args.asof)
-    raw_payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
+    with span("snapshot") as sp:
+        raw_payload = run_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
+        sp.rows = _snapshot_rows(raw_payload)
 
     raw_payload.setdefault("filters", {})
     raw_payload["filters"]["test_mode"] = test_mode
     if test_mode:
         raw_payload["filters"]["test_mode_note"] = "SIMULATION (weekend / non-trading hours)"
 
-    raw_payload = run_nontrading_guard_or_raise(
-        market="tw",
-        today=ymd,
-        raw_payload=raw_payload,
-        allow_nontrading_flag=bool(args.allow_nontrading),
+    return finish_raw_payload(
+        "tw",
+        raw_payload,
+        aggregate,
+        ymd=ymd,
+        slot=args.slot,
+        asof=args.asof,
+        base_dir=base_dir,
+        raw_only=bool(args.raw_only),
+        allow_nontrading=bool(args.allow_nontrading),
     )
 
-    payload = raw_payload if args.raw_only else aggregate(raw_payload)
-
-    payload.setdefault("ymd", ymd)
-    payload.setdefault("slot", args.slot)
-    payload.setdefault("asof", args.asof)
-    payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
-    return payload
-
 
 # =============================================================================
 # US (open movers market)
 # =============================================================================
 def run_market_us(args: argparse.Namespace, base_dir: Path, ymd: str, meta: dict) -> Dict[str, Any]:
-    from markets.us.downloader_us import run_sync as run_us_sync
     from markets.us.downloader_us import run_intraday as run_us_intraday
     from markets.us.aggregator import aggregate as aggregate_us
-    from markets.guard import run_nontrading_guard_or_raise
-
-    start_date = args.start
-    end_date = args.end
-    refresh_list = not args.no_refresh_list
-
-    res_sync = run_us_sync(start_date, end_date, refresh_list=refresh_list)
-    raw_payload = run_us_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
-
-    raw_payload.setdefault("ymd", ymd)
-    raw_payload.setdefault("slot", args.slot)
-    raw_payload.setdefault("asof", args.asof)
-    raw_payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
 
-    raw_payload.setdefault("filters", {})
-    raw_payload["filters"].setdefault("enable_open_watchlist", True)
-    raw_payload["filters"]["us_sync"] = res_sync
-
-    raw_payload = run_nontrading_guard_or_raise(
-        market="us",
-        today=ymd,
-        raw_payload=raw_payload,
-        allow_nontrading_flag=bool(args.allow_nontrading),
+    res_sync = _skipped_sync(args) if _skip_sync(args) else sync_market_us(args)
+    with span("snapshot") as sp:
+        raw_payload = run_us_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
+        sp.rows = _snapshot_rows(raw_payload)
+
+    return finish_raw_payload(
+        "us",
+        raw_payload,
+        aggregate_us,
+        ymd=ymd,
+        slot=args.slot,
+        asof=args.asof,
+        base_dir=base_dir,
+        raw_only=bool(args.raw_only),
+        sync=res_sync,
+        allow_nontrading=bool(args.allow_nontrading),
     )
 
-    payload = raw_payload if args.raw_only else aggregate_us(raw_payload)
-
-    payload.setdefault("ymd", ymd)
-    payload.setdefault("slot", args.slot)
-    payload.setdefault("asof", args.asof)
-    payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
-    return payload
-
 
 # =============================================================================
 # UK (open movers market)
 # =============================================================================
 def run_market_uk(args: argparse.Namespace, base_dir: Path, ymd: str, meta: dict) -> Dict[str, Any]:
-    from markets.uk.downloader_uk import run_sync as run_uk_sync
     from markets.uk.downloader_uk import run_intraday as run_uk_intraday
     from markets.uk.aggregator import aggregate as aggregate_uk
-    from markets.guard import run_nontrading_guard_or_raise
-
-    start_date = args.start
-    end_date = args.end
-    refresh_list = not args.no_refresh_list
-
-    res_sync = run_uk_sync(start_date, end_date, refresh_list=refresh_list)
-    raw_payload = run_uk_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
-
-    raw_payload.setdefault("ymd", ymd)
-    raw_payload.setdefault("slot", args.slot)
-    raw_payload.setdefault("asof", args.asof)
-    raw_payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
 
-    raw_payload.setdefault("filters", {})
-    raw_payload["filters"].setdefault("enable_open_watchlist", True)
-    raw_payload["filters"]["uk_sync"] = res_sync
-
-    raw_payload = run_nontrading_guard_or_raise(
-        market="uk",
-        today=ymd,
-        raw_payload=raw_payload,
-        allow_nontrading_flag=bool(args.allow_nontrading),
+    res_sync = _skipped_sync(args) if _skip_sync(args) else sync_market_uk(args)
+    with span("snapshot") as sp:
+        raw_payload = run_uk_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
+        sp.rows = _snapshot_rows(raw_payload)
+
+    return finish_raw_payload(
+        "uk",
+        raw_payload,
+        aggregate_uk,
+        ymd=ymd,
+        slot=args.slot,
+        asof=args.asof,
+        base_dir=base_dir,
+        raw_only=bool(args.raw_only),
+        sync=res_sync,
+        allow_nontrading=bool(args.allow_nontrading),
     )
 
-    payload = raw_payload if args.raw_only else aggregate_uk(raw_payload)
-
-    payload.setdefault("ymd", ymd)
-    payload.setdefault("slot", args.slot)
-    payload.setdefault("asof", args.asof)
-    payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
-    return payload
-
 
 # =============================================================================
 # CA (Canada open movers market)
 # =============================================================================
 def run_market_ca(args: argparse.Namespace, base_dir: Path, ymd: str, meta: dict) -> Dict[str, Any]:
-    from markets.ca.downloader_ca import run_sync as run_ca_sync
     from markets.ca.downloader_ca import run_intraday as run_ca_intraday
     from markets.ca.aggregator import aggregate as aggregate_ca
-    from markets.guard import run_nontrading_guard_or_raise
-
-    start_date = args.start
-    end_date = args.end
-    refresh_list = not args.no_refresh_list
-
-    res_sync = run_ca_sync(start_date, end_date, refresh_list=refresh_list)
-    raw_payload = run_ca_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
 
-    raw_payload.setdefault("ymd", ymd)
-    raw_payload.setdefault("slot", args.slot)
-    raw_payload.setdefault("asof", args.asof)
-    raw_payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
-
-    raw_payload.setdefault("filters", {})
-    raw_payload["filters"].setdefault("enable_open_watchlist", True)
-    raw_payload["filters"]["ca_sync"] = res_sync
-
-    raw_payload = run_nontrading_guard_or_raise(
-        market="ca",
-        today=ymd,
-        raw_payload=raw_payload,
-        allow_nontrading_flag=bool(args.allow_nontrading),
+    res_sync = _skipped_sync(args) if _skip_sync(args) else sync_market_ca(args)
+    with span("snapshot") as sp:
+        raw_payload = run_ca_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
+        sp.rows = _snapshot_rows(raw_payload)
+
+    return finish_raw_payload(
+        "ca",
+        raw_payload,
+        aggregate_ca,
+        ymd=ymd,
+        slot=args.slot,
+        asof=args.asof,
+        base_dir=base_dir,
+        raw_only=bool(args.raw_only),
+        sync=res_sync,
+        allow_nontrading=bool(args.allow_nontrading),
     )
 
-    payload = raw_payload if args.raw_only else aggregate_ca(raw_payload)
-
-    payload.setdefault("ymd", ymd)
-    payload.setdefault("slot", args.slot)
-    payload.setdefault("asof", args.asof)
-    payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
-    return payload
-
 
 # =============================================================================
 # AU (Australia open movers market)
 # =============================================================================
 def run_market_au(args: argparse.Namespace, base_dir: Path, ymd: str, meta: dict) -> Dict[str, Any]:
-    from markets.au.downloader_au import run_sync as run_au_sync
     from markets.au.downloader_au import run_intraday as run_au_intraday
     from markets.au.aggregator import aggregate as aggregate_au
-    from markets.guard import run_nontrading_guard_or_raise
-
-    start_date = args.start
-    end_date = args.end
-    refresh_list = not args.no_refresh_list
-
-    res_sync = run_au_sync(start_date, end_date, refresh_list=refresh_list)
-    raw_payload = run_au_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
-
-    raw_payload.setdefault("ymd", ymd)
-    raw_payload.setdefault("slot", args.slot)
-    raw_payload.setdefault("asof", args.asof)
-    raw_payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
 
-    raw_payload.setdefault("filters", {})
-    raw_payload["filters"].setdefault("enable_open_watchlist", True)
-    raw_payload["filters"]["au_sync"] = res_sync
-
-    raw_payload = run_nontrading_guard_or_raise(
-        market="au",
-        today=ymd,
-        raw_payload=raw_payload,
-        allow_nontrading_flag=bool(args.allow_nontrading),
+    res_sync = _skipped_sync(args) if _skip_sync(args) else sync_market_au(args)
+    with span("snapshot") as sp:
+        raw_payload = run_au_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
+        sp.rows = _snapshot_rows(raw_payload)
+
+    return finish_raw_payload(
+        "au",
+        raw_payload,
+        aggregate_au,
+        ymd=ymd,
+        slot=args.slot,
+        asof=args.asof,
+        base_dir=base_dir,
+        raw_only=bool(args.raw_only),
+        sync=res_sync,
+        allow_nontrading=bool(args.allow_nontrading),
     )
 
-    payload = raw_payload if args.raw_only else aggregate_au(raw_payload)
-
-    payload.setdefault("ymd", ymd)
-    payload.setdefault("slot", args.slot)
-    payload.setdefault("asof", args.asof)
-    payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
-    return payload
-
 
 # =============================================================================
 # IN (India open movers market) ✅ NEW (markets/india/)
@@ -238,43 +351,27 @@ def run_market_in(args: argparse.Namespace, base_dir: Path, ymd: str, meta: dict
     mod_dl = importlib.import_module("markets.india.downloader")
     mod_ag = importlib.import_module("markets.india.aggregator")
 
-    run_in_sync = getattr(mod_dl, "run_sync")
     run_in_intraday = getattr(mod_dl, "run_intraday")
     aggregate_in = getattr(mod_ag, "aggregate")
 
-    from markets.guard import run_nontrading_guard_or_raise
-
-    start_date = args.start
-    end_date = args.end
-    refresh_list = not args.no_refresh_list
-
-    res_sync = run_in_sync(start_date, end_date, refresh_list=refresh_list)
-    raw_payload = run_in_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
-
-    raw_payload.setdefault("ymd", ymd)
-    raw_payload.setdefault("slot", args.slot)
-    raw_payload.setdefault("asof", args.asof)
-    raw_payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
-
-    raw_payload.setdefault("filters", {})
-    raw_payload["filters"].setdefault("enable_open_watchlist", True)
-    raw_payload["filters"]["in_sync"] = res_sync
-
-    raw_payload = run_nontrading_guard_or_raise(
-        market="in",
-        today=ymd,
-        raw_payload=raw_payload,
-        allow_nontrading_flag=bool(args.allow_nontrading),
+    res_sync = _skipped_sync(args) if _skip_sync(args) else sync_market_in(args)
+    with span("snapshot") as sp:
+        raw_payload = run_in_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
+        sp.rows = _snapshot_rows(raw_payload)
+
+    return finish_raw_payload(
+        "in",
+        raw_payload,
+        aggregate_in,
+        ymd=ymd,
+        slot=args.slot,
+        asof=args.asof,
+        base_dir=base_dir,
+        raw_only=bool(args.raw_only),
+        sync=res_sync,
+        allow_nontrading=bool(args.allow_nontrading),
     )
 
-    payload = raw_payload if args.raw_only else aggregate_in(raw_payload)
-
-    payload.setdefault("ymd", ymd)
-    payload.setdefault("slot", args.slot)
-    payload.setdefault("asof", args.asof)
-    payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
-    return payload
-
 
 # =============================================================================
 # TH (Thailand ceiling+bigmove hybrid)
@@ -285,141 +382,99 @@ def run_market_th(args: argparse.Namespace, base_dir: Path, ymd: str, meta: dict
     - ceiling touch/locked (30% default)
     - bigmove >=10% (includes touch-only)
     """
-    from markets.th.downloader import run_sync as run_th_sync
     from markets.th.downloader import run_intraday as run_th_intraday
     from markets.th.aggregator import aggregate as aggregate_th
-    from markets.guard import run_nontrading_guard_or_raise
-
-    start_date = args.start
-    end_date = args.end
-    refresh_list = not args.no_refresh_list
-
-    res_sync = run_th_sync(start_date, end_date, refresh_list=refresh_list)
-    raw_payload = run_th_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
-
-    raw_payload.setdefault("ymd", ymd)
-    raw_payload.setdefault("slot", args.slot)
-    raw_payload.setdefault("asof", args.asof)
-    raw_payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
 
-    raw_payload.setdefault("filters", {})
-    raw_payload["filters"].setdefault("enable_open_watchlist", True)
-    raw_payload["filters"]["th_sync"] = res_sync
-
-    raw_payload = run_nontrading_guard_or_raise(
-        market="th",
-        today=ymd,
-        raw_payload=raw_payload,
-        allow_nontrading_flag=bool(args.allow_nontrading),
+    res_sync = _skipped_sync(args) if _skip_sync(args) else sync_market_th(args)
+    with span("snapshot") as sp:
+        raw_payload = run_th_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
+        sp.rows = _snapshot_rows(raw_payload)
+
+    return finish_raw_payload(
+        "th",
+        raw_payload,
+        aggregate_th,
+        ymd=ymd,
+        slot=args.slot,
+        asof=args.asof,
+        base_dir=base_dir,
+        raw_only=bool(args.raw_only),
+        sync=res_sync,
+        allow_nontrading=bool(args.allow_nontrading),
     )
 
-    payload = raw_payload if args.raw_only else aggregate_th(raw_payload)
-
-    payload.setdefault("ymd", ymd)
-    payload.setdefault("slot", args.slot)
-    payload.setdefault("asof", args.asof)
-    payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
-    return payload
-
 
 # =============================================================================
 # CN / JP / KR (limit markets)
 # =============================================================================
 def run_market_cn(args: argparse.Namespace, base_dir: Path, ymd: str, meta: dict) -> Dict[str, Any]:
-    from markets.cn.downloader import run_sync as run_cn_sync
     from markets.cn.downloader import run_intraday as run_cn_intraday
     from markets.cn.aggregator import aggregate
-    from markets.guard import run_nontrading_guard_or_raise
-
-    res_sync = run_cn_sync(start_date=None, end_date=None, refresh_list=True)
-    raw_payload = run_cn_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
-
-    raw_payload.setdefault("ymd", ymd)
-    raw_payload.setdefault("slot", args.slot)
-    raw_payload.setdefault("asof", args.asof)
-    raw_payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
-
-    raw_payload.setdefault("filters", {})
-    raw_payload["filters"]["cn_sync"] = res_sync
 
-    raw_payload = run_nontrading_guard_or_raise(
-        market="cn",
-        today=ymd,
-        raw_payload=raw_payload,
-        allow_nontrading_flag=bool(args.allow_nontrading),
+    res_sync = _skipped_sync(args) if _skip_sync(args) else sync_market_cn(args)
+    with span("snapshot") as sp:
+        raw_payload = run_cn_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
+        sp.rows = _snapshot_rows(raw_payload)
+
+    return finish_raw_payload(
+        "cn",
+        raw_payload,
+        aggregate,
+        ymd=ymd,
+        slot=args.slot,
+        asof=args.asof,
+        base_dir=base_dir,
+        raw_only=bool(args.raw_only),
+        sync=res_sync,
+        allow_nontrading=bool(args.allow_nontrading),
     )
 
-    payload = raw_payload if args.raw_only else aggregate(raw_payload)
-    payload.setdefault("ymd", ymd)
-    payload.setdefault("slot", args.slot)
-    payload.setdefault("asof", args.asof)
-    payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
-    return payload
-
 
 def run_market_jp(args: argparse.Namespace, base_dir: Path, ymd: str, meta: dict) -> Dict[str, Any]:
-    from markets.jp.downloader import run_sync as run_jp_sync
     from markets.jp.downloader import run_intraday as run_jp_intraday
     from markets.jp.aggregator import aggregate
-    from markets.guard import run_nontrading_guard_or_raise
-
-    res_sync = run_jp_sync(start_date=None, end_date=None, refresh_list=True)
-    raw_payload = run_jp_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
-
-    raw_payload.setdefault("ymd", ymd)
-    raw_payload.setdefault("slot", args.slot)
-    raw_payload.setdefault("asof", args.asof)
-    raw_payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
 
-    raw_payload.setdefault("filters", {})
-    raw_payload["filters"]["jp_sync"] = res_sync
-
-    raw_payload = run_nontrading_guard_or_raise(
-        market="jp",
-        today=ymd,
-        raw_payload=raw_payload,
-        allow_nontrading_flag=bool(args.allow_nontrading),
+    res_sync = _skipped_sync(args) if _skip_sync(args) else sync_market_jp(args)
+    with span("snapshot") as sp:
+        raw_payload = run_jp_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
+        sp.rows = _snapshot_rows(raw_payload)
+
+    return finish_raw_payload(
+        "jp",
+        raw_payload,
+        aggregate,
+        ymd=ymd,
+        slot=args.slot,
+        asof=args.asof,
+        base_dir=base_dir,
+        raw_only=bool(args.raw_only),
+        sync=res_sync,
+        allow_nontrading=bool(args.allow_nontrading),
     )
 
-    payload = raw_payload if args.raw_only else aggregate(raw_payload)
-    payload.setdefault("ymd", ymd)
-    payload.setdefault("slot", args.slot)
-    payload.setdefault("asof", args.asof)
-    payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
-    return payload
-
 
 def run_market_kr(args: argparse.Namespace, base_dir: Path, ymd: str, meta: dict) -> Dict[str, Any]:
-    from markets.kr.downloader import run_sync as run_kr_sync
     from markets.kr.downloader import run_intraday as run_kr_intraday
     from markets.kr.aggregator import aggregate as aggregate_kr
-    from markets.guard import run_nontrading_guard_or_raise
-
-    res_sync = run_kr_sync(start_date=None, end_date=None, refresh_list=True)
-    raw_payload = run_kr_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
-
-    raw_payload.setdefault("ymd", ymd)
-    raw_payload.setdefault("slot", args.slot)
-    raw_payload.setdefault("asof", args.asof)
-    raw_payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
-
-    raw_payload.setdefault("filters", {})
-    raw_payload["filters"]["kr_sync"] = res_sync
 
-    raw_payload = run_nontrading_guard_or_raise(
-        market="kr",
-        today=ymd,
-        raw_payload=raw_payload,
-        allow_nontrading_flag=bool(args.allow_nontrading),
+    res_sync = _skipped_sync(args) if _skip_sync(args) else sync_market_kr(args)
+    with span("snapshot") as sp:
+        raw_payload = run_kr_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
+        sp.rows = _snapshot_rows(raw_payload)
+
+    return finish_raw_payload(
+        "kr",
+        raw_payload,
+        aggregate_kr,
+        ymd=ymd,
+        slot=args.slot,
+        asof=args.asof,
+        base_dir=base_dir,
+        raw_only=bool(args.raw_only),
+        sync=res_sync,
+        allow_nontrading=bool(args.allow_nontrading),
     )
 
-    payload = raw_payload if args.raw_only else aggregate_kr(raw_payload)
-    payload.setdefault("ymd", ymd)
-    payload.setdefault("slot", args.slot)
-    payload.setdefault("asof", args.asof)
-    payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
-    return payload
-
 # =============================================================================
 # FR (France open movers market) ✅ NEW (markets/fr/)
 # =============================================================================
@@ -435,9 +490,6 @@ def run_market_fr(args: argparse.Namespace, base_dir: Path, ymd: str, meta: dict
       - markets.fr.aggregator.aggregate(raw_payload)
     """
     import importlib
-    from datetime import datetime
-
-    from markets.guard import run_nontrading_guard_or_raise
 
     mod_dl = importlib.import_module("markets.fr.fr_snapshot")
     mod_ag = importlib.import_module("markets.fr.aggregator")
@@ -446,40 +498,28 @@ def run_market_fr(args: argparse.Namespace, base_dir: Path, ymd: str, meta: dict
     run_fr_intraday = getattr(mod_dl, "run_intraday")
     aggregate_fr = getattr(mod_ag, "aggregate")
 
-    start_date = args.start
-    end_date = args.end
-    refresh_list = not args.no_refresh_list
-
     res_sync = None
-    if callable(run_fr_sync):
-        res_sync = run_fr_sync(start_date, end_date, refresh_list=refresh_list)
-
-    raw_payload = run_fr_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
-
-    raw_payload.setdefault("ymd", ymd)
-    raw_payload.setdefault("slot", args.slot)
-    raw_payload.setdefault("asof", args.asof)
-    raw_payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
-
-    raw_payload.setdefault("filters", {})
-    raw_payload["filters"].setdefault("enable_open_watchlist", True)
-    if res_sync is not None:
-        raw_payload["filters"]["fr_sync"] = res_sync
-
-    raw_payload = run_nontrading_guard_or_raise(
-        market="fr",
-        today=ymd,
-        raw_payload=raw_payload,
-        allow_nontrading_flag=bool(args.allow_nontrading),
+    if _skip_sync(args):
+        res_sync = _skipped_sync(args)
+    elif callable(run_fr_sync):
+        res_sync = sync_market_fr(args)
+
+    with span("snapshot") as sp:
+        raw_payload = run_fr_intraday(slot=args.slot, asof=args.asof, ymd=ymd)
+        sp.rows = _snapshot_rows(raw_payload)
+
+    return finish_raw_payload(
+        "fr",
+        raw_payload,
+        aggregate_fr,
+        ymd=ymd,
+        slot=args.slot,
+        asof=args.asof,
+        base_dir=base_dir,
+        raw_only=bool(args.raw_only),
+        sync=res_sync,
+        allow_nontrading=bool(args.allow_nontrading),
     )
-
-    payload = raw_payload if args.raw_only else aggregate_fr(raw_payload)
-
-    payload.setdefault("ymd", ymd)
-    payload.setdefault("slot", args.slot)
-    payload.setdefault("asof", args.asof)
-    payload.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
-    return payload
 # =============================================================================
 # Runner registry
 # =============================================================================
@@ -513,3 +553,23 @@ RUNNERS.update(
         "bse": run_market_in,
     }
 )
+
+# -----------------------------------------------------------------------------
+# Sync-only registry (main.py --sync-only / scripts/run_daily.py)
+# TW has no warehouse sync: run_intraday downloads directly.
+# -----------------------------------------------------------------------------
+SYNCERS: Dict[str, Callable[[argparse.Namespace], Any]] = {
+    "us": sync_market_us,
+    "uk": sync_market_uk,
+    "ca": sync_market_ca,
+    "au": sync_market_au,
+    "fr": sync_market_fr,
+    "in": sync_market_in,
+    "india": sync_market_in,
+    "nse": sync_market_in,
+    "bse": sync_market_in,
+    "th": sync_market_th,
+    "cn": sync_market_cn,
+    "jp": sync_market_jp,
+    "kr": sync_market_kr,
+}
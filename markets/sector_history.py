@@ -0,0 +1,509 @@
+# markets/sector_history.py
+# -*- coding: utf-8 -*-
+"""
+Sector breadth history (SQLite) — one row per (market, ymd, sector)
+
+Every aggregated payload carries one day of sector_summary. main.py write_payload()
+hands it here right after the payload catalog, so the history grows one day at a
+time and nobody has to re-open old payload JSONs to tell whether a sector's move
+is just starting or accelerating.
+
+Table sector_history (fixed columns, PK market, ymd, sector):
+  sector_total, locked_cnt, touched_cnt, bigmove10_cnt, mix_cnt    counts of the day
+  locked_pct, touched_pct, bigmove10_pct, mix_pct                 / sector_total
+  rank            1 = most mix_cnt that day
+  breadth_5/20    mean mix_pct over the last 5 / 20 recorded days (absent day = 0)
+  accel           breadth_5 - breadth_20  (> 0: heating up)
+  rank_chg_1/5    rank 1 / 5 recorded days ago - rank today (> 0: climbing; NULL if absent)
+  active_streak   consecutive recorded days with mix_cnt > 0 (not capped: previous
+                  day's streak + 1, so it can run past the 20-day window)
+
+Table sector_days: which slot a day's rows came from (open < midday < close;
+a later slot replaces an earlier one, never the other way round).
+
+Days are keyed by ymd_effective. Writing a day recomputes the rolling columns of
+that day and the 19 recorded days after it, and active_streak further on until it
+stops changing, so out-of-order writes (--replay workers) end up identical to an
+in-order run.
+
+History lives in <cache root>/sector_history.sqlite (INTRADAY_SECTOR_HISTORY overrides).
+
+CLI:
+  python -m markets.sector_history --rebuild                 # from every payload on disk
+  python -m markets.sector_history --market kr --top 15
+  python -m markets.sector_history --market kr --sector 반도체 --days 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_CACHE_ROOT = REPO_ROOT / "data" / "cache"
+PAYLOAD_SUFFIX = ".payload.json"
+
+SHORT_DAYS = 5
+LONG_DAYS = 20
+
+_LOCK = threading.Lock()
+
+_SLOT_RANK = {"open": 0, "midday": 1, "close": 2}
+
+_COUNT_COLS = ("sector_total", "locked_cnt", "touched_cnt", "bigmove10_cnt", "mix_cnt")
+_PCT_COLS = ("locked_pct", "touched_pct", "bigmove10_pct", "mix_pct")
+_ROLL_COLS = ("rank", "breadth_5", "breadth_20", "accel", "rank_chg_1", "rank_chg_5", "active_streak")
+
+
+def history_path(cache_root: Optional[Path] = None) -> Path:
+    p = (os.getenv("INTRADAY_SECTOR_HISTORY") or "").strip()
+    if p:
+        return Path(p)
+    return Path(cache_root or DEFAULT_CACHE_ROOT) / "sector_history.sqlite"
+
+
+def connect(cache_root: Optional[Path] = None) -> sqlite3.Connection:
+    path = history_path(cache_root)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS sector_days (
+            market TEXT NOT NULL,
+            ymd TEXT NOT NULL,
+            slot TEXT NOT NULL,
+            written_at_utc TEXT,
+            PRIMARY KEY (market, ymd)
+        );
+        CREATE TABLE IF NOT EXISTS sector_history (
+            market TEXT NOT NULL,
+            ymd TEXT NOT NULL,
+            sector TEXT NOT NULL,
+            sector_total INTEGER NOT NULL DEFAULT 0,
+            locked_cnt INTEGER NOT NULL DEFAULT 0,
+            touched_cnt INTEGER NOT NULL DEFAULT 0,
+            bigmove10_cnt INTEGER NOT NULL DEFAULT 0,
+            mix_cnt INTEGER NOT NULL DEFAULT 0,
+            locked_pct REAL NOT NULL DEFAULT 0,
+            touched_pct REAL NOT NULL DEFAULT 0,
+            bigmove10_pct REAL NOT NULL DEFAULT 0,
+            mix_pct REAL NOT NULL DEFAULT 0,
+            rank INTEGER,
+            breadth_5 REAL,
+            breadth_20 REAL,
+            accel REAL,
+            rank_chg_1 INTEGER,
+            rank_chg_5 INTEGER,
+            active_streak INTEGER,
+            PRIMARY KEY (market, ymd, sector)
+        );
+        CREATE INDEX IF NOT EXISTS idx_sector_history_sector ON sector_history(market, sector, ymd);
+        """
+    )
+    # rows recorded before market codes were canonicalized (payload_catalog.catalog_market)
+    from markets.payload_catalog import MARKET_ALIASES
+
+    aliases = tuple(MARKET_ALIASES)
+    marks = ", ".join("?" for _ in aliases)
+    for table in ("sector_days", "sector_history"):
+        if conn.execute(f"SELECT 1 FROM {table} WHERE market IN ({marks}) LIMIT 1", aliases).fetchone():
+            conn.execute(f"UPDATE OR REPLACE {table} SET market = 'in' WHERE market IN ({marks})", aliases)
+    return conn
+
+
+# =============================================================================
+# sector_summary row -> fixed columns
+# =============================================================================
+def _int(v: Any) -> int:
+    try:
+        return int(float(v))
+    except Exception:
+        return 0
+
+
+def _float(v: Any) -> Optional[float]:
+    try:
+        f = float(v)
+    except Exception:
+        return None
+    return f if f == f else None
+
+
+def normalize_row(r: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Markets name the columns slightly differently (sector_total / sector_total_cnt,
+    mix_cnt present or not); fold them into the table's fixed columns.
+    """
+    sector = str(r.get("sector") or "").strip()
+    if not sector:
+        return None
+    total = _int(r.get("sector_total", r.get("sector_total_cnt", r.get("total_cnt", 0))))
+    locked = _int(r.get("locked_cnt"))
+    touched = _int(r.get("touched_cnt", r.get("touch_cnt", 0)))
+    big = _int(r.get("bigmove10_cnt"))
+    mix = _int(r["mix_cnt"]) if r.get("mix_cnt") is not None else locked + touched + big
+
+    out: Dict[str, Any] = {
+        "sector": sector,
+        "sector_total": total,
+        "locked_cnt": locked,
+        "touched_cnt": touched,
+        "bigmove10_cnt": big,
+        "mix_cnt": mix,
+    }
+    for col, cnt in zip(_PCT_COLS, (locked, touched, big, mix)):
+        v = _float(r.get(col))
+        out[col] = v if v is not None else (cnt / total if total > 0 else 0.0)
+    return out
+
+
+def _ranked(rows: List[Dict[str, Any]]) -> Dict[str, int]:
+    order = sorted(rows, key=lambda x: (-int(x["mix_cnt"]), -float(x["mix_pct"]), str(x["sector"])))
+    return {str(x["sector"]): i + 1 for i, x in enumerate(order)}
+
+
+# =============================================================================
+# Write
+# =============================================================================
+def _rolling(
+    dates: List[str],
+    by_day: Dict[str, Dict[str, Dict[str, Any]]],
+    ranks: Dict[str, Dict[str, int]],
+    ymd: str,
+    prev_streak: Dict[str, int],
+) -> Dict[str, Tuple[Any, ...]]:
+    """
+    dates: recorded days <= ymd (asc, ymd last) -> {sector: rolling columns of ymd}
+    prev_streak: {sector: active_streak} of the recorded day before ymd
+    """
+    hist = dates[-LONG_DAYS:]
+    out: Dict[str, Tuple[Any, ...]] = {}
+    for sector, row in by_day.get(ymd, {}).items():
+        pcts = [float((by_day.get(d, {}).get(sector) or {}).get("mix_pct") or 0.0) for d in hist]
+        short = pcts[-SHORT_DAYS:]
+        b5 = sum(short) / len(short)
+        b20 = sum(pcts) / len(pcts)
+
+        rank = ranks[ymd][sector]
+        chg: List[Optional[int]] = []
+        for back in (1, SHORT_DAYS):
+            prev = ranks.get(hist[-1 - back], {}).get(sector) if len(hist) > back else None
+            chg.append(prev - rank if prev is not None else None)
+
+        streak = prev_streak.get(sector, 0) + 1 if int(row.get("mix_cnt") or 0) > 0 else 0
+        out[sector] = (rank, b5, b20, b5 - b20, chg[0], chg[1], streak)
+    return out
+
+
+def _refresh(conn: sqlite3.Connection, market: str, ymd: str) -> int:
+    """
+    Recompute rolling columns for ymd and the LONG_DAYS - 1 recorded days after it.
+    """
+    before = [
+        r[0]
+        for r in conn.execute(
+            "SELECT ymd FROM sector_days WHERE market = ? AND ymd < ? ORDER BY ymd DESC LIMIT ?",
+            (market, ymd, LONG_DAYS - 1),
+        )
+    ]
+    after = [
+        r[0]
+        for r in conn.execute(
+            "SELECT ymd FROM sector_days WHERE market = ? AND ymd >= ? ORDER BY ymd LIMIT ?",
+            (market, ymd, LONG_DAYS),
+        )
+    ]
+    dates = sorted(before) + after
+    if not after:
+        return 0
+
+    by_day: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    cur = conn.execute(
+        "SELECT ymd, sector, mix_cnt, mix_pct FROM sector_history WHERE market = ? AND ymd BETWEEN ? AND ?",
+        (market, dates[0], dates[-1]),
+    )
+    for d, sector, mix_cnt, mix_pct in cur:
+        by_day.setdefault(d, {})[sector] = {"sector": sector, "mix_cnt": mix_cnt, "mix_pct": mix_pct}
+    ranks = {d: _ranked(list(rows.values())) for d, rows in by_day.items()}
+
+    # active_streak is not windowed: seed with the stored streaks of the last day before ymd
+    streak: Dict[str, int] = {}
+    if before:
+        cur = conn.execute(
+            "SELECT sector, active_streak FROM sector_history WHERE market = ? AND ymd = ?",
+            (market, before[0]),
+        )
+        streak = {sector: int(v or 0) for sector, v in cur}
+
+    n = 0
+    for i, d in enumerate(dates):
+        if d < ymd:
+            continue
+        upd = _rolling(dates[: i + 1], by_day, ranks, d, streak)
+        streak = {sector: int(vals[-1]) for sector, vals in upd.items()}
+        conn.executemany(
+            "UPDATE sector_history SET "
+            + ", ".join(f"{c} = ?" for c in _ROLL_COLS)
+            + " WHERE market = ? AND ymd = ? AND sector = ?",
+            [(*vals, market, d, sector) for sector, vals in upd.items()],
+        )
+        n += len(upd)
+    return n + _carry_streak(conn, market, after[-1], streak)
+
+
+def _carry_streak(conn: sqlite3.Connection, market: str, last: str, streak: Dict[str, int]) -> int:
+    """
+    active_streak of the recorded days after last (beyond the refresh window),
+    walking forward until a day's streaks come out unchanged.
+    """
+    n = 0
+    while True:
+        r = conn.execute("SELECT MIN(ymd) FROM sector_days WHERE market = ? AND ymd > ?", (market, last)).fetchone()
+        if not r or r[0] is None:
+            return n
+        last = str(r[0])
+        rows = conn.execute(
+            "SELECT sector, mix_cnt, active_streak FROM sector_history WHERE market = ? AND ymd = ?",
+            (market, last),
+        ).fetchall()
+        new = {sector: (streak.get(sector, 0) + 1 if int(mix_cnt or 0) > 0 else 0) for sector, mix_cnt, _ in rows}
+        changed = [(new[sector], market, last, sector) for sector, _, old in rows if old != new[sector]]
+        if not changed:
+            return n
+        conn.executemany(
+            "UPDATE sector_history SET active_streak = ? WHERE market = ? AND ymd = ? AND sector = ?",
+            changed,
+        )
+        n += len(changed)
+        streak = new
+
+
+def record_day(
+    market: str,
+    ymd: str,
+    slot: str,
+    sector_summary: List[Dict[str, Any]],
+    *,
+    cache_root: Optional[Path] = None,
+    conn: Optional[sqlite3.Connection] = None,
+) -> bool:
+    """
+    Replace one (market, ymd) with this sector_summary, then refresh rolling columns.
+    A lower slot (midday) never replaces a day already recorded from a higher one (close).
+    """
+    rows = [x for x in (normalize_row(r) for r in sector_summary if isinstance(r, dict)) if x]
+    own = conn is None
+    with _LOCK:
+        conn = conn or connect(cache_root)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                prev = conn.execute(
+                    "SELECT slot FROM sector_days WHERE market = ? AND ymd = ?", (market, ymd)
+                ).fetchone()
+                if prev and _SLOT_RANK.get(str(prev[0]), 1) > _SLOT_RANK.get(str(slot), 1):
+                    conn.execute("ROLLBACK")
+                    return False
+
+                conn.execute("DELETE FROM sector_history WHERE market = ? AND ymd = ?", (market, ymd))
+                cols = ("sector",) + _COUNT_COLS + _PCT_COLS
+                conn.executemany(
+                    f"INSERT INTO sector_history(market, ymd, {', '.join(cols)}) "
+                    f"VALUES (?, ?, {', '.join('?' for _ in cols)})",
+                    [(market, ymd, *(r[c] for c in cols)) for r in rows],
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO sector_days(market, ymd, slot, written_at_utc) VALUES (?, ?, ?, ?)",
+                    (market, ymd, slot, datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")),
+                )
+                _refresh(conn, market, ymd)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            if own:
+                conn.close()
+    return True
+
+
+def record(path: Path, payload: Dict[str, Any], *, cache_root: Optional[Path] = None) -> bool:
+    """
+    main.write_payload() hook: .../<market>/<ymd>/<slot>.payload.json + payload.
+    Raw payloads (--raw-only, no sector_summary) are skipped.
+    """
+    from markets.payload_catalog import parse_payload_path
+
+    key = parse_payload_path(path)
+    ss = payload.get("sector_summary") if isinstance(payload, dict) else None
+    if key is None or not isinstance(ss, list):
+        return False
+    market, ymd, slot = key
+    ymd = str(payload.get("ymd_effective") or ymd)[:10]
+    root = Path(cache_root or Path(path).resolve().parents[2])
+    return record_day(market, ymd, slot, ss, cache_root=root)
+
+
+def rebuild(cache_root: Optional[Path] = None, markets: Optional[Iterable[str]] = None) -> int:
+    """
+    Re-read every payload under the cache root (oldest day first).
+    """
+    root = Path(cache_root or DEFAULT_CACHE_ROOT)
+    if not root.is_dir():
+        return 0
+    from markets.payload_catalog import catalog_market, parse_payload_path
+
+    want = {catalog_market(m) for m in markets} if markets else None
+    mdirs = [d for d in root.iterdir() if d.is_dir() and (want is None or catalog_market(d.name) in want)]
+    paths = sorted(
+        (p for d in mdirs for p in d.glob("*/*" + PAYLOAD_SUFFIX)),
+        key=lambda p: (catalog_market(p.parent.parent.name), p.parent.name, _SLOT_RANK.get(p.name[: -len(PAYLOAD_SUFFIX)], 1)),
+    )
+    conn = connect(root)
+    n = 0
+    try:
+        for p in paths:
+            try:
+                obj = json.loads(p.read_text(encoding="utf-8"))
+            except Exception:
+                continue
+            ss = obj.get("sector_summary") if isinstance(obj, dict) else None
+            if not isinstance(ss, list):
+                continue
+            key = parse_payload_path(p)
+            if key is None:
+                continue
+            market, ymd, slot = key
+            if record_day(market, str(obj.get("ymd_effective") or ymd)[:10], slot, ss, conn=conn):
+                n += 1
+    finally:
+        conn.close()
+    return n
+
+
+# =============================================================================
+# Queries (renderers / dashboard)
+# =============================================================================
+def _rows(sql: str, params: Tuple[Any, ...], cache_root: Optional[Path]) -> List[Dict[str, Any]]:
+    if not history_path(cache_root).exists():
+        return []
+    conn = connect(cache_root)
+    try:
+        cur = conn.execute(sql, params)
+        cols = [c[0] for c in cur.description]
+        return [dict(zip(cols, r)) for r in cur.fetchall()]
+    finally:
+        conn.close()
+
+
+def latest(
+    market: str,
+    ymd: Optional[str] = None,
+    *,
+    limit: Optional[int] = None,
+    cache_root: Optional[Path] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Sectors of the last recorded day <= ymd (default: newest), rank order.
+    """
+    sql = (
+        "SELECT * FROM sector_history WHERE market = ? AND ymd = ("
+        "  SELECT MAX(ymd) FROM sector_days WHERE market = ?" + (" AND ymd <= ?" if ymd else "") + ")"
+        " ORDER BY rank"
+    )
+    from markets.payload_catalog import catalog_market
+
+    market = catalog_market(market)
+    params: Tuple[Any, ...] = (market, market, str(ymd)[:10]) if ymd else (market, market)
+    if limit:
+        sql += " LIMIT ?"
+        params += (int(limit),)
+    return _rows(sql, params, cache_root)
+
+
+def by_sector(market: str, ymd: Optional[str] = None, *, cache_root: Optional[Path] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    {sector: row} for one day — what an overview needs to put an arrow next to each sector.
+    """
+    return {str(r["sector"]): r for r in latest(market, ymd, cache_root=cache_root)}
+
+
+def sector_trend(
+    market: str,
+    sector: str,
+    *,
+    days: int = LONG_DAYS,
+    until: Optional[str] = None,
+    cache_root: Optional[Path] = None,
+) -> List[Dict[str, Any]]:
+    """
+    One sector's last `days` recorded rows (ymd asc).
+    """
+    from markets.payload_catalog import catalog_market
+
+    rows = _rows(
+        "SELECT * FROM sector_history WHERE market = ? AND sector = ? AND ymd <= ? ORDER BY ymd DESC LIMIT ?",
+        (catalog_market(market), sector, str(until or "9999-12-31")[:10], int(days)),
+        cache_root,
+    )
+    return rows[::-1]
+
+
+def trend_arrow(row: Optional[Dict[str, Any]], *, eps: float = 0.005) -> str:
+    """
+    ↑ accelerating / ↓ cooling / → flat (accel = breadth_5 - breadth_20)
+    """
+    if not row:
+        return ""
+    accel = _float(row.get("accel"))
+    if accel is None:
+        return ""
+    if accel > eps:
+        return "↑"
+    if accel < -eps:
+        return "↓"
+    return "→"
+
+
+def main(argv: Optional[list] = None) -> int:
+    ap = argparse.ArgumentParser(description="Sector breadth history (data/cache/sector_history.sqlite).")
+    ap.add_argument("--cache-root", default=str(DEFAULT_CACHE_ROOT))
+    ap.add_argument("--rebuild", action="store_true", help="re-read every payload under the cache root")
+    ap.add_argument("--market", default="")
+    ap.add_argument("--ymd", default=None)
+    ap.add_argument("--sector", default=None, help="print one sector's history instead of a day")
+    ap.add_argument("--days", type=int, default=LONG_DAYS)
+    ap.add_argument("--top", type=int, default=20)
+    args = ap.parse_args(argv)
+
+    root = Path(args.cache_root)
+    if args.rebuild:
+        n = rebuild(root, [args.market] if args.market else None)
+        print(f"recorded {n} day(s) -> {history_path(root)}")
+    if not args.market:
+        return 0
+
+    if args.sector:
+        rows = sector_trend(args.market, args.sector, days=args.days, until=args.ymd, cache_root=root)
+    else:
+        rows = latest(args.market, args.ymd, limit=args.top, cache_root=root)
+    for r in rows:
+        print(
+            f"{r['ymd']} #{r['rank'] or '-':<3} {trend_arrow(r) or ' '} {r['sector'][:18]:<18} "
+            f"mix={r['mix_cnt']:>3}/{r['sector_total']:<4} {r['mix_pct'] * 100:5.1f}%  "
+            f"b5={(r['breadth_5'] or 0) * 100:5.1f}% b20={(r['breadth_20'] or 0) * 100:5.1f}%  "
+            f"d1={r['rank_chg_1'] if r['rank_chg_1'] is not None else '-'} "
+            f"d5={r['rank_chg_5'] if r['rank_chg_5'] is not None else '-'} streak={r['active_streak']}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
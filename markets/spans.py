@@ -0,0 +1,369 @@
+# markets/spans.py
+# -*- coding: utf-8 -*-
+"""
+Lightweight stage timing spans (wall / CPU / peak RSS / rows)
+
+Usage:
+    from markets.spans import span
+
+    with span("download_batch", market="us") as sp:
+        df = ...
+        sp.rows = len(df)
+
+    @span_fn("render_page")
+    def draw_block_table(...): ...
+
+- Records are kept in-process; every process appends them to the sidecar
+  data/cache/<market>/<ymd>/timings.jsonl (see flush()). main.py only puts the
+  per-name summary in payload["meta"]["timings"] (payload_timings()).
+- Nested spans record their parent ("sync/download_batch").
+- INTRADAY_TIMINGS=0 turns span() into a shared no-op object (one bool check).
+- INTRADAY_TIMINGS_SIDECAR=<path> makes child processes (render / encode)
+  flush their spans to that file at exit.
+- INTRADAY_RUN_ID groups spans of one pipeline run across processes.
+- INTRADAY_PROFILE=<stages> profiles the matching spans (markets/profiling.py).
+- add_meta_provider(name, fn) adds fn() next to the summary in payload_timings()
+  (engine/cache_manager.py registers its hit/miss/latency counters as "cache").
+
+cpu_s is process CPU time (all threads), rss_peak_mb is the process
+high-water mark (getrusage; None where unavailable, e.g. Windows).
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+try:
+    import resource  # POSIX only
+except Exception:  # pragma: no cover
+    resource = None  # type: ignore
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    v = os.getenv(name)
+    if v is None:
+        return default
+    v = str(v).strip().lower()
+    if v in ("1", "true", "yes", "y", "on"):
+        return True
+    if v in ("0", "false", "no", "n", "off"):
+        return False
+    return default
+
+
+_ENABLED = _env_bool("INTRADAY_TIMINGS", True)
+_LOCK = threading.Lock()
+_LOCAL = threading.local()
+_RECORDS: List[Dict[str, Any]] = []
+_FLUSHED = 0  # records[:_FLUSHED] already written to a sidecar
+_T0 = time.perf_counter()
+_ATEXIT_REGISTERED = False
+# markets.profiling.Profiler when INTRADAY_PROFILE / --profile is set (enter/exit per span)
+_PROFILER: Any = None
+# extra blocks for payload_timings() (e.g. engine.cache_manager hit/miss counters)
+_META_PROVIDERS: Dict[str, Callable[[], Any]] = {}
+
+
+def enabled() -> bool:
+    return _ENABLED
+
+
+def set_enabled(on: bool) -> None:
+    global _ENABLED
+    _ENABLED = bool(on)
+
+
+def run_id() -> str:
+    """
+    One id per pipeline run; exported to os.environ so child processes share it.
+    """
+    rid = (os.getenv("INTRADAY_RUN_ID") or "").strip()
+    if not rid:
+        rid = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + f"-{os.getpid()}"
+        os.environ["INTRADAY_RUN_ID"] = rid
+    return rid
+
+
+def _rss_peak_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    try:
+        v = float(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    except Exception:
+        return None
+    # Linux: KiB, macOS: bytes
+    return round(v / (1024.0 * 1024.0) if sys.platform == "darwin" else v / 1024.0, 1)
+
+
+def _stack() -> List[str]:
+    st = getattr(_LOCAL, "stack", None)
+    if st is None:
+        st = []
+        _LOCAL.stack = st
+    return st
+
+
+# =============================================================================
+# Span objects
+# =============================================================================
+class Span:
+    __slots__ = ("name", "attrs", "rows", "_t0", "_c0", "_parent", "_prof")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+        self.rows: Optional[int] = None
+        self._t0 = 0.0
+        self._c0 = 0.0
+        self._parent = ""
+        self._prof: Any = None
+
+    def add_rows(self, n: Any) -> None:
+        try:
+            self.rows = int(self.rows or 0) + int(n)
+        except Exception:
+            pass
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        st = _stack()
+        self._parent = "/".join(st)
+        st.append(self.name)
+        if _PROFILER is not None:
+            self._prof = _PROFILER.enter(self.name)
+        self._c0 = time.process_time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        wall = time.perf_counter() - self._t0
+        cpu = time.process_time() - self._c0
+        if self._prof is not None:
+            _PROFILER.exit(self._prof)
+            self._prof = None
+        st = _stack()
+        if st and st[-1] == self.name:
+            st.pop()
+        if not _ENABLED:
+            return False
+
+        rec: Dict[str, Any] = {
+            "name": self.name,
+            "parent": self._parent or None,
+            "start_s": round(self._t0 - _T0, 4),
+            "wall_s": round(wall, 4),
+            "cpu_s": round(cpu, 4),
+            "rss_peak_mb": _rss_peak_mb(),
+            "rows": self.rows,
+            "ok": exc_type is None,
+        }
+        if self.attrs:
+            rec["attrs"] = self.attrs
+        if threading.current_thread() is not threading.main_thread():
+            rec["thread"] = threading.current_thread().name
+        with _LOCK:
+            _RECORDS.append(rec)
+        _maybe_register_atexit()
+        return False
+
+
+class _NullSpan:
+    """Shared no-op span returned when timings are disabled."""
+
+    __slots__ = ()
+    name = ""
+    attrs: Dict[str, Any] = {}
+
+    @property
+    def rows(self) -> None:
+        return None
+
+    @rows.setter
+    def rows(self, v: Any) -> None:
+        pass
+
+    def add_rows(self, n: Any) -> None:
+        pass
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NULL = _NullSpan()
+
+
+def span(name: str, **attrs: Any) -> Any:
+    if not _ENABLED and _PROFILER is None:
+        return _NULL
+    return Span(name, attrs)
+
+
+def span_fn(name: str, **attrs: Any) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Decorator form of span(); the disabled path is one bool check per call.
+    """
+
+    def deco(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _ENABLED and _PROFILER is None:
+                return fn(*args, **kwargs)
+            with Span(name, dict(attrs)):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return deco
+
+
+# =============================================================================
+# Collection / output
+# =============================================================================
+def records() -> List[Dict[str, Any]]:
+    with _LOCK:
+        return list(_RECORDS)
+
+
+def reset() -> None:
+    global _FLUSHED
+    with _LOCK:
+        _RECORDS.clear()
+        _FLUSHED = 0
+
+
+def summarize(recs: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Aggregate by span name: count / wall / cpu / rows / max peak RSS.
+    """
+    out: Dict[str, Dict[str, Any]] = {}
+    for r in recs:
+        name = str(r.get("name") or "")
+        a = out.setdefault(name, {"count": 0, "wall_s": 0.0, "cpu_s": 0.0, "rows": None, "rss_peak_mb": None})
+        a["count"] += 1
+        a["wall_s"] = round(a["wall_s"] + float(r.get("wall_s") or 0.0), 4)
+        a["cpu_s"] = round(a["cpu_s"] + float(r.get("cpu_s") or 0.0), 4)
+        if r.get("rows") is not None:
+            a["rows"] = int(a["rows"] or 0) + int(r["rows"])
+        rss = r.get("rss_peak_mb")
+        if rss is not None and (a["rss_peak_mb"] is None or rss > a["rss_peak_mb"]):
+            a["rss_peak_mb"] = rss
+    return out
+
+
+def add_meta_provider(name: str, fn: Callable[[], Any]) -> None:
+    """
+    payload_timings()[name] = fn() (skipped when empty or when fn raises).
+    """
+    with _LOCK:
+        _META_PROVIDERS[str(name)] = fn
+
+
+def _add_providers(out: Dict[str, Any]) -> Dict[str, Any]:
+    with _LOCK:
+        providers = list(_META_PROVIDERS.items())
+    for name, fn in providers:
+        try:
+            v = fn()
+        except Exception:
+            continue
+        if v:
+            out[name] = v
+    return out
+
+
+def payload_timings(recs: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Block for payload["meta"]["timings"]: by_name summary (+ provider counters) only.
+    Span records, run_id and peak RSS stay in the timings.jsonl sidecar (flush()).
+    """
+    recs = records() if recs is None else recs
+    return _add_providers({"by_name": summarize(recs)})
+
+
+def sidecar_path(repo_root: Path, market_lower: str, ymd: str) -> Path:
+    return Path(repo_root) / "data" / "cache" / market_lower / ymd / "timings.jsonl"
+
+
+def flush(path: Optional[Path] = None, **context: Any) -> int:
+    """
+    Append records not yet flushed to a JSONL sidecar (one span per line).
+    context (market / ymd / slot / stage ...) is stored on every line.
+    Returns the number of lines written.
+    """
+    global _FLUSHED
+    if path is None:
+        p = (os.getenv("INTRADAY_TIMINGS_SIDECAR") or "").strip()
+        if not p:
+            return 0
+        path = Path(p)
+
+    with _LOCK:
+        pending = _RECORDS[_FLUSHED:]
+        _FLUSHED = len(_RECORDS)
+    if not pending:
+        return 0
+
+    base = {"run_id": run_id(), "pid": os.getpid(), "argv0": Path(sys.argv[0]).name if sys.argv else ""}
+    base.update({k: v for k, v in context.items() if v is not None})
+    try:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # single write() per flush so concurrent processes don't interleave lines
+        text = "".join(json.dumps({**base, **r}, ensure_ascii=False, default=str) + "\n" for r in pending)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(text)
+    except Exception as e:
+        print(f"[timings] could not write {path}: {e}", flush=True)
+        return 0
+    return len(pending)
+
+
+def _maybe_register_atexit() -> None:
+    global _ATEXIT_REGISTERED
+    if _ATEXIT_REGISTERED or not os.getenv("INTRADAY_TIMINGS_SIDECAR"):
+        return
+    _ATEXIT_REGISTERED = True
+    atexit.register(flush)
+
+
+def read_jsonl(path: Path) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    obj = json.loads(line)
+                except Exception:
+                    continue
+                if isinstance(obj, dict):
+                    out.append(obj)
+    except FileNotFoundError:
+        pass
+    return out
+
+
+# profiling hook for child processes (render / encode) started with INTRADAY_PROFILE set
+if (os.getenv("INTRADAY_PROFILE") or "").strip():
+    from markets import profiling as _profiling  # noqa: E402
+
+    _profiling.install_from_env()
@@ -0,0 +1,487 @@
+# markets/synthetic.py
+# -*- coding: utf-8 -*-
+"""
+Synthetic market generator (for scaling benchmarks / offline runs)
+
+Fills a market warehouse with N symbols x D trading days of plausible OHLCV:
+  - random-walk closes with market-typical price levels
+  - limit-up events (locked / touched-only) using each market's limit rule
+      TW : 10% floored to tick (markets/tw/rules.py)
+      CN : 10% main / 20% ChiNext+STAR / 30% BJ / 5% ST
+      JP : tiered yen amount (markets/jp/jp_limit_rules.py)
+      KR : 30%
+      US : no limit (big movers instead)
+  - limit-up persistence (yesterday locked -> higher chance today) so streaks exist
+  - sector cardinality with a skewed size distribution
+  - new listings (first bar inside the window, no limit on the first days)
+
+Writers produce what the real pipeline reads:
+  - CN / JP / KR / US : SQLite created by the market's own init_db
+                        (stock_prices / stock_info / download_errors)
+  - TW                : tw_stock_list.json + long-format daily CSV
+                        (same columns as markets/tw/downloader.py cache)
+
+CLI:
+  python -m markets.synthetic --market cn --symbols 10000 --days 60 --out data/cache/bench/cn_10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import sqlite3
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+MARKETS = ("tw", "cn", "jp", "kr", "us")
+
+# starting price range per market (log-uniform)
+_PRICE_RANGE: Dict[str, Tuple[float, float]] = {
+    "tw": (10.0, 1000.0),
+    "cn": (3.0, 120.0),
+    "jp": (100.0, 12000.0),
+    "kr": (1000.0, 300000.0),
+    "us": (2.0, 500.0),
+}
+
+_SECTOR_LABEL = {
+    "tw": "產業{:02d}",
+    "cn": "行业{:02d}",
+    "jp": "業種{:02d}",
+    "kr": "업종{:02d}",
+    "us": "Sector {:02d}",
+}
+
+
+@dataclass
+class SyntheticSpec:
+    market: str
+    n_symbols: int = 1000
+    n_days: int = 60
+    end_ymd: str = ""                 # default: last weekday <= today
+    seed: int = 7
+    n_sectors: int = 30
+    daily_vol: float = 0.022          # stdev of normal daily returns
+    limitup_share: float = 0.03       # P(limit-up event) per symbol-day (limit markets)
+    locked_share: float = 0.6         # share of limit-up events that close locked
+    repeat_boost: float = 0.35        # P(limit-up again | locked yesterday)
+    big_mover_share: float = 0.03     # P(|ret| >= 10%) per symbol-day (US)
+    new_listing_share: float = 0.01   # symbols whose first bar is inside the last 5 days
+    st_share: float = 0.03            # CN: "*ST" names (5% limit)
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.market = (self.market or "").strip().lower()
+        if self.market not in MARKETS:
+            raise ValueError(f"market must be one of {MARKETS}, got {self.market!r}")
+        if not self.end_ymd:
+            self.end_ymd = _last_weekday(date.today()).isoformat()
+
+
+@dataclass
+class SymbolInfo:
+    symbol: str
+    name: str
+    sector: str
+    market: str
+    market_detail: str
+    first_day: int = 0               # index into trading days of the first bar
+    listed_date: str = ""
+
+
+# =============================================================================
+# Calendar / codes
+# =============================================================================
+def _last_weekday(d: date) -> date:
+    while d.weekday() >= 5:
+        d -= timedelta(days=1)
+    return d
+
+
+def trading_days(end_ymd: str, n_days: int) -> List[str]:
+    """
+    n_days weekdays ending at end_ymd (no holiday calendar; good enough for load tests).
+    """
+    d = _last_weekday(datetime.strptime(end_ymd[:10], "%Y-%m-%d").date())
+    out: List[str] = []
+    while len(out) < n_days:
+        if d.weekday() < 5:
+            out.append(d.isoformat())
+        d -= timedelta(days=1)
+    return out[::-1]
+
+
+def _base36(n: int) -> str:
+    digits = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    s = ""
+    while True:
+        n, r = divmod(n, 36)
+        s = digits[r] + s
+        if n == 0:
+            return s
+
+
+def _alpha(n: int) -> str:
+    # 0 -> A, 25 -> Z, 26 -> AA ...
+    s = ""
+    n += 1
+    while n > 0:
+        n, r = divmod(n - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+
+def _sector_weights(n: int) -> List[float]:
+    # a few big sectors, long tail of small ones
+    return [1.0 / (k + 1) ** 0.8 for k in range(max(1, n))]
+
+
+def _split_counts(n: int, shares: List[Tuple[str, float, int]]) -> Dict[str, int]:
+    """
+    shares: [(bucket, share, capacity)]; overflow goes to the first bucket.
+    """
+    counts: Dict[str, int] = {}
+    left = n
+    for key, share, cap in shares[1:]:
+        c = min(int(round(n * share)), cap, left)
+        counts[key] = c
+        left -= c
+    counts[shares[0][0]] = left
+    return counts
+
+
+def make_universe(spec: SyntheticSpec, rng: random.Random) -> List[SymbolInfo]:
+    m = spec.market
+    n = int(spec.n_symbols)
+    label = _SECTOR_LABEL[m]
+    sectors = [label.format(k + 1) for k in range(max(1, spec.n_sectors))]
+    weights = _sector_weights(len(sectors))
+
+    out: List[SymbolInfo] = []
+
+    def add(sym: str, detail: str, market: str, name: Optional[str] = None) -> None:
+        out.append(
+            SymbolInfo(
+                symbol=sym,
+                name=name or f"SYN{sym.split('.')[0]}",
+                sector=rng.choices(sectors, weights=weights, k=1)[0],
+                market=market,
+                market_detail=detail,
+            )
+        )
+
+    if m == "tw":
+        c = _split_counts(n, [("listed", 0.55, n), ("otc", 0.33, n), ("emerging", 0.08, n), ("dr", 0.02, n), ("innovation_a", 0.02, n)])
+        i = 0
+        for detail in ("listed", "otc", "emerging", "dr", "innovation_a"):
+            for _ in range(c[detail]):
+                code = str(1101 + i) if i < 8899 else str(100000 + i)
+                sfx = ".TW" if detail in ("listed", "dr", "innovation_a") else ".TWO"
+                add(code + sfx, detail, "TWSE" if sfx == ".TW" else "TPEx")
+                i += 1
+
+    elif m == "cn":
+        # code ranges follow markets/cn/cn_market.py classification
+        c = _split_counts(n, [("sz_main", 0.0, n), ("sh_main", 0.45, 88000), ("chinext", 0.20, 2000), ("star", 0.10, 1000), ("bj", 0.05, 10000)])
+        for k in range(c["sh_main"]):
+            add(f"{600000 + k}.SS", "main", "SSE")
+        for k in range(c["sz_main"]):
+            add(f"{k + 1:06d}.SZ", "main", "SZSE")
+        for k in range(c["chinext"]):
+            add(f"{300000 + k}.SZ", "chinext", "SZSE")
+        for k in range(c["star"]):
+            add(f"{688000 + k}.SS", "star", "SSE")
+        for k in range(c["bj"]):
+            add(f"{830000 + k}.BJ", "bj", "BSE")
+        for it in out:
+            if it.market_detail == "main" and rng.random() < spec.st_share:
+                it.name = "*ST" + it.name
+
+    elif m == "jp":
+        details = ["Prime", "Standard", "Growth"]
+        for k in range(n):
+            # 4-char codes ("1000", "100A", ...) like the newer alphanumeric TSE codes
+            add(f"{_base36(46656 + k)}.T", rng.choices(details, weights=[0.45, 0.40, 0.15], k=1)[0], "TSE")
+
+    elif m == "kr":
+        c = _split_counts(n, [("KOSDAQ", 0.0, n), ("KOSPI", 0.45, n), ("KONEX", 0.03, n)])
+        k = 0
+        for detail in ("KOSPI", "KOSDAQ", "KONEX"):
+            for _ in range(c[detail]):
+                sfx = ".KS" if detail == "KOSPI" else ".KQ"
+                add(f"{(k * 10 + 20) % 1000000:06d}{sfx}", detail, detail)
+                k += 1
+
+    else:  # us
+        exch = ["NASDAQ", "NYSE", "AMEX"]
+        for k in range(n):
+            add(_alpha(k + 26 * 26), rng.choices(exch, weights=[0.55, 0.38, 0.07], k=1)[0], "US")
+
+    # new listings: first bar in the last 5 days of the window
+    days = int(spec.n_days)
+    for it in out:
+        if rng.random() < spec.new_listing_share and days > 6:
+            it.first_day = days - rng.randint(1, 5)
+    return out
+
+
+# =============================================================================
+# Price rules
+# =============================================================================
+def _cn_limit_rate(it: SymbolInfo) -> float:
+    # same tiers as markets/cn/snapshot_builder._limit_rate
+    if it.name.upper().lstrip("*").startswith("ST"):
+        return 0.05
+    if it.market_detail == "bj":
+        return 0.30
+    if it.market_detail in ("chinext", "star"):
+        return 0.20
+    return 0.10
+
+
+def _limit_rule(market: str, it: SymbolInfo) -> Optional[Callable[[float], float]]:
+    """
+    prev_close -> limit-up price for this symbol (None = no price limit).
+    """
+    if market == "tw":
+        if it.market_detail == "emerging":
+            return None
+        from markets.tw.rules import calc_limitup_price
+
+        return lambda prev: calc_limitup_price(prev, 0.10)
+    if market == "cn":
+        rate = _cn_limit_rate(it)
+        return lambda prev: round(prev * (1.0 + rate), 2)
+    if market == "jp":
+        from markets.jp.jp_limit_rules import jp_limit_amount
+
+        return lambda prev: float(prev + jp_limit_amount(prev))
+    if market == "kr":
+        return lambda prev: float(math.floor(prev * 1.30))
+    return None
+
+
+def _round_px(market: str, px: float) -> float:
+    if market == "tw":
+        from markets.tw.rules import round_to_tick
+
+        return round(round_to_tick(px), 2)
+    if market in ("jp", "kr"):
+        return float(max(1, round(px)))
+    return round(px, 2)
+
+
+# =============================================================================
+# Bars
+# =============================================================================
+Bar = Tuple[str, str, float, float, float, float, int]  # symbol, date, o, h, l, c, v
+
+
+def generate_bars(spec: SyntheticSpec, universe: List[SymbolInfo], rng: random.Random) -> Iterator[Bar]:
+    m = spec.market
+    days = trading_days(spec.end_ymd, int(spec.n_days))
+    lo, hi = _PRICE_RANGE[m]
+    log_lo, log_hi = math.log(lo), math.log(hi)
+    no_limit_days = int(os.getenv("TW_NO_LIMIT_LISTING_DAYS", "5"))
+
+    for it in universe:
+        if it.first_day:
+            it.listed_date = days[it.first_day]
+        prev = math.exp(rng.uniform(log_lo, log_hi))
+        rule = _limit_rule(m, it)
+        locked_prev = False
+        for di in range(it.first_day, len(days)):
+            ymd = days[di]
+            new_listing = bool(it.first_day) and (di - it.first_day) < no_limit_days
+            up = None if (new_listing or rule is None) else rule(prev)
+            # symmetric lower limit
+            dn = None if up is None else max(0.01, prev - (up - prev))
+
+            p_limit = spec.limitup_share + (spec.repeat_boost if locked_prev else 0.0)
+            locked_prev = False
+
+            if up is not None and rng.random() < p_limit:
+                if rng.random() < spec.locked_share:
+                    close = high = up
+                    locked_prev = True
+                else:
+                    high = up
+                    close = up * (1.0 - rng.uniform(0.01, 0.06))
+                opn = prev * (1.0 + rng.uniform(0.0, (up / prev - 1.0)))
+                low = min(opn, close) * (1.0 - abs(rng.gauss(0.0, 0.01)))
+            else:
+                if up is None and (new_listing or rng.random() < spec.big_mover_share):
+                    ret = rng.uniform(0.10, 1.2 if new_listing else 0.6) * (1 if rng.random() < 0.8 else -0.3)
+                else:
+                    ret = rng.gauss(0.0, spec.daily_vol)
+                close = prev * (1.0 + ret)
+                opn = prev * (1.0 + rng.gauss(0.0, spec.daily_vol / 2))
+                high = max(opn, close) * (1.0 + abs(rng.gauss(0.0, 0.008)))
+                low = min(opn, close) * (1.0 - abs(rng.gauss(0.0, 0.008)))
+                if up is not None:
+                    # keep normal days strictly below the limit
+                    cap = up * 0.995
+                    close, opn, high = min(close, cap), min(opn, cap), min(high, cap)
+                if dn is not None:
+                    close, opn, low = max(close, dn), max(opn, dn), max(low, dn)
+
+            close = _round_px(m, close)
+            opn = _round_px(m, opn)
+            high = max(_round_px(m, high), opn, close)
+            low = min(_round_px(m, low), opn, close)
+            vol = int(rng.lognormvariate(12.0, 1.3))
+            yield (it.symbol, ymd, opn, high, low, close, vol)
+            prev = max(close, 0.01)
+
+
+# =============================================================================
+# Writers
+# =============================================================================
+def _init_market_db(market: str, db_path: Path) -> None:
+    # use the market's own schema so the pipeline sees exactly what it expects
+    if market == "cn":
+        from markets.cn.cn_db import init_db
+
+        init_db(str(db_path))
+    elif market == "jp":
+        from markets.jp.downloader import init_db
+
+        init_db(str(db_path))
+    elif market == "kr":
+        from markets.kr.downloader import init_db
+
+        init_db(str(db_path))
+    elif market == "us":
+        from markets.us.us_db import init_db
+
+        init_db(Path(db_path))
+    else:
+        raise ValueError(f"{market} has no SQLite warehouse (TW uses write_tw)")
+
+
+def write_sqlite(spec: SyntheticSpec, db_path: Path, *, chunk: int = 50000) -> Dict[str, Any]:
+    db_path = Path(db_path)
+    if db_path.exists():
+        db_path.unlink()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    _init_market_db(spec.market, db_path)
+
+    rng = random.Random(spec.seed)
+    universe = make_universe(spec, rng)
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    n_rows = 0
+    conn = sqlite3.connect(str(db_path))
+    try:
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA journal_mode=MEMORY")
+        buf: List[Bar] = []
+        for bar in generate_bars(spec, universe, rng):
+            buf.append(bar)
+            if len(buf) >= chunk:
+                conn.executemany("INSERT OR REPLACE INTO stock_prices VALUES (?,?,?,?,?,?,?)", buf)
+                n_rows += len(buf)
+                buf = []
+        if buf:
+            conn.executemany("INSERT OR REPLACE INTO stock_prices VALUES (?,?,?,?,?,?,?)", buf)
+            n_rows += len(buf)
+        conn.executemany(
+            "INSERT OR REPLACE INTO stock_info (symbol, name, sector, market, market_detail, updated_at) VALUES (?,?,?,?,?,?)",
+            [(it.symbol, it.name, it.sector, it.market, it.market_detail, now) for it in universe],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {"db_path": str(db_path), "symbols": len(universe), "rows": n_rows, "end_ymd": spec.end_ymd}
+
+
+def write_tw(spec: SyntheticSpec, out_dir: Path) -> Dict[str, Any]:
+    """
+    Writes out_dir/tw_stock_list.json and out_dir/tw_prices_1d.csv.
+    markets/tw/downloader.py looks the CSV up by a hash of the symbol list;
+    scripts/bench_scaling.py points the downloader at these files.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(spec.seed)
+    universe = make_universe(spec, rng)
+
+    csv_path = out_dir / "tw_prices_1d.csv"
+    n_rows = 0
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["symbol", "date", "open", "high", "low", "close", "volume"])
+        for bar in generate_bars(spec, universe, rng):
+            w.writerow(bar)
+            n_rows += 1
+
+    items = []
+    for it in universe:
+        row = {"symbol": it.symbol, "name": it.name, "sector": it.sector, "market": it.market, "market_detail": it.market_detail}
+        if it.listed_date:
+            row["listed_date"] = it.listed_date
+        items.append(row)
+    list_path = out_dir / "tw_stock_list.json"
+    list_path.write_text(json.dumps(items, ensure_ascii=False), encoding="utf-8")
+
+    return {
+        "stock_list": str(list_path),
+        "csv_path": str(csv_path),
+        "symbols": len(universe),
+        "rows": n_rows,
+        "end_ymd": spec.end_ymd,
+    }
+
+
+def generate(spec: SyntheticSpec, out_dir: Path) -> Dict[str, Any]:
+    """
+    One call for any market: SQLite <market>_stock_warehouse.db or TW list + CSV.
+    """
+    out_dir = Path(out_dir)
+    if spec.market == "tw":
+        res = write_tw(spec, out_dir)
+    else:
+        res = write_sqlite(spec, out_dir / f"{spec.market}_stock_warehouse.db")
+    res["spec"] = asdict(spec)
+    return res
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Generate a synthetic market warehouse.")
+    ap.add_argument("--market", required=True, choices=list(MARKETS))
+    ap.add_argument("--symbols", type=int, default=1000)
+    ap.add_argument("--days", type=int, default=60)
+    ap.add_argument("--end", default="", help="last trading day YYYY-MM-DD (default: last weekday)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--sectors", type=int, default=30)
+    ap.add_argument("--limitup-share", type=float, default=0.03)
+    ap.add_argument("--locked-share", type=float, default=0.6)
+    ap.add_argument("--new-listing-share", type=float, default=0.01)
+    ap.add_argument("--out", required=True, help="output folder")
+    args = ap.parse_args(argv)
+
+    spec = SyntheticSpec(
+        market=args.market,
+        n_symbols=args.symbols,
+        n_days=args.days,
+        end_ymd=args.end,
+        seed=args.seed,
+        n_sectors=args.sectors,
+        limitup_share=args.limitup_share,
+        locked_share=args.locked_share,
+        new_listing_share=args.new_listing_share,
+    )
+    res = generate(spec, Path(args.out))
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -9,6 +9,8 @@ from typing import Any, Dict, List, Tuple, Optional
 
 import pandas as pd
 
+from markets import agg_state
+
 
 # =============================================================================
 # Env knobs (Thailand)
@@ -355,10 +357,16 @@ def aggregate(raw_payload: Dict[str, Any]) -> Dict[str, Any]:
 
     if ymd_effective and db_path and os.path.exists(db_path):
         try:
+            # 同一天的下一個 slot：DB 沒動就沿用，新出現的 symbol 才查（markets.agg_state）
             conn = sqlite3.connect(db_path)
             try:
                 syms = df["symbol"].dropna().astype(str).unique().tolist()
-                today_map = _fetch_today_rows(conn, ymd=ymd_effective, symbols=syms)
+                today_map = agg_state.memo_many(
+                    "th.today_rows",
+                    syms,
+                    lambda miss: _fetch_today_rows(conn, ymd=ymd_effective, symbols=miss),
+                    deps=(ymd_effective,) + agg_state.db_token(db_path),
+                )
             finally:
                 conn.close()
 
@@ -470,12 +478,20 @@ def aggregate(raw_payload: Dict[str, Any]) -> Dict[str, Any]:
 
     if ymd_effective and db_path and os.path.exists(db_path):
         try:
+            db_tok = agg_state.db_token(db_path)
             conn = sqlite3.connect(db_path)
             try:
-                ymd_prev = _get_prev_trade_date(conn, ymd_effective)
+                ymd_prev = agg_state.memo(
+                    "th.prev_trade_date", ymd_effective, lambda: _get_prev_trade_date(conn, ymd_effective), deps=db_tok
+                )
                 if ymd_prev:
                     syms = df_calc["symbol"].dropna().astype(str).unique().tolist()
-                    prev_map = _fetch_prev_day_rows(conn, ymd_prev=ymd_prev, symbols=syms)
+                    prev_map = agg_state.memo_many(
+                        "th.prev_day_rows",
+                        syms,
+                        lambda miss: _fetch_prev_day_rows(conn, ymd_prev=ymd_prev, symbols=miss),
+                        deps=(ymd_prev,) + db_tok,
+                    )
             finally:
                 conn.close()
         except Exception:
@@ -852,7 +868,9 @@ def aggregate(raw_payload: Dict[str, Any]) -> Dict[str, Any]:
         if c not in df_safe.columns:
             df_safe[c] = 0.0 if c != "is_penny" else False
 
-    raw_payload["snapshot_main"] = _sanitize_nan(df_safe.to_dict(orient="records"))
+    raw_payload["snapshot_main"] = agg_state.rows(
+        "th.snapshot_main", df_safe, lambda d: _sanitize_nan(d.to_dict(orient="records"))
+    )
     raw_payload["limitup"] = _sanitize_nan(limitup_records)
     raw_payload["sector_summary"] = _sanitize_nan(summary_rows)
     raw_payload["peers_by_sector"] = _sanitize_nan(peers_by_sector)
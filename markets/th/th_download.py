@@ -7,18 +7,19 @@ import time
 from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
-import yfinance as yf
 
 from .th_config import _yf_threads_enabled
 
 
 def download_one_th(symbol: str, start_date: str, end_date_exclusive: str) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    from markets.datasource import yf_download
+
     max_retries = 2
     last_err: Optional[str] = None
 
     for attempt in range(max_retries + 1):
         try:
-            df = yf.download(
+            df = yf_download(
                 symbol,
                 start=start_date,
                 end=end_date_exclusive,
@@ -71,13 +72,15 @@ def download_batch(
     start_date: str,
     end_date_exclusive: str,
 ) -> Tuple[pd.DataFrame, List[str], Optional[str]]:
+    from markets.datasource import yf_download
+
     if not tickers:
         empty = pd.DataFrame(columns=["symbol", "date", "open", "high", "low", "close", "volume"])
         return empty, [], None
 
     tickers_str = " ".join(tickers)
     try:
-        df = yf.download(
+        df = yf_download(
             tickers=tickers_str,
             start=start_date,
             end=end_date_exclusive,
@@ -24,6 +24,34 @@ def _pick_latest_leq(conn: sqlite3.Connection, ymd: str) -> Optional[str]:
     return row[0] if row and row[0] else None
 
 
+# {day_filter}: single day "p.date = ?" / replay "p.date BETWEEN ? AND ?" (one LAG pass for the range)
+_SNAPSHOT_SQL = """
+WITH p AS (
+  SELECT
+    symbol,
+    date,
+    open, high, low, close, volume,
+    LAG(close) OVER (PARTITION BY symbol ORDER BY date) AS last_close
+  FROM stock_prices
+)
+SELECT
+  p.symbol,
+  p.date AS ymd,
+  p.open, p.high, p.low, p.close, p.volume,
+  p.last_close,
+  i.local_symbol,
+  i.name,
+  i.industry,
+  i.sector,
+  i.market,
+  i.market_detail
+FROM p
+LEFT JOIN stock_info i ON i.symbol = p.symbol
+WHERE {day_filter}
+  AND p.close IS NOT NULL
+"""
+
+
 def run_intraday(*, slot: str, asof: str, ymd: str) -> Dict[str, Any]:
     db_path = _db_path()
     if not os.path.exists(db_path):
@@ -35,90 +63,92 @@ def run_intraday(*, slot: str, asof: str, ymd: str) -> Dict[str, Any]:
         log(f"🕒 requested ymd={ymd} slot={slot} asof={asof}")
         log(f"📅 ymd_effective = {ymd_effective}")
 
-        sql = """
-        WITH p AS (
-          SELECT
-            symbol,
-            date,
-            open, high, low, close, volume,
-            LAG(close) OVER (PARTITION BY symbol ORDER BY date) AS last_close
-          FROM stock_prices
-        )
-        SELECT
-          p.symbol,
-          p.date AS ymd,
-          p.open, p.high, p.low, p.close, p.volume,
-          p.last_close,
-          i.local_symbol,
-          i.name,
-          i.industry,
-          i.sector,
-          i.market,
-          i.market_detail
-        FROM p
-        LEFT JOIN stock_info i ON i.symbol = p.symbol
-        WHERE p.date = ?
-          AND p.close IS NOT NULL
-        """
-        df = pd.read_sql_query(sql, conn, params=(ymd_effective,))
-
-        if df.empty:
-            snapshot_main: List[Dict[str, Any]] = []
-        else:
-            df["name"] = df["name"].fillna("Unknown")
-            df["industry"] = df["industry"].fillna("Unclassified")
-            df["sector"] = df["sector"].fillna("Unclassified")
-
-            bad_sector = df["sector"].astype(str).str.strip().isin(["", "-", "—", "--", "－", "–", "nan", "None"])
-            df.loc[bad_sector, "sector"] = df.loc[bad_sector, "industry"]
-
-            df["last_close"] = pd.to_numeric(df["last_close"], errors="coerce")
-            df["close"] = pd.to_numeric(df["close"], errors="coerce")
-
-            df["ret"] = 0.0
-            m = df["last_close"].notna() & (df["last_close"] > 0) & df["close"].notna()
-            df.loc[m, "ret"] = (df.loc[m, "close"] / df.loc[m, "last_close"]) - 1.0
-
-            df["streak"] = 1
-
-            snapshot_main = df[
-                [
-                    "symbol",        # Yahoo symbol, e.g. AOT.BK
-                    "local_symbol",  # original TH symbol, e.g. AOT
-                    "name",
-                    "sector",
-                    "industry",
-                    "ymd",
-                    "open",
-                    "high",
-                    "low",
-                    "close",
-                    "volume",
-                    "last_close",
-                    "ret",
-                    "streak",
-                    "market",
-                    "market_detail",
-                ]
-            ].to_dict(orient="records")
-
-        # ✅ unified meta.time schema for renderers (Bangkok)
-        meta_time = build_meta_time_asia(
-            datetime.now(timezone.utc),
-            tz_name="Asia/Bangkok",
-            fallback_offset="+07:00",
-        )
-
-        return {
-            "market": "th",
-            "slot": slot,
-            "asof": asof,
-            "ymd": ymd,
-            "ymd_effective": ymd_effective,
-            "snapshot_main": snapshot_main,
-            "snapshot_open": [],
-            "stats": {"snapshot_main_count": int(len(snapshot_main)), "snapshot_open_count": 0},
-            "meta": {"db_path": db_path, "ymd_effective": ymd_effective, "time": meta_time},
-        }
+        df = pd.read_sql_query(_SNAPSHOT_SQL.format(day_filter="p.date = ?"), conn, params=(ymd_effective,))
+    finally:
+        conn.close()
+
+    return _build_payload(df, slot=slot, asof=asof, ymd=ymd, ymd_effective=ymd_effective, db_path=db_path)
+
+
+def load_replay(start: str, end: str) -> Dict[str, Any]:
+    """
+    --replay: one range SQL (single LAG pass) -> {ymd_effective: that day's rows}
+    """
+    from markets.replay import split_days, trading_days
+
+    db_path = _db_path()
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"TH DB not found: {db_path} (set TH_DB_PATH to override)")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        days = trading_days(conn, start, end, close_not_null=True)
+        df = pd.read_sql_query(_SNAPSHOT_SQL.format(day_filter="p.date BETWEEN ? AND ?"), conn, params=(start, end))
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+    return split_days(df, days)
+
+
+def replay_payload(ymd: str, day: pd.DataFrame, *, slot: str, asof: str) -> Dict[str, Any]:
+    return _build_payload(day, slot=slot, asof=asof, ymd=ymd, ymd_effective=ymd, db_path=_db_path())
+
+
+def _build_payload(df: pd.DataFrame, *, slot: str, asof: str, ymd: str, ymd_effective: str, db_path: str) -> Dict[str, Any]:
+    if df.empty:
+        snapshot_main: List[Dict[str, Any]] = []
+    else:
+        df["name"] = df["name"].fillna("Unknown")
+        df["industry"] = df["industry"].fillna("Unclassified")
+        df["sector"] = df["sector"].fillna("Unclassified")
+
+        bad_sector = df["sector"].astype(str).str.strip().isin(["", "-", "—", "--", "－", "–", "nan", "None"])
+        df.loc[bad_sector, "sector"] = df.loc[bad_sector, "industry"]
+
+        df["last_close"] = pd.to_numeric(df["last_close"], errors="coerce")
+        df["close"] = pd.to_numeric(df["close"], errors="coerce")
+
+        df["ret"] = 0.0
+        m = df["last_close"].notna() & (df["last_close"] > 0) & df["close"].notna()
+        df.loc[m, "ret"] = (df.loc[m, "close"] / df.loc[m, "last_close"]) - 1.0
+
+        df["streak"] = 1
+
+        snapshot_main = df[
+            [
+                "symbol",        # Yahoo symbol, e.g. AOT.BK
+                "local_symbol",  # original TH symbol, e.g. AOT
+                "name",
+                "sector",
+                "industry",
+                "ymd",
+                "open",
+                "high",
+                "low",
+                "close",
+                "volume",
+                "last_close",
+                "ret",
+                "streak",
+                "market",
+                "market_detail",
+            ]
+        ].to_dict(orient="records")
+
+    # ✅ unified meta.time schema for renderers (Bangkok)
+    meta_time = build_meta_time_asia(
+        datetime.now(timezone.utc),
+        tz_name="Asia/Bangkok",
+        fallback_offset="+07:00",
+    )
+
+    return {
+        "market": "th",
+        "slot": slot,
+        "asof": asof,
+        "ymd": ymd,
+        "ymd_effective": ymd_effective,
+        "snapshot_main": snapshot_main,
+        "snapshot_open": [],
+        "stats": {"snapshot_main_count": int(len(snapshot_main)), "snapshot_open_count": 0},
+        "meta": {"db_path": db_path, "ymd_effective": ymd_effective, "time": meta_time},
+    }
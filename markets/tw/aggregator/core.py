@@ -7,6 +7,8 @@ from typing import Any, Dict, List
 
 import pandas as pd
 
+from markets import agg_state
+
 from ..snapshot import extract_effective_ymd, is_snapshot_effectively_empty
 from ..limit_type import infer_limit_type
 from ..limitup_flags import infer_limitup_flags_from_price
@@ -215,6 +217,11 @@ def _tw_attach_bigmove10_and_pcts(
     return out
 
 
+def _json_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    df_safe = df.where(pd.notna(df), None)
+    return sanitize_nan(df_safe.to_dict(orient="records"))
+
+
 def aggregate(payload: Dict[str, Any]) -> Dict[str, Any]:
     payload = dict(payload or {})
 
@@ -499,13 +506,16 @@ def aggregate(payload: Dict[str, Any]) -> Dict[str, Any]:
     payload["snapshot_open"] = snapshot_open
 
     # 15) snapshot_main enrichment: keep ALL rows with new flags (json-safe)
+    # row-local => 上一個 slot 沒變的列直接沿用（markets.agg_state）
+    json_safe_keys = set()
     if dfS is not None and not dfS.empty:
-        df_safe = dfS.where(pd.notna(dfS), None)
-        payload["snapshot_main"] = sanitize_nan(df_safe.to_dict(orient="records"))
+        payload["snapshot_main"] = agg_state.rows("tw.snapshot_main", dfS, _json_records)
+        json_safe_keys.add("snapshot_main")
 
     # also output normalized snapshot_open rows (helps debugging)
     if dfO is not None and not dfO.empty:
-        dfO_safe = dfO.where(pd.notna(dfO), None)
-        payload["snapshot_open_norm"] = sanitize_nan(dfO_safe.to_dict(orient="records"))
+        payload["snapshot_open_norm"] = agg_state.rows("tw.snapshot_open_norm", dfO, _json_records)
+        json_safe_keys.add("snapshot_open_norm")
 
-    return sanitize_nan(payload)
\ No newline at end of file
+    # 上面兩包已經 sanitize 過，不用再整包 deep walk 一次（key 順序不變）
+    return {k: (v if k in json_safe_keys else sanitize_nan(v)) for k, v in payload.items()}
\ No newline at end of file
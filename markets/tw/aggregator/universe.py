@@ -6,6 +6,8 @@ from typing import Any, Dict, List, Optional
 
 import pandas as pd
 
+from markets import agg_state
+
 
 # =============================================================================
 # Small helpers
@@ -73,6 +75,11 @@ def build_universe(
     if df_open is None and dfO is not None:
         df_open = dfO
 
+    if agg_state.active() is not None:
+        counts = _universe_counts_incremental(df_main, df_open if include_open_limit else None)
+        if counts is not None:
+            return _universe_from_counts(counts)
+
     frames: List[pd.DataFrame] = []
 
     # --- main board always counted
@@ -110,6 +117,36 @@ def build_universe(
     }
 
 
+def _universe_counts_incremental(
+    df_main: Optional[pd.DataFrame], df_open: Optional[pd.DataFrame]
+) -> Optional[Dict[str, int]]:
+    """
+    Same counts as the groupby below, but only symbols that appeared / left / changed sector
+    since the previous slot are re-normalized (markets.agg_state). None => no symbol column.
+    """
+    keys: List[str] = []
+    sectors: List[Any] = []
+    for tag, df in (("S", df_main), ("O", df_open)):
+        if df is None or df.empty or "sector" not in df.columns:
+            continue
+        if "symbol" not in df.columns:
+            return None
+        keys.extend(f"{tag}:{s}" for s in df["symbol"].astype(str).tolist())
+        sectors.extend(df["sector"].tolist())
+    return dict(agg_state.sector_counts("tw.universe", keys, sectors, norm_sector))
+
+
+def _universe_from_counts(counts: Dict[str, int]) -> Dict[str, Any]:
+    if not counts:
+        return {"total": 0, "by_sector": []}
+    # groupby 的 key 順序（sorted）+ 同一個 sort_values => by_sector 順序跟完整重算一致
+    agg = pd.DataFrame(sorted(counts.items()), columns=["sector", "count"]).sort_values("count", ascending=False)
+    return {
+        "total": int(sum(counts.values())),
+        "by_sector": agg.to_dict(orient="records"),
+    }
+
+
 # =============================================================================
 # Merge denominators into sector summary
 # =============================================================================
@@ -7,6 +7,8 @@ from typing import Any, Dict, List, Optional, Set
 
 import pandas as pd
 
+from markets import agg_state
+
 
 def _env_bool(name: str, default: str = "0") -> bool:
     v = str(os.getenv(name, default)).strip().lower()
@@ -138,11 +140,16 @@ def build_peers_by_sector(
         cols = set(dfS.columns)
         if "sector" in cols and "symbol" in cols:
             dfP = dfS[~dfS["symbol"].astype(str).isin(limit_symbols)].copy()
-            for sec, g in dfP.groupby("sector"):
+            # row-local => 上一個 slot 沒變的列直接沿用（markets.agg_state）
+            peer_rows = agg_state.rows(
+                "tw.peers_main",
+                dfP,
+                lambda d: [_row_to_peer_dict(rr.to_dict()) for _, rr in d.iterrows()],
+            )
+            pos = pd.Series(range(len(dfP)), index=dfP.index)
+            for sec, g in pos.groupby(dfP["sector"].to_numpy()):
                 sec_name = _safe_str(sec) or "未分類"
-                rows: List[Dict[str, Any]] = []
-                for _, rr in g.iterrows():
-                    rows.append(_row_to_peer_dict(rr.to_dict()))
+                rows: List[Dict[str, Any]] = [peer_rows[i] for i in g.tolist()]
                 if rows:
                     peers_by_sector.setdefault(sec_name, []).extend(rows)
 
@@ -175,8 +182,8 @@ def build_peers_by_sector(
         # sector counts actually inserted into peers_by_sector
         used_sector_counts: Dict[str, int] = {}
 
-        for _, rr in dfO.iterrows():
-            row = rr.to_dict()
+        open_rows = agg_state.rows("tw.peers_open", dfO, lambda d: [rr.to_dict() for _, rr in d.iterrows()])
+        for row in open_rows:
             if not _is_emerging_row(row):
                 continue
 
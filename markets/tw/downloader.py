@@ -34,7 +34,6 @@ from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
 import pandas as pd
-import yfinance as yf
 from tqdm import tqdm
 
 # ✅ indicators enrichment (streak / streak_prev / future indicators)
@@ -231,50 +230,58 @@ def load_tw_stock_list() -> Dict[str, Dict[str, Any]]:
 # =============================================================================
 # Fetch daily bars (pure 1d) + cache (single BIG file)
 # =============================================================================
+def _daily_cache_ns() -> Any:
+    """
+    engine.cache_manager namespace for the big daily file (same file names as before:
+    tw_prices_1d_{lookback}d_{hash}.csv|parquet in CACHE_DIR); old symbol-hash files
+    are evicted by size instead of piling up.
+    """
+    from engine.cache_manager import namespace
+
+    return namespace(
+        "tw_daily",
+        dir=CACHE_DIR,
+        prefix="tw_prices_1d_",
+        codec="parquet" if CACHE_FORMAT == "parquet" else "csv",
+    )
+
+
+def _daily_cache_key(symbols: List[str]) -> str:
+    return f"{DAILY_LOOKBACK_DAYS}d_{_hash_symbols(symbols)}"
+
+
 def _cache_daily_path(symbols: List[str]) -> str:
-    h = _hash_symbols(symbols)
-    if CACHE_FORMAT == "parquet":
-        return os.path.join(CACHE_DIR, f"tw_prices_1d_{DAILY_LOOKBACK_DAYS}d_{h}.parquet")
-    return os.path.join(CACHE_DIR, f"tw_prices_1d_{DAILY_LOOKBACK_DAYS}d_{h}.csv")
+    return str(_daily_cache_ns().path_for(_daily_cache_key(symbols)))
 
 
-def _read_daily_cache(path: str, *, ymd_hint: Optional[str] = None) -> Optional[pd.DataFrame]:
+def _daily_cache_ok(df: Any, *, ymd_hint: Optional[str] = None) -> bool:
     """
     ✅ 修正：如果 cache 的最大日期 < ymd_hint，視為「cache 太舊」→ 忽略 cache 重新下載
     （避免你今天跑還卡在昨天/前天的 cache）
     """
-    if not os.path.exists(path):
-        return None
-    try:
-        if path.endswith(".parquet"):
-            df = pd.read_parquet(path)
-        else:
-            df = pd.read_csv(path)
-        need = {"symbol", "date", "open", "high", "low", "close", "volume"}
-        if not need.issubset(set(df.columns)):
-            return None
+    need = {"symbol", "date", "open", "high", "low", "close", "volume"}
+    if not isinstance(df, pd.DataFrame) or not need.issubset(set(df.columns)):
+        return False
 
-        # cache stale check
-        if ymd_hint:
-            try:
-                dmax = pd.to_datetime(df["date"].astype(str).str.slice(0, 10), errors="coerce").max()
-                yh = pd.to_datetime(str(ymd_hint)[:10], errors="coerce")
-                if pd.notna(dmax) and pd.notna(yh) and dmax.normalize() < yh.normalize():
-                    return None
-            except Exception:
-                pass
+    # cache stale check
+    if ymd_hint:
+        try:
+            dmax = pd.to_datetime(df["date"].astype(str).str.slice(0, 10), errors="coerce").max()
+            yh = pd.to_datetime(str(ymd_hint)[:10], errors="coerce")
+            if pd.notna(dmax) and pd.notna(yh) and dmax.normalize() < yh.normalize():
+                return False
+        except Exception:
+            pass
+    return True
 
-        return df
-    except Exception:
-        return None
+
+def _read_daily_cache(symbols: List[str], *, ymd_hint: Optional[str] = None) -> Optional[pd.DataFrame]:
+    return _daily_cache_ns().get(_daily_cache_key(symbols), validate=lambda df: _daily_cache_ok(df, ymd_hint=ymd_hint))
 
 
-def _write_daily_cache(df: pd.DataFrame, path: str) -> None:
+def _write_daily_cache(df: pd.DataFrame, symbols: List[str]) -> None:
     try:
-        if path.endswith(".parquet"):
-            df.to_parquet(path, index=False)
-        else:
-            df.to_csv(path, index=False, encoding="utf-8-sig")
+        _daily_cache_ns().set(_daily_cache_key(symbols), df)
     except Exception:
         pass
 
@@ -285,12 +292,14 @@ def _download_batch(tickers: List[str]) -> Tuple[pd.DataFrame, List[str]]:
     - long-format df
     - failed symbols list
     """
+    from markets.datasource import yf_download
+
     if not tickers:
         return pd.DataFrame(columns=["symbol", "date", "open", "high", "low", "close", "volume"]), []
 
     tickers_str = " ".join(tickers)
 
-    df = yf.download(
+    df = yf_download(
         tickers=tickers_str,
         period=f"{DAILY_LOOKBACK_DAYS}d",
         interval="1d",
@@ -387,7 +396,7 @@ def fetch_daily_bars(symbols: List[str], *, ymd_hint: Optional[str] = None) -> T
     cache_path = _cache_daily_path(symbols)
 
     if CACHE_ENABLED:
-        dfc = _read_daily_cache(cache_path, ymd_hint=ymd_hint)
+        dfc = _read_daily_cache(symbols, ymd_hint=ymd_hint)
         if dfc is not None and not dfc.empty:
             return dfc, [], cache_path
 
@@ -410,7 +419,7 @@ def fetch_daily_bars(symbols: List[str], *, ymd_hint: Optional[str] = None) -> T
     out = out.dropna(subset=["symbol", "date"]).sort_values(["symbol", "date"]).reset_index(drop=True)
 
     if CACHE_ENABLED and not out.empty and cache_path:
-        _write_daily_cache(out, cache_path)
+        _write_daily_cache(out, symbols)
         print(f"✅ Cached daily {CACHE_FORMAT.upper()}: {cache_path} (rows={len(out)})")
 
     failed_unique = sorted(list(set(failed_all)))
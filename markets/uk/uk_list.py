@@ -41,8 +41,8 @@ from pathlib import Path
 from typing import List, Tuple
 
 import pandas as pd
-import requests
 
+from markets.datasource import http_get
 from markets.us.us_db import init_db
 from markets.us.us_config import TICKER_RE, EXCLUDE_NAME_RE, log
 
@@ -137,7 +137,7 @@ def _open_excel() -> pd.ExcelFile:
 
     url = (os.getenv("UK_LIST_URL") or DEFAULT_UK_LIST_URL).strip() or DEFAULT_UK_LIST_URL
     log(f"📡 Downloading UK instrument list ... {url}")
-    r = requests.get(url, timeout=90)
+    r = http_get(url, timeout=90)
     r.raise_for_status()
     return pd.ExcelFile(BytesIO(r.content))
 
@@ -40,10 +40,12 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-import yfinance as yf
 from tqdm import tqdm
 
+from engine.db_writer import PRICES_UPSERT_SQL, DbWriter, price_rows
+
 # -----------------------------------------------------------------------------
 # Optional imports (repo 已拆模組；若不存在就走內建 fallback)
 # -----------------------------------------------------------------------------
@@ -187,6 +189,8 @@ def init_db(db_path: str) -> None:
 # Calendar helpers (fallback internal)
 # =============================================================================
 def _latest_trading_day_from_calendar(asof_ymd: Optional[str] = None) -> Optional[str]:
+    from markets.datasource import yf_download
+
     if _latest_td_ext is not None:
         try:
             return _latest_td_ext(asof_ymd=asof_ymd)
@@ -198,7 +202,7 @@ def _latest_trading_day_from_calendar(asof_ymd: Optional[str] = None) -> Optiona
     try:
         end_dt = pd.to_datetime(asof_ymd) if asof_ymd else pd.Timestamp.now()
         start_dt = end_dt - timedelta(days=lookback)
-        df = yf.download(
+        df = yf_download(
             cal_ticker,
             start=start_dt.strftime("%Y-%m-%d"),
             end=(end_dt + timedelta(days=1)).strftime("%Y-%m-%d"),
@@ -222,6 +226,8 @@ def _latest_trading_day_from_calendar(asof_ymd: Optional[str] = None) -> Optiona
 
 
 def _infer_window_by_trading_days(end_ymd: str, n_trading_days: int) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    from markets.datasource import yf_download
+
     if _infer_window_ext is not None:
         try:
             return _infer_window_ext(end_ymd=end_ymd, n_trading_days=n_trading_days)
@@ -233,7 +239,7 @@ def _infer_window_by_trading_days(end_ymd: str, n_trading_days: int) -> Tuple[Op
     try:
         end_dt = pd.to_datetime(end_ymd)
         start_dt = end_dt - timedelta(days=lookback)
-        df = yf.download(
+        df = yf_download(
             cal_ticker,
             start=start_dt.strftime("%Y-%m-%d"),
             end=(end_dt + timedelta(days=1)).strftime("%Y-%m-%d"),
@@ -356,7 +362,8 @@ def _normalize_symbol_ohlc(
     factor: float,
 ) -> Tuple[pd.DataFrame, int, int]:
     """
-    Normalize a single symbol's OHLC within the downloaded window.
+    Normalize a single symbol's OHLC within the downloaded window (scalar reference;
+    _normalize_prices_long uses the array form in _normalize_frame).
 
     Forward pass uses last adjusted close (seeded from DB prev close if available).
     Backward pass helps fix the very first day when seed is missing.
@@ -429,6 +436,144 @@ def _normalize_symbol_ohlc(
     return df_sym, n_down, n_up
 
 
+# scale states per row: divided by factor / untouched / multiplied by factor
+_S_DOWN, _S_KEEP, _S_UP = 0, 1, 2
+
+
+def _scale_states(
+    close: np.ndarray,
+    valid: np.ndarray,
+    seg_start: np.ndarray,
+    seed: np.ndarray,
+    upper_ratio: float,
+    lower_ratio: float,
+    factor: float,
+) -> np.ndarray:
+    """
+    Array form of one pass of _normalize_symbol_ohlc over many symbols at once.
+
+    Rows are in processing order, one contiguous segment per symbol (seg_start =
+    first row of the row's segment). The scalar loop compares each valid close
+    with the last *adjusted* close, which is the previous valid close times one
+    of {1/factor, 1, factor}; so each row is a map state_in -> state_out over 3
+    states, and the state sequence is a prefix composition of those maps
+    (log2(n) numpy steps). Invalid rows are identity maps, the first valid row
+    of a segment is a constant map (seed ratio, or untouched without seed).
+
+    Returns the state applied to every row (invalid rows: _S_KEEP).
+    """
+    n = int(close.shape[0])
+    keep = np.full(n, _S_KEEP, dtype=np.int8)
+    if n == 0 or not valid.any():
+        return keep
+
+    eps = 1e-12
+    idx = np.arange(n)
+    last_valid = np.maximum.accumulate(np.where(valid, idx, -1))
+    prev_valid = np.empty(n, dtype=np.int64)
+    prev_valid[0] = -1
+    prev_valid[1:] = last_valid[:-1]
+    has_prev = prev_valid >= seg_start
+    p = close[np.where(has_prev, prev_valid, 0)]
+
+    def _g(ratio: np.ndarray) -> np.ndarray:
+        return np.where(ratio >= upper_ratio, _S_DOWN, np.where(ratio <= lower_ratio, _S_UP, _S_KEEP)).astype(np.int8)
+
+    maps = np.tile(np.array([_S_DOWN, _S_KEEP, _S_UP], dtype=np.int8), (n, 1))
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        # same float ops as the loop: last = prev / factor | prev | prev * factor
+        m = valid & has_prev
+        maps[m, _S_DOWN] = _g(close / (p / factor))[m]
+        maps[m, _S_KEEP] = _g(close / p)[m]
+        maps[m, _S_UP] = _g(close / (p * factor))[m]
+
+        first = valid & ~has_prev
+        maps[first, :] = _S_KEEP
+        seeded = first & (seed > eps)
+        if seeded.any():
+            maps[seeded, :] = _g(close / seed)[seeded][:, None]
+
+    # fast path: nothing ever leaves the untouched state
+    if bool((maps[:, _S_KEEP] == _S_KEEP).all()):
+        return keep
+
+    # prefix composition: maps[i] <- maps[i] o maps[i-d]
+    d = 1
+    while d < n:
+        maps[d:] = np.take_along_axis(maps[d:], maps[:-d], axis=1)
+        d *= 2
+
+    states = maps[:, _S_KEEP].copy()
+    states[~valid] = _S_KEEP
+    return states
+
+
+def _apply_states(dfw: pd.DataFrame, states: np.ndarray, factor: float) -> Tuple[int, int]:
+    down = states == _S_DOWN
+    up = states == _S_UP
+    n_down = int(down.sum())
+    n_up = int(up.sum())
+    if n_down == 0 and n_up == 0:
+        return 0, 0
+    for c in ("open", "high", "low", "close"):
+        arr = dfw[c].to_numpy(dtype=float, copy=True)
+        arr[down] = arr[down] / factor
+        arr[up] = arr[up] * factor
+        dfw[c] = arr
+    return n_down, n_up
+
+
+def _segment_starts(sym: np.ndarray) -> np.ndarray:
+    n = int(sym.shape[0])
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    new = np.empty(n, dtype=bool)
+    new[0] = True
+    new[1:] = sym[1:] != sym[:-1]
+    return np.maximum.accumulate(np.where(new, np.arange(n), 0))
+
+
+def _normalize_frame(
+    dfw: pd.DataFrame,
+    prev_close_seed: Dict[str, float],
+    upper_ratio: float,
+    lower_ratio: float,
+    factor: float,
+) -> Tuple[pd.DataFrame, int, int]:
+    """
+    Vectorized _normalize_symbol_ohlc over a long frame sorted by (symbol, date).
+    Returns: (df_adjusted, n_scaled_down, n_scaled_up)
+    """
+    eps = 1e-12
+    dfw = dfw.reset_index(drop=True)
+    sym = dfw["symbol"].to_numpy(dtype=object)
+    seg_start = _segment_starts(sym)
+    seeded_syms = [k for k, v in prev_close_seed.items() if v is not None]
+    no_seed = ~dfw["symbol"].isin(seeded_syms).to_numpy()
+    seed = pd.to_numeric(dfw["symbol"].map(prev_close_seed), errors="coerce").to_numpy(dtype=float)
+
+    # ---------- forward pass ----------
+    close = dfw["close"].to_numpy(dtype=float)
+    with np.errstate(invalid="ignore"):
+        valid = close > eps
+    st = _scale_states(close, valid, seg_start, seed, upper_ratio, lower_ratio, factor)
+    n_down, n_up = _apply_states(dfw, st, factor)
+
+    # ---------- backward pass (symbols without seed) ----------
+    if no_seed.any():
+        close = dfw["close"].to_numpy(dtype=float)[::-1]
+        with np.errstate(invalid="ignore"):
+            valid = (close > eps) & no_seed[::-1]
+        st = _scale_states(
+            close, valid, _segment_starts(sym[::-1]), np.full(close.shape[0], np.nan), upper_ratio, lower_ratio, factor
+        )
+        d2, u2 = _apply_states(dfw, st[::-1], factor)
+        n_down += d2
+        n_up += u2
+
+    return dfw, n_down, n_up
+
+
 def _normalize_prices_long(
     df_long: pd.DataFrame,
     prev_close_seed: Dict[str, float],
@@ -452,19 +597,29 @@ def _normalize_prices_long(
         dfw[c] = pd.to_numeric(dfw[c], errors="coerce")
 
     dfw["volume"] = pd.to_numeric(dfw.get("volume"), errors="coerce")
+    dfw = dfw.sort_values(["symbol", "date"], kind="stable").reset_index(drop=True)
+
+    # closes so small that an adjusted close could drop under eps take the scalar path
+    # (the loop then stops updating its reference close, which the array form doesn't model)
+    tiny_mult = min(factor, 1.0 / factor) ** 2 if factor > 0 else 0.0
+    close = dfw["close"].to_numpy(dtype=float)
+    with np.errstate(invalid="ignore"):
+        tiny = (close > 1e-12) & (close * tiny_mult <= 1e-12)
+    slow_syms = set(dfw.loc[tiny, "symbol"]) if tiny.any() else set()
+
+    if slow_syms:
+        is_slow = dfw["symbol"].isin(slow_syms)
+        fast, total_down, total_up = _normalize_frame(dfw[~is_slow], prev_close_seed, upper, lower, factor)
+        parts = [fast]
+        for sym, g in dfw[is_slow].groupby("symbol", sort=False):
+            g2, n_down, n_up = _normalize_symbol_ohlc(g, prev_close_seed.get(sym), upper_ratio=upper, lower_ratio=lower, factor=factor)
+            total_down += n_down
+            total_up += n_up
+            parts.append(g2)
+        out = pd.concat(parts, ignore_index=True)
+    else:
+        out, total_down, total_up = _normalize_frame(dfw, prev_close_seed, upper, lower, factor)
 
-    total_down = 0
-    total_up = 0
-    out_parts: List[pd.DataFrame] = []
-
-    for sym, g in dfw.groupby("symbol", sort=False):
-        seed = prev_close_seed.get(sym)
-        g2, n_down, n_up = _normalize_symbol_ohlc(g, seed, upper_ratio=upper, lower_ratio=lower, factor=factor)
-        total_down += n_down
-        total_up += n_up
-        out_parts.append(g2)
-
-    out = pd.concat(out_parts, ignore_index=True) if out_parts else dfw
     out = out.dropna(subset=["symbol", "date"]).sort_values(["symbol", "date"]).reset_index(drop=True)
 
     if _scale_debug() and (total_down > 0 or total_up > 0):
@@ -477,11 +632,13 @@ def _normalize_prices_long(
 # Download core (batch + single fallback)
 # =============================================================================
 def _download_one(symbol: str, start_date: str, end_date_exclusive: str) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    from markets.datasource import yf_download
+
     max_retries = 2
     last_err: Optional[str] = None
     for attempt in range(max_retries + 1):
         try:
-            df = yf.download(
+            df = yf_download(
                 symbol,
                 start=start_date,
                 end=end_date_exclusive,
@@ -538,12 +695,14 @@ def _download_batch(
     回傳 (long_df, failed_tickers, err_msg)
     long_df 欄位：symbol,date,open,high,low,close,volume
     """
+    from markets.datasource import yf_download
+
     if not tickers:
         empty = pd.DataFrame(columns=["symbol", "date", "open", "high", "low", "close", "volume"])
         return empty, [], None
 
     try:
-        df = yf.download(
+        df = yf_download(
             tickers=" ".join(tickers),
             start=start_date,
             end=end_date_exclusive,
@@ -647,34 +806,6 @@ def _download_batch(
     return out, sorted(list(set(failed))), None
 
 
-def _insert_prices(conn: sqlite3.Connection, df_long: pd.DataFrame) -> None:
-    if df_long is None or df_long.empty:
-        return
-
-    dfw = df_long.copy()
-    dfw["volume"] = pd.to_numeric(dfw["volume"], errors="coerce")
-    for col in ["open", "high", "low", "close"]:
-        dfw[col] = pd.to_numeric(dfw[col], errors="coerce")
-
-    rows = [
-        (
-            str(r.symbol),
-            str(r.date)[:10],
-            None if pd.isna(r.open) else float(r.open),
-            None if pd.isna(r.high) else float(r.high),
-            None if pd.isna(r.low) else float(r.low),
-            None if pd.isna(r.close) else float(r.close),
-            None if pd.isna(r.volume) else int(r.volume),
-        )
-        for r in dfw.itertuples(index=False)
-    ]
-
-    conn.executemany(
-        "INSERT OR REPLACE INTO stock_prices (symbol, date, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?)",
-        rows,
-    )
-
-
 def _write_download_errors(
     conn: sqlite3.Connection,
     final_failed: Dict[str, str],
@@ -778,9 +909,9 @@ def run_sync(
     ok_set: set[str] = set()
     final_failed: Dict[str, str] = {}
 
-    conn = sqlite3.connect(db_path, timeout=120)
-    try:
-        for batch in pbar:
+    # ✅ 寫入交給背景 writer（合併交易、不擋下載）；離開 with 時 flush + checkpoint
+    with DbWriter(db_path, name="uk", job="uk_prices") as writer:
+        for bi, batch in enumerate(pbar):
             df_long, failed_batch, err_msg = _download_batch(batch, start_ymd, end_excl_date)
 
             if err_msg:
@@ -792,8 +923,7 @@ def run_sync(
             if df_long is not None and not df_long.empty:
                 # ✅ normalize before write
                 df_long = _normalize_prices_long(df_long, prev_close_seed=prev_seed)
-                _insert_prices(conn, df_long)
-                conn.commit()
+                writer.submit(PRICES_UPSERT_SQL, price_rows(df_long), tag=f"batch:{bi}")
 
             failed_batch_set = set(failed_batch or [])
             for sym in batch:
@@ -811,8 +941,7 @@ def run_sync(
                     if df_one is not None and not df_one.empty:
                         # ✅ normalize before write (single)
                         df_one = _normalize_prices_long(df_one, prev_close_seed=prev_seed)
-                        _insert_prices(conn, df_one)
-                        conn.commit()
+                        writer.submit(PRICES_UPSERT_SQL, price_rows(df_one), tag=f"single:{sym}")
                         ok_set.add(sym)
                         final_failed.pop(sym, None)
                     else:
@@ -822,6 +951,11 @@ def run_sync(
 
             time.sleep(_batch_sleep_sec())
 
+    writer_stats = writer.stats
+    log(f"💾 writer: {writer_stats['rows']} rows / {writer_stats['batches']} batches in {writer_stats['commits']} commits")
+
+    conn = sqlite3.connect(db_path, timeout=120)
+    try:
         _write_download_errors(conn, final_failed, name_map, start_ymd, end_inclusive)
         conn.commit()
 
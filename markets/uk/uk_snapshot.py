@@ -14,7 +14,7 @@ import os
 import sqlite3
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
 import pandas as pd
 
@@ -218,6 +218,61 @@ def _compute_streaks(df: pd.DataFrame) -> pd.DataFrame:
     return df.drop(columns=["g"], errors="ignore")
 
 
+# Load recent rows per symbol (for streak), with prev_close via LAG(close)
+_SNAPSHOT_SQL = """
+WITH base AS (
+  SELECT
+    sp.symbol,
+    sp.date AS ymd,
+    sp.open, sp.high, sp.low, sp.close, sp.volume,
+    LAG(sp.close) OVER (PARTITION BY sp.symbol ORDER BY sp.date) AS prev_close,
+    i.name,
+    i.sector,
+    i.market_detail,
+    ROW_NUMBER() OVER (PARTITION BY sp.symbol ORDER BY sp.date DESC) AS rn
+  FROM stock_prices sp
+  JOIN stock_info i ON i.symbol = sp.symbol
+  WHERE i.market='UK' AND sp.date <= ?
+)
+SELECT
+  symbol, ymd, open, high, low, close, volume, prev_close,
+  name, sector, market_detail
+FROM base
+WHERE rn <= ?
+"""
+
+# --replay: same LAG pass over [start, end] plus each symbol's last N rows before start
+# (tail N rows per day == rn <= N of _SNAPSHOT_SQL)
+_REPLAY_SQL = """
+WITH base AS (
+  SELECT
+    sp.symbol,
+    sp.date AS ymd,
+    sp.open, sp.high, sp.low, sp.close, sp.volume,
+    LAG(sp.close) OVER (PARTITION BY sp.symbol ORDER BY sp.date) AS prev_close,
+    i.name,
+    i.sector,
+    i.market_detail
+  FROM stock_prices sp
+  JOIN stock_info i ON i.symbol = sp.symbol
+  WHERE i.market='UK' AND sp.date <= ?
+),
+ranked AS (
+  SELECT
+    *,
+    SUM(CASE WHEN ymd < ? THEN 1 ELSE 0 END)
+      OVER (PARTITION BY symbol ORDER BY ymd DESC ROWS UNBOUNDED PRECEDING) AS pre_rn
+  FROM base
+)
+SELECT
+  symbol, ymd, open, high, low, close, volume, prev_close,
+  name, sector, market_detail
+FROM ranked
+WHERE ymd >= ? OR pre_rn <= ?
+ORDER BY symbol, ymd
+"""
+
+
 def run_intraday(slot: str, asof: str, ymd: str, db_path: Optional[Path] = None) -> Dict[str, Any]:
     db_path = db_path or _db_path()
     if isinstance(db_path, str):
@@ -232,32 +287,50 @@ def run_intraday(slot: str, asof: str, ymd: str, db_path: Optional[Path] = None)
         log(f"🕒 requested ymd={ymd} slot={slot} asof={asof}")
         log(f"📅 ymd_effective = {ymd_effective}")
 
-        # Load recent rows per symbol (for streak), with prev_close via LAG(close)
-        sql = """
-        WITH base AS (
-          SELECT
-            sp.symbol,
-            sp.date AS ymd,
-            sp.open, sp.high, sp.low, sp.close, sp.volume,
-            LAG(sp.close) OVER (PARTITION BY sp.symbol ORDER BY sp.date) AS prev_close,
-            i.name,
-            i.sector,
-            i.market_detail,
-            ROW_NUMBER() OVER (PARTITION BY sp.symbol ORDER BY sp.date DESC) AS rn
-          FROM stock_prices sp
-          JOIN stock_info i ON i.symbol = sp.symbol
-          WHERE i.market='UK' AND sp.date <= ?
-        )
-        SELECT
-          symbol, ymd, open, high, low, close, volume, prev_close,
-          name, sector, market_detail
-        FROM base
-        WHERE rn <= ?
-        """
-        df = pd.read_sql_query(sql, conn, params=(ymd_effective, int(UK_STREAK_LOOKBACK_ROWS)))
+        df = pd.read_sql_query(_SNAPSHOT_SQL, conn, params=(ymd_effective, int(UK_STREAK_LOOKBACK_ROWS)))
+    finally:
+        conn.close()
+
+    return _build_payload(df, slot=slot, asof=asof, ymd=ymd, ymd_effective=ymd_effective, db_path=db_path)
+
+
+def load_replay(start: str, end: str, db_path: Optional[Path] = None) -> Mapping:
+    """
+    --replay: one LAG pass over the warehouse -> {ymd_effective: last N rows per symbol <= ymd}
+    (per-day slices are cut lazily; streaks are recomputed per slice exactly like run_intraday)
+    """
+    from markets.replay import LazyDays, tail_rows, trading_days
+
+    db_path = Path(db_path or _db_path())
+    if not db_path.exists():
+        raise FileNotFoundError(f"UK DB not found: {db_path} (set UK_DB_PATH to override)")
+
+    n = int(UK_STREAK_LOOKBACK_ROWS)
+    conn = sqlite3.connect(str(db_path))
+    try:
+        days = trading_days(conn, start, end)
+        df = pd.read_sql_query(_REPLAY_SQL, conn, params=(end, start, start, n))
     finally:
         conn.close()
+    return LazyDays(days, lambda d: tail_rows(df, d, n))
+
+
+def replay_payload(ymd: str, day: pd.DataFrame, *, slot: str, asof: str) -> Dict[str, Any]:
+    return _build_payload(day, slot=slot, asof=asof, ymd=ymd, ymd_effective=ymd, db_path=Path(_db_path()))
 
+
+def _build_payload(
+    df: pd.DataFrame,
+    *,
+    slot: str,
+    asof: str,
+    ymd: str,
+    ymd_effective: str,
+    db_path: Path,
+) -> Dict[str, Any]:
+    """
+    lookback rows (last N per symbol, <= ymd_effective) -> raw payload (shared by run_intraday / replay)
+    """
     # ---- build meta.time (DST-aware) early so even empty payload has it ----
     time_meta = _build_time_meta_uk(ymd_effective=str(ymd_effective)[:10], asof=str(asof))
 
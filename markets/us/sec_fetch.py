@@ -0,0 +1,302 @@
+# markets/us/sec_fetch.py
+# -*- coding: utf-8 -*-
+"""
+SEC submissions (SIC) fetcher — shared by
+  - markets/us/sec_industry_sync.py        (daily DB sector fill)
+  - stocksymboldownload/download_us.py     (sec_industry_cache.json builder)
+
+✅ 一個 keep-alive session（連線池大小 = workers）
+✅ Token bucket 限速：SEC fair-access 上限 10 requests / second（整個 process 共用）
+✅ 條件式請求：cache 有 etag / last_modified 時送 If-None-Match / If-Modified-Since，
+   304 => 沿用舊值、只更新 fetched_at（新鮮度本身仍由呼叫端的 TTL 判斷，新鮮的不會送出請求）
+✅ 429 / 5xx / 連線錯誤 => 退避重試（尊重 Retry-After）
+✅ 同一個 CIK 只抓一次（呼叫端以 CIK 去重）
+✅ on_result 在呼叫端的 thread 執行（可直接寫 sqlite / dict），on_flush 定期呼叫，
+   中斷（Ctrl-C / 例外）時也會先 flush，已抓到的進度不會丟
+
+Env:
+- US_SEC_RPS          (default 10, capped at 10)
+- US_SEC_WORKERS      (default 8)
+- US_SEC_RETRIES      (default 3)
+- US_SEC_FLUSH_EVERY  (default 250 results)
+- US_SEC_FLUSH_SEC    (default 30)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from markets.datasource import http_get
+from markets.ratelimit import TokenBucket
+
+SEC_SUBMISSIONS_URL_TMPL = "https://data.sec.gov/submissions/CIK{cik10}.json"
+
+# https://www.sec.gov/os/accessing-edgar-data : max 10 requests per second
+SEC_MAX_RPS = 10.0
+
+
+def _rps() -> float:
+    try:
+        v = float(os.getenv("US_SEC_RPS", str(SEC_MAX_RPS)))
+    except Exception:
+        v = SEC_MAX_RPS
+    return max(0.1, min(v, SEC_MAX_RPS))
+
+
+# process-wide: SEC's limit is per client, so every fetch_many / fetch_sic call shares it
+_BUCKET: Optional[TokenBucket] = None
+_BUCKET_LOCK = threading.Lock()
+
+
+def shared_bucket(rps: Optional[float] = None) -> TokenBucket:
+    """
+    The process's SEC token bucket (created on first use at US_SEC_RPS).
+    A lower rps from a later caller slows it down; a higher one never speeds it up.
+    """
+    global _BUCKET
+    rate = max(0.1, min(float(rps or _rps()), SEC_MAX_RPS))
+    with _BUCKET_LOCK:
+        if _BUCKET is None:
+            _BUCKET = TokenBucket(rate)
+        elif rate < _BUCKET.rate:
+            _BUCKET.rate = rate
+        return _BUCKET
+
+
+def _workers() -> int:
+    return max(1, int(os.getenv("US_SEC_WORKERS", "8")))
+
+
+def _retries() -> int:
+    return max(0, int(os.getenv("US_SEC_RETRIES", "3")))
+
+
+def _flush_every() -> int:
+    return max(1, int(os.getenv("US_SEC_FLUSH_EVERY", "250")))
+
+
+def _flush_sec() -> float:
+    return float(os.getenv("US_SEC_FLUSH_SEC", "30"))
+
+
+# =============================================================================
+# Session
+# =============================================================================
+def make_session(user_agent: str, *, pool_size: Optional[int] = None) -> Any:
+    """
+    requests.Session with a keep-alive pool big enough for all workers.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    n = int(pool_size or _workers())
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(2, n))
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.headers.update(
+        {
+            "User-Agent": user_agent,
+            "Accept": "application/json,text/plain,*/*",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        }
+    )
+    return s
+
+
+# =============================================================================
+# Fetch
+# =============================================================================
+@dataclass
+class SicJob:
+    cik: str  # 10 digits
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+@dataclass
+class SicResult:
+    cik: str
+    sic: Optional[str] = None
+    sic_description: Optional[str] = None
+    err: Optional[str] = None
+    not_modified: bool = False  # 304: keep cached sic / sicDescription
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    attempts: int = 0
+
+
+def _retry_after(r: Any, attempt: int) -> float:
+    try:
+        v = float(r.headers.get("Retry-After"))
+        if v > 0:
+            return min(v, 60.0)
+    except Exception:
+        pass
+    return min(30.0, 1.0 * (2 ** attempt))
+
+
+def fetch_sic(
+    session: Any,
+    job: SicJob,
+    *,
+    timeout: float,
+    bucket: Optional[TokenBucket] = None,
+    retries: Optional[int] = None,
+) -> SicResult:
+    """
+    One submissions request (conditional when the job carries etag / last_modified).
+    Never raises; errors are returned in SicResult.err ("http_404", "exception:...").
+    bucket defaults to shared_bucket().
+    """
+    if bucket is None:
+        bucket = shared_bucket()
+    url = SEC_SUBMISSIONS_URL_TMPL.format(cik10=job.cik)
+    headers: Dict[str, str] = {}
+    if job.etag:
+        headers["If-None-Match"] = job.etag
+    if job.last_modified:
+        headers["If-Modified-Since"] = job.last_modified
+
+    n_retry = _retries() if retries is None else int(retries)
+    res = SicResult(cik=job.cik)
+    for attempt in range(n_retry + 1):
+        res.attempts = attempt + 1
+        bucket.acquire()
+        try:
+            r = http_get(url, session=session, headers=headers, timeout=timeout)
+        except Exception as e:
+            res.err = f"exception:{e}"
+            time.sleep(min(30.0, 0.5 * (2 ** attempt)))
+            continue
+
+        if r.status_code == 304:
+            res.not_modified = True
+            res.err = None
+            res.etag = r.headers.get("ETag") or job.etag
+            res.last_modified = r.headers.get("Last-Modified") or job.last_modified
+            return res
+
+        if r.status_code == 429 or r.status_code >= 500:
+            res.err = f"http_{r.status_code}"
+            wait_s = _retry_after(r, attempt)
+            if bucket is not None and r.status_code == 429:
+                bucket.pause(wait_s)
+            else:
+                time.sleep(wait_s)
+            continue
+
+        if r.status_code != 200:
+            res.err = f"http_{r.status_code}"
+            return res
+
+        try:
+            j = r.json()
+        except Exception as e:
+            res.err = f"exception:{e}"
+            return res
+
+        sic = j.get("sic")
+        sic_desc = j.get("sicDescription")
+        res.sic = str(sic) if sic not in (None, "") else None
+        res.sic_description = str(sic_desc) if sic_desc not in (None, "") else None
+        res.etag = r.headers.get("ETag")
+        res.last_modified = r.headers.get("Last-Modified")
+        res.err = None
+        return res
+
+    return res
+
+
+def fetch_many(
+    jobs: Iterable[SicJob],
+    *,
+    user_agent: str,
+    timeout: float,
+    on_result: Callable[[SicJob, SicResult], None],
+    on_flush: Optional[Callable[[], None]] = None,
+    session: Any = None,
+    workers: Optional[int] = None,
+    rps: Optional[float] = None,
+    flush_every: Optional[int] = None,
+    flush_sec: Optional[float] = None,
+    progress: Optional[Callable[[int, int, Dict[str, int]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Fetch all jobs concurrently (workers threads, the process-wide token bucket).
+
+    on_result(job, result) and on_flush() run in the calling thread, so they can
+    touch sqlite connections / plain dicts without locks. on_flush also runs
+    once more at the end, including when interrupted.
+    """
+    job_list: List[SicJob] = list(jobs)
+    n_workers = int(workers or _workers())
+    bucket = shared_bucket(rps)
+    every = int(flush_every or _flush_every())
+    every_s = float(_flush_sec() if flush_sec is None else flush_sec)
+    sess = session if session is not None else make_session(user_agent, pool_size=n_workers)
+
+    stats = {"requests": 0, "ok": 0, "not_modified": 0, "failed": 0, "retried": 0, "flushes": 0}
+    t0 = time.perf_counter()
+    since_flush = 0
+    last_flush = time.monotonic()
+
+    def _flush() -> None:
+        nonlocal since_flush, last_flush
+        since_flush = 0
+        last_flush = time.monotonic()
+        if on_flush is not None:
+            on_flush()
+            stats["flushes"] += 1
+
+    it = iter(job_list)
+    done_n = 0
+    ex = ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="sec")
+    try:
+        # bounded in-flight window: an interrupt doesn't leave thousands of queued requests
+        inflight: Dict[Any, SicJob] = {}
+        for job in it:
+            inflight[ex.submit(fetch_sic, sess, job, timeout=timeout, bucket=bucket)] = job
+            if len(inflight) >= n_workers * 2:
+                break
+
+        while inflight:
+            done, _ = wait(list(inflight.keys()), return_when=FIRST_COMPLETED)
+            for fut in done:
+                job = inflight.pop(fut)
+                res = fut.result()
+                done_n += 1
+                stats["requests"] += res.attempts
+                stats["retried"] += max(0, res.attempts - 1)
+                if res.err:
+                    stats["failed"] += 1
+                elif res.not_modified:
+                    stats["not_modified"] += 1
+                else:
+                    stats["ok"] += 1
+                on_result(job, res)
+                since_flush += 1
+
+                nxt = next(it, None)
+                if nxt is not None:
+                    inflight[ex.submit(fetch_sic, sess, nxt, timeout=timeout, bucket=bucket)] = nxt
+
+            if since_flush >= every or (every_s > 0 and time.monotonic() - last_flush >= every_s):
+                _flush()
+            if progress is not None:
+                progress(done_n, len(job_list), stats)
+    finally:
+        ex.shutdown(wait=False, cancel_futures=True)
+        _flush()
+
+    dt = time.perf_counter() - t0
+    stats["jobs"] = len(job_list)
+    stats["elapsed_s"] = round(dt, 1)
+    stats["rate_per_s"] = round(done_n / dt, 2) if dt > 0 else 0.0
+    return stats
@@ -29,9 +29,14 @@ SEC industry (SIC) sync — Local cache first, fetch missing only (complete over
 - US_SEC_CACHE_TTL_DAYS            (default: 30)
 - US_SEC_ONLY_FILL_MISSING         (default: 1)
 - US_SEC_HTTP_TIMEOUT              (default: 20)
-- US_SEC_SLEEP_SEC                 (default: 0.12)
-- US_SEC_MAX_FETCH                 (default: 999999)
+- US_SEC_MAX_FETCH                 (default: 999999)   # 每輪最多打幾個 CIK
 - US_SEC_USER_AGENT                (default: "GrissomQuantLab/1.0 (contact: you@example.com)")
+- US_SEC_RPS / US_SEC_WORKERS / US_SEC_FLUSH_EVERY  併發抓取設定（見 markets/us/sec_fetch.py）
+
+抓取：
+- 需要補抓的 symbol 先依 CIK 去重，再交給 sec_fetch.fetch_many 併發抓（共用 session + token bucket）
+- cache 過期但有 etag / last_modified => 條件式請求，304 只更新 fetched_at
+- 每 US_SEC_FLUSH_EVERY 筆結果 commit DB + 落地 cache（atomic），中斷也保留進度
 """
 
 from __future__ import annotations
@@ -40,13 +45,12 @@ import json
 import os
 import re
 import sqlite3
-import time
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
-import requests
+from markets.us import sec_fetch
 
 # -----------------------------------------------------------------------------
 # Small logger (avoid hard dependency)
@@ -116,10 +120,6 @@ def _timeout() -> int:
     return int(os.getenv("US_SEC_HTTP_TIMEOUT", "20"))
 
 
-def _sleep_sec() -> float:
-    return float(os.getenv("US_SEC_SLEEP_SEC", "0.12"))
-
-
 def _max_fetch() -> int:
     return int(os.getenv("US_SEC_MAX_FETCH", "999999"))
 
@@ -178,6 +178,8 @@ class IndustryInfo:
     sic: Optional[str]
     sic_description: Optional[str]
     fetched_at: str  # ISO Z
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
 
 
 # -----------------------------------------------------------------------------
@@ -212,15 +214,16 @@ def _load_company_tickers(path: Path) -> Dict[str, Dict[str, Any]]:
 # -----------------------------------------------------------------------------
 # Local industry cache (ticker -> IndustryInfo)
 # -----------------------------------------------------------------------------
-def _load_industry_cache(path: Path) -> Dict[str, IndustryInfo]:
-    if not path.exists():
-        return {}
+def _industry_cache_ns(path: Path) -> Any:
+    # pinned (evict=False): the file is shared with download_us.py / Google Drive,
+    # the cache manager only provides the memory tier, atomic writes and counters
+    from engine.cache_manager import namespace
 
-    try:
-        raw = json.loads(path.read_text(encoding="utf-8"))
-    except Exception:
-        return {}
+    return namespace("sec_industry", dir=path.parent, ext=path.suffix, evict=False)
 
+
+def _load_industry_cache(path: Path) -> Dict[str, IndustryInfo]:
+    raw = _industry_cache_ns(path).get(path.stem)
     if not isinstance(raw, dict):
         return {}
 
@@ -239,13 +242,13 @@ def _load_industry_cache(path: Path) -> Dict[str, IndustryInfo]:
             sic=str(v.get("sic")) if v.get("sic") not in (None, "") else None,
             sic_description=str(v.get("sicDescription")) if v.get("sicDescription") not in (None, "") else None,
             fetched_at=str(v.get("fetched_at") or v.get("fetchedAt") or ""),
+            etag=str(v.get("etag")) if v.get("etag") else None,
+            last_modified=str(v.get("last_modified")) if v.get("last_modified") else None,
         )
     return out
 
 
 def _save_industry_cache(path: Path, cache: Dict[str, IndustryInfo]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-
     out: Dict[str, Dict[str, Any]] = {}
     for sym, info in cache.items():
         out[_norm_symbol(sym)] = {
@@ -253,9 +256,12 @@ def _save_industry_cache(path: Path, cache: Dict[str, IndustryInfo]) -> None:
             "sic": info.sic,
             "sicDescription": info.sic_description,
             "fetched_at": info.fetched_at,
+            "etag": info.etag,
+            "last_modified": info.last_modified,
         }
 
-    path.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
+    # atomic: an interrupted flush never leaves a half-written cache
+    _industry_cache_ns(path).set(path.stem, out)
 
 
 def _is_cache_fresh(info: IndustryInfo, ttl_days: int) -> bool:
@@ -274,32 +280,11 @@ def _is_cache_fresh(info: IndustryInfo, ttl_days: int) -> bool:
 # -----------------------------------------------------------------------------
 def _fetch_submissions_sic(cik10: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
     """
-    returns (sic, sicDescription, err)
+    returns (sic, sicDescription, err) — single request, for ad-hoc use
     """
-    url = f"https://data.sec.gov/submissions/CIK{cik10}.json"
-    headers = {
-        "User-Agent": _user_agent(),
-        "Accept": "application/json,text/plain,*/*",
-        "Accept-Encoding": "gzip, deflate",
-        "Host": "data.sec.gov",
-        "Connection": "keep-alive",
-    }
-
-    try:
-        r = requests.get(url, headers=headers, timeout=_timeout())
-        if r.status_code != 200:
-            return None, None, f"http_{r.status_code}"
-
-        j = r.json()
-        sic = j.get("sic")
-        sic_desc = j.get("sicDescription")
-
-        sic_s = str(sic) if sic not in (None, "") else None
-        sic_desc_s = str(sic_desc) if sic_desc not in (None, "") else None
-        return sic_s, sic_desc_s, None
-
-    except Exception as e:
-        return None, None, f"exception:{e}"
+    session = sec_fetch.make_session(_user_agent(), pool_size=1)
+    r = sec_fetch.fetch_sic(session, sec_fetch.SicJob(cik=cik10), timeout=_timeout())
+    return r.sic, r.sic_description, r.err
 
 
 # -----------------------------------------------------------------------------
@@ -363,6 +348,7 @@ def sync_sec_industry(db_path: str) -> Dict[str, Any]:
         "only_fill_missing": _only_fill_missing(),
         "ttl_days": ttl,
         "fetched": 0,
+        "not_modified": 0,
         "cache_hit": 0,
         "cache_stale": 0,
         "updated_db": 0,
@@ -392,7 +378,11 @@ def sync_sec_industry(db_path: str) -> Dict[str, Any]:
         targets = list(symbols.keys())
         res["targets"] = len(targets)
 
-        for idx, sym in enumerate(targets, 1):
+        # CIK -> symbols that need it (one request per CIK: BRK-A / BRK-B, GOOG / GOOGL ...)
+        need: Dict[str, List[str]] = {}
+        conditional: Dict[str, IndustryInfo] = {}
+
+        for sym in targets:
             db_sector = symbols[sym].get("sector")
 
             # 只補缺：DB 已有 sector 就跳過
@@ -420,42 +410,80 @@ def sync_sec_industry(db_path: str) -> Dict[str, Any]:
                 res["missing_cik"] += 1
                 continue
 
-            # 4) 限制本輪 fetch 數
-            if res["fetched"] >= _max_fetch():
-                res["notes"].append(f"max_fetch_reached:{_max_fetch()}")
-                break
-
-            # 5) 打 SEC
-            sic, sic_desc, err = _fetch_submissions_sic(cik)
-            res["fetched"] += 1
-            time.sleep(_sleep_sec())
+            need.setdefault(cik, []).append(sym)
+            # 過期但有資料 + validator => 條件式請求（304 沿用舊值）
+            if info and info.cik == cik and (info.sic_description or info.sic) and (info.etag or info.last_modified):
+                conditional.setdefault(cik, info)
 
-            if err:
-                res["failed"] += 1
-                continue
+        conn.commit()
 
-            # 6) 更新 cache
-            cache[sym] = IndustryInfo(
-                cik=cik,
-                sic=sic,
-                sic_description=sic_desc,
-                fetched_at=_now_iso(),
+        # 4) 限制本輪 fetch 數（以 CIK 計）
+        ciks = list(need.keys())
+        if len(ciks) > _max_fetch():
+            res["notes"].append(f"max_fetch_reached:{_max_fetch()}")
+            ciks = ciks[: _max_fetch()]
+        res["fetch_ciks"] = len(ciks)
+
+        jobs = [
+            sec_fetch.SicJob(
+                cik=c,
+                etag=conditional[c].etag if c in conditional else None,
+                last_modified=conditional[c].last_modified if c in conditional else None,
             )
+            for c in ciks
+        ]
 
-            # 7) 寫回 DB
-            if sic_desc or sic:
-                sector = sic_desc or f"SIC {sic}"
-                _update_sector(conn, sym, sector)
-                res["updated_db"] += 1
+        def _on_result(job: sec_fetch.SicJob, r: sec_fetch.SicResult) -> None:
+            res["fetched"] += 1
+            if r.err:
+                res["failed"] += 1
+                return
+
+            sic, sic_desc = r.sic, r.sic_description
+            if r.not_modified:
+                res["not_modified"] += 1
+                old = conditional[job.cik]
+                sic, sic_desc = old.sic, old.sic_description
+
+            now = _now_iso()
+            for sym in need.get(job.cik, []):
+                # 5) 更新 cache
+                cache[sym] = IndustryInfo(
+                    cik=job.cik,
+                    sic=sic,
+                    sic_description=sic_desc,
+                    fetched_at=now,
+                    etag=r.etag,
+                    last_modified=r.last_modified,
+                )
+                # 6) 寫回 DB
+                if sic_desc or sic:
+                    _update_sector(conn, sym, sic_desc or f"SIC {sic}")
+                    res["updated_db"] += 1
+
+        def _on_flush() -> None:
+            conn.commit()
+            _save_industry_cache(cp, cache)
 
-            if idx == 1 or idx % 500 == 0:
+        def _progress(done: int, total: int, st: Dict[str, int]) -> None:
+            if done == 1 or done % 500 == 0 or done == total:
                 log(
-                    f"[SEC sync] {idx}/{len(targets)} | "
+                    f"[SEC sync] fetch {done}/{total} | "
                     f"updated_db={res['updated_db']} cache_hit={res['cache_hit']} "
-                    f"fetched={res['fetched']} failed={res['failed']} "
+                    f"ok={st['ok']} not_modified={st['not_modified']} failed={res['failed']} "
                     f"stale={res['cache_stale']} missing_cik={res['missing_cik']}"
                 )
 
+        if jobs:
+            res["fetch_stats"] = sec_fetch.fetch_many(
+                jobs,
+                user_agent=_user_agent(),
+                timeout=_timeout(),
+                on_result=_on_result,
+                on_flush=_on_flush,
+                progress=_progress,
+            )
+
         conn.commit()
 
     finally:
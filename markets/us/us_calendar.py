@@ -7,7 +7,6 @@ from __future__ import annotations
 from typing import Optional, Tuple
 
 import pandas as pd
-import yfinance as yf
 
 def _latest_n_trading_days_window(
     n: int = 30,
@@ -20,11 +19,13 @@ def _latest_n_trading_days_window(
     - end_inclusive_ymd：最後一個交易日
     - end_exclusive_ymd：end_inclusive + 1 day（給 yfinance end=exclusive）
     """
+    from markets.datasource import yf_download
+
     try:
         end_dt = pd.Timestamp.today().normalize()
         start_dt = end_dt - pd.Timedelta(days=int(lookback_cal_days))
 
-        df = yf.download(
+        df = yf_download(
             proxy_symbol,
             start=start_dt.strftime("%Y-%m-%d"),
             end=(end_dt + pd.Timedelta(days=1)).strftime("%Y-%m-%d"),
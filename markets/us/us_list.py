@@ -14,7 +14,8 @@ from typing import List, Tuple
 
 import pandas as pd
 import sqlite3
-import requests
+
+from markets.datasource import http_get
 
 from .us_db import init_db
 from .us_config import NASDAQ_API, NASDAQ_REFERER, EXCLUDE_NAME_RE, TICKER_RE, log
@@ -29,7 +30,7 @@ def _fetch_us_list_from_nasdaq_api() -> List[dict]:
         "Accept": "application/json, text/plain, */*",
         "Referer": NASDAQ_REFERER,
     }
-    r = requests.get(NASDAQ_API, headers=headers, timeout=30)
+    r = http_get(NASDAQ_API, headers=headers, timeout=30)
     r.raise_for_status()
     j = r.json()
     rows = (j.get("data") or {}).get("rows") or []
@@ -42,7 +43,7 @@ def _fetch_us_list_fallback_csv() -> List[dict]:
     """
     log("📡 Nasdaq API failed; using fallback CSV list (Stooq) ...")
     url = "https://stooq.com/q/l/?s=us&i=1"
-    r = requests.get(url, timeout=30)
+    r = http_get(url, timeout=30)
     r.raise_for_status()
 
     df = pd.read_csv(io.StringIO(r.text))
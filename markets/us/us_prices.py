@@ -5,7 +5,7 @@ US rolling-window price sync (DB-based) — Batch + Clean Stats
 
 你要的重點：
 ✅ 保留對外 API：run_sync(start_date=None, end_date=None, refresh_list=True)
-✅ 下載改 batch：yf.download("AAPL MSFT ...", group_by="ticker")
+✅ 下載改 batch：yf_download("AAPL MSFT ...", group_by="ticker")
 ✅ 統計「不灌水」：每個 ticker 最終只算一次 ok/failed（fallback 成功會把 failed 改 ok）
 ✅ batch error 記錄更乾淨：download_errors 只寫「最終仍失敗」的 ticker（不重複、不洗版）
 ✅ fallback 寫入更快：executemany + INSERT OR REPLACE
@@ -34,9 +34,11 @@ from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
-import yfinance as yf
 from tqdm import tqdm
 
+from engine.db_writer import PRICES_UPSERT_SQL, DbWriter, price_rows
+from markets.spans import span, span_fn
+
 # -----------------------------------------------------------------------------
 # Optional imports (repo 已拆模組；若不存在就走內建 fallback)
 # -----------------------------------------------------------------------------
@@ -164,7 +166,10 @@ def init_db(db_path: str) -> None:
 # =============================================================================
 # Calendar helpers (fallback internal)
 # =============================================================================
+@span_fn("calendar")
 def _latest_trading_day_from_calendar(asof_ymd: Optional[str] = None) -> Optional[str]:
+    from markets.datasource import yf_download
+
     if _latest_td_ext is not None:
         try:
             return _latest_td_ext(asof_ymd=asof_ymd)
@@ -177,7 +182,7 @@ def _latest_trading_day_from_calendar(asof_ymd: Optional[str] = None) -> Optiona
     try:
         end_dt = pd.to_datetime(asof_ymd) if asof_ymd else pd.Timestamp.now()
         start_dt = end_dt - timedelta(days=lookback)
-        df = yf.download(
+        df = yf_download(
             cal_ticker,
             start=start_dt.strftime("%Y-%m-%d"),
             end=(end_dt + timedelta(days=1)).strftime("%Y-%m-%d"),
@@ -200,7 +205,10 @@ def _latest_trading_day_from_calendar(asof_ymd: Optional[str] = None) -> Optiona
         return None
 
 
+@span_fn("calendar")
 def _infer_window_by_trading_days(end_ymd: str, n_trading_days: int) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    from markets.datasource import yf_download
+
     if _infer_window_ext is not None:
         try:
             return _infer_window_ext(end_ymd=end_ymd, n_trading_days=n_trading_days)
@@ -212,7 +220,7 @@ def _infer_window_by_trading_days(end_ymd: str, n_trading_days: int) -> Tuple[Op
     try:
         end_dt = pd.to_datetime(end_ymd)
         start_dt = end_dt - timedelta(days=lookback)
-        df = yf.download(
+        df = yf_download(
             cal_ticker,
             start=start_dt.strftime("%Y-%m-%d"),
             end=(end_dt + timedelta(days=1)).strftime("%Y-%m-%d"),
@@ -246,6 +254,7 @@ def _infer_window_by_trading_days(end_ymd: str, n_trading_days: int) -> Tuple[Op
 # =============================================================================
 # List helpers
 # =============================================================================
+@span_fn("list_refresh")
 def _get_us_items(db_path: str, refresh_list: bool) -> List[Tuple[str, str]]:
     """
     回傳 [(symbol, name), ...]
@@ -296,11 +305,13 @@ def _get_us_items(db_path: str, refresh_list: bool) -> List[Tuple[str, str]]:
 # Download core (batch + single fallback)
 # =============================================================================
 def _download_one(symbol: str, start_date: str, end_date_exclusive: str) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    from markets.datasource import yf_download
+
     max_retries = 2
     last_err: Optional[str] = None
     for attempt in range(max_retries + 1):
         try:
-            df = yf.download(
+            df = yf_download(
                 symbol,
                 start=start_date,
                 end=end_date_exclusive,
@@ -357,12 +368,14 @@ def _download_batch(
     回傳 (long_df, failed_tickers, err_msg)
     long_df 欄位：symbol,date,open,high,low,close,volume
     """
+    from markets.datasource import yf_download
+
     if not tickers:
         empty = pd.DataFrame(columns=["symbol", "date", "open", "high", "low", "close", "volume"])
         return empty, [], None
 
     try:
-        df = yf.download(
+        df = yf_download(
             tickers=" ".join(tickers),
             start=start_date,
             end=end_date_exclusive,
@@ -466,34 +479,6 @@ def _download_batch(
     return out, sorted(list(set(failed))), None
 
 
-def _insert_prices(conn: sqlite3.Connection, df_long: pd.DataFrame) -> None:
-    if df_long is None or df_long.empty:
-        return
-
-    dfw = df_long.copy()
-    dfw["volume"] = pd.to_numeric(dfw["volume"], errors="coerce")
-    for col in ["open", "high", "low", "close"]:
-        dfw[col] = pd.to_numeric(dfw[col], errors="coerce")
-
-    rows = [
-        (
-            str(r.symbol),
-            str(r.date)[:10],
-            None if pd.isna(r.open) else float(r.open),
-            None if pd.isna(r.high) else float(r.high),
-            None if pd.isna(r.low) else float(r.low),
-            None if pd.isna(r.close) else float(r.close),
-            None if pd.isna(r.volume) else int(r.volume),
-        )
-        for r in dfw.itertuples(index=False)
-    ]
-
-    conn.executemany(
-        "INSERT OR REPLACE INTO stock_prices (symbol, date, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?)",
-        rows,
-    )
-
-
 def _write_download_errors(
     conn: sqlite3.Connection,
     final_failed: Dict[str, str],
@@ -592,10 +577,12 @@ def run_sync(
     ok_set: set[str] = set()
     final_failed: Dict[str, str] = {}
 
-    conn = sqlite3.connect(db_path, timeout=120)
-    try:
-        for batch in pbar:
-            df_long, failed_batch, err_msg = _download_batch(batch, start_ymd, end_excl_date)
+    # ✅ 寫入交給背景 writer（合併交易、不擋下載）；離開 with 時 flush + checkpoint
+    with DbWriter(db_path, name="us", job="us_prices") as writer:
+        for bi, batch in enumerate(pbar):
+            with span("download_batch", market="us") as sp:
+                df_long, failed_batch, err_msg = _download_batch(batch, start_ymd, end_excl_date)
+                sp.rows = 0 if df_long is None else len(df_long)
 
             if err_msg:
                 # 整批掛：先把 batch 都標成 failed（原因相同），再看 fallback 是否救回
@@ -606,8 +593,7 @@ def run_sync(
 
             # 寫入成功 rows
             if df_long is not None and not df_long.empty:
-                _insert_prices(conn, df_long)
-                conn.commit()
+                writer.submit(PRICES_UPSERT_SQL, price_rows(df_long), tag=f"batch:{bi}")
 
             # batch 級別：暫時把 ok/fail 標記（還可能被 fallback 改寫）
             failed_batch_set = set(failed_batch or [])
@@ -628,8 +614,7 @@ def run_sync(
                 for sym in need_fallback:
                     df_one, err_one = _download_one(sym, start_ymd, end_excl_date)
                     if df_one is not None and not df_one.empty:
-                        _insert_prices(conn, df_one)
-                        conn.commit()
+                        writer.submit(PRICES_UPSERT_SQL, price_rows(df_one), tag=f"single:{sym}")
                         ok_set.add(sym)
                         final_failed.pop(sym, None)  # ✅ fallback 救回：移出最終失敗
                     else:
@@ -640,6 +625,11 @@ def run_sync(
 
             time.sleep(_batch_sleep_sec())
 
+    writer_stats = writer.stats
+    log(f"💾 writer: {writer_stats['rows']} rows / {writer_stats['batches']} batches in {writer_stats['commits']} commits")
+
+    conn = sqlite3.connect(db_path, timeout=120)
+    try:
         # 寫最終失敗清單（乾淨：只寫一次）
         #（不先清 error table，讓你保留歷史；若你要只留最新一輪，可自己在外層先 DELETE）
         _write_download_errors(conn, final_failed, name_map, start_ymd, end_inclusive)
@@ -652,8 +642,9 @@ def run_sync(
             pass
 
         log("🧹 VACUUM...")
-        conn.execute("VACUUM")
-        conn.commit()
+        with span("db_vacuum", market="us"):
+            conn.execute("VACUUM")
+            conn.commit()
     finally:
         conn.close()
 
@@ -680,6 +671,7 @@ def run_sync(
             "threads": bool(_yf_threads_enabled()),
             "fallback_single": bool(_fallback_single_enabled()),
         },
+        "writer": writer_stats,
     }
 
 
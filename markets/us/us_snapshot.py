@@ -12,6 +12,8 @@ from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
 
+from markets.spans import span
+
 from .us_config import log, _db_path
 
 
@@ -146,6 +148,98 @@ def _utcnow_iso() -> str:
     return datetime.now(timezone.utc).isoformat(timespec="seconds")
 
 
+# ✅ 修復：簡化 streak 計算邏輯，使用更清晰的方法
+# {day_filter}: 單日 "f.date = ?" / replay "f.date BETWEEN ? AND ?"（同一個 window pass 算整段）
+_SNAPSHOT_SQL = """
+WITH p AS (
+  SELECT
+    symbol,
+    date,
+    open, high, low, close, volume,
+    LAG(close) OVER (PARTITION BY symbol ORDER BY date) AS prev_close
+  FROM stock_prices
+  WHERE date <= ?
+),
+rets AS (
+  SELECT
+    symbol,
+    date,
+    open, high, low, close, volume,
+    prev_close,
+    CASE
+      WHEN prev_close IS NOT NULL AND prev_close > 0 AND close IS NOT NULL
+      THEN (close / prev_close) - 1.0
+      ELSE NULL
+    END AS ret,
+    CASE
+      WHEN prev_close IS NOT NULL AND prev_close > 0 AND close IS NOT NULL
+           AND (close / prev_close) - 1.0 >= ?
+      THEN 1 ELSE 0
+    END AS hit
+  FROM p
+),
+-- ✅ 修復：使用 SUM 累加當前連續區間內的 hit 數量
+grp AS (
+  SELECT
+    symbol,
+    date,
+    open, high, low, close, volume,
+    prev_close,
+    ret,
+    hit,
+    -- g 標記連續區間：每次遇到 hit=0 時 g 遞增
+    SUM(CASE WHEN hit = 0 THEN 1 ELSE 0 END)
+      OVER (PARTITION BY symbol ORDER BY date ROWS UNBOUNDED PRECEDING) AS g
+  FROM rets
+  WHERE ret IS NOT NULL
+),
+streaked AS (
+  SELECT
+    symbol,
+    date,
+    open, high, low, close, volume,
+    prev_close,
+    ret,
+    hit,
+    -- ✅ 關鍵修復：只計算 hit=1 的記錄數量
+    -- 使用 SUM(hit) 而不是 ROW_NUMBER()，這樣只會累加 hit=1 的天數
+    CASE
+      WHEN hit = 1 THEN
+        SUM(hit) OVER (
+          PARTITION BY symbol, g
+          ORDER BY date
+          ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+        )
+      ELSE 0
+    END AS streak
+  FROM grp
+),
+final AS (
+  SELECT
+    s.*,
+    LAG(s.hit)    OVER (PARTITION BY s.symbol ORDER BY s.date) AS hit_prev,
+    LAG(s.streak) OVER (PARTITION BY s.symbol ORDER BY s.date) AS streak_prev
+  FROM streaked s
+)
+SELECT
+  f.symbol,
+  f.date AS ymd,
+  f.open, f.high, f.low, f.close, f.volume,
+  f.prev_close,
+  f.ret,
+  f.hit,
+  f.streak,
+  COALESCE(f.hit_prev, 0) AS hit_prev,
+  COALESCE(f.streak_prev, 0) AS streak_prev,
+  i.name,
+  i.sector,
+  i.market_detail
+FROM final f
+JOIN stock_info i ON i.symbol = f.symbol
+WHERE i.market='US' AND {day_filter}
+"""
+
+
 def run_intraday(slot: str, asof: str, ymd: str, db_path: Optional[Path] = None) -> Dict[str, Any]:
     db_path = db_path or _db_path()
     if isinstance(db_path, str):
@@ -160,99 +254,60 @@ def run_intraday(slot: str, asof: str, ymd: str, db_path: Optional[Path] = None)
         log(f"🕒 requested ymd={ymd} slot={slot} asof={asof}")
         log(f"📅 ymd_effective = {ymd_effective}")
 
-        # ✅ 修復：簡化 streak 計算邏輯，使用更清晰的方法
-        sql = """
-        WITH p AS (
-          SELECT
-            symbol,
-            date,
-            open, high, low, close, volume,
-            LAG(close) OVER (PARTITION BY symbol ORDER BY date) AS prev_close
-          FROM stock_prices
-          WHERE date <= ?
-        ),
-        rets AS (
-          SELECT
-            symbol,
-            date,
-            open, high, low, close, volume,
-            prev_close,
-            CASE
-              WHEN prev_close IS NOT NULL AND prev_close > 0 AND close IS NOT NULL
-              THEN (close / prev_close) - 1.0
-              ELSE NULL
-            END AS ret,
-            CASE
-              WHEN prev_close IS NOT NULL AND prev_close > 0 AND close IS NOT NULL
-                   AND (close / prev_close) - 1.0 >= ?
-              THEN 1 ELSE 0
-            END AS hit
-          FROM p
-        ),
-        -- ✅ 修復：使用 SUM 累加當前連續區間內的 hit 數量
-        grp AS (
-          SELECT
-            symbol,
-            date,
-            open, high, low, close, volume,
-            prev_close,
-            ret,
-            hit,
-            -- g 標記連續區間：每次遇到 hit=0 時 g 遞增
-            SUM(CASE WHEN hit = 0 THEN 1 ELSE 0 END)
-              OVER (PARTITION BY symbol ORDER BY date ROWS UNBOUNDED PRECEDING) AS g
-          FROM rets
-          WHERE ret IS NOT NULL
-        ),
-        streaked AS (
-          SELECT
-            symbol,
-            date,
-            open, high, low, close, volume,
-            prev_close,
-            ret,
-            hit,
-            -- ✅ 關鍵修復：只計算 hit=1 的記錄數量
-            -- 使用 SUM(hit) 而不是 ROW_NUMBER()，這樣只會累加 hit=1 的天數
-            CASE
-              WHEN hit = 1 THEN
-                SUM(hit) OVER (
-                  PARTITION BY symbol, g
-                  ORDER BY date
-                  ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
-                )
-              ELSE 0
-            END AS streak
-          FROM grp
-        ),
-        final AS (
-          SELECT
-            s.*,
-            LAG(s.hit)    OVER (PARTITION BY s.symbol ORDER BY s.date) AS hit_prev,
-            LAG(s.streak) OVER (PARTITION BY s.symbol ORDER BY s.date) AS streak_prev
-          FROM streaked s
-        )
-        SELECT
-          f.symbol,
-          f.date AS ymd,
-          f.open, f.high, f.low, f.close, f.volume,
-          f.prev_close,
-          f.ret,
-          f.hit,
-          f.streak,
-          COALESCE(f.hit_prev, 0) AS hit_prev,
-          COALESCE(f.streak_prev, 0) AS streak_prev,
-          i.name,
-          i.sector,
-          i.market_detail
-        FROM final f
-        JOIN stock_info i ON i.symbol = f.symbol
-        WHERE i.market='US' AND f.date = ?
-        """
-        df = pd.read_sql_query(sql, conn, params=(ymd_effective, US_RET_TH, ymd_effective))
+        with span("snapshot_sql", market="us") as sp:
+            df = pd.read_sql_query(
+                _SNAPSHOT_SQL.format(day_filter="f.date = ?"),
+                conn,
+                params=(ymd_effective, US_RET_TH, ymd_effective),
+            )
+            sp.rows = len(df)
     finally:
         conn.close()
 
+    return _build_payload(df, slot=slot, asof=asof, ymd=ymd, ymd_effective=ymd_effective, db_path=db_path)
+
+
+def load_replay(start: str, end: str, db_path: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    --replay：一次 range SQL（causal window：date <= end）=> {ymd_effective: 當天的 df}
+    """
+    from markets.replay import split_days, trading_days
+
+    db_path = Path(db_path or _db_path())
+    if not db_path.exists():
+        raise FileNotFoundError(f"US DB not found: {db_path} (set US_DB_PATH to override)")
+
+    conn = sqlite3.connect(str(db_path))
+    try:
+        days = trading_days(conn, start, end)
+        with span("snapshot_sql", market="us") as sp:
+            df = pd.read_sql_query(
+                _SNAPSHOT_SQL.format(day_filter="f.date BETWEEN ? AND ?"),
+                conn,
+                params=(end, US_RET_TH, start, end),
+            )
+            sp.rows = len(df)
+    finally:
+        conn.close()
+    return split_days(df, days)
+
+
+def replay_payload(ymd: str, day: pd.DataFrame, *, slot: str, asof: str) -> Dict[str, Any]:
+    return _build_payload(day, slot=slot, asof=asof, ymd=ymd, ymd_effective=ymd, db_path=Path(_db_path()))
+
+
+def _build_payload(
+    df: pd.DataFrame,
+    *,
+    slot: str,
+    asof: str,
+    ymd: str,
+    ymd_effective: str,
+    db_path: Path,
+) -> Dict[str, Any]:
+    """
+    snapshot SQL rows (one day) -> raw payload（run_intraday / replay 共用）
+    """
     # ---- build meta.time (DST-aware) early so even empty payload has it ----
     time_meta = _build_time_meta_us(asof=asof, ymd_effective=ymd_effective)
 
@@ -0,0 +1,227 @@
+# scripts/bench_import_time.py
+# -*- coding: utf-8 -*-
+"""
+Import-time / cold-start benchmark + regression check
+
+For every entry point runs a fresh interpreter with `python -X importtime`
+and reports:
+  - cumulative import cost of the entry module
+  - the heaviest modules it pulled in
+  - whether any "heavy" package (yfinance / matplotlib / googleapiclient /
+    pandas ...) got imported although that path must not need it
+
+Examples:
+  python scripts/bench_import_time.py
+  python scripts/bench_import_time.py --json > import_times.json
+  python scripts/bench_import_time.py --baseline import_times.json --max-regress-pct 25
+  python scripts/bench_import_time.py --entry main --entry markets.runners --budget-ms 400
+
+Exit code 1 when an entry fails to import, a forbidden module is imported,
+a budget is exceeded or an entry regressed more than --max-regress-pct vs
+the baseline.
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# entry module -> top-level packages that must NOT be imported by just importing it
+# (main.py: cache-hit / --help path; run_shorts: orchestration only)
+DEFAULT_ENTRIES: Dict[str, List[str]] = {
+    "main": ["yfinance", "matplotlib", "googleapiclient", "pandas"],
+    "markets.runners": ["yfinance", "matplotlib", "googleapiclient", "pandas"],
+    "scripts.run_shorts": ["yfinance", "matplotlib", "googleapiclient", "pandas"],
+    "scripts.run_daily": ["yfinance", "matplotlib", "googleapiclient", "pandas"],
+    "scripts.utils.drive_upload": ["googleapiclient", "google.oauth2", "matplotlib", "pandas"],
+    "scripts.youtube_upload": ["googleapiclient", "google.oauth2", "matplotlib", "pandas"],
+    "scripts.render_images_common.overview.i18n_font": ["matplotlib"],
+    "markets.us.us_prices": ["yfinance", "matplotlib"],
+    "markets.tw.downloader": ["yfinance", "matplotlib"],
+    "markets.jp.downloader": ["yfinance", "matplotlib"],
+    "markets.kr.downloader": ["yfinance", "matplotlib"],
+    "markets.cn.cn_prices": ["yfinance", "matplotlib"],
+    "markets._calendar_cache": ["yfinance", "matplotlib"],
+}
+
+# "import time:       123 |       4567 | pkg.mod"
+_LINE_RE = re.compile(r"^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)\s*$")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """
+    Returns [(module, self_us, cumulative_us, depth)] in import order.
+    """
+    out: List[Tuple[str, int, int, int]] = []
+    for line in stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if not m:
+            continue
+        depth = max(0, (len(m.group(3)) - 1) // 2)
+        out.append((m.group(4), int(m.group(1)), int(m.group(2)), depth))
+    return out
+
+
+def _entry_code(entry: str) -> str:
+    # main.py is a script, not a package module
+    if entry == "main":
+        return "import runpy, sys; sys.argv=['main.py','--help']\ntry:\n runpy.run_path('main.py', run_name='__bench__')\nexcept SystemExit:\n pass"
+    return f"import {entry}"
+
+
+def measure(entry: str, *, py: str, timeout_s: float) -> Dict[str, Any]:
+    env = os.environ.copy()
+    env["PYTHONPATH"] = str(REPO_ROOT) + (os.pathsep + env["PYTHONPATH"] if env.get("PYTHONPATH") else "")
+    env.setdefault("PYTHONUTF8", "1")
+    # keep the benchmark quiet / side-effect free
+    env["INTRADAY_TIMINGS"] = "0"
+    env.pop("INTRADAY_PROFILE", None)
+
+    cmd = [py, "-X", "importtime", "-c", _entry_code(entry)]
+    t0 = time.perf_counter()
+    try:
+        p = subprocess.run(cmd, cwd=str(REPO_ROOT), env=env, capture_output=True, text=True, timeout=timeout_s)
+    except subprocess.TimeoutExpired:
+        return {"entry": entry, "ok": False, "error": f"timeout after {timeout_s}s"}
+    wall_ms = (time.perf_counter() - t0) * 1000.0
+
+    rows = parse_importtime(p.stderr)
+    mods = {name for name, _, _, _ in rows}
+    total_us = sum(cum for _, _, cum, depth in rows if depth == 0)
+    err = None
+    if p.returncode != 0:
+        tail = [ln for ln in p.stderr.splitlines() if not ln.startswith("import time:")][-3:]
+        err = " | ".join(tail) or f"rc={p.returncode}"
+    return {
+        "entry": entry,
+        "ok": p.returncode == 0,
+        "error": err,
+        "wall_ms": round(wall_ms, 1),
+        "import_ms": round(total_us / 1000.0, 1),
+        "n_modules": len(rows),
+        "modules": mods,
+        "rows": rows,
+    }
+
+
+def _top_heavy(rows: List[Tuple[str, int, int, int]], n: int) -> List[Dict[str, Any]]:
+    # top-level packages by cumulative time of their first (outermost) import
+    best: Dict[str, int] = {}
+    for name, _, cum, _ in rows:
+        root = name.split(".")[0]
+        if cum > best.get(root, -1) and (name == root):
+            best[root] = cum
+    items = sorted(best.items(), key=lambda kv: kv[1], reverse=True)[:n]
+    return [{"module": k, "cumulative_ms": round(v / 1000.0, 1)} for k, v in items]
+
+
+def _forbidden_hits(mods: set, forbidden: List[str]) -> List[str]:
+    hits: List[str] = []
+    for f in forbidden:
+        if any(m == f or m.startswith(f + ".") for m in mods):
+            hits.append(f)
+    return hits
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Measure import / cold-start cost of pipeline entry points.")
+    ap.add_argument("--entry", action="append", default=[], help="module to measure (repeatable; default: built-in list)")
+    ap.add_argument("--repeat", type=int, default=3, help="runs per entry (median is reported)")
+    ap.add_argument("--top", type=int, default=8, help="heaviest packages to list per entry")
+    ap.add_argument("--budget-ms", type=float, default=0.0, help="fail if median import_ms exceeds this (0 = off)")
+    ap.add_argument("--baseline", default="", help="previous --json output to compare against")
+    ap.add_argument("--max-regress-pct", type=float, default=0.0, help="fail if import_ms grew more than this vs baseline")
+    ap.add_argument("--no-forbid", action="store_true", help="don't check forbidden heavy imports")
+    ap.add_argument("--timeout", type=float, default=120.0)
+    ap.add_argument("--json", action="store_true", help="print results as JSON")
+    args = ap.parse_args(argv)
+
+    entries = args.entry or list(DEFAULT_ENTRIES.keys())
+    results: List[Dict[str, Any]] = []
+    failed = False
+
+    for entry in entries:
+        runs = [measure(entry, py=sys.executable, timeout_s=float(args.timeout)) for _ in range(max(1, int(args.repeat)))]
+        last = runs[-1]
+        if not last.get("ok"):
+            # a broken entry point is a failure, not a skipped measurement
+            results.append({"entry": entry, "ok": False, "error": last.get("error")})
+            failed = True
+            continue
+        forbidden = [] if args.no_forbid else DEFAULT_ENTRIES.get(entry, [])
+        hits = _forbidden_hits(last["modules"], forbidden)
+        res = {
+            "entry": entry,
+            "ok": True,
+            "import_ms": round(statistics.median(r["import_ms"] for r in runs), 1),
+            "wall_ms": round(statistics.median(r["wall_ms"] for r in runs), 1),
+            "n_modules": last["n_modules"],
+            "heavy": _top_heavy(last["rows"], int(args.top)),
+            "forbidden_imported": hits,
+        }
+        if hits:
+            failed = True
+        if args.budget_ms > 0 and res["import_ms"] > args.budget_ms:
+            res["over_budget"] = True
+            failed = True
+        results.append(res)
+
+    if args.baseline:
+        try:
+            base = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+            base_by = {r["entry"]: r for r in base.get("results", []) if r.get("ok")}
+        except Exception as e:
+            print(f"[bench] could not read baseline {args.baseline}: {e}", file=sys.stderr)
+            base_by = {}
+        for r in results:
+            b = base_by.get(r["entry"])
+            if not r.get("ok") or not b:
+                continue
+            a_ms = float(b.get("import_ms") or 0.0)
+            r["baseline_ms"] = a_ms
+            r["delta_pct"] = round((r["import_ms"] - a_ms) / a_ms * 100.0, 1) if a_ms > 0 else None
+            if args.max_regress_pct > 0 and r["delta_pct"] is not None and r["delta_pct"] > args.max_regress_pct:
+                r["regressed"] = True
+                failed = True
+
+    if args.json:
+        print(json.dumps({"python": sys.version.split()[0], "results": results}, ensure_ascii=False, indent=2))
+        return 1 if failed else 0
+
+    hdr = f"{'entry':<48} {'import ms':>10} {'wall ms':>9} {'mods':>5} {'Δ%':>7}  notes"
+    print(hdr)
+    print("-" * len(hdr))
+    for r in results:
+        if not r.get("ok"):
+            print(f"{r['entry']:<48} {'-':>10} {'-':>9} {'-':>5} {'-':>7}  ❌ {r.get('error')}")
+            continue
+        notes: List[str] = []
+        if r["forbidden_imported"]:
+            notes.append("❌ imports " + ",".join(r["forbidden_imported"]))
+        if r.get("over_budget"):
+            notes.append(f"❌ > budget {args.budget_ms:.0f}ms")
+        if r.get("regressed"):
+            notes.append("❌ regressed")
+        heavy = ", ".join(f"{h['module']}={h['cumulative_ms']:.0f}" for h in r["heavy"][:4])
+        notes.append(heavy)
+        d = r.get("delta_pct")
+        ds = f"{d:+.1f}" if isinstance(d, (int, float)) else "-"
+        print(f"{r['entry']:<48} {r['import_ms']:>10.1f} {r['wall_ms']:>9.1f} {r['n_modules']:>5} {ds:>7}  {' | '.join(notes)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
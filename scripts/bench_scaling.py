@@ -0,0 +1,371 @@
+# scripts/bench_scaling.py
+# -*- coding: utf-8 -*-
+"""
+End-to-end scaling benchmark on synthetic markets (markets/synthetic.py)
+
+For every market x size:
+  generate warehouse (cached per spec) -> snapshot (run_intraday)
+      -> aggregate -> render (render_images_<m>/cli.py, in-process)
+
+Each case runs in its own interpreter so peak RSS and import state are
+per case. Stage numbers come from markets/spans.py, so nested spans
+(snapshot_sql, render_page, ...) show up in the result too.
+
+Examples:
+  python scripts/bench_scaling.py                                   # tw,cn,jp,kr,us x 1k,10k,50k
+  python scripts/bench_scaling.py --markets cn,jp --sizes 1000,10000 --no-render
+  python scripts/bench_scaling.py --baseline data/bench/scaling_prev.json --max-regress-pct 20
+
+Output JSON (default data/bench/scaling_<utc>.json):
+  {"meta": {...host / git / spec...}, "cases": [{"market", "n_symbols", "stages": {...}, ...}]}
+Exit code 1 when a case fails or regresses more than --max-regress-pct.
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import time
+from dataclasses import asdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+BENCH_MARKETS = ["tw", "cn", "jp", "kr", "us"]
+DEFAULT_SIZES = [1000, 10000, 50000]
+PIPELINE_STAGES = ["snapshot", "aggregate", "render"]
+
+_DB_ENV = {"cn": "CN_DB_PATH", "jp": "JP_DB_PATH", "kr": "KR_DB_PATH", "us": "US_DB_PATH"}
+
+RESULT_PREFIX = "BENCH_RESULT "
+
+
+def _git_rev() -> str:
+    try:
+        p = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(REPO_ROOT), capture_output=True, text=True, timeout=10)
+        return p.stdout.strip()
+    except Exception:
+        return ""
+
+
+# =============================================================================
+# One case (child process)
+# =============================================================================
+def _ensure_dataset(spec: Any, case_dir: Path, *, regen: bool) -> Dict[str, Any]:
+    """
+    Reuse the generated warehouse when the spec is unchanged (generation is slow at 50k).
+    """
+    from markets.synthetic import generate
+
+    spec_path = case_dir / "spec.json"
+    want = asdict(spec)
+    if not regen and spec_path.exists():
+        try:
+            have = json.loads(spec_path.read_text(encoding="utf-8"))
+            if have.get("spec") == want:
+                have["cached"] = True
+                return have
+        except Exception:
+            pass
+
+    t0 = time.perf_counter()
+    res = generate(spec, case_dir)
+    res["generate_s"] = round(time.perf_counter() - t0, 3)
+    spec_path.write_text(json.dumps(res, ensure_ascii=False, indent=2), encoding="utf-8")
+    res["cached"] = False
+    return res
+
+
+def _point_tw_at(gen: Dict[str, Any]) -> None:
+    """
+    markets/tw/downloader.py reads module-level paths; aim them at the synthetic
+    list and drop the CSV where its cache lookup expects it.
+    """
+    from markets.tw import downloader as tw_dl
+
+    list_path = Path(gen["stock_list"])
+    tw_dl.STOCKLIST_FILE = str(list_path)
+    tw_dl.CACHE_DIR = str(list_path.parent)
+    tw_dl.CACHE_ENABLED = True
+
+    meta = tw_dl.load_tw_stock_list()
+    cache_path = Path(tw_dl._cache_daily_path(list(meta.keys())))
+    src = Path(gen["csv_path"])
+    if src.resolve() != cache_path.resolve():
+        if cache_path.exists():
+            cache_path.unlink()
+        try:
+            os.link(src, cache_path)
+        except OSError:
+            shutil.copyfile(src, cache_path)
+
+
+def _snapshot_fn(market: str):
+    if market == "tw":
+        from markets.tw.downloader import run_intraday
+    elif market == "cn":
+        from markets.cn.downloader import run_intraday
+    elif market == "jp":
+        from markets.jp.downloader import run_intraday
+    elif market == "kr":
+        from markets.kr.downloader import run_intraday
+    else:
+        from markets.us.downloader_us import run_intraday
+    return run_intraday
+
+
+def _aggregate_fn(market: str):
+    if market == "tw":
+        from markets.tw.aggregator import aggregate
+    elif market == "cn":
+        from markets.cn.aggregator import aggregate
+    elif market == "jp":
+        from markets.jp.aggregator import aggregate
+    elif market == "kr":
+        from markets.kr.aggregator import aggregate
+    else:
+        from markets.us.aggregator import aggregate
+    return aggregate
+
+
+def run_case(market: str, n_symbols: int, *, days: int, end_ymd: str, seed: int, work_dir: Path,
+             render: bool, regen: bool) -> Dict[str, Any]:
+    import importlib
+
+    from markets import spans
+    from markets.synthetic import SyntheticSpec
+
+    spec = SyntheticSpec(market=market, n_symbols=n_symbols, n_days=days, end_ymd=end_ymd, seed=seed)
+    case_dir = work_dir / f"{market}_{n_symbols}"
+    case_dir.mkdir(parents=True, exist_ok=True)
+
+    gen = _ensure_dataset(spec, case_dir, regen=regen)
+    if market == "tw":
+        _point_tw_at(gen)
+    else:
+        os.environ[_DB_ENV[market]] = str(gen["db_path"])
+
+    spans.set_enabled(True)
+    spans.reset()
+    ymd = spec.end_ymd
+    snapshot = _snapshot_fn(market)
+    aggregate = _aggregate_fn(market)
+
+    with spans.span("snapshot") as sp:
+        raw = snapshot(slot="close", asof="close", ymd=ymd)
+        sp.rows = sum(len(raw.get(k) or []) for k in ("snapshot_main", "snapshot_open", "snapshot_emerging"))
+
+    with spans.span("aggregate") as sp:
+        payload = aggregate(raw)
+        sp.rows = len(payload.get("snapshot_main") or [])
+
+    payload_path = case_dir / "close.payload.json"
+    payload_path.write_text(json.dumps(payload, ensure_ascii=False, default=str), encoding="utf-8")
+
+    n_images = 0
+    if render:
+        out_dir = case_dir / "images"
+        mod = importlib.import_module(f"scripts.render_images_{market}.cli")
+        with spans.span("render") as sp:
+            rc = mod.main(
+                ["--payload", str(payload_path), "--outdir", str(out_dir), "--no-debug"],
+                payload=payload,
+            )
+            n_images = len(list(out_dir.glob("*.png")))
+            sp.rows = n_images
+        if rc not in (None, 0):
+            raise RuntimeError(f"render exited with {rc}")
+
+    recs = spans.records()
+    by_name = spans.summarize(recs)
+    stages = {k: by_name[k] for k in PIPELINE_STAGES if k in by_name}
+    return {
+        "market": market,
+        "n_symbols": int(n_symbols),
+        "n_days": int(days),
+        "ok": True,
+        "rows_in_db": gen.get("rows"),
+        "generate_s": gen.get("generate_s"),
+        "dataset_cached": bool(gen.get("cached")),
+        "pipeline_s": round(sum(float(v["wall_s"]) for v in stages.values()), 3),
+        "stages": stages,
+        "spans": {k: v for k, v in by_name.items() if k not in stages},
+        "payload_bytes": payload_path.stat().st_size,
+        "images": n_images,
+    }
+
+
+# =============================================================================
+# Driver
+# =============================================================================
+def _spawn_case(args: argparse.Namespace, market: str, n: int) -> Dict[str, Any]:
+    cmd = [
+        sys.executable, str(Path(__file__).resolve()),
+        "--one", market, "--one-size", str(n),
+        "--days", str(args.days), "--end", args.end, "--seed", str(args.seed),
+        "--work-dir", str(args.work_dir),
+    ]
+    if args.no_render:
+        cmd.append("--no-render")
+    if args.regen:
+        cmd.append("--regen")
+
+    env = os.environ.copy()
+    env.setdefault("PYTHONUTF8", "1")
+    env.setdefault("MPLBACKEND", "Agg")
+    env["INTRADAY_TIMINGS_SIDECAR"] = ""  # results go to stdout, not a market sidecar
+
+    log_path = Path(args.work_dir) / f"{market}_{n}.log"
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    try:
+        p = subprocess.run(cmd, cwd=str(REPO_ROOT), env=env, capture_output=True, text=True,
+                           timeout=(args.timeout or None))
+        out, err, rc = p.stdout, p.stderr, p.returncode
+    except subprocess.TimeoutExpired as e:
+        out, err, rc = (e.stdout or ""), f"timeout after {args.timeout}s", -9
+    log_path.write_text(str(out) + "\n----- stderr -----\n" + str(err), encoding="utf-8")
+
+    for line in reversed(str(out).splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            res = json.loads(line[len(RESULT_PREFIX):])
+            res["wall_total_s"] = round(time.perf_counter() - t0, 3)
+            return res
+
+    tail = [ln for ln in str(err).splitlines() if ln.strip()][-3:]
+    return {"market": market, "n_symbols": n, "ok": False, "rc": rc, "error": " | ".join(tail), "log": str(log_path)}
+
+
+def _compare(cases: List[Dict[str, Any]], baseline: Dict[str, Any], max_pct: float) -> bool:
+    base = {(c["market"], int(c["n_symbols"])): c for c in baseline.get("cases", []) if c.get("ok")}
+    regressed = False
+    for c in cases:
+        b = base.get((c["market"], int(c["n_symbols"])))
+        if not c.get("ok") or not b:
+            continue
+        a_s = float(b.get("pipeline_s") or 0.0)
+        c["baseline_pipeline_s"] = a_s
+        c["delta_pct"] = round((float(c["pipeline_s"]) - a_s) / a_s * 100.0, 1) if a_s > 0 else None
+        if max_pct > 0 and c["delta_pct"] is not None and c["delta_pct"] > max_pct:
+            c["regressed"] = True
+            regressed = True
+    return regressed
+
+
+def print_summary(cases: List[Dict[str, Any]]) -> None:
+    hdr = f"{'market':<6} {'symbols':>8} {'snapshot':>9} {'aggregate':>10} {'render':>8} {'total s':>8} {'rssMB':>7} {'Δ%':>7}"
+    print(hdr)
+    print("-" * len(hdr))
+    for c in cases:
+        if not c.get("ok"):
+            print(f"{c['market']:<6} {c['n_symbols']:>8}  ❌ {c.get('error')}")
+            continue
+        st = c["stages"]
+
+        def _w(k: str) -> str:
+            return f"{st[k]['wall_s']:.2f}" if k in st else "-"
+
+        rss = max((float(v.get("rss_peak_mb") or 0) for v in st.values()), default=0.0)
+        d = c.get("delta_pct")
+        ds = f"{d:+.1f}" if isinstance(d, (int, float)) else "-"
+        flag = " ❌" if c.get("regressed") else ""
+        print(f"{c['market']:<6} {c['n_symbols']:>8} {_w('snapshot'):>9} {_w('aggregate'):>10} {_w('render'):>8} "
+              f"{c['pipeline_s']:>8.2f} {rss:>7.0f} {ds:>7}{flag}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Scaling benchmark: snapshot -> aggregate -> render on synthetic markets.")
+    ap.add_argument("--markets", default=",".join(BENCH_MARKETS))
+    ap.add_argument("--sizes", default=",".join(str(x) for x in DEFAULT_SIZES), help="symbol counts, comma list")
+    ap.add_argument("--days", type=int, default=60)
+    ap.add_argument("--end", default="2026-02-20", help="last synthetic trading day (fixed so runs are comparable)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--no-render", action="store_true")
+    ap.add_argument("--regen", action="store_true", help="regenerate datasets even if cached")
+    ap.add_argument("--work-dir", default=str(REPO_ROOT / "data" / "cache" / "bench"))
+    ap.add_argument("--out", default="", help="result JSON (default: data/bench/scaling_<utc>.json)")
+    ap.add_argument("--baseline", default="", help="previous result JSON to compare against")
+    ap.add_argument("--max-regress-pct", type=float, default=0.0)
+    ap.add_argument("--timeout", type=float, default=0.0, help="seconds per case; 0 = none")
+    # internal: run a single case in this process
+    ap.add_argument("--one", default="", help=argparse.SUPPRESS)
+    ap.add_argument("--one-size", type=int, default=0, help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.one:
+        res = run_case(
+            args.one,
+            int(args.one_size),
+            days=int(args.days),
+            end_ymd=str(args.end),
+            seed=int(args.seed),
+            work_dir=Path(args.work_dir),
+            render=not args.no_render,
+            regen=bool(args.regen),
+        )
+        print(RESULT_PREFIX + json.dumps(res, ensure_ascii=False, default=str), flush=True)
+        return 0
+
+    markets = [m.strip().lower() for m in str(args.markets).split(",") if m.strip()]
+    bad = [m for m in markets if m not in BENCH_MARKETS]
+    if bad:
+        ap.error(f"unsupported market(s): {','.join(bad)} (choose from {','.join(BENCH_MARKETS)})")
+    sizes = [int(x) for x in str(args.sizes).split(",") if x.strip()]
+
+    cases: List[Dict[str, Any]] = []
+    for m in markets:
+        for n in sizes:
+            print(f"[bench] ▶ {m} x {n} symbols", flush=True)
+            res = _spawn_case(args, m, n)
+            cases.append(res)
+            if res.get("ok"):
+                print(f"[bench] ✅ {m} x {n}: pipeline {res['pipeline_s']:.2f}s", flush=True)
+            else:
+                print(f"[bench] ❌ {m} x {n}: {res.get('error')} (log: {res.get('log')})", flush=True)
+
+    failed = any(not c.get("ok") for c in cases)
+    if args.baseline:
+        try:
+            base = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        except Exception as e:
+            print(f"[bench] could not read baseline {args.baseline}: {e}", flush=True)
+            base = {}
+        failed = _compare(cases, base, float(args.max_regress_pct)) or failed
+
+    now = datetime.now(timezone.utc)
+    result = {
+        "meta": {
+            "generated_at_utc": now.isoformat(timespec="seconds").replace("+00:00", "Z"),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "days": int(args.days),
+            "end_ymd": str(args.end),
+            "seed": int(args.seed),
+            "render": not args.no_render,
+        },
+        "cases": cases,
+    }
+    out = Path(args.out) if args.out else REPO_ROOT / "data" / "bench" / f"scaling_{now.strftime('%Y%m%dT%H%M%SZ')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print()
+    print_summary(cases)
+    print(f"\n[bench] results: {out}", flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 
 # =============================================================================
@@ -221,10 +221,27 @@ def _desc_fr(region_name: str = "France") -> str:
 # =============================================================================
 # Public API
 # =============================================================================
-def build_metadata(market: str, ymd: str, slot: str) -> Dict[str, Any]:
+def _summary_tags(summary: Optional[Dict[str, Any]], *, limit: int = 3) -> list:
+    """
+    Top sectors of the day from markets/cross_summary.py (one market entry).
+    """
+    if not isinstance(summary, dict):
+        return []
+    out = []
+    for t in summary.get("top_sectors") or []:
+        name = str((t or {}).get("sector") or "")
+        if name and name not in ("-", "未分類", "Unclassified"):
+            out.append(name)
+        if len(out) >= limit:
+            break
+    return out
+
+
+def build_metadata(market: str, ymd: str, slot: str, summary: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Centralized YouTube metadata builder.
     Keep descriptions short, safe, and under 5000 chars.
+    summary: optional cross_market_summary.json entry -> top sectors added as tags.
     """
     m_in = (market or "").upper().strip()
     m = _norm_market(m_in)
@@ -287,6 +304,7 @@ def build_metadata(market: str, ymd: str, slot: str) -> Dict[str, Any]:
     else:
         raise ValueError(f"Unsupported market code: {m}")
 
+    tags = tags + _summary_tags(summary)
     tags = [clean_tag(t) for t in tags if clean_tag(t)]
 
     return {
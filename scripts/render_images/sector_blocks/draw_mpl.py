@@ -8,6 +8,7 @@ from typing import Any, Dict, List, Tuple
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
 
+from markets.spans import span_fn
 from .layout import LayoutSpec, calc_rows_layout
 
 
@@ -89,6 +90,7 @@ def _safe_ascii_math(s: str) -> str:
 # =============================================================================
 # Drawing
 # =============================================================================
+@span_fn("render_page")
 def draw_block_table(
     out_path: Path,
     *,
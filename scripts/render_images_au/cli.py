@@ -352,7 +352,7 @@ def build_peers_by_sector(universe: List[Dict[str, Any]], ret_th: float):
 # =============================================================================
 # Main (JP-style UX)
 # =============================================================================
-def main() -> int:
+def main(argv: Optional[List[str]] = None, *, payload: Optional[Dict[str, Any]] = None) -> int:
     ap = argparse.ArgumentParser()
 
     ap.add_argument("--payload", required=True)
@@ -377,7 +377,7 @@ def main() -> int:
     # keep quiet flag for logs (not related to Drive anymore)
     ap.add_argument("--quiet", action="store_true", help="Less logs")
 
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     # Debug env handling
     if args.no_debug:
@@ -385,7 +385,8 @@ def main() -> int:
     else:
         _enable_debug_env()
 
-    payload = load_payload(args.payload)
+    # in-process runner (run_shorts) may hand over the payload dict directly
+    payload = payload if payload is not None else load_payload(args.payload)
     universe = pick_universe(payload)
     if not universe:
         raise RuntimeError("No usable snapshot in payload")
@@ -7,6 +7,7 @@ from typing import Any, Dict, List, Tuple, Optional
 
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
+from markets.spans import span_fn
 from .layout import LayoutSpec, calc_rows_layout
 # =============================================================================
 # Optional shared time note builder
@@ -323,6 +324,7 @@ def pick_big_tag(ret_decimal: float) -> Tuple[str, str]:
 # =============================================================================
 # Main draw
 # =============================================================================
+@span_fn("render_page")
 def draw_block_table(
     out_path: Path,
     *,
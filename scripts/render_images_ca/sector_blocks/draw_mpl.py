@@ -10,6 +10,7 @@ from datetime import datetime, timedelta, timezone
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
 
+from markets.spans import span_fn
 from .layout import LayoutSpec, calc_rows_layout
 
 # =============================================================================
@@ -482,6 +483,7 @@ def _pick_touch_tag_text(row: Dict[str, Any], *, default_th: float = 0.10) -> st
 # =============================================================================
 # Main draw
 # =============================================================================
+@span_fn("render_page")
 def draw_block_table(
     out_path: Path,
     *,
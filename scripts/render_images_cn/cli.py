@@ -491,7 +491,7 @@ def _norm_overview_metric_arg(s: str) -> str:
 # =============================================================================
 # Main
 # =============================================================================
-def main() -> int:
+def main(argv: Optional[List[str]] = None, *, payload: Optional[Dict[str, Any]] = None) -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument("--payload", required=True)
     ap.add_argument("--outdir", default=None)
@@ -508,7 +508,7 @@ def main() -> int:
     # ✅ DEBUG: default ON, allow opt-out
     ap.add_argument("--no-debug", action="store_true", help="overview/footer debug を無効化")
 
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     # If user explicitly disables debug, override envs to 0
     if args.no_debug:
@@ -516,7 +516,8 @@ def main() -> int:
         os.environ["OVERVIEW_DEBUG_FONTS"] = "0"
         os.environ["OVERVIEW_DEBUG"] = "0"
 
-    payload = load_payload(args.payload)
+    # in-process runner (run_shorts) may hand over the payload dict directly
+    payload = payload if payload is not None else load_payload(args.payload)
     universe = pick_universe(payload)
     if not universe:
         raise RuntimeError("No usable snapshot in payload")
@@ -1,5 +1,14 @@
 # scripts/render_images_common/overview/__init__.py
 # -*- coding: utf-8 -*-
-from .render import render_overview_png
+# render.py pulls in matplotlib.pyplot; resolve it on first use so that importing a
+# light submodule (e.g. .i18n_font for normalize_market / resolve_lang) stays cheap.
 
 __all__ = ["render_overview_png"]
+
+
+def __getattr__(name):
+    if name == "render_overview_png":
+        from .render import render_overview_png
+
+        return render_overview_png
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
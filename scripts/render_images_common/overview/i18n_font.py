@@ -3,11 +3,12 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as fm
-from matplotlib.font_manager import FontProperties
+# matplotlib is imported inside the font functions (cold start);
+# normalize_market / resolve_lang don't need it
+if TYPE_CHECKING:  # pragma: no cover
+    from matplotlib.font_manager import FontProperties
 
 __all__ = [
     "normalize_market",
@@ -163,6 +164,8 @@ def _get_font_profile() -> str:
 
 
 def _debug_print_fonts(market: str, profile: str, font_list: List[str], chosen: Optional[str]) -> None:
+    import matplotlib.pyplot as plt
+
     if not _env_on("OVERVIEW_DEBUG_FONTS"):
         return
     try:
@@ -182,6 +185,8 @@ def _debug_print_fonts(market: str, profile: str, font_list: List[str], chosen:
 
 
 def _debug_print_noto_paths() -> None:
+    import matplotlib.font_manager as fm
+
     if not _env_on("OVERVIEW_DEBUG_FONTS"):
         return
     try:
@@ -220,6 +225,8 @@ def _try_add_noto_cjk_ttc() -> None:
 
     Force-add TTC via fontManager.addfont() (idempotent).
     """
+    import matplotlib.font_manager as fm
+
     try:
         for p in _CJK_TTC_PATHS:
             if os.path.exists(p):
@@ -235,6 +242,8 @@ def _try_add_noto_cjk_ttc() -> None:
 # Small helpers
 # =============================================================================
 def _available_font_names() -> set[str]:
+    import matplotlib.font_manager as fm
+
     _try_add_noto_cjk_ttc()
     return {f.name for f in fm.fontManager.ttflist}
 
@@ -281,6 +290,8 @@ def setup_cjk_font(payload: Optional[Dict[str, Any]] = None) -> Optional[str]:
     - On GitHub runners, Noto CJK TTC is often registered ONLY as "Noto Sans CJK JP".
       So we treat it as a universal CJK fallback to avoid DejaVu tofu warnings.
     """
+    import matplotlib.pyplot as plt
+
     try:
         _try_add_noto_cjk_ttc()
         available = _available_font_names()
@@ -438,6 +449,8 @@ def fontprops_for_text(
     IMPORTANT:
     - Treat "Noto Sans CJK JP" as universal CJK fallback on CI.
     """
+    from matplotlib.font_manager import FontProperties
+
     try:
         setup_cjk_font(payload or {"market": market})
     except Exception:
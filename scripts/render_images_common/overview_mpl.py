@@ -6,6 +6,8 @@ import os
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+from markets.spans import span_fn
+
 from scripts.render_images_common.overview.render import (
     render_overview_png as _render_overview_png,
 )
@@ -171,6 +173,7 @@ def _debug_overview_pct(payload: Dict[str, Any], metric_arg: str) -> None:
         print(f"[OVERVIEW_DEBUG_PCT] ⚠️ debug failed: {type(e).__name__}: {e}")
 
 
+@span_fn("render_overview")
 def render_overview_png(
     payload: Dict[str, Any],
     out_dir: Path,
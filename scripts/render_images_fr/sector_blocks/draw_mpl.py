@@ -7,6 +7,8 @@ from typing import Any, Dict, List, Tuple, Optional
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
 
+from markets.spans import span_fn
+
 # ✅ reuse UK layout primitives to avoid duplicating layout.py in FR
 from scripts.render_images_uk.sector_blocks.layout import LayoutSpec, calc_rows_layout  # type: ignore
 
@@ -185,6 +187,7 @@ def pick_big_tag(ret_decimal: float) -> Tuple[str, str]:
     return ("MOVER", "#4dabf7")           # Blue
 
 
+@span_fn("render_page")
 def draw_block_table(
     out_path: Path,
     *,
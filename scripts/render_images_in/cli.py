@@ -452,7 +452,7 @@ def _norm_overview_metric_arg(s: str) -> str:
 # =============================================================================
 # Main
 # =============================================================================
-def main() -> int:
+def main(argv: Optional[List[str]] = None, *, payload: Optional[Dict[str, Any]] = None) -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument("--payload", required=True)
     ap.add_argument("--outdir", default=None)
@@ -471,14 +471,15 @@ def main() -> int:
     ap.add_argument("--no-debug", action="store_true")
     ap.add_argument("--peer-ret-min", type=float, default=0.0)
 
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     if args.no_debug:
         os.environ["OVERVIEW_DEBUG_FOOTER"] = "0"
         os.environ["OVERVIEW_DEBUG_FONTS"] = "0"
         os.environ["OVERVIEW_DEBUG"] = "0"
 
-    payload = load_payload(args.payload)
+    # in-process runner (run_shorts) may hand over the payload dict directly
+    payload = payload if payload is not None else load_payload(args.payload)
     universe0 = pick_universe(payload)
     if not universe0:
         raise RuntimeError("No usable snapshot in payload")
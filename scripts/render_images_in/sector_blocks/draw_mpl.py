@@ -8,6 +8,7 @@ from typing import Any, Dict, List, Optional, Tuple
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
 
+from markets.spans import span_fn
 from .layout import LayoutSpec, calc_rows_layout
 from .mpl_text import (
     ensure_renderer,
@@ -318,6 +319,7 @@ def _top_row_ret_display(r: Dict[str, Any]) -> str:
 # =============================================================================
 # Draw
 # =============================================================================
+@span_fn("render_page")
 def draw_block_table(
     out_path: Path,
     *,
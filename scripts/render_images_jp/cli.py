@@ -449,7 +449,7 @@ def make_drive_subfolder_name(payload: Dict[str, Any], market: str) -> str:
 # =============================================================================
 # Main
 # =============================================================================
-def main() -> int:
+def main(argv: Optional[List[str]] = None, *, payload: Optional[Dict[str, Any]] = None) -> int:
     ap = argparse.ArgumentParser()
 
     ap.add_argument("--payload", required=True)
@@ -483,14 +483,15 @@ def main() -> int:
     ap.add_argument("--drive-no-overwrite", action="store_true")
     ap.add_argument("--drive-quiet", action="store_true")
 
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     if args.no_debug:
         os.environ["OVERVIEW_DEBUG_FOOTER"] = "0"
         os.environ["OVERVIEW_DEBUG_FONTS"] = "0"
         os.environ["OVERVIEW_DEBUG"] = "0"
 
-    payload = load_payload(args.payload)
+    # in-process runner (run_shorts) may hand over the payload dict directly
+    payload = payload if payload is not None else load_payload(args.payload)
     universe = pick_universe(payload)
     if not universe:
         raise RuntimeError("Payload に snapshot が見つかりません")
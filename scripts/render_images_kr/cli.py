@@ -475,7 +475,7 @@ def build_peers_by_sector_kr(
 # =============================================================================
 # Main
 # =============================================================================
-def main() -> int:
+def main(argv: Optional[List[str]] = None, *, payload: Optional[Dict[str, Any]] = None) -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument("--payload", required=True)
     ap.add_argument("--outdir", default=None)
@@ -509,14 +509,15 @@ def main() -> int:
     ap.add_argument("--drive-no-overwrite", action="store_true")
     ap.add_argument("--drive-quiet", action="store_true")
 
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     if args.no_debug:
         os.environ["OVERVIEW_DEBUG_FOOTER"] = "0"
         os.environ["OVERVIEW_DEBUG_FONTS"] = "0"
         os.environ["OVERVIEW_DEBUG"] = "0"
 
-    payload = load_payload(args.payload)
+    # in-process runner (run_shorts) may hand over the payload dict directly
+    payload = payload if payload is not None else load_payload(args.payload)
     universe = pick_universe(payload)
     if not universe:
         raise RuntimeError("No usable snapshot in payload")
@@ -9,6 +9,7 @@ from typing import Any, Dict, List, Tuple, Optional
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
 
+from markets.spans import span_fn
 from .layout import LayoutSpec, calc_rows_layout
 
 EPS = 1e-12
@@ -214,6 +215,7 @@ def get_ret_color(ret: float, theme: str = "light") -> str:
 # =============================================================================
 # Main draw
 # =============================================================================
+@span_fn("render_page")
 def draw_block_table(
     out_path: Path,
     *,
@@ -8,6 +8,7 @@ from typing import Any, Dict, List, Tuple, Optional
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
 
+from markets.spans import span_fn
 from .layout import LayoutSpec, calc_rows_layout
 
 # ✅ Use centralized font strategy (same as overview)
@@ -125,6 +126,7 @@ def get_ret_color(ret: float, theme: str = "light") -> str:
 # =============================================================================
 # Main draw
 # =============================================================================
+@span_fn("render_page")
 def draw_block_table(
     out_path: Path,
     *,
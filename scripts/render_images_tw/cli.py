@@ -109,7 +109,7 @@ def write_list_txt(
 # =============================================================================
 # Main
 # =============================================================================
-def main() -> int:
+def main(argv: Optional[List[str]] = None, *, payload: Optional[Dict[str, Any]] = None) -> int:
     ap = argparse.ArgumentParser()
 
     ap.add_argument("--payload", required=True)
@@ -131,14 +131,15 @@ def main() -> int:
     ap.add_argument("--debug-sector", default=None)
     ap.add_argument("--debug-only", action="store_true")
 
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     if args.no_debug:
         os.environ["OVERVIEW_DEBUG_FOOTER"] = "0"
         os.environ["OVERVIEW_DEBUG_FONTS"] = "0"
         os.environ["OVERVIEW_DEBUG"] = "0"
 
-    payload = load_payload(args.payload)
+    # in-process runner (run_shorts) may hand over the payload dict directly
+    payload = payload if payload is not None else load_payload(args.payload)
 
     if int(args.debug_rows or 0) > 0:
         print_open_limit_watchlist(payload, n=int(args.debug_rows))
@@ -8,6 +8,7 @@ from typing import Any, Dict, List, Optional
 
 import matplotlib.pyplot as plt
 
+from markets.spans import span_fn
 from .layout import LayoutSpec, calc_rows_layout
 from ._font import setup_cjk_font
 from ._time import parse_cutoff, get_market_time_info
@@ -176,6 +177,7 @@ def _peer_line2(r: Dict[str, Any]) -> str:
 # =============================================================================
 # Main renderer
 # =============================================================================
+@span_fn("render_page")
 def draw_block_table(
     out_path: Path,
     *,
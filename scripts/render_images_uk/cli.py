@@ -313,7 +313,7 @@ def build_peers_by_sector(universe: List[Dict[str, Any]], ret_th: float):
 # =============================================================================
 # Main
 # =============================================================================
-def main() -> int:
+def main(argv: Optional[List[str]] = None, *, payload: Optional[Dict[str, Any]] = None) -> int:
     ap = argparse.ArgumentParser()
 
     ap.add_argument("--payload", required=True)
@@ -337,7 +337,7 @@ def main() -> int:
 
     ap.add_argument("--no-debug", action="store_true", help="disable debug prints/env (default: debug ON)")
 
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     debug_on = (not bool(args.no_debug))
     if not debug_on:
@@ -345,7 +345,8 @@ def main() -> int:
         os.environ["OVERVIEW_DEBUG_FONTS"] = "0"
         os.environ["OVERVIEW_DEBUG"] = "0"
 
-    payload = load_payload(args.payload)
+    # in-process runner (run_shorts) may hand over the payload dict directly
+    payload = payload if payload is not None else load_payload(args.payload)
     universe = pick_universe(payload)
     if not universe:
         raise RuntimeError("No usable snapshot in payload")
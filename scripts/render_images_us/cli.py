@@ -8,7 +8,7 @@ import os
 import re
 import sys
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 # ✅ VERY IMPORTANT: Force matplotlib headless backend (avoid tkinter warnings)
 os.environ.setdefault("MPLBACKEND", "Agg")
@@ -379,7 +379,7 @@ def build_peers_by_sector(universe: List[Dict[str, Any]], ret_th: float):
 # =============================================================================
 # Main
 # =============================================================================
-def main() -> int:
+def main(argv: Optional[List[str]] = None, *, payload: Optional[Dict[str, Any]] = None) -> int:
     ap = argparse.ArgumentParser()
 
     ap.add_argument("--payload", required=True)
@@ -399,7 +399,7 @@ def main() -> int:
     # ✅ Debug default ON (user can disable)
     ap.add_argument("--no-debug", action="store_true", help="Disable overview/footer/font debug env (default: ON)")
 
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     debug_on = (not bool(args.no_debug))
     if debug_on:
@@ -411,7 +411,8 @@ def main() -> int:
         os.environ["OVERVIEW_DEBUG_FOOTER"] = "0"
         os.environ["OVERVIEW_DEBUG_FONTS"] = "0"
 
-    payload = load_payload(args.payload)
+    # in-process runner (run_shorts) may hand over the payload dict directly
+    payload = payload if payload is not None else load_payload(args.payload)
     universe = pick_universe(payload)
     if not universe:
         raise RuntimeError("No usable snapshot in payload")
@@ -7,6 +7,7 @@ from typing import Any, Dict, List, Tuple, Optional
 
 import matplotlib.pyplot as plt
 
+from markets.spans import span_fn
 from .layout import LayoutSpec, calc_rows_layout
 
 from ._font import setup_chinese_font
@@ -17,6 +18,7 @@ from ._colors import get_ret_color, pick_big_tag
 # =============================================================================
 # Main draw
 # =============================================================================
+@span_fn("render_page")
 def draw_block_table(
     out_path: Path,
     *,
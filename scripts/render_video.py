@@ -3,9 +3,24 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
+import math
+import os
 import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from markets.spans import span_fn  # noqa: E402
+
+# bump when the per-segment ffmpeg command changes (invalidates every cached segment)
+SEGMENT_CACHE_VERSION = 1
 
 
 def _run(cmd: List[str]) -> None:
@@ -13,6 +28,19 @@ def _run(cmd: List[str]) -> None:
     subprocess.run(cmd, check=True)
 
 
+def _run_quiet(cmd: List[str]) -> None:
+    r = subprocess.run(cmd, capture_output=True, text=True)
+    if r.returncode != 0:
+        print("[render_video] $", " ".join(cmd))
+        print((r.stderr or "")[-2000:])
+        raise subprocess.CalledProcessError(r.returncode, cmd)
+
+
+def _env_bool(name: str, default: str = "0") -> bool:
+    v = str(os.getenv(name, default)).strip().lower()
+    return v in ("1", "true", "yes", "y", "on")
+
+
 def _ensure_ffmpeg() -> None:
     try:
         subprocess.run(["ffmpeg", "-version"], check=True, capture_output=True, text=True)
@@ -114,6 +142,238 @@ def _write_concat_list(
     out_txt.write_text("\n".join(lines), encoding="utf-8")
 
 
+# =============================================================================
+# Segment cache（每頁預先編碼成短片段，內容相同就直接重用）
+# =============================================================================
+def default_segment_cache_dir() -> Path:
+    v = (os.getenv("RENDER_VIDEO_SEGMENT_CACHE_DIR") or "").strip()
+    if v:
+        return Path(v)
+    return REPO_ROOT / "media" / "cache" / "video_segments"
+
+
+def _file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _segment_vf(*, force_scale: Optional[str], fade_in: bool, fade_out_at: Optional[float]) -> str:
+    vf: List[str] = []
+    if force_scale:
+        w, h = force_scale.split(":")
+        vf.append(f"scale={w}:{h}:force_original_aspect_ratio=decrease")
+        vf.append(f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2")
+    vf.append("format=yuv420p")
+    if fade_in:
+        vf.append("fade=t=in:st=0:d=0.6")
+    if fade_out_at is not None:
+        vf.append(f"fade=t=out:st={max(0.0, fade_out_at):.3f}:d=0.6")
+    return ",".join(vf)
+
+
+def _segment_key(
+    *,
+    image_sha: str,
+    n_frames: int,
+    fps: int,
+    crf: int,
+    force_scale: Optional[str],
+    fade_in: bool,
+    fade_out: bool,
+) -> str:
+    """
+    Content address of one encoded page:
+      page-image hash + encode params (fps/crf/scale/frames) + fade flags.
+    Duration is keyed as a frame count so float noise never causes a miss.
+    """
+    parts = [
+        f"v{SEGMENT_CACHE_VERSION}",
+        image_sha,
+        f"frames={n_frames}",
+        f"fps={fps}",
+        f"crf={crf}",
+        f"scale={force_scale or ''}",
+        f"fade_in={int(fade_in)}",
+        f"fade_out={int(fade_out)}",
+    ]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+@span_fn("encode_segment")
+def _encode_segment(
+    *,
+    image: Path,
+    out_path: Path,
+    n_frames: int,
+    fps: int,
+    crf: int,
+    force_scale: Optional[str],
+    fade_in: bool,
+    fade_out: bool,
+) -> None:
+    seg_seconds = n_frames / float(fps)
+    vf = _segment_vf(
+        force_scale=force_scale,
+        fade_in=fade_in,
+        fade_out_at=(seg_seconds - 0.6) if fade_out else None,
+    )
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(out_path.stem + f".tmp{os.getpid()}.mp4")
+
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-loop", "1",
+        "-framerate", str(fps),
+        "-i", str(image),
+        "-frames:v", str(n_frames),
+        "-r", str(fps),
+        "-c:v", "libx264",
+        "-crf", str(crf),
+        "-pix_fmt", "yuv420p",
+        "-vf", vf,
+        "-an",
+        str(tmp),
+    ]
+    try:
+        _run_quiet(cmd)
+        os.replace(tmp, out_path)
+    finally:
+        if tmp.exists():
+            try:
+                tmp.unlink()
+            except Exception:
+                pass
+
+
+def prune_segment_cache(cache_dir: Path, *, max_age_days: float) -> int:
+    """
+    Delete cached segments not used for max_age_days (mtime is refreshed on every hit).
+    """
+    if max_age_days <= 0 or not cache_dir.exists():
+        return 0
+    cutoff = time.time() - max_age_days * 86400.0
+    n = 0
+    for p in cache_dir.rglob("*.mp4"):
+        try:
+            if p.stat().st_mtime < cutoff:
+                p.unlink()
+                n += 1
+        except Exception:
+            pass
+    return n
+
+
+def _build_video_from_segments(
+    *,
+    images_abs: List[Path],
+    images_dir: Path,
+    out_mp4: Path,
+    seconds_per_image: float,
+    fps: int,
+    crf: int,
+    force_scale: Optional[str],
+    fade: bool,
+    cache_dir: Path,
+    workers: int,
+    capped: bool = False,
+) -> Dict[str, int]:
+    """
+    Encode each page as its own short segment (cached by content hash),
+    then assemble the final mp4 with ffmpeg concat + stream copy.
+
+    Only new / changed pages are re-encoded; unchanged pages across
+    open/midday/close slots and --force reruns are cache hits.
+
+    capped=True (target_seconds / auto_cap in effect): frames per page are
+    floored so n * frames / fps never exceeds the cap (min 1 frame per page).
+    """
+    n = len(images_abs)
+    frames_f = float(seconds_per_image) * int(fps)
+    if capped:
+        n_frames = max(1, int(math.floor(frames_f + 1e-9)))
+    else:
+        n_frames = max(1, int(round(frames_f)))
+
+    plan: List[Tuple[Path, Path, bool, bool]] = []
+    for i, img in enumerate(images_abs):
+        fade_in = bool(fade) and i == 0
+        fade_out = bool(fade) and i == n - 1
+        key = _segment_key(
+            image_sha=_file_sha256(img),
+            n_frames=n_frames,
+            fps=int(fps),
+            crf=int(crf),
+            force_scale=force_scale,
+            fade_in=fade_in,
+            fade_out=fade_out,
+        )
+        seg = cache_dir / key[:2] / f"{key}.mp4"
+        plan.append((img, seg, fade_in, fade_out))
+
+    misses: Dict[Path, Tuple[Path, bool, bool]] = {}
+    hits = 0
+    for img, seg, fade_in, fade_out in plan:
+        if seg.exists() and seg.stat().st_size > 0:
+            hits += 1
+            try:
+                os.utime(seg, None)
+            except Exception:
+                pass
+        elif seg not in misses:
+            misses[seg] = (img, fade_in, fade_out)
+
+    print(
+        f"[render_video] segment cache: pages={n} hits={hits} to_encode={len(misses)} "
+        f"frames/page={n_frames} dir={cache_dir}"
+    )
+
+    def _encode_one(item: Tuple[Path, Tuple[Path, bool, bool]]) -> None:
+        seg, (img, fade_in, fade_out) = item
+        _encode_segment(
+            image=img,
+            out_path=seg,
+            n_frames=n_frames,
+            fps=int(fps),
+            crf=int(crf),
+            force_scale=force_scale,
+            fade_in=fade_in,
+            fade_out=fade_out,
+        )
+
+    if misses:
+        w = max(1, min(int(workers), len(misses)))
+        if w == 1:
+            for item in misses.items():
+                _encode_one(item)
+        else:
+            with ThreadPoolExecutor(max_workers=w) as ex:
+                list(ex.map(_encode_one, misses.items()))
+
+    seg_list = images_dir / "list_segments.txt"
+    lines = [f"file '{seg.resolve().as_posix()}'" for _, seg, _, _ in plan]
+    seg_list.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-f", "concat",
+        "-safe", "0",
+        "-i", str(seg_list),
+        "-c", "copy",
+        "-movflags", "+faststart",
+        str(out_mp4),
+    ]
+    _run(cmd)
+
+    return {"pages": n, "hits": hits, "encoded": len(misses)}
+
+
+@span_fn("encode")
 def build_video_from_images(
     *,
     images_dir: Path,
@@ -131,6 +391,10 @@ def build_video_from_images(
     # ✅ 自動上限：只有「原本會超過上限」才壓縮
     auto_cap: bool = True,
     max_seconds: float = 178.0,
+    # ✅ 分段快取：None = 依 env RENDER_VIDEO_SEGMENT_CACHE（預設開）
+    segment_cache: Optional[bool] = None,
+    segment_cache_dir: Optional[Path] = None,
+    segment_workers: Optional[int] = None,
 ) -> None:
     """
     用 ffmpeg concat 把圖片串成 mp4。
@@ -145,6 +409,10 @@ def build_video_from_images(
       - 若 target_seconds 提供：永遠固定總長度（覆蓋 seconds_per_image）
       - 否則若 auto_cap=True：只有當 (N * seconds_per_image) > max_seconds 才壓縮到 max_seconds
       - 否則：照 seconds_per_image 原樣輸出
+
+    ✅ segment_cache：
+      - 每張圖先編成一小段 mp4，以「圖檔 hash + fps/crf/scale/張數長度」為 key 存入快取
+      - 最後用 concat + stream copy 組合，只有新的 / 有變的頁面才需要重新編碼
     """
     _ensure_ffmpeg()
     out_mp4.parent.mkdir(parents=True, exist_ok=True)
@@ -170,6 +438,7 @@ def build_video_from_images(
     n = len(imgs_abs)
     base_seconds = float(seconds_per_image)
     est_total = n * base_seconds
+    capped = False
 
     # ✅ 優先：手動固定總長度
     if target_seconds is not None:
@@ -177,6 +446,7 @@ def build_video_from_images(
         if ts <= 0:
             raise RuntimeError("--target-seconds 必須大於 0")
         seconds_per_image = ts / max(1, n)
+        capped = True
         print(
             f"[render_video] 強制總長度模式：target_seconds={ts:.3f}s, 圖片數={n}, "
             f"每張停留={seconds_per_image:.6f}s"
@@ -190,6 +460,7 @@ def build_video_from_images(
 
             if est_total > ms:
                 seconds_per_image = ms / max(1, n)
+                capped = True
                 print(
                     f"[render_video] 自動上限觸發：max_seconds={ms:.3f}s, 圖片數={n}, "
                     f"原本預估={est_total:.3f}s（{base_seconds:.3f}s/張） -> "
@@ -206,6 +477,34 @@ def build_video_from_images(
                 f"預估總長={est_total:.3f}s（{base_seconds:.3f}s/張），照原設定輸出"
             )
 
+    if segment_cache is None:
+        segment_cache = _env_bool("RENDER_VIDEO_SEGMENT_CACHE", "1")
+
+    if segment_cache:
+        cache_dir = Path(segment_cache_dir) if segment_cache_dir else default_segment_cache_dir()
+        if segment_workers is None:
+            segment_workers = int(os.getenv("RENDER_VIDEO_SEGMENT_WORKERS", "") or min(4, os.cpu_count() or 1))
+
+        _build_video_from_segments(
+            images_abs=imgs_abs,
+            images_dir=images_dir,
+            out_mp4=out_mp4,
+            seconds_per_image=seconds_per_image,
+            fps=fps,
+            crf=crf,
+            force_scale=force_scale,
+            fade=fade,
+            cache_dir=cache_dir,
+            workers=int(segment_workers),
+            capped=capped,
+        )
+
+        max_age = float(os.getenv("RENDER_VIDEO_SEGMENT_CACHE_MAX_DAYS", "7") or "7")
+        pruned = prune_segment_cache(cache_dir, max_age_days=max_age)
+        if pruned:
+            print(f"[render_video] segment cache pruned: {pruned} file(s) older than {max_age:g} days")
+        return
+
     using_txt = images_dir / "list_video.txt"
     _write_concat_list(
         images_abs=imgs_abs,
@@ -315,6 +614,17 @@ def main():
     ap.add_argument("--ext", default="png", choices=["png", "jpg", "jpeg"], help="圖片副檔名（預設 png）")
     ap.add_argument("--prefer-top", type=int, default=15, help="overview 預設使用 top N（預設 15）")
 
+    ap.add_argument(
+        "--segment-cache",
+        dest="segment_cache",
+        action="store_true",
+        default=None,
+        help="每頁分段編碼並快取，只重編有變動的頁面（預設依 env RENDER_VIDEO_SEGMENT_CACHE，預設開）",
+    )
+    ap.add_argument("--no-segment-cache", dest="segment_cache", action="store_false", help="關閉分段快取，整段重新編碼")
+    ap.add_argument("--segment-cache-dir", default="", help="分段快取資料夾（預設 media/cache/video_segments）")
+    ap.add_argument("--segment-workers", type=int, default=None, help="同時編碼的分段數（預設 min(4, CPU 數)）")
+
     ap.add_argument("--use-existing-list", action="store_true")
     ap.add_argument("--no-use-existing-list", dest="use_existing_list", action="store_false")
     # ✅ 關鍵：auto_cap 預設 True（不用加參數也會「超過才壓縮」）
@@ -345,6 +655,9 @@ def main():
         ext=args.ext,
         prefer_top=args.prefer_top,
         use_existing_list=args.use_existing_list,
+        segment_cache=args.segment_cache,
+        segment_cache_dir=(Path(args.segment_cache_dir) if args.segment_cache_dir.strip() else None),
+        segment_workers=args.segment_workers,
     )
 
     print(f"✅ 影片已輸出：{out_mp4}")
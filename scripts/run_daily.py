@@ -0,0 +1,227 @@
+# scripts/run_daily.py
+# -*- coding: utf-8 -*-
+"""
+Multi-market daily scheduler (one box, many markets)
+
+Builds a DAG per market / slot and runs it in parallel:
+
+    sync (per market, network) -> build (snapshot + aggregate, main.py --no-sync)
+        -> render (render_images_<m>/cli.py) -> encode (render_video.py) -> upload
+
+- sync / upload run on the network pool (all markets concurrently)
+- build / render / encode run on the CPU pool (bounded by core count)
+- sync + build of the same market share a lock on its SQLite warehouse
+- state + logs in data/cache/scheduler/<run-id>/ ; rerun with the same
+  --run-id to retry failed nodes without re-running finished ones
+
+Examples:
+  python scripts/run_daily.py --markets tw,jp,kr,cn,th --slots close
+  python scripts/run_daily.py --markets all --slots midday --video
+  python scripts/run_daily.py --run-id 2026-02-20_close   # resume / retry failed
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from scripts.shorts.paths import payload_path
+from scripts.shorts.scheduler import Node, SchedulerState, print_report, run_dag, timing_report
+
+ALL_MARKETS = ["tw", "cn", "jp", "kr", "th", "india", "us", "ca", "uk", "au", "fr"]
+
+# markets whose sync stage is separate from the snapshot (TW downloads inside run_intraday)
+NO_SYNC_STAGE = {"tw"}
+
+# main.py EXIT_NONTRADING (kept in sync by hand; importing main.py here would pull in every runner)
+EXIT_NONTRADING = 3
+
+
+def _images_market(m: str) -> str:
+    return "in" if m == "india" else m
+
+
+def _canon_market(m: str) -> str:
+    m = (m or "").strip().lower()
+    return {"in": "india", "nse": "india", "bse": "india"}.get(m, m)
+
+
+def build_nodes(
+    *,
+    markets: List[str],
+    slots: List[str],
+    py: str,
+    video: bool,
+    upload: bool,
+    privacy: str,
+    theme: str,
+    force: bool,
+) -> Dict[str, Node]:
+    from markets.spans import sidecar_path
+    from markets.timekit import market_now_hhmm, market_today_ymd
+
+    nodes: Dict[str, Node] = {}
+
+    def add(n: Node) -> None:
+        nodes[n.key] = n
+        # render / encode children flush their spans here (main.py writes its own)
+        n.env.setdefault("INTRADAY_TIMINGS_SIDECAR", str(sidecar_path(REPO_ROOT, n.market, ymd)))
+
+    for m in markets:
+        lock = f"db:{m}"
+        sync_key = f"{m}:sync"
+        has_sync = m not in NO_SYNC_STAGE
+        ymd = market_today_ymd(m)
+        im = _images_market(m)
+
+        if has_sync:
+            add(Node(key=sync_key, market=m, stage="sync", pool="net", lock=lock,
+                     cmd=[py, "main.py", "--market", m, "--sync-only", "--no-debug"]))
+
+        for slot in slots:
+            base = f"{m}:{slot}"
+
+            build_cmd = [py, "main.py", "--market", m, "--slot", slot, "--no-debug"]
+            if has_sync:
+                build_cmd += ["--no-sync"]
+            if slot != "close":
+                # same as run_shorts --asof auto
+                build_cmd += ["--asof", market_now_hhmm(m)]
+            if force:
+                build_cmd += ["--force"]
+            add(Node(key=f"{base}:build", market=m, slot=slot, stage="build",
+                     # TW downloads inside its snapshot -> network pool
+                     pool=("cpu" if has_sync else "net"), lock=lock,
+                     deps=[sync_key] if has_sync else [], cmd=build_cmd,
+                     # non-trading day: render/encode/upload are skipped, not failed
+                     skip_rc=EXIT_NONTRADING))
+
+            cli = REPO_ROOT / "scripts" / f"render_images_{im}" / "cli.py"
+            p_payload = payload_path(REPO_ROOT, m, ymd, slot)
+            add(Node(key=f"{base}:render", market=m, slot=slot, stage="render", pool="cpu",
+                     deps=[f"{base}:build"],
+                     cmd=[py, str(cli), "--payload", str(p_payload), "--theme", theme]))
+
+            if not video:
+                continue
+
+            add(Node(key=f"{base}:encode", market=m, slot=slot, stage="encode", pool="cpu",
+                     deps=[f"{base}:render"],
+                     cmd=[py, "scripts/render_video.py", "--market", im, "--ymd", ymd, "--slot", slot]))
+
+            if not upload:
+                continue
+
+            mp4 = REPO_ROOT / "media" / "videos" / im / f"{ymd}_{slot}.mp4"
+            add(Node(key=f"{base}:upload", market=m, slot=slot, stage="upload", pool="net",
+                     deps=[f"{base}:encode"],
+                     cmd=[py, "scripts/youtube_pipeline_safe.py", "--video", str(mp4),
+                          "--market", m.upper(), "--ymd", ymd, "--slot", slot, "--privacy", privacy]))
+
+    return nodes
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Run several markets/slots in parallel as one DAG.")
+    ap.add_argument("--markets", default="all", help=f"comma list or 'all' ({','.join(ALL_MARKETS)})")
+    ap.add_argument("--slots", default="close", help="comma list: open,midday,close")
+    ap.add_argument("--video", action="store_true", help="also encode videos (render_video.py)")
+    ap.add_argument("--upload", action="store_true", help="also upload to YouTube (implies --video)")
+    ap.add_argument("--privacy", default="private")
+    ap.add_argument("--theme", default="dark")
+    ap.add_argument("--force", action="store_true", help="pass --force to main.py build nodes")
+
+    ap.add_argument("--net-workers", type=int, default=int(os.getenv("RUN_DAILY_NET_WORKERS", "0") or 0),
+                    help="concurrent network nodes (default: number of markets)")
+    ap.add_argument("--cpu-workers", type=int, default=int(os.getenv("RUN_DAILY_CPU_WORKERS", "0") or 0),
+                    help="concurrent CPU nodes (default: os.cpu_count())")
+    ap.add_argument("--retries", type=int, default=1, help="in-run retries per failed node")
+    ap.add_argument("--retry-backoff", type=float, default=15.0)
+    ap.add_argument("--node-timeout", type=float, default=0.0, help="seconds; 0 = no timeout")
+
+    ap.add_argument("--run-id", default="", help="state/log folder name (default: <utc-date>_<slots>)")
+    ap.add_argument("--fresh", action="store_true", help="ignore existing state for this run-id")
+    ap.add_argument("--dry-run", action="store_true", help="print the DAG and exit")
+    args = ap.parse_args()
+
+    if str(args.markets).strip().lower() in ("", "all"):
+        markets = list(ALL_MARKETS)
+    else:
+        markets = []
+        for x in str(args.markets).split(","):
+            m = _canon_market(x)
+            if m and m not in markets:
+                markets.append(m)
+    slots = [s.strip().lower() for s in str(args.slots).split(",") if s.strip()]
+    if args.upload:
+        args.video = True
+
+    run_id = args.run_id.strip() or f"{datetime.now(timezone.utc).strftime('%Y-%m-%d')}_{'-'.join(slots)}"
+    run_dir = REPO_ROOT / "data" / "cache" / "scheduler" / run_id
+    # every node's spans share this id in timings.jsonl
+    os.environ.setdefault("INTRADAY_RUN_ID", run_id)
+
+    nodes = build_nodes(
+        markets=markets,
+        slots=slots,
+        py=sys.executable,
+        video=bool(args.video),
+        upload=bool(args.upload),
+        privacy=str(args.privacy),
+        theme=str(args.theme),
+        force=bool(args.force),
+    )
+
+    net_workers = args.net_workers or max(1, len(markets))
+    cpu_workers = args.cpu_workers or (os.cpu_count() or 2)
+
+    print(f"[sched] run_id={run_id} markets={','.join(markets)} slots={','.join(slots)} nodes={len(nodes)}", flush=True)
+    print(f"[sched] pools: net={net_workers} cpu={cpu_workers} retries={args.retries}", flush=True)
+
+    if args.dry_run:
+        for k, n in nodes.items():
+            deps = ",".join(n.deps) or "-"
+            print(f"  {k:<28} pool={n.pool:<3} lock={n.lock or '-':<8} deps={deps}", flush=True)
+        return 0
+
+    state = SchedulerState(run_dir / "state.json", fresh=bool(args.fresh))
+
+    t0 = time.perf_counter()
+    ok = run_dag(
+        nodes,
+        state=state,
+        log_dir=run_dir / "logs",
+        net_workers=net_workers,
+        cpu_workers=cpu_workers,
+        retries=int(args.retries),
+        retry_backoff_s=float(args.retry_backoff),
+        node_timeout_s=(float(args.node_timeout) if args.node_timeout > 0 else None),
+    )
+    wall = time.perf_counter() - t0
+
+    rep = timing_report(nodes, state, wall_seconds=wall)
+    rep["run_id"] = run_id
+    rep["ok"] = bool(ok)
+    (run_dir / "report.json").write_text(json.dumps(rep, ensure_ascii=False, indent=2), encoding="utf-8")
+    print_report(rep)
+    print(f"[sched] report: {run_dir / 'report.json'}", flush=True)
+
+    if not ok:
+        print(f"[sched] some nodes failed; rerun with --run-id {run_id} to retry them", flush=True)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
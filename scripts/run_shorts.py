@@ -24,6 +24,7 @@ UPLOAD_PAYLOAD_TO_DRIVE = True
 import argparse
 import os
 
+from scripts.shorts.inproc import StepRunner
 from scripts.shorts.paths import (
     images_dir,
     post_align_images_dir,
@@ -32,16 +33,20 @@ from scripts.shorts.paths import (
     video_out,
 )
 from scripts.shorts.steps import (
+    NonTradingSkip,
     drive_upload,
     env_bool,
     ensure_json_file_from_env,
+    images_step_inputs,
     import_build_video,
     import_timekit,
     normalize_market,
+    open_step_cache,
     resolve_payload_and_maybe_realign,
-    run_cmd,
     summary_print,
     tree,
+    upload_step_inputs,
+    video_step_inputs,
 )
 
 # =============================================================================
@@ -102,6 +107,20 @@ def main() -> int:
         help="Force refresh: delete existing payload/done/images/video for the resolved ymd before running.",
     )
 
+    # Step cache (content hash)
+    ap.add_argument(
+        "--no-step-cache",
+        action="store_true",
+        help="Always run images/video/upload even if their input fingerprints are unchanged.",
+    )
+    ap.add_argument(
+        "--rerun",
+        action="append",
+        default=[],
+        choices=["images", "video", "upload"],
+        help="Invalidate one step's fingerprint (repeatable). Downstream steps rerun only if their inputs change.",
+    )
+
     # Drive
     ap.add_argument("--drive", action="store_true", help="Upload artifacts to Google Drive (default: off)")
     ap.add_argument("--drive-parent-id", default=os.getenv("GDRIVE_ROOT_FOLDER_ID", "").strip())
@@ -110,6 +129,17 @@ def main() -> int:
     ap.add_argument("--drive-images-mode", default="zip", choices=["zip", "dir"])
     ap.add_argument("--drive-workers", type=int, default=8)
 
+    # Execution mode
+    ap.add_argument(
+        "--subprocess",
+        action="store_true",
+        help="Run main.py / render_images / upload as isolated subprocesses (default: in-process; env RUN_SHORTS_SUBPROCESS=1).",
+    )
+
+    # Profiling (markets/profiling.py; env INTRADAY_PROFILE works too)
+    ap.add_argument("--profile", default="", help="Stages to profile, e.g. sync,aggregate,render or snapshot:mem")
+    ap.add_argument("--profile-mode", default=None, choices=["cpu", "mem", "pyspy"])
+
     # Debug tree
     ap.add_argument("--no-debug-tree", action="store_true")
     ap.add_argument("--debug-tree-depth", type=int, default=5)
@@ -155,9 +185,20 @@ def main() -> int:
         args.skip_video = True
         args.skip_upload = True
 
-    py = sys.executable
     is_gha = env_bool("GITHUB_ACTIONS", "0")
 
+    use_subprocess = bool(args.subprocess) or env_bool("RUN_SHORTS_SUBPROCESS", "0")
+    runner = StepRunner(inproc=not use_subprocess)
+    print(f"[mode] steps run {runner.mode}", flush=True)
+    runner.bind_timings(market_lower, ymd, slot)
+
+    from markets import profiling
+
+    if args.profile:
+        profiling.install(args.profile, mode=args.profile_mode)
+    # exported to env as well, so subprocess-mode children write next to the payload
+    profiling.set_output(REPO_ROOT / "data" / "cache" / market_lower / ymd, tag=slot)
+
     # ✅ GHA: write env json to files if provided
     if is_gha:
         token_path = ensure_json_file_from_env("YOUTUBE_TOKEN_JSON", REPO_ROOT / args.token)
@@ -168,17 +209,37 @@ def main() -> int:
         playlist_map_path = (REPO_ROOT / args.playlist_map).expanduser().resolve()
 
     # 1) main.py -> payload (with fallback realign)
-    payload, ymd = resolve_payload_and_maybe_realign(
-        market_lower=market_lower,
-        ymd=ymd,
-        slot=slot,
-        force=bool(args.force),
-        skip_main=bool(args.skip_main),
-        asof=asof,
-        debug_tree=debug_tree,
-        debug_depth=int(args.debug_tree_depth),
-        debug_max=int(args.debug_tree_max),
+    try:
+        payload, ymd = resolve_payload_and_maybe_realign(
+            market_lower=market_lower,
+            ymd=ymd,
+            slot=slot,
+            force=bool(args.force),
+            skip_main=bool(args.skip_main),
+            asof=asof,
+            debug_tree=debug_tree,
+            debug_depth=int(args.debug_tree_depth),
+            debug_max=int(args.debug_tree_max),
+            runner=runner,
+        )
+    except NonTradingSkip as e:
+        print(f"⏭️  {e}; nothing to render/upload", flush=True)
+        return 0
+    runner.bind_timings(market_lower, ymd, slot)
+    profiling.set_output(payload.parent, tag=slot)
+
+    # ✅ step cache: per (market, ymd, slot) fingerprints of images/video/upload
+    step_cache = open_step_cache(
+        market_lower,
+        ymd,
+        slot,
+        enabled=(not args.no_step_cache) and env_bool("RUN_SHORTS_STEP_CACHE", "1"),
     )
+    if args.force:
+        step_cache.invalidate("render_images", "render_video", "upload")
+    elif args.rerun:
+        step_map = {"images": "render_images", "video": "render_video", "upload": "upload"}
+        step_cache.invalidate(*[step_map[x] for x in args.rerun])
 
     # 2) resolve images ymd and dir
     images_ymd = resolve_images_ymd(
@@ -201,7 +262,22 @@ def main() -> int:
         safe_rm(video_out(REPO_ROOT, images_market_lower, images_ymd, slot))
 
     # 3) render_images
+    images_inputs = None
     if not args.skip_images:
+        images_inputs = images_step_inputs(
+            market_lower=market_lower,
+            payload=payload,
+            theme=str(args.theme or ""),
+            layout=str(args.layout or ""),
+        )
+        images_inputs["images_dir"] = str(images_dir_path)
+
+    if images_inputs is not None and step_cache.is_fresh("render_images", images_inputs):
+        # post-align may have moved the dir last time; reuse the recorded output path
+        rec = (step_cache.get("render_images") or {}).get("outputs", {}).get("images", {})
+        images_dir_path = Path(rec.get("path") or images_dir_path)
+        print(f"[step-cache] render_images fresh (payload/renderer unchanged) -> skip: {images_dir_path}", flush=True)
+    elif not args.skip_images:
         cli_path = REPO_ROOT / "scripts" / f"render_images_{market_lower}" / "cli.py"
 
         # Backward compatibility: allow old folder name render_images_in
@@ -213,12 +289,12 @@ def main() -> int:
         if not cli_path.exists():
             raise FileNotFoundError(f"market cli not found: {cli_path}")
 
-        cmd = [py, str(cli_path), "--payload", str(payload)]
+        cli_args = ["--payload", str(payload)]
         if args.theme:
-            cmd += ["--theme", str(args.theme)]
+            cli_args += ["--theme", str(args.theme)]
         if args.layout:
-            cmd += ["--layout", str(args.layout)]
-        run_cmd(cmd, cwd=REPO_ROOT)
+            cli_args += ["--layout", str(args.layout)]
+        runner.run_render_images(cli_path, cli_args, payload_path=payload)
 
         # post-align may move images dir; keep market_lower for decision logic,
         # but pass the current images_dir_path we built from images_market_lower.
@@ -232,6 +308,8 @@ def main() -> int:
             slot=slot,
             payload_path=payload,
         )
+        if images_dir_path.exists():
+            step_cache.record("render_images", images_inputs, outputs={"images": images_dir_path})
 
     if not images_dir_path.exists():
         if debug_tree:
@@ -246,9 +324,25 @@ def main() -> int:
     # 4) render_video
     out_mp4 = video_out(REPO_ROOT, images_market_lower, ymd, slot)
 
+    video_inputs = None
     if not args.skip_video:
+        video_inputs = video_step_inputs(
+            images_dir_path=images_dir_path,
+            seconds=float(args.seconds),
+            fps=int(args.fps),
+            crf=int(args.crf),
+            scale=str(args.scale),
+            fade=bool(args.fade),
+        )
+        video_inputs["out_mp4"] = str(out_mp4)
+
+    if video_inputs is not None and step_cache.is_fresh("render_video", video_inputs):
+        print(f"[step-cache] render_video fresh (images/params unchanged) -> skip: {out_mp4}", flush=True)
+    elif not args.skip_video:
         build_video_from_images = import_build_video()
-        build_video_from_images(
+        runner.timed(
+            "render_video",
+            build_video_from_images,
             images_dir=images_dir_path,
             out_mp4=out_mp4,
             seconds_per_image=float(args.seconds),
@@ -264,9 +358,14 @@ def main() -> int:
         if not out_mp4.exists():
             raise FileNotFoundError(f"video not generated: {out_mp4}")
 
+        step_cache.record("render_video", video_inputs, outputs={"video": out_mp4})
+
+    if not args.skip_video:
         if args.drive and args.drive_order == "after_video":
             print("[drive] uploading after video ...", flush=True)
-            drive_upload(
+            runner.timed(
+                "drive_upload",
+                drive_upload,
                 drive_parent_id=str(args.drive_parent_id),
                 market_upper=market_upper,
                 ymd=ymd,
@@ -284,9 +383,7 @@ def main() -> int:
         if not out_mp4.exists():
             raise FileNotFoundError(f"video not generated: {out_mp4}")
 
-        cmd = [
-            py,
-            "scripts/youtube_pipeline_safe.py",
+        cli_args = [
             "--video",
             str(out_mp4),
             "--token",
@@ -303,12 +400,27 @@ def main() -> int:
             str(args.privacy),
         ]
         if args.skip_playlist:
-            cmd += ["--skip-playlist"]
-        run_cmd(cmd, cwd=REPO_ROOT)
+            cli_args += ["--skip-playlist"]
+
+        upload_inputs = upload_step_inputs(
+            out_mp4=out_mp4,
+            market_upper=market_upper,
+            ymd=ymd,
+            slot=slot,
+            privacy=str(args.privacy),
+            skip_playlist=bool(args.skip_playlist),
+        )
+        if step_cache.is_fresh("upload", upload_inputs):
+            print("[step-cache] upload fresh (same video already uploaded) -> skip YouTube upload", flush=True)
+        else:
+            runner.run_youtube_upload(cli_args)
+            step_cache.record("upload", upload_inputs)
 
         if args.drive and args.drive_order == "after_youtube":
             print("[drive] uploading after youtube ...", flush=True)
-            drive_upload(
+            runner.timed(
+                "drive_upload",
+                drive_upload,
                 drive_parent_id=str(args.drive_parent_id),
                 market_upper=market_upper,
                 ymd=ymd,
@@ -323,7 +435,9 @@ def main() -> int:
 
     if args.drive and args.drive_order == "end":
         print("[drive] uploading at end ...", flush=True)
-        drive_upload(
+        runner.timed(
+            "drive_upload",
+            drive_upload,
             drive_parent_id=str(args.drive_parent_id),
             market_upper=market_upper,
             ymd=ymd,
@@ -351,6 +465,10 @@ def main() -> int:
         slot=slot,
     )
 
+    profiling.finish()
+    runner.print_timings()
+    runner.write_timings(payload.parent / f"{slot}.run_shorts_timings.json")
+
     if debug_tree:
         tree(payload.parent, enabled=True, max_depth=int(args.debug_tree_depth), max_items=int(args.debug_tree_max))
         tree(images_dir_path, enabled=True, max_depth=int(args.debug_tree_depth), max_items=int(args.debug_tree_max))
@@ -0,0 +1,183 @@
+# scripts/shorts/inproc.py
+# -*- coding: utf-8 -*-
+"""
+In-process step runner for run_shorts.py
+
+Default mode calls the same entry points the subprocess mode launches:
+  - main.py            -> main.main(argv)          (payload dict kept in memory)
+  - render_images_<m>  -> scripts.render_images_<m>.cli.main(argv, payload=...)
+  - youtube upload     -> scripts.youtube_pipeline_safe.main(argv)
+
+so pandas / matplotlib / yfinance / Google clients are imported once per run
+and the payload JSON is not re-parsed from disk.
+
+--subprocess (or RUN_SHORTS_SUBPROCESS=1) keeps the old isolated behavior.
+"""
+
+from __future__ import annotations
+
+import importlib
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .steps import REPO_ROOT, run_cmd
+
+
+def _call_entry(fn: Callable[..., Any], argv: List[str], **kwargs: Any) -> Any:
+    """
+    Call a CLI-style main(argv) and turn a non-zero SystemExit into an error
+    (same failure semantics as run_cmd's CalledProcessError).
+    """
+    try:
+        return fn(argv, **kwargs)
+    except SystemExit as e:
+        code = e.code
+        if code in (None, 0):
+            return None
+        raise RuntimeError(f"in-process step exited with code={code}: {getattr(fn, '__module__', fn)}") from e
+
+
+class StepRunner:
+    """
+    Runs pipeline steps either in-process (default) or as subprocesses,
+    and records wall time per step.
+    """
+
+    def __init__(self, *, inproc: bool = True):
+        self.inproc = bool(inproc)
+        self.timings: List[Dict[str, Any]] = []
+        self._payload_obj: Optional[Dict[str, Any]] = None
+        self._payload_path: Optional[Path] = None
+        self._timings_ctx: Dict[str, Any] = {}
+
+        if self.inproc:
+            # subprocess mode runs with cwd=REPO_ROOT; several scripts use relative paths
+            os.chdir(str(REPO_ROOT))
+            os.environ.setdefault("PYTHONUTF8", "1")
+            os.environ.setdefault("PYTHONIOENCODING", "utf-8")
+            if str(REPO_ROOT) not in sys.path:
+                sys.path.insert(0, str(REPO_ROOT))
+
+    @property
+    def mode(self) -> str:
+        return "inproc" if self.inproc else "subprocess"
+
+    # -------------------------------------------------------------------------
+    # timing
+    # -------------------------------------------------------------------------
+    def bind_timings(self, market_lower: str, ymd: str, slot: str) -> None:
+        """
+        Point stage spans (markets/spans.py) of this run and its child
+        processes at data/cache/<market>/<ymd>/timings.jsonl.
+        """
+        from markets import spans
+
+        spans.run_id()
+        os.environ["INTRADAY_TIMINGS_SIDECAR"] = str(spans.sidecar_path(REPO_ROOT, market_lower, ymd))
+        self._timings_ctx = {"market": market_lower, "ymd": ymd, "slot": slot}
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            dt = time.perf_counter() - t0
+            self.timings.append({"step": name, "seconds": round(dt, 3), "mode": self.mode, "ok": ok})
+            print(f"[timing] {name}: {dt:.2f}s ({self.mode}{'' if ok else ', FAILED'})", flush=True)
+            if self.inproc and self._timings_ctx:
+                from markets import spans
+
+                spans.flush(**self._timings_ctx, stage=name)
+
+    def print_timings(self) -> None:
+        if not self.timings:
+            return
+        total = sum(float(t["seconds"]) for t in self.timings)
+        print(f"\n[timing] per-step ({self.mode})", flush=True)
+        for t in self.timings:
+            flag = "" if t["ok"] else "  (failed)"
+            print(f"  {t['step']:<16} {float(t['seconds']):>8.2f}s{flag}", flush=True)
+        print(f"  {'total':<16} {total:>8.2f}s", flush=True)
+
+    def write_timings(self, path: Path) -> None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(
+                json.dumps({"mode": self.mode, "steps": self.timings}, ensure_ascii=False, indent=2),
+                encoding="utf-8",
+            )
+        except Exception as e:
+            print(f"[timing] could not write {path}: {e}", flush=True)
+
+    # -------------------------------------------------------------------------
+    # steps
+    # -------------------------------------------------------------------------
+    def run_main(self, main_args: List[str], *, payload_path: Path) -> None:
+        """
+        main.py --market ... --slot ... [--asof ...]
+        """
+        with self.step("main"):
+            if not self.inproc:
+                run_cmd([sys.executable, "main.py", *main_args], cwd=REPO_ROOT)
+                return
+
+            print("▶ [inproc] main.py", " ".join(main_args), flush=True)
+            import main as main_mod  # type: ignore
+
+            obj = _call_entry(main_mod.main, list(main_args))
+            if isinstance(obj, dict):
+                self._payload_obj = obj
+                self._payload_path = Path(payload_path).resolve()
+
+    def payload_for(self, payload_path: Path) -> Optional[Dict[str, Any]]:
+        """
+        In-memory payload if main() produced exactly this file in this run.
+        """
+        if self._payload_obj is None or self._payload_path is None:
+            return None
+        if Path(payload_path).resolve() != self._payload_path:
+            return None
+        return self._payload_obj
+
+    def run_render_images(self, cli_path: Path, cli_args: List[str], *, payload_path: Path) -> None:
+        with self.step("render_images"):
+            if not self.inproc:
+                run_cmd([sys.executable, str(cli_path), *cli_args], cwd=REPO_ROOT)
+                return
+
+            rel = Path(cli_path).resolve().relative_to(REPO_ROOT).with_suffix("")
+            mod_name = ".".join(rel.parts)
+            print(f"▶ [inproc] {mod_name}", " ".join(cli_args), flush=True)
+            mod = importlib.import_module(mod_name)
+
+            payload_obj = self.payload_for(payload_path)
+            if payload_obj is not None:
+                print("[inproc] payload handed over in memory (no JSON re-parse)", flush=True)
+
+            from markets.spans import span
+
+            with span("render_images", module=mod_name):
+                _call_entry(mod.main, list(cli_args), payload=payload_obj)
+
+    def timed(self, name: str, fn: Callable[..., Any], **kwargs: Any) -> Any:
+        # build_video_from_images / drive_upload are in-process calls in both modes
+        with self.step(name):
+            return fn(**kwargs)
+
+    def run_youtube_upload(self, cli_args: List[str]) -> None:
+        with self.step("upload"):
+            if not self.inproc:
+                run_cmd([sys.executable, "scripts/youtube_pipeline_safe.py", *cli_args], cwd=REPO_ROOT)
+                return
+
+            print("▶ [inproc] scripts.youtube_pipeline_safe", " ".join(cli_args), flush=True)
+            mod = importlib.import_module("scripts.youtube_pipeline_safe")
+            _call_entry(mod.main, list(cli_args))
@@ -17,6 +17,11 @@ def done_path(repo_root: Path, market_lower: str, ymd: str, slot: str) -> Path:
     return repo_root / "data" / "cache" / market_lower / ymd / f"{slot}.done.json"
 
 
+def skip_path(repo_root: Path, market_lower: str, ymd: str, slot: str) -> Path:
+    # written by main.py when the market clock says ymd is not a trading day
+    return repo_root / "data" / "cache" / market_lower / ymd / f"{slot}.skip.json"
+
+
 def images_dir(repo_root: Path, market_lower: str, ymd: str, slot: str) -> Path:
     return repo_root / "media" / "images" / market_lower / ymd / slot
 
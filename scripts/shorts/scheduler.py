@@ -0,0 +1,311 @@
+# scripts/shorts/scheduler.py
+# -*- coding: utf-8 -*-
+"""
+Small DAG executor for multi-market daily runs (used by scripts/run_daily.py)
+
+- Every node is one subprocess (main.py / render_images cli / render_video / upload)
+  so CPU-bound stages really run in parallel.
+- Two pools:
+    net : network-bound nodes (sync, upload)      -> many at once
+    cpu : CPU-bound nodes (build, render, encode) -> bounded by core count
+- Optional per-node lock key (e.g. "db:us") so only one node touches a
+  market's SQLite warehouse at a time.
+- A node may declare skip_rc (main.py's non-trading-day exit code): that rc
+  marks it and everything downstream "skipped" instead of failed.
+- State is persisted after every node; re-running with the same state file
+  retries failed / pending nodes and never reruns finished ones.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from .steps import REPO_ROOT
+
+# run order preference when several nodes are ready
+STAGE_ORDER = ["sync", "build", "render", "encode", "upload"]
+
+# statuses that count as finished: never rerun on resume, run_dag still returns True
+FINAL_OK = ("done", "skipped")
+
+
+def _now_utc_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+
+
+@dataclass
+class Node:
+    key: str
+    market: str
+    stage: str
+    cmd: List[str]
+    pool: str = "cpu"                       # "net" | "cpu"
+    deps: List[str] = field(default_factory=list)
+    lock: Optional[str] = None              # e.g. "db:us"
+    slot: Optional[str] = None
+    env: Dict[str, str] = field(default_factory=dict)
+    skip_rc: Optional[int] = None           # rc meaning "nothing to do" (e.g. main.py EXIT_NONTRADING)
+
+
+class SchedulerState:
+    """
+    JSON file: {"nodes": {key: {"status": ..., "attempts": n, "seconds": ..., ...}}}
+    status: pending | running | done | skipped | failed | blocked
+    """
+
+    def __init__(self, path: Path, *, fresh: bool = False):
+        self.path = Path(path)
+        self.data: Dict[str, Any] = {"nodes": {}}
+        if not fresh and self.path.exists():
+            try:
+                obj = json.loads(self.path.read_text(encoding="utf-8"))
+                if isinstance(obj, dict) and isinstance(obj.get("nodes"), dict):
+                    self.data = obj
+            except Exception:
+                pass
+
+    def node(self, key: str) -> Dict[str, Any]:
+        return self.data["nodes"].setdefault(key, {"status": "pending", "attempts": 0})
+
+    def status(self, key: str) -> str:
+        return str(self.node(key).get("status") or "pending")
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self.data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def _run_node(node: Node, log_path: Path, timeout_s: Optional[float]) -> Dict[str, Any]:
+    env = os.environ.copy()
+    env.setdefault("PYTHONUTF8", "1")
+    env.setdefault("PYTHONIOENCODING", "utf-8")
+    env.update(node.env)
+
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    started = _now_utc_iso()
+    rc: int
+    err = None
+    with open(log_path, "a", encoding="utf-8") as logf:
+        logf.write(f"\n===== {started} ▶ {' '.join(node.cmd)}\n")
+        logf.flush()
+        try:
+            p = subprocess.run(
+                node.cmd,
+                cwd=str(REPO_ROOT),
+                env=env,
+                stdout=logf,
+                stderr=subprocess.STDOUT,
+                timeout=timeout_s,
+            )
+            rc = int(p.returncode)
+        except subprocess.TimeoutExpired:
+            rc = -9
+            err = f"timeout after {timeout_s}s"
+        except Exception as e:
+            rc = -1
+            err = str(e)
+    return {
+        "rc": rc,
+        "error": err,
+        "started_at_utc": started,
+        "finished_at_utc": _now_utc_iso(),
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+
+
+def _tail(path: Path, n: int = 30) -> str:
+    try:
+        lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
+        return "\n".join(lines[-n:])
+    except Exception:
+        return ""
+
+
+def run_dag(
+    nodes: Dict[str, Node],
+    *,
+    state: SchedulerState,
+    log_dir: Path,
+    net_workers: int,
+    cpu_workers: int,
+    retries: int = 1,
+    retry_backoff_s: float = 15.0,
+    node_timeout_s: Optional[float] = None,
+) -> bool:
+    """
+    Execute nodes respecting deps, pool sizes and locks. Returns True if all done.
+    """
+    pending: Set[str] = set()
+    for k in nodes:
+        st = state.node(k)
+        if st.get("status") in FINAL_OK:
+            continue
+        # previous run's failures get a fresh retry budget
+        st["status"] = "pending"
+        st["attempts_this_run"] = 0
+        st.pop("not_before", None)
+        pending.add(k)
+    state.save()
+
+    skipped_done = len(nodes) - len(pending)
+    if skipped_done:
+        print(f"[sched] resume: {skipped_done} node(s) already done/skipped, {len(pending)} to run", flush=True)
+
+    cap = {"net": max(1, int(net_workers)), "cpu": max(1, int(cpu_workers))}
+    active = {"net": 0, "cpu": 0}
+    held: Set[str] = set()
+    running: Dict[Future, str] = {}
+
+    def _prio(k: str):
+        n = nodes[k]
+        si = STAGE_ORDER.index(n.stage) if n.stage in STAGE_ORDER else len(STAGE_ORDER)
+        return (si, n.market, n.slot or "", k)
+
+    with ThreadPoolExecutor(max_workers=cap["net"]) as net_ex, ThreadPoolExecutor(max_workers=cap["cpu"]) as cpu_ex:
+        while pending or running:
+            now = time.time()
+
+            for k in sorted(pending, key=_prio):
+                n = nodes[k]
+                dep_status = [state.status(d) if d in nodes else "done" for d in n.deps]
+                if any(s in ("failed", "blocked") for s in dep_status):
+                    st = state.node(k)
+                    st["status"] = "blocked"
+                    st["reason"] = "dependency failed"
+                    pending.discard(k)
+                    print(f"[sched] ⛔ blocked {k} (dependency failed)", flush=True)
+                    continue
+                if "skipped" in dep_status:
+                    st = state.node(k)
+                    st["status"] = "skipped"
+                    st["reason"] = "dependency skipped"
+                    pending.discard(k)
+                    print(f"[sched] ⏭️  skipped {k} (dependency skipped)", flush=True)
+                    continue
+                if any(s != "done" for s in dep_status):
+                    continue
+                if float(state.node(k).get("not_before") or 0) > now:
+                    continue
+                if active[n.pool] >= cap[n.pool]:
+                    continue
+                if n.lock and n.lock in held:
+                    continue
+
+                st = state.node(k)
+                st["status"] = "running"
+                st["attempts"] = int(st.get("attempts") or 0) + 1
+                st["attempts_this_run"] = int(st.get("attempts_this_run") or 0) + 1
+                active[n.pool] += 1
+                if n.lock:
+                    held.add(n.lock)
+                pending.discard(k)
+
+                ex = net_ex if n.pool == "net" else cpu_ex
+                log_path = log_dir / f"{k.replace(':', '_')}.log"
+                st["log"] = str(log_path)
+                print(f"[sched] ▶ {k} ({n.pool}{', lock=' + n.lock if n.lock else ''})", flush=True)
+                running[ex.submit(_run_node, n, log_path, node_timeout_s)] = k
+
+            state.save()
+
+            if not running:
+                if pending:
+                    # only retries waiting on backoff remain
+                    time.sleep(1.0)
+                    continue
+                break
+
+            done, _ = wait(list(running.keys()), timeout=1.0, return_when=FIRST_COMPLETED)
+            for fut in done:
+                k = running.pop(fut)
+                n = nodes[k]
+                active[n.pool] -= 1
+                if n.lock:
+                    held.discard(n.lock)
+
+                try:
+                    res = fut.result()
+                except Exception as e:
+                    res = {"rc": -1, "error": str(e), "seconds": 0.0}
+
+                st = state.node(k)
+                st.update(res)
+                if int(res.get("rc", -1)) == 0:
+                    st["status"] = "done"
+                    print(f"[sched] ✅ {k} {float(res.get('seconds') or 0):.1f}s", flush=True)
+                elif n.skip_rc is not None and int(res.get("rc", -1)) == int(n.skip_rc):
+                    st["status"] = "skipped"
+                    st["reason"] = f"rc={n.skip_rc}"
+                    print(f"[sched] ⏭️  {k} skipped (rc={n.skip_rc})", flush=True)
+                elif int(st.get("attempts_this_run") or 0) <= int(retries):
+                    st["status"] = "pending"
+                    st["not_before"] = time.time() + retry_backoff_s * int(st.get("attempts_this_run") or 1)
+                    pending.add(k)
+                    print(f"[sched] 🔁 {k} failed rc={res.get('rc')} -> retry", flush=True)
+                else:
+                    st["status"] = "failed"
+                    print(f"[sched] ❌ {k} failed rc={res.get('rc')} log={st.get('log')}", flush=True)
+                    tail = _tail(Path(str(st.get("log") or "")))
+                    if tail:
+                        print("----- tail begin -----\n" + tail + "\n----- tail end -----", flush=True)
+            state.save()
+
+    return all(state.status(k) in FINAL_OK for k in nodes)
+
+
+def timing_report(nodes: Dict[str, Node], state: SchedulerState, *, wall_seconds: float) -> Dict[str, Any]:
+    rows: List[Dict[str, Any]] = []
+    by_market: Dict[str, float] = {}
+    by_stage: Dict[str, float] = {}
+    for k, n in nodes.items():
+        st = state.node(k)
+        sec = float(st.get("seconds") or 0.0)
+        rows.append(
+            {
+                "node": k,
+                "market": n.market,
+                "slot": n.slot,
+                "stage": n.stage,
+                "pool": n.pool,
+                "status": st.get("status"),
+                "attempts": st.get("attempts"),
+                "seconds": sec,
+                "started_at_utc": st.get("started_at_utc"),
+                "finished_at_utc": st.get("finished_at_utc"),
+            }
+        )
+        by_market[n.market] = by_market.get(n.market, 0.0) + sec
+        by_stage[n.stage] = by_stage.get(n.stage, 0.0) + sec
+
+    busy = sum(by_market.values())
+    return {
+        "generated_at_utc": _now_utc_iso(),
+        "wall_seconds": round(wall_seconds, 3),
+        "busy_seconds": round(busy, 3),
+        "parallelism": round(busy / wall_seconds, 2) if wall_seconds > 0 else None,
+        "by_market": {k: round(v, 3) for k, v in sorted(by_market.items())},
+        "by_stage": {k: round(v, 3) for k, v in by_stage.items()},
+        "nodes": sorted(rows, key=lambda r: (r["market"], r["slot"] or "", STAGE_ORDER.index(r["stage"]))),
+    }
+
+
+def print_report(rep: Dict[str, Any]) -> None:
+    print("\n[sched] timing report", flush=True)
+    print(f"  {'node':<28} {'status':<8} {'att':>3} {'sec':>9}", flush=True)
+    for r in rep["nodes"]:
+        print(f"  {r['node']:<28} {str(r['status']):<8} {int(r['attempts'] or 0):>3} {r['seconds']:>9.1f}", flush=True)
+    print(
+        f"  wall={rep['wall_seconds']:.1f}s busy={rep['busy_seconds']:.1f}s parallelism={rep['parallelism']}",
+        flush=True,
+    )
@@ -10,7 +10,7 @@ import subprocess
 import sys
 import zipfile
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Any, Optional, Tuple
 
 from .paths import (
     done_path,
@@ -21,12 +21,17 @@ from .paths import (
     post_align_images_dir,
     resolve_images_ymd,
     safe_rm,
+    skip_path,
     video_out,
 )
 
 REPO_ROOT = Path(__file__).resolve().parents[2]
 
 
+class NonTradingSkip(Exception):
+    """main.py skipped ymd as a non-trading day; there is nothing to render or upload."""
+
+
 def env_bool(name: str, default: str = "0") -> bool:
     v = str(os.getenv(name, default)).strip().lower()
     return v in ("1", "true", "yes", "y", "on")
@@ -203,21 +208,51 @@ def tree(root: Path, *, enabled: bool, max_depth: int = 5, max_items: int = 300)
         print(f"  (tree error: {e})", flush=True)
 
 
+# fixed entry metadata => identical images give a byte-identical zip (same Drive md5Checksum)
+_ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+
 def zip_dir_to(zip_path: Path, src_dir: Path) -> Path:
+    """
+    Deterministic zip of src_dir: sorted entries, fixed timestamps / permissions,
+    fixed compression level. The existing zip is kept untouched when the new bytes
+    are identical (so its mtime doesn't change either).
+    """
     src_dir = Path(src_dir).resolve()
     zip_path = Path(zip_path).resolve()
     zip_path.parent.mkdir(parents=True, exist_ok=True)
 
-    if zip_path.exists():
-        zip_path.unlink()
+    tmp = zip_path.with_name(zip_path.name + ".tmp")
+    with zipfile.ZipFile(str(tmp), mode="w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        files = [p for p in src_dir.rglob("*") if p.is_file()]
+        for p in sorted(files, key=lambda x: x.relative_to(src_dir).as_posix()):
+            zi = zipfile.ZipInfo(p.relative_to(src_dir).as_posix(), date_time=_ZIP_EPOCH)
+            zi.compress_type = zipfile.ZIP_DEFLATED
+            zi.external_attr = 0o644 << 16
+            zi.create_system = 3  # unix, regardless of the host OS
+            with open(p, "rb") as f:
+                zf.writestr(zi, f.read(), compress_type=zipfile.ZIP_DEFLATED, compresslevel=6)
+
+    if zip_path.exists() and _same_bytes(tmp, zip_path):
+        tmp.unlink()
+    else:
+        os.replace(tmp, zip_path)
+    return zip_path
 
-    with zipfile.ZipFile(str(zip_path), mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-        for p in sorted(src_dir.rglob("*")):
-            if p.is_file():
-                arc = p.relative_to(src_dir).as_posix()
-                zf.write(str(p), arcname=arc)
 
-    return zip_path
+def _same_bytes(a: Path, b: Path) -> bool:
+    try:
+        if a.stat().st_size != b.stat().st_size:
+            return False
+        with open(a, "rb") as fa, open(b, "rb") as fb:
+            while True:
+                x = fa.read(1024 * 1024)
+                if x != fb.read(1024 * 1024):
+                    return False
+                if not x:
+                    return True
+    except OSError:
+        return False
 
 
 def import_build_video():
@@ -228,6 +263,72 @@ def import_build_video():
     return build_video_from_images
 
 
+# =============================================================================
+# Step fingerprints (content-hash cache, see markets/pipeline_cache.py)
+# =============================================================================
+def open_step_cache(market_lower: str, ymd: str, slot: str, *, enabled: bool):
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+    from markets.pipeline_cache import StepCache, steps_manifest_path  # type: ignore
+
+    return StepCache(steps_manifest_path(REPO_ROOT, market_lower, ymd, slot), enabled=enabled)
+
+
+def images_step_inputs(*, market_lower: str, payload: Path, theme: str, layout: str) -> dict:
+    from markets.pipeline_cache import payload_fingerprint, renderer_source_dirs, source_fingerprint  # type: ignore
+
+    return {
+        "market": market_lower,
+        "payload": payload_fingerprint(payload),
+        "renderer": source_fingerprint(renderer_source_dirs(market_lower)),
+        "theme": theme,
+        "layout": layout,
+    }
+
+
+def video_step_inputs(
+    *,
+    images_dir_path: Path,
+    seconds: float,
+    fps: int,
+    crf: int,
+    scale: str,
+    fade: bool,
+) -> dict:
+    from markets.pipeline_cache import dir_fingerprint, file_sha256  # type: ignore
+
+    return {
+        "images": dir_fingerprint(images_dir_path, patterns=("*.png", "list.txt")),
+        "seconds": float(seconds),
+        "fps": int(fps),
+        "crf": int(crf),
+        "scale": str(scale),
+        "fade": bool(fade),
+        "code": file_sha256(REPO_ROOT / "scripts" / "render_video.py"),
+    }
+
+
+def upload_step_inputs(
+    *,
+    out_mp4: Path,
+    market_upper: str,
+    ymd: str,
+    slot: str,
+    privacy: str,
+    skip_playlist: bool,
+) -> dict:
+    from markets.pipeline_cache import file_sha256  # type: ignore
+
+    return {
+        "video": file_sha256(out_mp4),
+        "market": market_upper,
+        "ymd": ymd,
+        "slot": slot,
+        "privacy": privacy,
+        "skip_playlist": bool(skip_playlist),
+    }
+
+
 def drive_upload(
     *,
     drive_parent_id: str,
@@ -417,10 +518,23 @@ def resolve_payload_and_maybe_realign(
     debug_tree: bool,
     debug_depth: int,
     debug_max: int,
+    runner: Any = None,
 ) -> Tuple[Path, str]:
+    """
+    runner: optional scripts.shorts.inproc.StepRunner (in-process main.py + timings).
+    """
     py = sys.executable
     p = payload_path(REPO_ROOT, market_lower, ymd, slot)
 
+    def _run_main(expected: Path) -> None:
+        main_args = ["--market", market_lower, "--slot", slot]
+        if asof and slot != "close":
+            main_args += ["--asof", asof]
+        if runner is not None:
+            runner.run_main(main_args, payload_path=expected)
+        else:
+            run_cmd([py, "main.py", *main_args], cwd=REPO_ROOT)
+
     if force:
         print("[force] deleting existing artifacts (best effort) ...", flush=True)
         force_clear_recent_done(REPO_ROOT, market_lower, slot, keep_n=6)
@@ -429,15 +543,22 @@ def resolve_payload_and_maybe_realign(
         safe_rm(images_dir(REPO_ROOT, market_lower, ymd, slot))
         safe_rm(video_out(REPO_ROOT, market_lower, ymd, slot))
 
+    skip = skip_path(REPO_ROOT, market_lower, ymd, slot)
     if not skip_main:
-        cmd = [py, "main.py", "--market", market_lower, "--slot", slot]
-        if asof and slot != "close":
-            cmd += ["--asof", asof]
-        run_cmd(cmd, cwd=REPO_ROOT)
+        try:
+            _run_main(p)
+        except Exception:
+            # main.py exits non-zero on a non-trading day; never fall back to an older payload then
+            if skip.exists():
+                raise NonTradingSkip(f"non-trading day: market={market_lower} ymd={ymd} ({skip})") from None
+            raise
 
     if p.exists():
         return p, ymd
 
+    if skip.exists():
+        raise NonTradingSkip(f"non-trading day: market={market_lower} ymd={ymd} ({skip})")
+
     print("[WARN] payload not found at expected path.", flush=True)
     if debug_tree:
         tree(REPO_ROOT / "data" / "cache" / market_lower, enabled=True, max_depth=debug_depth, max_items=debug_max)
@@ -458,10 +579,7 @@ def resolve_payload_and_maybe_realign(
         safe_rm(video_out(REPO_ROOT, market_lower, ymd2, slot))
 
         if not skip_main:
-            cmd = [py, "main.py", "--market", market_lower, "--slot", slot]
-            if asof and slot != "close":
-                cmd += ["--asof", asof]
-            run_cmd(cmd, cwd=REPO_ROOT)
+            _run_main(fb)
 
         if not fb.exists():
             if debug_tree:
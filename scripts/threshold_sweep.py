@@ -0,0 +1,453 @@
+# scripts/threshold_sweep.py
+# -*- coding: utf-8 -*-
+"""
+Threshold sweep: evaluate mover / limit thresholds over a whole warehouse at once
+
+Tuning US_RET_TH / US_TOUCH_TH, KR th30 / th10 or the TW open-limit knobs
+(EMERGING_STRONG_RET, AUTO_NO_LIMIT_MIN_RET) used to mean re-running the
+pipeline one day at a time. Here the warehouse is loaded once into
+[days x symbols] arrays (ret, ret_high), and every grid combination is a
+handful of numpy comparisons across all days:
+
+  - <rule>.mean / .max      daily count of rows hitting the rule
+  - <rule>.sectors          mean number of sectors with >= 1 hit per day (breadth)
+  - <rule>.top_share        mean share of the day's hits in the busiest sector
+  - <streak>.s1..s4+ / .smax  streak-length distribution of hit rows (streak rules only)
+
+Streaks follow the SQL / pandas builders: they count consecutive *rows* of a
+symbol, so days without a valid ret (missing bar, NULL close) do not break
+a streak.
+
+Examples:
+  python scripts/threshold_sweep.py --market us --grid ret=0.05:0.20:0.01 --grid touch=0.08,0.10,0.12
+  python scripts/threshold_sweep.py --market kr --grid th30=0.25:0.30:0.01 --grid th10=0.08:0.15:0.01 \\
+      --heatmap th30,th10 --metric bigup10.mean --png data/bench/kr_sweep.png
+  python scripts/threshold_sweep.py --market tw --csv data/cache/tw/tw_prices_1d_400d_xxxx.csv \\
+      --grid strong=0.05:0.15:0.01 --out data/bench/tw_sweep.csv
+
+Knobs left out of --grid stay at the value the pipeline would use now (env / config).
+Rules are an approximation where the pipeline needs more than prices: the TW
+no_limit rule counts AUTO_NO_LIMIT_MIN_RET candidates on standard boards and
+ignores the "high beyond limit price + N ticks" check.
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import argparse
+import itertools
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# =============================================================================
+# Panel: the whole warehouse as [days x symbols] arrays
+# =============================================================================
+@dataclass
+class Panel:
+    dates: List[str]
+    symbols: List[str]
+    sectors: List[str]          # sector names (column order of onehot)
+    sector_idx: np.ndarray      # [N] int
+    ret: np.ndarray             # [D, N] float, NaN = no valid ret that day
+    ret_high: np.ndarray        # [D, N] float
+    board: Optional[np.ndarray] = None  # [N] bool (TW: open-limit / emerging board)
+
+    @property
+    def onehot(self) -> np.ndarray:
+        oh = np.zeros((len(self.symbols), len(self.sectors)), dtype=np.float32)
+        oh[np.arange(len(self.symbols)), self.sector_idx] = 1.0
+        return oh
+
+
+def _panel_from_long(
+    df: pd.DataFrame,
+    info: pd.DataFrame,
+    *,
+    start: Optional[str],
+    end: Optional[str],
+    board_col: Optional[str] = None,
+    board_values: Tuple[str, ...] = (),
+) -> Panel:
+    """
+    long (symbol, date, high, close) + info (symbol, sector[, board_col]) -> Panel
+    prev_close = previous row of the same symbol (= LAG(close) in the snapshot SQL)
+    """
+    df = df.copy()
+    df["symbol"] = df["symbol"].astype(str).str.strip()
+    df["date"] = df["date"].astype(str).str.slice(0, 10)
+    for c in ("high", "close"):
+        df[c] = pd.to_numeric(df[c], errors="coerce")
+    if end:
+        df = df[df["date"] <= end]
+
+    df = df.sort_values(["symbol", "date"], kind="mergesort")
+    prev = df.groupby("symbol", sort=False)["close"].shift(1)
+    ok = prev.notna() & (prev > 0) & df["close"].notna()
+    df["ret"] = np.where(ok, df["close"] / prev - 1.0, np.nan)
+    okh = ok & df["high"].notna()
+    df["ret_high"] = np.where(okh, df["high"] / prev - 1.0, np.nan)
+    if start:
+        df = df[df["date"] >= start]
+
+    info = info.copy()
+    info["symbol"] = info["symbol"].astype(str).str.strip()
+    info = info.drop_duplicates("symbol").set_index("symbol")
+    df = df[df["symbol"].isin(info.index)]
+
+    ret = df.pivot(index="date", columns="symbol", values="ret").sort_index()
+    ret_high = df.pivot(index="date", columns="symbol", values="ret_high").reindex(index=ret.index, columns=ret.columns)
+    symbols = [str(s) for s in ret.columns]
+
+    sector = info["sector"].reindex(symbols).fillna("").astype(str).str.strip()
+    sector = sector.where(sector != "", "未分類")
+    codes, uniques = pd.factorize(sector, sort=True)
+
+    board = None
+    if board_col and board_col in info.columns:
+        board = info[board_col].reindex(symbols).astype(str).str.strip().isin(board_values).to_numpy()
+
+    return Panel(
+        dates=[str(d) for d in ret.index],
+        symbols=symbols,
+        sectors=[str(u) for u in uniques],
+        sector_idx=np.asarray(codes, dtype=np.int64),
+        ret=ret.to_numpy(dtype=np.float64),
+        ret_high=ret_high.to_numpy(dtype=np.float64),
+        board=board,
+    )
+
+
+def _load_sqlite(db_path: str, *, market: Optional[str], start: Optional[str], end: Optional[str]) -> Panel:
+    if not Path(db_path).exists():
+        raise FileNotFoundError(f"DB not found: {db_path}")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        first = None
+        if start:
+            # one extra date before start so the first day has a prev_close
+            from markets.replay import dates_before
+
+            first = (dates_before(conn, start, 1) or [start])[0]
+        where, params = [], []
+        if first:
+            where.append("date >= ?")
+            params.append(first)
+        if end:
+            where.append("date <= ?")
+            params.append(end)
+        sql = "SELECT symbol, date, high, close FROM stock_prices"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        df = pd.read_sql_query(sql, conn, params=tuple(params))
+
+        sql_info = "SELECT symbol, sector FROM stock_info"
+        info = pd.read_sql_query(
+            sql_info + (" WHERE market = ?" if market else ""),
+            conn,
+            params=(market,) if market else (),
+        )
+    finally:
+        conn.close()
+    return _panel_from_long(df, info, start=start, end=end)
+
+
+def _load_tw(csv_path: Optional[str], list_path: Optional[str], *, start: Optional[str], end: Optional[str]) -> Panel:
+    cache_dir = REPO_ROOT / "data" / "cache" / "tw"
+    if not csv_path:
+        cands = sorted(
+            list(cache_dir.glob("tw_prices_1d_*.csv")) + list(cache_dir.glob("tw_prices_1d_*.parquet")),
+            key=lambda p: p.stat().st_mtime,
+        )
+        if not cands:
+            raise FileNotFoundError(f"no tw_prices_1d_* cache in {cache_dir} (pass --csv)")
+        csv_path = str(cands[-1])
+    p = Path(csv_path)
+    df = pd.read_parquet(p) if p.suffix == ".parquet" else pd.read_csv(p, dtype={"symbol": str})
+
+    lp = Path(list_path or (REPO_ROOT / "data" / "tw_stock_list.json"))
+    info = pd.DataFrame(json.loads(lp.read_text(encoding="utf-8")))
+    for c in ("sector", "market_detail"):
+        if c not in info.columns:
+            info[c] = ""
+    return _panel_from_long(
+        df[["symbol", "date", "high", "close"]],
+        info,
+        start=start,
+        end=end,
+        board_col="market_detail",
+        board_values=("emerging",),
+    )
+
+
+# =============================================================================
+# Vectorized metrics
+# =============================================================================
+def streak_rows(hit: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """
+    [D, N] consecutive-hit length ending at each row; rows with valid=False are
+    skipped (neither extend nor break a streak), like the per-symbol row streaks.
+    """
+    d = hit.shape[0]
+    c = np.cumsum(hit, axis=0, dtype=np.int32)
+    brk = valid & ~hit
+    idx = np.where(brk, np.arange(d)[:, None], -1)
+    last = np.maximum.accumulate(idx, axis=0)
+    base = np.where(last >= 0, np.take_along_axis(c, np.clip(last, 0, None), axis=0), 0)
+    return np.where(hit, c - base, 0)
+
+
+def rule_metrics(name: str, hit: np.ndarray, onehot: np.ndarray) -> Dict[str, float]:
+    daily = hit.sum(axis=1)
+    per_sector = hit.astype(np.float32) @ onehot
+    active = daily > 0
+    top = per_sector.max(axis=1) if per_sector.shape[1] else np.zeros_like(daily, dtype=np.float32)
+    return {
+        f"{name}.mean": float(daily.mean()) if daily.size else 0.0,
+        f"{name}.max": int(daily.max()) if daily.size else 0,
+        f"{name}.sectors": float((per_sector > 0).sum(axis=1).mean()) if daily.size else 0.0,
+        f"{name}.top_share": float((top[active] / daily[active]).mean()) if active.any() else 0.0,
+    }
+
+
+def streak_metrics(name: str, hit: np.ndarray, valid: np.ndarray) -> Dict[str, float]:
+    s = streak_rows(hit, valid)[hit]
+    n = max(1, int(s.size))
+    return {
+        f"{name}.s1": float((s == 1).sum() / n),
+        f"{name}.s2": float((s == 2).sum() / n),
+        f"{name}.s3": float((s == 3).sum() / n),
+        f"{name}.s4+": float((s >= 4).sum() / n),
+        f"{name}.smax": int(s.max()) if s.size else 0,
+    }
+
+
+# =============================================================================
+# Market rules (mirror the snapshot builders' flag definitions)
+# =============================================================================
+RuleFn = Callable[[Panel, Dict[str, float]], Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]]
+
+
+def _rules_us(p: Panel, k: Dict[str, float]):
+    # us_snapshot: hit_10_close = ret >= US_RET_TH; touched_10 = ret_high >= US_TOUCH_TH (close not hit)
+    mover = p.ret >= k["ret"]
+    touched = (p.ret_high >= k["touch"]) & ~mover
+    return {"mover": mover, "touched": touched}, {"mover": mover}
+
+
+def _rules_kr(p: Panel, k: Dict[str, float]):
+    # snapshot_builder._add_flags + indicators_kr (KR_STREAK30_MODE touch/locked)
+    from markets.kr.indicators_kr import _mode30
+
+    locked30 = p.ret >= k["th30"]
+    touch30 = (p.ret_high >= k["th30"]) & (p.ret < k["th30"])
+    bigup10 = p.ret >= k["th10"]
+    limit30 = (locked30 | touch30) if _mode30() == "touch" else locked30
+    return (
+        {"locked30": locked30, "touch30": touch30, "bigup10": bigup10},
+        {"limit30": limit30, "bigup10": bigup10},
+    )
+
+
+def _rules_tw(p: Panel, k: Dict[str, float]):
+    # open-limit board: builders/open_limit (surge touch / locked at EMERGING_STRONG_RET)
+    # standard boards: AUTO_NO_LIMIT_MIN_RET candidates (tick check not modelled)
+    board = p.board if p.board is not None else np.zeros(len(p.symbols), dtype=bool)
+    surge_locked = (p.ret >= k["strong"]) & board
+    surge_touch = (p.ret_high >= k["strong"]) & ~surge_locked & board
+    no_limit = (p.ret >= k["no_limit"]) & ~board
+    return (
+        {"surge_locked": surge_locked, "surge_touch": surge_touch, "no_limit": no_limit},
+        {"surge_locked": surge_locked},
+    )
+
+
+def _knobs_us() -> Dict[str, float]:
+    from markets.us.us_snapshot import US_RET_TH, US_TOUCH_TH
+
+    return {"ret": float(US_RET_TH), "touch": float(US_TOUCH_TH)}
+
+
+def _knobs_kr() -> Dict[str, float]:
+    from markets.kr.snapshot_builder import _th10, _th30
+
+    return {"th30": _th30(), "th10": _th10()}
+
+
+def _knobs_tw() -> Dict[str, float]:
+    from markets.tw.config import AUTO_NO_LIMIT_MIN_RET, EMERGING_STRONG_RET
+
+    return {"strong": float(EMERGING_STRONG_RET), "no_limit": float(AUTO_NO_LIMIT_MIN_RET)}
+
+
+def _db_us() -> str:
+    from markets.us.us_config import _db_path
+
+    return str(_db_path())
+
+
+def _db_kr() -> str:
+    from markets.kr.snapshot_builder import _default_db_path
+
+    return _default_db_path()
+
+
+# market -> (current knob values, rules, sqlite DB path + stock_info.market filter | None for TW CSV)
+MARKETS: Dict[str, Tuple[Callable[[], Dict[str, float]], RuleFn, Optional[Tuple[Callable[[], str], Optional[str]]]]] = {
+    "us": (_knobs_us, _rules_us, (_db_us, "US")),
+    "kr": (_knobs_kr, _rules_kr, (_db_kr, None)),
+    "tw": (_knobs_tw, _rules_tw, None),
+}
+
+
+# =============================================================================
+# Grid
+# =============================================================================
+def parse_grid(specs: List[str], knobs: Dict[str, float]) -> Dict[str, List[float]]:
+    """
+    ["ret=0.05:0.20:0.01", "touch=0.08,0.10"] -> {"ret": [...], "touch": [...]}
+    a:b:step is inclusive of b; knobs not listed keep their current value
+    """
+    grid: Dict[str, List[float]] = {k: [v] for k, v in knobs.items()}
+    for spec in specs or []:
+        name, _, vals = str(spec).partition("=")
+        name = name.strip()
+        if name not in knobs:
+            raise ValueError(f"unknown knob {name!r} (known: {', '.join(knobs)})")
+        if ":" in vals:
+            a, b, step = (float(x) for x in vals.split(":"))
+            if step <= 0:
+                raise ValueError(f"step must be > 0: {spec}")
+            n = int(round((b - a) / step)) + 1
+            grid[name] = [round(a + i * step, 10) for i in range(max(0, n))]
+        else:
+            grid[name] = [float(x) for x in vals.split(",") if x.strip()]
+        if not grid[name]:
+            raise ValueError(f"empty grid for {name}")
+    return grid
+
+
+def sweep(panel: Panel, rules: RuleFn, grid: Dict[str, List[float]]) -> pd.DataFrame:
+    names = list(grid)
+    onehot = panel.onehot
+    valid = ~np.isnan(panel.ret)
+    rows: List[Dict[str, Any]] = []
+    for combo in itertools.product(*(grid[n] for n in names)):
+        k = dict(zip(names, combo))
+        hits, streaks = rules(panel, k)
+        row: Dict[str, Any] = dict(k)
+        for rn, h in hits.items():
+            row.update(rule_metrics(rn, h, onehot))
+        for sn, h in streaks.items():
+            row.update(streak_metrics(sn, h, valid))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def heatmap(df: pd.DataFrame, x: str, y: str, metric: str) -> pd.DataFrame:
+    # other knobs: keep their first grid value so the pivot has one cell per (y, x)
+    sub = df
+    for col in df.columns:
+        if col in (x, y) or "." in col:
+            continue
+        sub = sub[sub[col] == sub[col].iloc[0]]
+    return sub.pivot_table(index=y, columns=x, values=metric, aggfunc="first").sort_index(ascending=False)
+
+
+def save_png(hm: pd.DataFrame, path: str, *, title: str) -> None:
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(1.0 + 0.6 * hm.shape[1], 1.0 + 0.45 * hm.shape[0]))
+    im = ax.imshow(hm.to_numpy(dtype=float), aspect="auto", cmap="viridis")
+    ax.set_xticks(range(hm.shape[1]), [f"{v:g}" for v in hm.columns], rotation=45)
+    ax.set_yticks(range(hm.shape[0]), [f"{v:g}" for v in hm.index])
+    ax.set_xlabel(str(hm.columns.name))
+    ax.set_ylabel(str(hm.index.name))
+    ax.set_title(title)
+    fig.colorbar(im, ax=ax)
+    fig.tight_layout()
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(path, dpi=120)
+    plt.close(fig)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Sweep mover / limit thresholds over a whole warehouse.")
+    ap.add_argument("--market", required=True, choices=list(MARKETS))
+    ap.add_argument("--grid", action="append", default=[], help="knob=a:b:step or knob=v1,v2 (repeatable)")
+    ap.add_argument("--start", default=None, help="first day YYYY-MM-DD (default: whole warehouse)")
+    ap.add_argument("--end", default=None, help="last day YYYY-MM-DD")
+    ap.add_argument("--db", default=None, help="warehouse path (default: the market's *_DB_PATH)")
+    ap.add_argument("--csv", default=None, help="TW: daily cache csv/parquet (default: newest in data/cache/tw)")
+    ap.add_argument("--stock-list", default=None, help="TW: stock list json (default: data/tw_stock_list.json)")
+    ap.add_argument("--heatmap", default=None, metavar="X,Y", help="print METRIC as a Y x X table")
+    ap.add_argument("--metric", default=None, help="metric column for --heatmap (default: first rule .mean)")
+    ap.add_argument("--png", default=None, help="also save the heatmap as PNG (matplotlib)")
+    ap.add_argument("--out", default=None, help="write the full table (.csv or .json)")
+    args = ap.parse_args(argv)
+
+    knobs_fn, rules, src = MARKETS[args.market]
+    grid = parse_grid(args.grid, knobs_fn())
+
+    t0 = time.perf_counter()
+    if src is None:
+        panel = _load_tw(args.csv, args.stock_list, start=args.start, end=args.end)
+    else:
+        db_fn, market_filter = src
+        panel = _load_sqlite(args.db or db_fn(), market=market_filter, start=args.start, end=args.end)
+    t_load = time.perf_counter() - t0
+    if not panel.dates:
+        print("⚠️  no rows in range")
+        return 1
+
+    t1 = time.perf_counter()
+    df = sweep(panel, rules, grid)
+    t_sweep = time.perf_counter() - t1
+    print(
+        f"📊 {args.market}: {panel.dates[0]}..{panel.dates[-1]} days={len(panel.dates)} "
+        f"symbols={len(panel.symbols)} sectors={len(panel.sectors)} | combos={len(df)} "
+        f"load {t_load:.2f}s sweep {t_sweep:.2f}s"
+    )
+
+    with pd.option_context("display.width", 200, "display.max_columns", 50, "display.max_rows", 500):
+        print(df.round(3).to_string(index=False))
+
+        if args.heatmap:
+            x, _, y = args.heatmap.partition(",")
+            metric = args.metric or next(c for c in df.columns if c.endswith(".mean"))
+            hm = heatmap(df, x.strip(), y.strip(), metric)
+            print(f"\n🔥 {metric} ({y.strip()} x {x.strip()})")
+            print(hm.round(3).to_string())
+            if args.png:
+                save_png(hm, args.png, title=f"{args.market} {metric}")
+                print(f"✅ heatmap -> {args.png}")
+
+    if args.out:
+        out = Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        if out.suffix == ".json":
+            out.write_text(df.to_json(orient="records", force_ascii=False, indent=2), encoding="utf-8")
+        else:
+            df.to_csv(out, index=False, encoding="utf-8")
+        print(f"✅ table -> {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
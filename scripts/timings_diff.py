@@ -0,0 +1,216 @@
+# scripts/timings_diff.py
+# -*- coding: utf-8 -*-
+"""
+Compare stage timings of two runs (spans from markets/spans.py)
+
+Each side can be:
+  - a timings.jsonl      (pick a run with --run-a / --run-b; default = latest run)
+  - a payload json       (the timings.jsonl next to it, that slot's runs;
+                          older payloads that still embed meta.timings.spans are read directly)
+
+Examples:
+  # yesterday vs today (latest run in each sidecar)
+  python scripts/timings_diff.py data/cache/us/2026-02-19/timings.jsonl data/cache/us/2026-02-20/timings.jsonl
+
+  # last two runs of the same day
+  python scripts/timings_diff.py data/cache/us/2026-02-20/timings.jsonl
+
+  # two payloads
+  python scripts/timings_diff.py a/close.payload.json b/close.payload.json --sort cpu
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import argparse
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from markets.spans import read_jsonl, summarize
+
+
+def _run_ids(recs: List[Dict[str, Any]]) -> List[str]:
+    seen: List[str] = []
+    for r in recs:
+        rid = str(r.get("run_id") or "")
+        if rid and rid not in seen:
+            seen.append(rid)
+    return seen
+
+
+def _select_run(
+    recs: List[Dict[str, Any]], path: Path, run_id: Optional[str], nth_last: int
+) -> Tuple[str, List[Dict[str, Any]]]:
+    ids = _run_ids(recs)
+    if not ids:
+        raise SystemExit(f"no spans in {path}")
+    if run_id is None:
+        if len(ids) < nth_last:
+            raise SystemExit(f"{path} has only {len(ids)} run(s)")
+        run_id = ids[-nth_last]
+    sel = [r for r in recs if str(r.get("run_id") or "") == run_id]
+    if not sel:
+        raise SystemExit(f"run_id={run_id} not found in {path} (have: {', '.join(ids[-5:])})")
+    return run_id, sel
+
+
+def load_spans(path: Path, run_id: Optional[str] = None, *, nth_last: int = 1) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Returns (label, span records).
+    """
+    if path.suffix == ".jsonl":
+        rid, sel = _select_run(read_jsonl(path), path, run_id, nth_last)
+        return f"{path.parent.name}/{rid}", sel
+
+    obj = json.loads(path.read_text(encoding="utf-8"))
+    t = ((obj.get("meta") or {}).get("timings") or {}) if isinstance(obj, dict) else {}
+    spans = t.get("spans") or []
+    if spans:
+        return f"{path.name}/{t.get('run_id', '')}", list(spans)
+
+    # payload keeps only the by_name summary: the records are in the sidecar next to it
+    sidecar = path.parent / "timings.jsonl"
+    if not sidecar.exists():
+        raise SystemExit(f"no span records for {path}: {sidecar} missing (run with INTRADAY_TIMINGS=1)")
+    slot = path.name.split(".", 1)[0]
+    recs = [r for r in read_jsonl(sidecar) if str(r.get("slot") or "") == slot]
+    rid, sel = _select_run(recs, sidecar, run_id, nth_last)
+    return f"{path.parent.name}/{path.name}/{rid}", sel
+
+
+def _key(r: Dict[str, Any], by: str) -> str:
+    name = str(r.get("name") or "")
+    if by == "stage" and r.get("stage"):
+        return f"{r['stage']}:{name}"
+    if by == "market" and r.get("market"):
+        return f"{r['market']}:{name}"
+    return name
+
+
+def _summ(recs: List[Dict[str, Any]], by: str) -> Dict[str, Dict[str, Any]]:
+    if by == "name":
+        return summarize(recs)
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for r in recs:
+        grouped.setdefault(_key(r, by), []).append(r)
+    return {k: summarize(v).get(str(v[0].get("name") or ""), {}) for k, v in grouped.items()}
+
+
+def _pct(a: float, b: float) -> str:
+    if a <= 0:
+        return "   new" if b > 0 else "     -"
+    return f"{(b - a) / a * 100.0:+6.1f}%"
+
+
+def diff(sa: Dict[str, Dict[str, Any]], sb: Dict[str, Dict[str, Any]], *, sort: str) -> List[Dict[str, Any]]:
+    field = "cpu_s" if sort == "cpu" else "wall_s"
+    rows: List[Dict[str, Any]] = []
+    for k in sorted(set(sa) | set(sb)):
+        a = sa.get(k) or {}
+        b = sb.get(k) or {}
+        rows.append(
+            {
+                "span": k,
+                "count_a": int(a.get("count") or 0),
+                "count_b": int(b.get("count") or 0),
+                "wall_a": float(a.get("wall_s") or 0.0),
+                "wall_b": float(b.get("wall_s") or 0.0),
+                "cpu_a": float(a.get("cpu_s") or 0.0),
+                "cpu_b": float(b.get("cpu_s") or 0.0),
+                "rows_a": a.get("rows"),
+                "rows_b": b.get("rows"),
+                "rss_a": a.get("rss_peak_mb"),
+                "rss_b": b.get("rss_peak_mb"),
+            }
+        )
+    short = "cpu" if field == "cpu_s" else "wall"
+    rows.sort(key=lambda r: abs(r[f"{short}_b"] - r[f"{short}_a"]), reverse=True)
+    return rows
+
+
+def _top_level_wall(recs: List[Dict[str, Any]]) -> float:
+    # nested spans are already inside their parent's wall time
+    return sum(float(r.get("wall_s") or 0.0) for r in recs if not r.get("parent"))
+
+
+def print_table(
+    label_a: str,
+    label_b: str,
+    rows: List[Dict[str, Any]],
+    *,
+    top: int,
+    total_a: float,
+    total_b: float,
+) -> None:
+    print(f"A = {label_a}")
+    print(f"B = {label_b}\n")
+    hdr = f"{'span':<30} {'n':>7} {'wall A':>9} {'wall B':>9} {'Δwall':>9} {'%':>7} {'cpu A':>8} {'cpu B':>8} {'rows A→B':>17} {'rssMB A→B':>15}"
+    print(hdr)
+    print("-" * len(hdr))
+
+    def _rows(v: Any) -> str:
+        return "-" if v is None else str(v)
+
+    def _rss(v: Any) -> str:
+        return "-" if v is None else f"{float(v):.0f}"
+
+    for r in rows[: top if top > 0 else None]:
+        n = f"{r['count_a']}→{r['count_b']}" if r["count_a"] != r["count_b"] else str(r["count_b"])
+        print(
+            f"{r['span'][:30]:<30} {n:>7} {r['wall_a']:>9.2f} {r['wall_b']:>9.2f} "
+            f"{r['wall_b'] - r['wall_a']:>+9.2f} {_pct(r['wall_a'], r['wall_b']):>7} "
+            f"{r['cpu_a']:>8.2f} {r['cpu_b']:>8.2f} "
+            f"{_rows(r['rows_a']) + '→' + _rows(r['rows_b']):>17} "
+            f"{_rss(r['rss_a']) + '→' + _rss(r['rss_b']):>15}"
+        )
+
+    print("-" * len(hdr))
+    print(
+        f"{'(top-level total)':<30} {'':>7} {total_a:>9.2f} {total_b:>9.2f} "
+        f"{total_b - total_a:>+9.2f} {_pct(total_a, total_b):>7}"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Diff stage timings of two pipeline runs.")
+    ap.add_argument("a", help="payload json or timings.jsonl")
+    ap.add_argument("b", nargs="?", default="", help="payload json or timings.jsonl (default: same file as A)")
+    ap.add_argument("--run-a", default=None, help="run_id in A (jsonl / payload sidecar)")
+    ap.add_argument("--run-b", default=None, help="run_id in B (jsonl / payload sidecar)")
+    ap.add_argument("--by", default="stage", choices=["name", "stage", "market"], help="group spans by")
+    ap.add_argument("--sort", default="wall", choices=["wall", "cpu"])
+    ap.add_argument("--top", type=int, default=0, help="only show the N largest changes")
+    ap.add_argument("--json", action="store_true", help="print rows as JSON")
+    args = ap.parse_args(argv)
+
+    path_a = Path(args.a)
+    path_b = Path(args.b) if args.b else path_a
+    same = path_b == path_a
+
+    # one jsonl, no run ids -> previous run vs latest run
+    label_a, recs_a = load_spans(path_a, args.run_a, nth_last=2 if (same and args.run_a is None) else 1)
+    label_b, recs_b = load_spans(path_b, args.run_b, nth_last=1)
+
+    rows = diff(_summ(recs_a, args.by), _summ(recs_b, args.by), sort=args.sort)
+    if args.json:
+        print(json.dumps({"a": label_a, "b": label_b, "rows": rows}, ensure_ascii=False, indent=2))
+    else:
+        print_table(
+            label_a,
+            label_b,
+            rows,
+            top=int(args.top),
+            total_a=_top_level_wall(recs_a),
+            total_b=_top_level_wall(recs_b),
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
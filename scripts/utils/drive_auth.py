@@ -8,12 +8,11 @@ import json
 import os
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+# google client libraries are imported where they are used (cold start)
+if TYPE_CHECKING:  # pragma: no cover
+    from google.oauth2.credentials import Credentials
 
 # ✅ Prefer minimal scope to reduce invalid_scope when refreshing existing tokens
 DEFAULT_SCOPES = ["https://www.googleapis.com/auth/drive.file"]
@@ -323,6 +322,11 @@ def get_drive_service(
 
     本機若要互動登入（只做一次拿 refresh_token）：GDRIVE_ALLOW_INTERACTIVE=1
     """
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+
     scopes = scopes or DEFAULT_SCOPES
     _auto_load_dotenv()
 
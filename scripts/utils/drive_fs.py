@@ -7,14 +7,14 @@ import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional
 
-from googleapiclient.errors import HttpError
-
 
 def _escape_q(s: str) -> str:
     return (s or "").replace("'", "\\'")
 
 
 def _is_retryable_http_error(e: Exception) -> bool:
+    from googleapiclient.errors import HttpError
+
     if not isinstance(e, HttpError):
         return False
     status = getattr(e.resp, "status", None)
@@ -58,7 +58,13 @@ def ensure_folder(service, parent_id: str, name: str) -> str:
 # =============================================================================
 # List / clear
 # =============================================================================
-def list_files_in_folder(service, folder_id: str, *, page_size: int = 1000) -> list[dict]:
+def list_files_in_folder(
+    service,
+    folder_id: str,
+    *,
+    page_size: int = 1000,
+    fields: str = "id,name,mimeType,modifiedTime",
+) -> list[dict]:
     files: list[dict] = []
     page_token = None
     q = f"'{folder_id}' in parents and trashed = false"
@@ -67,7 +73,7 @@ def list_files_in_folder(service, folder_id: str, *, page_size: int = 1000) -> l
             service.files()
             .list(
                 q=q,
-                fields="nextPageToken,files(id,name,mimeType,modifiedTime)",
+                fields=f"nextPageToken,files({fields})",
                 pageSize=page_size,
                 pageToken=page_token,
                 supportsAllDrives=True,
@@ -2,27 +2,62 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import hashlib
 import mimetypes
+import os
 import random
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaFileUpload
+# google client libraries are imported where they are used (cold start)
+if TYPE_CHECKING:  # pragma: no cover
+    from google.oauth2.credentials import Credentials
 
 from .drive_fs import ensure_folder, list_files_in_folder
 
 
+def _skip_unchanged_default() -> bool:
+    # DRIVE_UPLOAD_SKIP_UNCHANGED=0 => always re-upload (old behaviour)
+    return str(os.getenv("DRIVE_UPLOAD_SKIP_UNCHANGED", "1")).strip().lower() not in ("0", "false", "no", "n", "off")
+
+
+def file_md5(path: Path, *, bufsize: int = 1024 * 1024) -> str:
+    """Same digest as Drive's md5Checksum."""
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(bufsize)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+
+def _remote_index(service, folder_id: str) -> dict[str, dict]:
+    """
+    name -> {"id", "md5"} from ONE listing of the folder (newest wins on duplicate names).
+    """
+    out: dict[str, dict] = {}
+    files = list_files_in_folder(service, folder_id, fields="id,name,mimeType,modifiedTime,md5Checksum,size")
+    files.sort(key=lambda f: str(f.get("modifiedTime") or ""))
+    for f in files:
+        name = str(f.get("name") or "")
+        fid = str(f.get("id") or "")
+        if name and fid:
+            out[name] = {"id": fid, "md5": str(f.get("md5Checksum") or "")}
+    return out
+
+
 def _guess_mime(path: Path) -> str:
     mt, _ = mimetypes.guess_type(str(path))
     return mt or "application/octet-stream"
 
 
 def _is_retryable_http_error(e: Exception) -> bool:
+    from googleapiclient.errors import HttpError
+
     if not isinstance(e, HttpError):
         return False
     status = getattr(e.resp, "status", None)
@@ -35,6 +70,8 @@ def _get_creds_from_service(service) -> Optional[Credentials]:
 
 
 def _build_service_from_creds(creds: Credentials):
+    from googleapiclient.discovery import build
+
     return build("drive", "v3", credentials=creds, cache_discovery=False)
 
 
@@ -55,6 +92,8 @@ def _upload_one_fast(
     - overwrite=True 且 existing_id 有值 -> update；否則 create
     - 內建 429/5xx 退避重試
     """
+    from googleapiclient.http import MediaFileUpload
+
     if not local_path.exists():
         raise FileNotFoundError(local_path)
 
@@ -62,7 +101,12 @@ def _upload_one_fast(
     service = base_service if creds is None else _build_service_from_creds(creds)
 
     mime_type = _guess_mime(local_path)
-    media = MediaFileUpload(str(local_path), mimetype=mime_type, resumable=True, chunksize=chunksize)
+    # small files (PNG / json): one multipart request instead of a resumable session
+    resumable = local_path.stat().st_size > chunksize
+    if resumable:
+        media = MediaFileUpload(str(local_path), mimetype=mime_type, resumable=True, chunksize=chunksize)
+    else:
+        media = MediaFileUpload(str(local_path), mimetype=mime_type, resumable=False)
 
     delay = 1.0
     for attempt in range(max_retries):
@@ -117,12 +161,16 @@ def upload_dir(
     concurrent: bool = True,
     workers: int = 8,
     subfolder_name: Optional[str] = None,
+    skip_unchanged: Optional[bool] = None,
 ) -> int:
     """
     上傳資料夾（加速版）
-    - overwrite=True：只 list 一次建立 name->id，避免每張圖都查詢
+    - overwrite=True：只 list 一次建立 name->(id, md5Checksum)，避免每張圖都查詢
+    - skip_unchanged（預設 DRIVE_UPLOAD_SKIP_UNCHANGED=1）：本地 MD5 == Drive md5Checksum 就跳過，
+      內容有變才 update in place
     - concurrent=True：多執行緒上傳（100+ 張圖會快很多）
     - subfolder_name：若提供，會先在 folder_id 下建立/取得子資料夾並上傳到該子資料夾
+    回傳：處理的檔案數（上傳 + 內容相同而跳過）
     """
     local_dir = Path(local_dir)
     if not local_dir.exists():
@@ -136,38 +184,39 @@ def upload_dir(
     if not paths:
         return 0
 
-    # Non-concurrent path (still uses overwrite map)
-    if not concurrent:
-        existing_map: dict[str, str] = {}
-        if overwrite:
-            for f in list_files_in_folder(service, folder_id):
-                name = str(f.get("name") or "")
-                fid = str(f.get("id") or "")
-                if name and fid:
-                    existing_map[name] = fid
-
-        n = 0
-        for p in paths:
+    skip = _skip_unchanged_default() if skip_unchanged is None else bool(skip_unchanged)
+    remote: dict[str, dict] = _remote_index(service, folder_id) if (overwrite or skip) else {}
+
+    todo: list[Path] = []
+    n_skipped = 0
+    for p in paths:
+        r = remote.get(p.name)
+        if skip and r and r.get("md5") and r["md5"] == file_md5(p):
+            n_skipped += 1
+            continue
+        todo.append(p)
+
+    if n_skipped:
+        print(f"[drive] unchanged (md5 match), skipped {n_skipped}/{len(paths)}", flush=True)
+
+    def _existing_id(p: Path) -> Optional[str]:
+        r = remote.get(p.name)
+        return r["id"] if (overwrite and r) else None
+
+    # Non-concurrent path
+    if not concurrent or len(todo) <= 1:
+        for p in todo:
             _upload_one_fast(
                 service,
                 folder_id,
                 p,
-                existing_id=existing_map.get(p.name),
+                existing_id=_existing_id(p),
                 overwrite=overwrite,
                 verbose=verbose,
             )
-            n += 1
-        return n
+        return len(todo) + n_skipped
 
     # Concurrent path
-    existing_map: dict[str, str] = {}
-    if overwrite:
-        for f in list_files_in_folder(service, folder_id):
-            name = str(f.get("name") or "")
-            fid = str(f.get("id") or "")
-            if name and fid:
-                existing_map[name] = fid
-
     n = 0
     with ThreadPoolExecutor(max_workers=max(1, int(workers))) as ex:
         futs = [
@@ -176,13 +225,13 @@ def upload_dir(
                 service,
                 folder_id,
                 p,
-                existing_id=existing_map.get(p.name),
+                existing_id=_existing_id(p),
                 overwrite=overwrite,
                 verbose=verbose,
             )
-            for p in paths
+            for p in todo
         ]
         for fut in as_completed(futs):
             _ = fut.result()
             n += 1
-    return n
+    return n + n_skipped
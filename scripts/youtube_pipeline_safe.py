@@ -264,7 +264,7 @@ def load_playlist_id(market: str, playlist_map_path: str) -> str:
 # Main
 # ===============================
 
-def main():
+def main(argv: List[str] | None = None):
     ap = argparse.ArgumentParser(description="YouTube pipeline (env-aware, safe args)", allow_abbrev=False)
     ap.add_argument("--video", required=True)
     ap.add_argument("--token", default="secrets/youtube_token.upload.json")
@@ -279,7 +279,7 @@ def main():
 
     ap.add_argument("--privacy", default="unlisted", choices=["private", "unlisted", "public"])
 
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
     py = sys.executable
 
     video = str(Path(args.video).expanduser().resolve())
@@ -295,7 +295,15 @@ def main():
     # ✅ normalize market (IN -> INDIA)
     market = normalize_market_for_meta(args.market)
 
-    meta: Dict[str, Any] = build_metadata(market, args.ymd, args.slot)
+    # ✅ top sectors from the cross-market summary (if built for this day)
+    try:
+        from markets.cross_summary import market_entry
+
+        summary = market_entry(market, args.ymd)
+    except Exception:
+        summary = None
+
+    meta: Dict[str, Any] = build_metadata(market, args.ymd, args.slot, summary=summary)
 
     # sanitize metadata
     meta_title = sanitize_youtube_text(str(meta.get("title", "")))
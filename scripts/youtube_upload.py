@@ -9,11 +9,6 @@ import tempfile
 from pathlib import Path
 from typing import List, Optional
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-
 YOUTUBE_SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
 
 
@@ -75,6 +70,9 @@ def _load_token_from_env_try(var_name: str) -> Optional[Path]:
     Try to load token.json content from env var (base64-encoded JSON),
     write to temp file, validate + refresh, then return temp path if ok.
     """
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+
     raw_b64 = (os.getenv(var_name) or "").strip()
     if not raw_b64:
         print(f"[INFO] {var_name} not set")
@@ -147,6 +145,11 @@ def upload_video(
     category_id: str,
     privacy_status: str,
 ) -> dict:
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build
+    from googleapiclient.http import MediaFileUpload
+
     if not video_path.exists():
         raise FileNotFoundError(f"Video not found: {video_path}")
 
@@ -10,9 +10,14 @@ Env required:
 Optional env:
 - NSE_SECTOR_CACHE_PATH      : cache file path (default: data/cache/nse_sector_cache.csv)
 - NSE_OUTPUT_NAME            : output csv name (default: NSE_Stock_Master_Data.csv)
-- NSE_SLEEP_SEC              : yfinance per-ticker sleep (default: 0.12)
 - NSE_MAX_RETRY              : yfinance retry count (default: 3)
 - NSE_RETRY_BACKOFF_SEC      : base backoff seconds (default: 0.6)
+- NSE_INFO_WORKERS           : concurrent yfinance info fetches (default: 6)
+- NSE_INFO_RPS               : max info requests / second across workers (default: 4)
+- NSE_CHECKPOINT_EVERY       : save the sector cache every N fetched symbols (default: 100)
+- NSE_PRIORITY_SYMBOLS       : comma list fetched first (default: today's India movers,
+                               from the latest India payload in data/cache/{in,india} or INDIA_DB_PATH)
+- NSE_PRIORITY_TOP           : how many movers to put first (default: 300)
 """
 
 from __future__ import annotations
@@ -21,20 +26,30 @@ import base64
 import io
 import json
 import os
+import re
+import sqlite3
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
 import requests
-import yfinance as yf
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseUpload
 
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from markets import payload_catalog  # noqa: E402
+from markets.datasource import http_get, yf_ticker_info  # noqa: E402
+from markets.ratelimit import TokenBucket  # noqa: E402
+
 
 # =============================================================================
 # Config
@@ -49,9 +64,14 @@ GDRIVE_FOLDER_ID = os.environ.get("GDRIVE_FOLDER_ID") or os.environ.get("IN_STOC
 CACHE_PATH = Path(os.environ.get("NSE_SECTOR_CACHE_PATH", "data/cache/nse_sector_cache.csv"))
 OUTPUT_NAME = os.environ.get("NSE_OUTPUT_NAME", "NSE_Stock_Master_Data.csv")
 
-SLEEP_SEC = float(os.environ.get("NSE_SLEEP_SEC", "0.12"))
 MAX_RETRY = int(os.environ.get("NSE_MAX_RETRY", "3"))
 BACKOFF_BASE = float(os.environ.get("NSE_RETRY_BACKOFF_SEC", "0.6"))
+INFO_WORKERS = max(1, int(os.environ.get("NSE_INFO_WORKERS", "6")))
+INFO_RPS = max(0.1, float(os.environ.get("NSE_INFO_RPS", "4")))
+CHECKPOINT_EVERY = max(1, int(os.environ.get("NSE_CHECKPOINT_EVERY", "100")))
+PRIORITY_TOP = int(os.environ.get("NSE_PRIORITY_TOP", "300"))
+REPO_CACHE_ROOT = REPO_ROOT / "data" / "cache"
+DAY_DIR_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
 
 
 # =============================================================================
@@ -149,13 +169,13 @@ def _make_nse_session() -> requests.Session:
 def _nse_get_bytes(session: requests.Session, url: str, *, timeout: int = 30) -> bytes:
     # First hit NSE home to get cookies (important for avoiding 403)
     try:
-        session.get(NSE_HOME, timeout=timeout)
+        http_get(NSE_HOME, session=session, timeout=timeout)
     except Exception:
         # Even if homepage fails, still try the CSV
         pass
 
     # CSV fetch
-    resp = session.get(url, timeout=timeout, headers={"Accept": "text/csv,*/*;q=0.8"})
+    resp = http_get(url, session=session, timeout=timeout, headers={"Accept": "text/csv,*/*;q=0.8"})
     if resp.status_code != 200 or not resp.content:
         raise RuntimeError(f"NSE 下載失敗: {url} status={resp.status_code} len={len(resp.content or b'')}")
     return resp.content
@@ -200,10 +220,13 @@ def save_cache(path: Path, df_cache: pd.DataFrame) -> None:
     df_cache = df_cache.copy()
     df_cache["SYMBOL"] = df_cache["SYMBOL"].astype(str).str.strip().str.upper()
     df_cache = df_cache.drop_duplicates("SYMBOL", keep="last")
-    df_cache.to_csv(path, index=False, encoding="utf-8-sig")
+    # atomic: checkpoints may be interrupted
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    df_cache.to_csv(tmp, index=False, encoding="utf-8-sig")
+    os.replace(tmp, path)
 
 
-def yf_fetch_sector_industry(symbol: str) -> Tuple[str, str]:
+def yf_fetch_sector_industry(symbol: str, bucket: Optional[TokenBucket] = None) -> Tuple[str, str]:
     """
     Return (sector, industry).
     Retry with backoff for transient issues.
@@ -212,7 +235,9 @@ def yf_fetch_sector_industry(symbol: str) -> Tuple[str, str]:
     last_err = None
     for attempt in range(1, MAX_RETRY + 1):
         try:
-            info = yf.Ticker(ticker).info  # network call
+            if bucket is not None:
+                bucket.acquire()
+            info = yf_ticker_info(ticker)  # network call
             sector = info.get("sector") or "Unclassified"
             industry = info.get("industry") or "Unclassified"
             return sector, industry
@@ -224,34 +249,158 @@ def yf_fetch_sector_industry(symbol: str) -> Tuple[str, str]:
     return "Error", "Error"
 
 
+def _strip_ns(sym: str) -> str:
+    s = str(sym or "").strip().upper()
+    for suf in (".NS", ".BO"):
+        if s.endswith(suf):
+            return s[: -len(suf)]
+    return s
+
+
+def _india_payload_paths() -> List[Path]:
+    """
+    Recent India payloads, newest first: payload_catalog (in/india/nse/bse -> "in"),
+    else a scan of data/cache/{in,india}/<YYYY-MM-DD>/<slot>.payload.json.
+    """
+    try:
+        payload_catalog.sync_new_days(REPO_CACHE_ROOT, ["in"])
+        rows = payload_catalog.latest("in", limit=10, cache_root=REPO_CACHE_ROOT)
+        paths = [Path(r["path"]) for r in rows if r.get("path")]
+        if paths:
+            return paths
+    except Exception as e:
+        print(f"⚠️ payload_catalog 不可用，改掃描目錄：{e}")
+
+    days: List[Path] = []
+    for name in ("in", "india"):
+        mdir = REPO_CACHE_ROOT / name
+        if mdir.is_dir():
+            days += [d for d in mdir.iterdir() if d.is_dir() and DAY_DIR_RE.match(d.name)]
+    days.sort(key=lambda d: d.name, reverse=True)
+    out: List[Path] = []
+    for d in days[:3]:
+        out += sorted(d.glob("*.payload.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    return out
+
+
+def _movers_from_payload() -> List[str]:
+    """
+    Symbols of the latest India payload with a snapshot_main, ret desc.
+    """
+    for p in _india_payload_paths():
+        try:
+            obj = json.loads(p.read_text(encoding="utf-8"))
+        except Exception:
+            continue
+        rows = [r for r in (obj.get("snapshot_main") or []) if isinstance(r, dict) and r.get("symbol")]
+        if not rows:
+            continue
+        rows.sort(key=lambda r: float(r.get("ret") or 0.0), reverse=True)
+        return [_strip_ns(r["symbol"]) for r in rows]
+    return []
+
+
+def _movers_from_db() -> List[str]:
+    """
+    Last session's close-to-close movers from the India warehouse (INDIA_DB_PATH), ret desc.
+    """
+    db = os.environ.get("INDIA_DB_PATH") or str(REPO_ROOT / "markets" / "india" / "india_stock_warehouse.db")
+    if not os.path.exists(db):
+        return []
+    try:
+        conn = sqlite3.connect(db, timeout=30)
+        try:
+            dates = [r[0] for r in conn.execute("SELECT DISTINCT date FROM stock_prices ORDER BY date DESC LIMIT 2")]
+            if len(dates) < 2:
+                return []
+            rows = conn.execute(
+                """
+                SELECT t.symbol, (t.close / p.close - 1.0) AS ret
+                FROM stock_prices t JOIN stock_prices p ON p.symbol = t.symbol AND p.date = ?
+                WHERE t.date = ? AND p.close > 0 AND t.close IS NOT NULL
+                ORDER BY ret DESC
+                """,
+                (dates[1], dates[0]),
+            ).fetchall()
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"⚠️ 讀取 India DB movers 失敗：{e}")
+        return []
+    return [_strip_ns(sym) for sym, _ in rows]
+
+
+def priority_symbols() -> List[str]:
+    """
+    Symbols to enrich first so today's India payload gets sectors before the long tail.
+    """
+    env = os.environ.get("NSE_PRIORITY_SYMBOLS", "").strip()
+    if env:
+        return [_strip_ns(x) for x in env.split(",") if x.strip()]
+    movers = _movers_from_payload() or _movers_from_db()
+    return movers[:PRIORITY_TOP] if PRIORITY_TOP > 0 else movers
+
+
 def build_sector_industry(df_symbols: pd.DataFrame, cache_path: Path) -> pd.DataFrame:
     """
     df_symbols must have column SYMBOL (upper).
-    Only fetch missing symbols not in cache.
+    Only fetch missing symbols not in cache:
+      - de-duplicated, today's movers first (priority_symbols)
+      - NSE_INFO_WORKERS concurrent fetches sharing one NSE_INFO_RPS token bucket
+      - cache checkpoint every NSE_CHECKPOINT_EVERY symbols (and on interrupt)
     """
     cache = load_cache(cache_path)
     cached_set = set(cache["SYMBOL"].astype(str).str.upper())
 
     symbols = df_symbols["SYMBOL"].astype(str).str.strip().str.upper()
-    missing = [s for s in symbols.tolist() if s and s not in cached_set]
-
-    print(f"🧠 sector/industry cache：已有 {len(cached_set)} 筆，需補 {len(missing)} 筆")
-    new_rows = []
-
-    for i, sym in enumerate(missing, 1):
-        if i == 1 or i % 50 == 0:
-            print(f"  進度: {i}/{len(missing)} (補缺 sector/industry)")
-        sector, industry = yf_fetch_sector_industry(sym)
-        new_rows.append({"SYMBOL": sym, "sector": sector, "industry": industry})
-        time.sleep(SLEEP_SEC)
-
-    if new_rows:
-        cache2 = pd.concat([cache, pd.DataFrame(new_rows)], ignore_index=True)
-        save_cache(cache_path, cache2)
-        print(f"💾 cache 已更新：{cache_path} (+{len(new_rows)})")
-        return cache2[["SYMBOL", "sector", "industry"]].drop_duplicates("SYMBOL", keep="last")
-
-    return cache[["SYMBOL", "sector", "industry"]].drop_duplicates("SYMBOL", keep="last")
+    missing = list(dict.fromkeys(s for s in symbols.tolist() if s and s not in cached_set))
+
+    missing_set = set(missing)
+    prio = [s for s in dict.fromkeys(priority_symbols()) if s in missing_set]
+    if prio:
+        prio_set = set(prio)
+        missing = prio + [s for s in missing if s not in prio_set]
+
+    print(f"🧠 sector/industry cache：已有 {len(cached_set)} 筆，需補 {len(missing)} 筆（優先 movers {len(prio)} 筆）")
+    if not missing:
+        return cache[["SYMBOL", "sector", "industry"]].drop_duplicates("SYMBOL", keep="last")
+
+    new_rows: List[Dict[str, str]] = []
+    saved_n = 0
+
+    def _checkpoint() -> None:
+        nonlocal saved_n
+        if len(new_rows) == saved_n:
+            return
+        save_cache(cache_path, pd.concat([cache, pd.DataFrame(new_rows)], ignore_index=True))
+        saved_n = len(new_rows)
+
+    bucket = TokenBucket(INFO_RPS)
+    t0 = time.perf_counter()
+    ex = ThreadPoolExecutor(max_workers=INFO_WORKERS, thread_name_prefix="nse_info")
+    try:
+        # submit in priority order; workers pick them up roughly in that order
+        futs = {ex.submit(yf_fetch_sector_industry, sym, bucket): sym for sym in missing}
+        for i, fut in enumerate(as_completed(futs), 1):
+            sym = futs[fut]
+            try:
+                sector, industry = fut.result()
+            except Exception:
+                sector, industry = "Error", "Error"
+            new_rows.append({"SYMBOL": sym, "sector": sector, "industry": industry})
+
+            if i == 1 or i % 50 == 0 or i == len(missing):
+                rate = i / max(1e-6, time.perf_counter() - t0)
+                print(f"  進度: {i}/{len(missing)} (補缺 sector/industry) {rate:.1f}/s")
+            if i % CHECKPOINT_EVERY == 0:
+                _checkpoint()
+    finally:
+        ex.shutdown(wait=False, cancel_futures=True)
+        _checkpoint()
+
+    cache2 = pd.concat([cache, pd.DataFrame(new_rows)], ignore_index=True)
+    print(f"💾 cache 已更新：{cache_path} (+{len(new_rows)})")
+    return cache2[["SYMBOL", "sector", "industry"]].drop_duplicates("SYMBOL", keep="last")
 
 
 # =============================================================================
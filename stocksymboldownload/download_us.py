@@ -18,8 +18,8 @@ Optional env:
 - US_SEC_CACHE_TTL_DAYS       default: 30
 - US_SEC_MAX_FETCH            default: 12000
 - US_SEC_HTTP_TIMEOUT         default: 20
-- US_SEC_SLEEP_SEC            default: 0.12
 - US_SEC_USER_AGENT           default: GrissomQuantLab/1.0 (contact: you@example.com)
+- US_SEC_RPS / US_SEC_WORKERS / US_SEC_FLUSH_EVERY   concurrent fetch (markets/us/sec_fetch.py)
 """
 
 from __future__ import annotations
@@ -29,7 +29,6 @@ import io
 import json
 import os
 import sys
-import time
 from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
@@ -41,6 +40,12 @@ from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseUpload
 
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from markets.us import sec_fetch  # noqa: E402
+
 
 # =============================================================================
 # Config
@@ -56,14 +61,13 @@ CACHE_NAME = os.environ.get("US_SEC_CACHE_NAME", "sec_industry_cache.json")
 TTL_DAYS = int(os.environ.get("US_SEC_CACHE_TTL_DAYS", "30"))
 MAX_FETCH = int(os.environ.get("US_SEC_MAX_FETCH", "12000"))
 HTTP_TIMEOUT = int(os.environ.get("US_SEC_HTTP_TIMEOUT", "20"))
-SLEEP_SEC = float(os.environ.get("US_SEC_SLEEP_SEC", "0.12"))
 USER_AGENT = os.environ.get(
     "US_SEC_USER_AGENT",
     "GrissomQuantLab/1.0 (contact: you@example.com)",
 )
 
 SEC_COMPANY_TICKERS_URL = "https://www.sec.gov/files/company_tickers.json"
-SEC_SUBMISSIONS_URL_TMPL = "https://data.sec.gov/submissions/CIK{cik10}.json"
+SEC_SUBMISSIONS_URL_TMPL = sec_fetch.SEC_SUBMISSIONS_URL_TMPL
 
 
 # =============================================================================
@@ -173,16 +177,7 @@ def upload_json_update_in_place(service, folder_id: str, file_name: str, payload
 # SEC fetch
 # =============================================================================
 def make_session() -> requests.Session:
-    s = requests.Session()
-    s.headers.update(
-        {
-            "User-Agent": USER_AGENT,
-            "Accept": "application/json,text/plain,*/*",
-            "Accept-Encoding": "gzip, deflate",
-            "Connection": "keep-alive",
-        }
-    )
-    return s
+    return sec_fetch.make_session(USER_AGENT)
 
 
 def fetch_company_tickers(session: requests.Session) -> Dict[str, Any]:
@@ -193,19 +188,8 @@ def fetch_company_tickers(session: requests.Session) -> Dict[str, Any]:
 
 
 def fetch_submissions_sic(session: requests.Session, cik_10: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
-    url = SEC_SUBMISSIONS_URL_TMPL.format(cik10=cik_10)
-    try:
-        r = session.get(url, timeout=HTTP_TIMEOUT)
-        if r.status_code != 200:
-            return None, None, f"http_{r.status_code}"
-        j = r.json()
-        sic = j.get("sic")
-        sic_desc = j.get("sicDescription")
-        sic_s = str(sic) if sic not in (None, "") else None
-        sic_desc_s = str(sic_desc) if sic_desc not in (None, "") else None
-        return sic_s, sic_desc_s, None
-    except Exception as e:
-        return None, None, f"exception:{e}"
+    r = sec_fetch.fetch_sic(session, sec_fetch.SicJob(cik=cik_10), timeout=HTTP_TIMEOUT)
+    return r.sic, r.sic_description, r.err
 
 
 # =============================================================================
@@ -217,15 +201,19 @@ class IndustryInfo:
     sic: Optional[str]
     sicDescription: Optional[str]
     fetched_at: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+def _cache_ns(path: Path) -> Any:
+    # pinned: published to Drive as-is, never evicted by the cache manager
+    from engine.cache_manager import namespace
+
+    return namespace("sec_industry", dir=path.parent, ext=path.suffix, evict=False)
 
 
 def load_cache(path: Path) -> Dict[str, IndustryInfo]:
-    if not path.exists():
-        return {}
-    try:
-        raw = json.loads(path.read_text(encoding="utf-8"))
-    except Exception:
-        return {}
+    raw = _cache_ns(path).get(path.stem)
 
     out: Dict[str, IndustryInfo] = {}
     if not isinstance(raw, dict):
@@ -242,14 +230,15 @@ def load_cache(path: Path) -> Dict[str, IndustryInfo]:
             sic=str(v.get("sic")) if v.get("sic") not in (None, "") else None,
             sicDescription=str(v.get("sicDescription")) if v.get("sicDescription") not in (None, "") else None,
             fetched_at=str(v.get("fetched_at") or ""),
+            etag=str(v.get("etag")) if v.get("etag") else None,
+            last_modified=str(v.get("last_modified")) if v.get("last_modified") else None,
         )
     return out
 
 
 def save_cache(path: Path, cache: Dict[str, IndustryInfo]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
     out = {sym: asdict(info) for sym, info in sorted(cache.items())}
-    path.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
+    _cache_ns(path).set(path.stem, out)
 
 
 def is_fresh(info: IndustryInfo, ttl_days: int) -> bool:
@@ -293,20 +282,26 @@ def update_sec_industry_cache(
     company_map: Dict[str, Dict[str, Any]],
     cache_old: Dict[str, IndustryInfo],
     session: requests.Session,
+    cache_path: Optional[Path] = None,
 ) -> Tuple[Dict[str, IndustryInfo], Dict[str, Any]]:
+    """
+    Missing / stale symbols are grouped by CIK and fetched concurrently
+    (sec_fetch.fetch_many). With cache_path the cache is flushed periodically,
+    so an interrupted run keeps what it already fetched.
+    """
     cache = dict(cache_old)
     stats = {
         "targets": len(company_map),
         "cache_hit_fresh": 0,
         "need_fetch": 0,
         "fetched_ok": 0,
+        "not_modified": 0,
         "fetched_failed": 0,
         "skipped_max_fetch": 0,
     }
 
-    fetched = 0
-
-    for i, (sym, row) in enumerate(company_map.items(), 1):
+    need: Dict[str, list] = {}
+    for sym, row in company_map.items():
         old = cache.get(sym)
         if old and is_fresh(old, TTL_DAYS) and (old.sicDescription or old.sic):
             stats["cache_hit_fresh"] += 1
@@ -317,33 +312,69 @@ def update_sec_industry_cache(
         c10 = cik10(row.get("cik_str"))
         if not c10:
             continue
+        need.setdefault(c10, []).append(sym)
+
+    ciks = list(need.keys())
+    for c in ciks[MAX_FETCH:]:
+        stats["skipped_max_fetch"] += len(need[c])
+    ciks = ciks[:MAX_FETCH]
+
+    # stale entries that still have data + a validator => conditional request
+    prior: Dict[str, IndustryInfo] = {}
+    jobs = []
+    for c in ciks:
+        old = next((cache[s] for s in need[c] if s in cache and cache[s].cik == c), None)
+        if old and (old.sicDescription or old.sic) and (old.etag or old.last_modified):
+            prior[c] = old
+            jobs.append(sec_fetch.SicJob(cik=c, etag=old.etag, last_modified=old.last_modified))
+        else:
+            jobs.append(sec_fetch.SicJob(cik=c))
+    log(f"🔎 need_fetch={stats['need_fetch']} unique_cik={len(jobs)} conditional={len(prior)}")
 
-        if fetched >= MAX_FETCH:
-            stats["skipped_max_fetch"] += 1
-            continue
-
-        sic, sic_desc, err = fetch_submissions_sic(session, c10)
-        fetched += 1
-
-        if err:
+    def _on_result(job: sec_fetch.SicJob, r: sec_fetch.SicResult) -> None:
+        if r.err:
             stats["fetched_failed"] += 1
+            return
+        sic, sic_desc = r.sic, r.sic_description
+        if r.not_modified:
+            stats["not_modified"] += 1
+            sic, sic_desc = prior[job.cik].sic, prior[job.cik].sicDescription
         else:
+            stats["fetched_ok"] += 1
+        now = now_utc_iso()
+        for sym in need[job.cik]:
             cache[sym] = IndustryInfo(
-                cik=c10,
+                cik=job.cik,
                 sic=sic,
                 sicDescription=sic_desc,
-                fetched_at=now_utc_iso(),
+                fetched_at=now,
+                etag=r.etag,
+                last_modified=r.last_modified,
             )
-            stats["fetched_ok"] += 1
 
-        if i == 1 or i % 500 == 0:
+    def _on_flush() -> None:
+        if cache_path is not None:
+            save_cache(cache_path, cache)
+
+    def _progress(done: int, total: int, st: Dict[str, int]) -> None:
+        if done == 1 or done % 500 == 0 or done == total:
             log(
-                f"進度 {i}/{len(company_map)} | "
+                f"進度 {done}/{total} | "
                 f"fresh={stats['cache_hit_fresh']} need_fetch={stats['need_fetch']} "
-                f"ok={stats['fetched_ok']} fail={stats['fetched_failed']}"
+                f"ok={stats['fetched_ok']} 304={stats['not_modified']} fail={stats['fetched_failed']}"
             )
 
-        time.sleep(SLEEP_SEC)
+    if jobs:
+        fs = sec_fetch.fetch_many(
+            jobs,
+            user_agent=USER_AGENT,
+            timeout=HTTP_TIMEOUT,
+            on_result=_on_result,
+            on_flush=_on_flush,
+            session=session,
+            progress=_progress,
+        )
+        log(f"⏱️ SEC fetch: {fs['jobs']} CIK in {fs['elapsed_s']}s ({fs['rate_per_s']}/s, retried={fs['retried']})")
 
     return cache, stats
 
@@ -383,7 +414,7 @@ def run():
     old_cache = load_cache(cache_path)
     log(f"🧠 舊 cache 筆數：{len(old_cache)}")
 
-    new_cache, stats = update_sec_industry_cache(company_map, old_cache, session)
+    new_cache, stats = update_sec_industry_cache(company_map, old_cache, session, cache_path=cache_path)
     save_cache(cache_path, new_cache)
     log(f"💾 已保存：{cache_path} | 新 cache 筆數：{len(new_cache)}")
 
@@ -407,6 +438,7 @@ def run():
     print(f"cache_hit_fresh        : {stats['cache_hit_fresh']}")
     print(f"need_fetch             : {stats['need_fetch']}")
     print(f"fetched_ok             : {stats['fetched_ok']}")
+    print(f"not_modified (304)     : {stats['not_modified']}")
     print(f"fetched_failed         : {stats['fetched_failed']}")
     print(f"skipped_max_fetch      : {stats['skipped_max_fetch']}")
     print(f"Drive company fileId   : {company_file_id}")
@@ -0,0 +1,181 @@
+# tests/test_intraday_engine.py
+# -*- coding: utf-8 -*-
+"""
+IntradayEngine + ReplaySource on the virtual clock (TW rules, one session 09:00-13:30).
+
+  python -m unittest tests.test_intraday_engine
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from engine.intraday_runner import IntradayEngine, ReplaySource, run  # noqa: E402
+
+YMD = "2026-10-16"
+SLOTS = [("open", "09:30"), ("midday", "11:00"), ("close", "13:30")]
+
+# limit prices (markets/tw/rules.py, +10%): A 1100, B 110, C 55, D 22
+UNIVERSE = {
+    "A.TW": {"prev_close": 1000, "name": "A", "sector": "半導體"},
+    "B.TW": {"prev_close": 100, "name": "B", "sector": "半導體"},
+    "C.TW": {"prev_close": 50, "name": "C", "sector": "航運"},
+    "D.TW": {"prev_close": 20, "name": "D", "sector": "航運"},
+}
+
+
+def _ts(hms: str) -> str:
+    return f"{YMD}T{hms}+08:00"
+
+
+TICKS = [
+    # A: locks 09:10, opens 09:20, relocks 09:40 and stays => 2 lock cycles, 1 unlock
+    {"ts": _ts("09:05:00"), "symbol": "A.TW", "price": 1050, "volume": 100},
+    {"ts": _ts("09:10:30"), "symbol": "A.TW", "price": 1100, "volume": 300},
+    {"ts": _ts("09:20:10"), "symbol": "A.TW", "price": 1095, "volume": 500},
+    {"ts": _ts("09:40:00"), "symbol": "A.TW", "price": 1100, "volume": 800},
+    # B: locks 09:15, no trades afterwards (a lock without trades is still a lock)
+    {"ts": _ts("09:15:00"), "symbol": "B.TW", "price": 110, "volume": 50},
+    {"ts": _ts("09:16:00"), "symbol": "B.TW", "price": 110, "volume": 50},  # unchanged: not re-evaluated
+    # C: touches 55 at 10:00 but trades at 53 => touched only (mover at 6%)
+    {"ts": _ts("10:00:00"), "symbol": "C.TW", "price": 53, "high": 55, "volume": 10},
+    # D: mover, far from the limit
+    {"ts": _ts("10:30:00"), "symbol": "D.TW", "price": 21.2, "volume": 5},
+    # not in the universe
+    {"ts": _ts("10:31:00"), "symbol": "ZZZ.TW", "price": 1, "volume": 1},
+]
+
+
+def _epoch(hm: str) -> float:
+    return datetime.fromisoformat(_ts(hm + ":00")).timestamp()
+
+
+class IntradayEngineReplayTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        path = Path(self.tmp.name) / "ticks.json"
+        path.write_text(
+            json.dumps({"market": "tw", "ymd": YMD, "universe": UNIVERSE, "ticks": TICKS}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        self.source, self.header = ReplaySource.from_file(path)
+        self.engine = IntradayEngine(
+            "tw", self.header["universe"], ymd=YMD, slots=SLOTS, mover_ret=0.05, minute_bars=True
+        )
+        self.emitted: List[Dict[str, Any]] = []
+
+        def on_payload(slot: str, now: float) -> None:
+            e = self.engine
+            self.emitted.append(
+                {
+                    "slot": slot,
+                    "now": now,
+                    "movers": set(e.movers),
+                    "locked": set(e.locked),
+                    "touched": set(e.touched),
+                    "payload": e.build_payload(slot, now=now),
+                }
+            )
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.res = run(
+                self.engine,
+                self.source,
+                poll_sec=60,
+                session=("09:00", "13:30"),
+                start=_epoch("09:00"),
+                on_payload=on_payload,
+            )
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def _rows(self, slot: str) -> Dict[str, Dict[str, Any]]:
+        ev = next(e for e in self.emitted if e["slot"] == slot)
+        return {r["symbol"]: r for r in ev["payload"]["snapshot_main"]}
+
+    def test_replay_header(self) -> None:
+        self.assertEqual(self.header["ymd"], YMD)
+        self.assertNotIn("ticks", self.header)
+        self.assertEqual(len(self.source.ticks), len(TICKS))
+        self.assertTrue(self.source.exhausted())
+
+    def test_slots_emitted_at_boundaries(self) -> None:
+        self.assertEqual(self.res["slots"], ["open", "midday", "close"])
+        self.assertEqual([e["now"] for e in self.emitted], [_epoch("09:30"), _epoch("11:00"), _epoch("13:30")])
+        self.assertEqual(self.engine.emitted, {"open", "midday", "close"})
+        self.assertEqual([e["payload"]["asof"] for e in self.emitted], ["09:30", "11:00", "13:30"])
+
+    def test_incremental_sets(self) -> None:
+        by_slot = {e["slot"]: e for e in self.emitted}
+
+        # 09:30: A opened again at 1095 (touched, not locked), B still locked
+        self.assertEqual(by_slot["open"]["movers"], {"A.TW", "B.TW"})
+        self.assertEqual(by_slot["open"]["locked"], {"B.TW"})
+        self.assertEqual(by_slot["open"]["touched"], {"A.TW", "B.TW"})
+
+        # 11:00: A relocked, C touched only, D mover only
+        self.assertEqual(by_slot["midday"]["movers"], {"A.TW", "B.TW", "C.TW", "D.TW"})
+        self.assertEqual(by_slot["midday"]["locked"], {"A.TW", "B.TW"})
+        self.assertEqual(by_slot["midday"]["touched"], {"A.TW", "B.TW", "C.TW"})
+
+        stats = by_slot["midday"]["payload"]["stats"]
+        self.assertEqual(stats["touched_only_count"], 1)
+        self.assertEqual(by_slot["midday"]["payload"]["intraday"]["touched_only"], ["C.TW"])
+
+        # only changed quotes are re-evaluated: B's repeat tick and the unknown symbol are not
+        self.assertEqual(self.res["counters"]["quotes"], len(TICKS))
+        self.assertEqual(self.res["counters"]["reevaluated"], len(TICKS) - 2)
+        self.assertEqual(self.res["counters"]["unknown_symbols"], 1)
+
+    def test_first_lock_and_touch_times(self) -> None:
+        rows = self._rows("close")
+        self.assertEqual(rows["A.TW"]["first_lock_at"], _ts("09:10:30"))
+        self.assertEqual(rows["A.TW"]["first_touch_at"], _ts("09:10:30"))
+        self.assertEqual(rows["B.TW"]["first_lock_at"], _ts("09:15:00"))
+        self.assertIsNone(rows["C.TW"]["first_lock_at"])
+        self.assertEqual(rows["C.TW"]["first_touch_at"], _ts("10:00:00"))
+        self.assertTrue(rows["C.TW"]["touched_only"])
+        self.assertIsNone(rows["D.TW"]["first_touch_at"])
+
+    def test_minute_bar_fields(self) -> None:
+        rows = self._rows("close")
+        a, b, c, d = (rows[s] for s in ("A.TW", "B.TW", "C.TW", "D.TW"))
+
+        self.assertEqual((a["lock_cycles"], a["unlock_count"]), (2, 1))
+        self.assertEqual(a["first_lock_hm"], "09:10")
+        # 09:10-09:19 + 09:40-13:29
+        self.assertEqual(a["minutes_locked"], 10 + 230)
+
+        self.assertEqual((b["lock_cycles"], b["unlock_count"]), (1, 0))
+        self.assertEqual(b["minutes_locked"], 270 - 15)
+
+        self.assertEqual((c["lock_cycles"], c["unlock_count"], c["minutes_locked"]), (0, 0, 0))
+        self.assertIsNone(c["first_lock_hm"])
+        self.assertEqual(c["first_touch_hm"], "10:00")
+
+        self.assertEqual((d["lock_cycles"], d["unlock_count"]), (0, 0))
+
+        # at the open slot A's first lock cycle had already ended
+        a_open = self._rows("open")["A.TW"]
+        self.assertEqual((a_open["lock_cycles"], a_open["unlock_count"]), (1, 1))
+
+        stats = next(e for e in self.emitted if e["slot"] == "close")["payload"]["stats"]
+        self.assertEqual(stats["relocked_count"], 1)
+        self.assertEqual(stats["unlocked_total"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
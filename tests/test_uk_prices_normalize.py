@@ -0,0 +1,159 @@
+# tests/test_uk_prices_normalize.py
+# -*- coding: utf-8 -*-
+"""
+markets/uk/uk_prices.py: the vectorized pence/pound normalize (_normalize_frame ->
+_scale_states / _apply_states, and the _normalize_prices_long dispatcher) must match the
+scalar _normalize_symbol_ohlc run per symbol, bit for bit, on randomized frames.
+
+  python -m unittest tests.test_uk_prices_normalize
+"""
+
+from __future__ import annotations
+
+import sys
+import unittest
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from markets.uk import uk_prices as up  # noqa: E402
+
+UPPER, LOWER, FACTOR = 20.0, 0.05, 100.0
+PX = ("open", "high", "low", "close")
+SEED = 20261016
+
+
+def _random_symbol(rng: np.random.Generator, sym: str, *, tiny: bool = False) -> Tuple[pd.DataFrame, Optional[float]]:
+    """
+    One symbol's daily bars: random walk, pence/pound flips (single days and runs),
+    ratios exactly on the thresholds, NaN / zero / negative closes; plus a DB seed
+    (None / 0 / NaN / in pounds / in pence).
+    """
+    n = int(rng.integers(1, 14))
+    base = 10.0 ** rng.uniform(-9.5, -7.0) if tiny else 10.0 ** rng.uniform(-1.0, 3.0)
+    close = base * np.cumprod(1.0 + rng.normal(0.0, 0.03, n))
+
+    scale = np.ones(n)
+    for _ in range(int(rng.integers(0, 3))):
+        a = int(rng.integers(0, n))
+        b = a + int(rng.integers(1, 4)) if rng.random() < 0.5 else n  # short run / rest of the window
+        scale[a:b] *= FACTOR if rng.random() < 0.6 else 1.0 / FACTOR
+    close = close * scale
+
+    # exact threshold ratios (>= / <= are inclusive)
+    if n >= 2 and rng.random() < 0.3:
+        i = int(rng.integers(1, n))
+        close[i] = close[i - 1] * (UPPER if rng.random() < 0.5 else LOWER)
+
+    r = rng.random(n)
+    close = np.where(r < 0.08, np.nan, close)
+    close = np.where((r >= 0.08) & (r < 0.12), 0.0, close)
+    close = np.where((r >= 0.12) & (r < 0.14), -close, close)
+
+    spread = np.abs(rng.normal(0.0, 0.01, (3, n)))
+    df = pd.DataFrame(
+        {
+            "symbol": sym,
+            "date": pd.bdate_range("2026-09-01", periods=n).strftime("%Y-%m-%d"),
+            "open": close * (1.0 + spread[0] - spread[1]),
+            "high": close * (1.0 + spread[0]),
+            "low": close * (1.0 - spread[1]),
+            "close": close,
+            "volume": rng.integers(0, 10_000, n).astype(float),
+        }
+    )
+    for c in ("open", "high", "low"):
+        df.loc[rng.random(n) < 0.05, c] = np.nan
+
+    k = rng.random()
+    if k < 0.35:
+        seed = None
+    elif k < 0.4:
+        seed = 0.0
+    elif k < 0.45:
+        seed = float("nan")
+    else:
+        seed = base * (FACTOR if rng.random() < 0.3 else 1.0)
+    return df, seed
+
+
+def _random_universe(rng: np.random.Generator, *, tiny_share: float = 0.0) -> Tuple[pd.DataFrame, Dict[str, Optional[float]]]:
+    frames: List[pd.DataFrame] = []
+    seeds: Dict[str, Optional[float]] = {}
+    for j in range(int(rng.integers(1, 9))):
+        sym = f"S{j:02d}.L"
+        df, seed = _random_symbol(rng, sym, tiny=rng.random() < tiny_share)
+        frames.append(df)
+        if seed is not None or rng.random() < 0.5:  # missing key and explicit None both mean "no seed"
+            seeds[sym] = seed
+    df = pd.concat(frames, ignore_index=True).sort_values(["symbol", "date"], kind="stable").reset_index(drop=True)
+    return df, seeds
+
+
+def _scalar(df: pd.DataFrame, seeds: Dict[str, Optional[float]]) -> Tuple[pd.DataFrame, int, int]:
+    parts, n_down, n_up = [], 0, 0
+    for sym, g in df.groupby("symbol", sort=True):
+        g2, d, u = up._normalize_symbol_ohlc(g.copy(), seeds.get(sym), UPPER, LOWER, FACTOR)
+        parts.append(g2)
+        n_down += d
+        n_up += u
+    return pd.concat(parts, ignore_index=True), n_down, n_up
+
+
+class UkNormalizeEquivalenceTest(unittest.TestCase):
+    def assertSameBars(self, got: pd.DataFrame, want: pd.DataFrame, msg: str) -> None:
+        got = got.sort_values(["symbol", "date"]).reset_index(drop=True)
+        want = want.sort_values(["symbol", "date"]).reset_index(drop=True)
+        self.assertEqual(got["symbol"].tolist(), want["symbol"].tolist(), msg)
+        self.assertEqual(got["date"].tolist(), want["date"].tolist(), msg)
+        for c in PX + ("volume",):
+            # exact: the array form uses the same float ops as the loop; NaN == NaN here
+            np.testing.assert_array_equal(got[c].to_numpy(dtype=float), want[c].to_numpy(dtype=float), err_msg=f"{msg} {c}")
+
+    def test_segment_starts(self) -> None:
+        sym = np.array(["A", "A", "B", "C", "C", "C"], dtype=object)
+        self.assertEqual(up._segment_starts(sym).tolist(), [0, 0, 2, 3, 3, 3])
+        self.assertEqual(up._segment_starts(np.array([], dtype=object)).tolist(), [])
+
+    def test_apply_states(self) -> None:
+        df = pd.DataFrame({c: [100.0, 1.0, 2.0] for c in PX})
+        states = np.array([up._S_DOWN, up._S_KEEP, up._S_UP], dtype=np.int8)
+        self.assertEqual(up._apply_states(df, states, FACTOR), (1, 1))
+        for c in PX:
+            self.assertEqual(df[c].tolist(), [1.0, 1.0, 200.0])
+
+    def test_frame_matches_scalar(self) -> None:
+        rng = np.random.default_rng(SEED)
+        flipped = 0
+        for trial in range(300):
+            df, seeds = _random_universe(rng)
+            want, w_down, w_up = _scalar(df, seeds)
+            got, g_down, g_up = up._normalize_frame(df.copy(), seeds, UPPER, LOWER, FACTOR)
+            msg = f"trial {trial}"
+            self.assertSameBars(got, want, msg)
+            self.assertEqual((g_down, g_up), (w_down, w_up), msg)
+            flipped += w_down + w_up
+        self.assertGreater(flipped, 100)  # the generator really exercises the scale flips
+
+    def test_prices_long_matches_scalar_with_tiny_closes(self) -> None:
+        rng = np.random.default_rng(SEED + 1)
+        slow = 0
+        for trial in range(150):
+            df, seeds = _random_universe(rng, tiny_share=0.3)
+            close = df["close"].to_numpy(dtype=float)
+            with np.errstate(invalid="ignore"):
+                slow += int(((close > 1e-12) & (close * FACTOR**-2 <= 1e-12)).any())
+            want, _, _ = _scalar(df, seeds)
+            got = up._normalize_prices_long(df.copy(), seeds)
+            self.assertSameBars(got, want, f"trial {trial}")
+        self.assertGreater(slow, 10)  # the tiny-close slow path ran
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,7 +9,6 @@ from datetime import datetime, timedelta
 from typing import List, Optional, Tuple
 
 import pandas as pd
-import yfinance as yf
 
 
 @dataclass
@@ -61,7 +60,9 @@ def _write_cache(path: str, payload: dict) -> None:
 
 
 def _download_calendar_dates(ticker: str, start_dt: pd.Timestamp, end_dt: pd.Timestamp) -> List[pd.Timestamp]:
-    df = yf.download(
+    from markets.datasource import yf_download
+
+    df = yf_download(
         ticker,
         start=start_dt.strftime("%Y-%m-%d"),
         end=(end_dt + timedelta(days=1)).strftime("%Y-%m-%d"),